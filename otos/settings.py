@@ -54,6 +54,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'otosapp.middleware.AccessProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -218,6 +219,9 @@ STATICFILES_FINDERS = [
 ACCOUNT_ACTIVATION_TOKEN_VALID_HOURS = int(os.environ.get('ACCOUNT_ACTIVATION_TOKEN_VALID_HOURS', '24'))
 ACCOUNT_ACTIVATION_RESEND_COOLDOWN_MINUTES = int(os.environ.get('ACCOUNT_ACTIVATION_RESEND_COOLDOWN_MINUTES', '5'))
 
+# Token cron Vercel (dikirim sebagai "Authorization: Bearer <CRON_SECRET>"); kosong = endpoint cron mati
+CRON_SECRET = os.environ.get('CRON_SECRET', '')
+
 # Email backend defaults
 EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND') or (
     'django.core.mail.backends.console.EmailBackend' if DEBUG else 'django.core.mail.backends.smtp.EmailBackend'
@@ -13,6 +13,7 @@ from .models import (
     Message,
     BroadcastMessage,
     ThreadStatusLog,
+    ThreadBroadcastJob,
     University,
     UniversityTarget,
     TryoutPackage,
@@ -159,6 +160,24 @@ class ThreadStatusLogAdmin(admin.ModelAdmin):
 admin.site.register(ThreadStatusLog, ThreadStatusLogAdmin)
 
 
+class ThreadBroadcastJobAdmin(admin.ModelAdmin):
+    list_display = ('title', 'created_by', 'status', 'processed_count', 'total_count', 'created_at', 'finished_at')
+    list_filter = ('status', 'thread_type', 'created_at')
+    search_fields = ('title', 'created_by__username')
+    readonly_fields = (
+        'student_ids', 'processed_count', 'claimed_by', 'heartbeat_at', 'created_at', 'started_at', 'finished_at', 'error',
+    )
+    actions = ['retry_failed_jobs']
+
+    @admin.action(description='Antrekan ulang job yang gagal')
+    def retry_failed_jobs(self, request, queryset):
+        from .services.thread_broadcast import retry_job
+        retried = sum(retry_job(job) for job in queryset)
+        self.message_user(request, f'{retried} job dimasukkan kembali ke antrean.')
+
+admin.site.register(ThreadBroadcastJob, ThreadBroadcastJobAdmin)
+
+
 # ======================= UNIVERSITY ADMIN =======================
 
 class UniversityAdmin(admin.ModelAdmin):
@@ -6,7 +6,7 @@ from django.contrib import messages
 def admin_required(function):
     @wraps(function)
     def wrap(request, *args, **kwargs):
-        if request.user.is_authenticated and request.user.role.role_name == 'Admin':
+        if request.user.is_authenticated and request.user.access_profile.role_name == 'Admin':
             return function(request, *args, **kwargs)
         raise PermissionDenied
     return wrap
@@ -14,7 +14,7 @@ def admin_required(function):
 def operator_required(function):
     @wraps(function)
     def wrap(request, *args, **kwargs):
-        if request.user.is_authenticated and request.user.role.role_name == 'Operator':
+        if request.user.is_authenticated and request.user.access_profile.role_name == 'Operator':
             return function(request, *args, **kwargs)
         raise PermissionDenied
     return wrap
@@ -22,7 +22,7 @@ def operator_required(function):
 def admin_or_operator_required(function):
     @wraps(function)
     def wrap(request, *args, **kwargs):
-        if request.user.is_authenticated and (request.user.role.role_name == 'Admin' or request.user.role.role_name == 'Operator'):
+        if request.user.is_authenticated and (request.user.access_profile.role_name == 'Admin' or request.user.access_profile.role_name == 'Operator'):
             return function(request, *args, **kwargs)
         raise PermissionDenied
     return wrap
@@ -30,7 +30,7 @@ def admin_or_operator_required(function):
 def admin_or_teacher_required(function):
     @wraps(function)
     def wrap(request, *args, **kwargs):
-        if request.user.is_authenticated and (request.user.role.role_name == 'Admin' or request.user.role.role_name == 'Teacher'):
+        if request.user.is_authenticated and (request.user.access_profile.role_name == 'Admin' or request.user.access_profile.role_name == 'Teacher'):
             return function(request, *args, **kwargs)
         raise PermissionDenied
     return wrap
@@ -38,7 +38,7 @@ def admin_or_teacher_required(function):
 def admin_or_teacher_or_operator_required(function):
     @wraps(function)
     def wrap(request, *args, **kwargs):
-        if request.user.is_authenticated and (request.user.role.role_name in ['Admin', 'Teacher', 'Operator']):
+        if request.user.is_authenticated and (request.user.access_profile.role_name in ['Admin', 'Teacher', 'Operator']):
             return function(request, *args, **kwargs)
         raise PermissionDenied
     return wrap
@@ -46,7 +46,7 @@ def admin_or_teacher_or_operator_required(function):
 def students_required(function):
     @wraps(function)
     def wrap(request, *args, **kwargs):
-        if request.user.is_authenticated and request.user.role.role_name == 'Student':
+        if request.user.is_authenticated and request.user.access_profile.role_name == 'Student':
             return function(request, *args, **kwargs)
         raise PermissionDenied
     return wrap
@@ -54,7 +54,7 @@ def students_required(function):
 def visitor_required(function):
     @wraps(function)
     def wrap(request, *args, **kwargs):
-        if request.user.is_authenticated and request.user.role.role_name == 'Visitor':
+        if request.user.is_authenticated and request.user.access_profile.role_name == 'Visitor':
             return function(request, *args, **kwargs)
         raise PermissionDenied
     return wrap
@@ -62,7 +62,7 @@ def visitor_required(function):
 def visitor_or_student_required(function):
     @wraps(function)
     def wrap(request, *args, **kwargs):
-        if request.user.is_authenticated and request.user.role.role_name in ['Visitor', 'Student']:
+        if request.user.is_authenticated and request.user.access_profile.role_name in ['Visitor', 'Student']:
             return function(request, *args, **kwargs)
         raise PermissionDenied
     return wrap
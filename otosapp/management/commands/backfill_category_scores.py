@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from otosapp.models import Test
+from otosapp.services.scoring import record_category_scores
+
+
+class Command(BaseCommand):
+    help = "Isi tabel TestCategoryScore untuk test yang sudah disubmit"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Tulis ulang breakdown untuk semua test, bukan hanya yang belum punya data',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Jumlah test yang dibaca per batch',
+        )
+
+    def handle(self, *args, **options):
+        tests = Test.objects.filter(is_submitted=True).order_by('pk')
+        if not options['all']:
+            tests = tests.filter(category_scores__isnull=True)
+
+        processed = 0
+        for test in tests.iterator(chunk_size=options['batch_size']):
+            # Scores are left untouched; only the breakdown is (re)written
+            record_category_scores(test)
+            processed += 1
+            if processed % options['batch_size'] == 0:
+                self.stdout.write(f"{processed} test diproses...")
+
+        self.stdout.write(self.style.SUCCESS(f"Selesai: {processed} test diproses."))
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from otosapp.models import Category
+from otosapp.services.irt import IRT_MODELS, CalibrationError, calibrate_irt_category
+
+
+class Command(BaseCommand):
+    help = "Kalibrasi model IRT (1PL/2PL) kategori UTBK dari seluruh jawaban yang sudah disubmit"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--category',
+            type=int,
+            action='append',
+            dest='category_ids',
+            help='Kalibrasi kategori dengan ID ini (boleh diulang); default semua kategori UTBK bermode IRT',
+        )
+        parser.add_argument(
+            '--model',
+            choices=IRT_MODELS,
+            help='Aktifkan model ini untuk kategori yang dikalibrasi (default: model kategori, atau 2pl)',
+        )
+
+    def handle(self, *args, **options):
+        categories = Category.objects.filter(scoring_method='utbk').order_by('pk')
+        if options['category_ids']:
+            categories = categories.filter(pk__in=options['category_ids'])
+        else:
+            categories = categories.filter(utbk_model__in=IRT_MODELS)
+
+        calibrated = 0
+        for category in categories:
+            started = time.monotonic()
+            try:
+                result = calibrate_irt_category(category.pk, model=options['model'])
+            except CalibrationError as exc:
+                self.stdout.write(self.style.WARNING(f"{category.category_name}: {exc}"))
+                continue
+            calibrated += 1
+            self.stdout.write(
+                f"{category.category_name}: {result.model.upper()} dari {result.responses} jawaban "
+                f"({result.questions} soal, {result.tests} test), {result.iterations} iterasi, "
+                f"{time.monotonic() - started:.1f} detik"
+            )
+
+        if not calibrated and options['category_ids'] and not categories.exists():
+            raise CommandError("Kategori UTBK tidak ditemukan.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai: {calibrated} kategori dikalibrasi. Jalankan rescore_tests untuk memperbarui skor."
+        ))
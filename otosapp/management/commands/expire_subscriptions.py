@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from otosapp.services.subscription_expiry import sweep_expired_subscriptions
+
+
+class Command(BaseCommand):
+    help = "Nonaktifkan langganan yang sudah berakhir dan turunkan user ke Visitor (jalankan terjadwal, mis. tiap 5 menit)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Hanya hitung langganan yang akan dinonaktifkan tanpa menyimpan perubahan',
+        )
+
+    def handle(self, *args, **options):
+        result = sweep_expired_subscriptions(dry_run=options['dry_run'])
+        if result.skipped:
+            self.stdout.write(self.style.WARNING("Sweeper lain sedang berjalan; run ini dilewati."))
+            return
+        suffix = " (dry run)" if result.dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai: {result.expired_subscriptions} langganan berakhir, "
+            f"{result.downgraded_users} user diturunkan ke Visitor dalam {result.duration_ms:.0f} ms{suffix}."
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from otosapp.models import ThreadBroadcastJob
+from otosapp.services.thread_broadcast import process_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Kirim broadcast thread yang masih antre ke siswa (jalankan terjadwal, mis. tiap menit)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Jumlah job maksimum per run')
+
+    def handle(self, *args, **options):
+        result = process_pending_jobs(limit=options['limit'])
+        for job in ThreadBroadcastJob.objects.filter(pk__in=result.processed_jobs + result.failed_jobs):
+            line = f"Job #{job.pk} '{job.title}': {job.processed_count}/{job.total_count} siswa ({job.get_status_display()})"
+            if job.status == 'failed':
+                self.stdout.write(self.style.ERROR(f"{line} - {job.error}"))
+            else:
+                self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai: {len(result.processed_jobs)} job terkirim, {len(result.failed_jobs)} gagal."
+        ))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+
+from otosapp.models import Test, User
+from otosapp.services.student_momentum import (
+    compute_momentum_from_tests,
+    momentum_from_snapshot,
+    rebuild_momentum_snapshot,
+)
+
+
+class Command(BaseCommand):
+    help = "Bangun ulang MomentumSnapshot siswa dari data test yang sudah disubmit"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Hanya bangun ulang siswa dengan ID ini (boleh diulang)',
+        )
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Bandingkan hasil snapshot dengan perhitungan langsung dari tabel Test',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if not user_ids:
+            user_ids = (
+                Test.objects.filter(is_submitted=True)
+                .order_by('student_id')
+                .values_list('student_id', flat=True)
+                .distinct()
+            )
+
+        processed = 0
+        mismatched = 0
+        for user_id in user_ids:
+            snapshot = rebuild_momentum_snapshot(user_id)
+            processed += 1
+            if options['verify']:
+                user = User.objects.select_related('role').get(pk=user_id)
+                stored = momentum_from_snapshot(user, snapshot)
+                expected = compute_momentum_from_tests(user)
+                differing = sorted(key for key in expected if stored.get(key) != expected[key])
+                if differing:
+                    mismatched += 1
+                    self.stdout.write(self.style.WARNING(f"Siswa {user_id}: berbeda pada {', '.join(differing)}"))
+            if processed % 500 == 0:
+                self.stdout.write(f"{processed} siswa diproses...")
+
+        summary = f"Selesai: snapshot {processed} siswa dibangun ulang."
+        if options['verify']:
+            summary += f" {mismatched} siswa berbeda dari perhitungan langsung."
+        self.stdout.write(self.style.SUCCESS(summary))
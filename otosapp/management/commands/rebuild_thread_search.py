@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from otosapp.models import MessageThread
+from otosapp.services.thread_search import refresh_thread_document
+
+
+class Command(BaseCommand):
+    help = "Bangun ulang dokumen pencarian full-text untuk semua thread pesan"
+
+    def handle(self, *args, **options):
+        total = 0
+        for thread in MessageThread.objects.only('pk', 'title').iterator(chunk_size=500):
+            refresh_thread_document(thread)
+            total += 1
+        if connection.vendor == 'sqlite':
+            # Sinkronkan ulang tabel FTS5 dengan tabel dokumen
+            with connection.cursor() as cursor:
+                cursor.execute("INSERT INTO otosapp_threadsearch_fts(otosapp_threadsearch_fts) VALUES ('rebuild')")
+        self.stdout.write(self.style.SUCCESS(f"Selesai: {total} dokumen thread dibangun ulang."))
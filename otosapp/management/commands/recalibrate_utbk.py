@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from otosapp.models import Category
+from otosapp.services.utbk_calibration import calibrate_categories
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang koefisien kesulitan UTBK untuk kategori ber-scoring UTBK"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--category',
+            type=int,
+            action='append',
+            dest='category_ids',
+            help='Hanya kalibrasi kategori dengan ID ini (boleh diulang)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Tampilkan perubahan koefisien tanpa menyimpannya',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Jumlah proses paralel (satu kategori per proses)',
+        )
+
+    def handle(self, *args, **options):
+        categories = Category.objects.filter(scoring_method='utbk').order_by('pk')
+        if options['category_ids']:
+            categories = categories.filter(pk__in=options['category_ids'])
+        names = dict(categories.values_list('pk', 'category_name'))
+
+        results = calibrate_categories(list(names), dry_run=options['dry_run'], workers=options['workers'])
+
+        changed = 0
+        for result in results:
+            changed += len(result.changes)
+            self.stdout.write(
+                f"{names[result.category_id]}: {len(result.changes)} dari {result.calibrated_questions} soal berubah"
+            )
+            if options['dry_run']:
+                for change in result.changes:
+                    self.stdout.write(
+                        f"  soal {change.question_id}: {change.old:.4f} -> {change.new:.4f}"
+                        f" (benar {change.success_rate:.0%})"
+                    )
+
+        action = "akan diperbarui (dry run)" if options['dry_run'] else "diperbarui"
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai: {len(results)} kategori diproses, {changed} koefisien {action}."
+        ))
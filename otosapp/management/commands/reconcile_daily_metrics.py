@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from otosapp.services.admin_metrics import reconcile_range, refresh_daily_metrics
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang rollup DailyMetrics dari tabel sumber (jalankan setiap malam)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=2,
+            help='Jumlah hari terakhir yang dihitung ulang, termasuk hari ini (default: 2)',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Hitung ulang seluruh riwayat sejak data paling awal',
+        )
+
+    def handle(self, *args, **options):
+        start, end = reconcile_range(None if options['all'] else max(1, options['days']))
+        refreshed = refresh_daily_metrics(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Selesai: {refreshed} hari diperbarui ({start} s.d. {end})."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from otosapp.services.inbox_badges import reconcile_badges
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang counter badge inbox dan pembayaran pending (jalankan berkala)"
+
+    def handle(self, *args, **options):
+        pending = reconcile_badges()
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai: counter pesan belum dibaca direset, {pending} pembayaran pending."
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from otosapp.models import Test
+from otosapp.services.leaderboard import refresh_expired_entries, refresh_student_leaderboard
+
+
+class Command(BaseCommand):
+    help = "Perbarui tabel leaderboard (default: hanya baris jendela waktu yang kedaluwarsa)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Bangun ulang leaderboard untuk semua siswa yang punya test tersubmit',
+        )
+
+    def handle(self, *args, **options):
+        if not options['all']:
+            refreshed = refresh_expired_entries()
+            self.stdout.write(self.style.SUCCESS(f"Selesai: {refreshed} siswa diperbarui."))
+            return
+
+        student_ids = (
+            Test.objects.filter(is_submitted=True)
+            .order_by('student_id')
+            .values_list('student_id', flat=True)
+            .distinct()
+        )
+        processed = 0
+        for student_id in student_ids.iterator():
+            refresh_student_leaderboard(student_id)
+            processed += 1
+            if processed % 500 == 0:
+                self.stdout.write(f"{processed} siswa diproses...")
+
+        self.stdout.write(self.style.SUCCESS(f"Selesai: leaderboard {processed} siswa dibangun ulang."))
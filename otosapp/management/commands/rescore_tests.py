@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from otosapp.models import Test
+from otosapp.services.scoring import SCORING_VERSION
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang skor test yang sudah disubmit (default: hanya yang stale)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Hitung ulang semua test yang sudah disubmit, bukan hanya yang stale',
+        )
+        parser.add_argument('--package', type=int, help='Batasi ke ID paket tryout tertentu')
+        parser.add_argument('--category', type=int, help='Batasi ke ID kategori tertentu')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Jumlah test yang dibaca per batch',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Tampilkan jumlah test yang akan dihitung ulang tanpa menyimpan perubahan',
+        )
+
+    def handle(self, *args, **options):
+        tests = Test.objects.filter(is_submitted=True).order_by('pk')
+        if not options['all']:
+            tests = tests.exclude(scoring_version=SCORING_VERSION)
+        if options['package']:
+            tests = tests.filter(tryout_package_id=options['package'])
+        if options['category']:
+            tests = tests.filter(categories__id=options['category']).distinct()
+
+        if options['dry_run']:
+            self.stdout.write(f"{tests.count()} test akan dihitung ulang (versi penilaian {SCORING_VERSION}).")
+            return
+
+        processed = 0
+        changed = 0
+        for test in tests.iterator(chunk_size=options['batch_size']):
+            previous_score = test.score
+            test.calculate_score()
+            processed += 1
+            if test.score != previous_score:
+                changed += 1
+            if processed % options['batch_size'] == 0:
+                self.stdout.write(f"{processed} test diproses...")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai: {processed} test dihitung ulang, {changed} skor berubah."
+        ))
@@ -0,0 +1,18 @@
+from .services.access import resolve_request_profile
+
+
+class AccessProfileMiddleware:
+    """Resolve role, subscription and access tier of ``request.user`` once per request.
+
+    Must come after ``AuthenticationMiddleware``. The profile is kept in the
+    session for a short TTL, so permission checks in decorators, views,
+    templates and context processors do not query the role or subscription
+    tables again.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.access_profile = resolve_request_profile(request)
+        return self.get_response(request)
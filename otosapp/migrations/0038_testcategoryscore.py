@@ -0,0 +1,31 @@
+# Generated by Django 5.1.2 on 2026-10-17 01:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0037_subscriptionpackagepricehistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestCategoryScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('answered', models.PositiveIntegerField(default=0)),
+                ('max_score', models.FloatField(blank=True, help_text='Skor maksimum kategori di paket (kosong jika bukan bagian paket)', null=True)),
+                ('contribution', models.FloatField(default=0, help_text='Kontribusi kategori terhadap skor test')),
+                ('percentage', models.FloatField(default=0, help_text='Persentase jawaban benar (0-100)')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_scores', to='otosapp.category')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_scores', to='otosapp.test')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'test'], name='otosapp_tes_categor_529a84_idx')],
+                'unique_together': {('test', 'category')},
+            },
+        ),
+    ]
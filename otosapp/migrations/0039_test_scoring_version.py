@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-17 01:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0038_testcategoryscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='scored_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Scored At'),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='scoring_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Scoring Version'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-17 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0039_test_scoring_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tryoutpackage',
+            name='layout_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
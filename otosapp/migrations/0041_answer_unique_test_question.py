@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-17 01:32
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_answers(apps, schema_editor):
+    """Keep the most recently written answer for every (test, question) pair."""
+    Answer = apps.get_model("otosapp", "Answer")
+
+    duplicates = (
+        Answer.objects.values("test_id", "question_id")
+        .annotate(answer_count=Count("id"), keep_id=Max("id"))
+        .filter(answer_count__gt=1)
+    )
+    for row in duplicates.iterator():
+        Answer.objects.filter(test_id=row["test_id"], question_id=row["question_id"]).exclude(
+            id=row["keep_id"]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0040_tryoutpackage_layout_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_answers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='answer',
+            constraint=models.UniqueConstraint(fields=('test', 'question'), name='unique_answer_per_test_question'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.2 on 2026-10-17 01:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0041_answer_unique_test_question'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ranking_type', models.CharField(choices=[('utbk_package_best', 'Skor Terbaik Paket UTBK'), ('overall_average', 'Rata-rata Keseluruhan'), ('category_best', 'Skor Terbaik Kategori'), ('category_average', 'Rata-rata Kategori')], max_length=30)),
+                ('time_period', models.CharField(choices=[('all', 'Semua Waktu'), ('week', '7 Hari'), ('month', '30 Hari'), ('year', '365 Hari')], default='all', max_length=10)),
+                ('scoring_method', models.CharField(default='all', max_length=20)),
+                ('package_key', models.PositiveIntegerField(default=0)),
+                ('category_key', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(help_text='Nilai yang diurutkan (skor terbaik atau rata-rata sesuai tipe ranking)')),
+                ('avg_score', models.FloatField(default=0)),
+                ('max_score', models.FloatField(default=0)),
+                ('total_tests', models.PositiveIntegerField(default=0)),
+                ('latest_test_at', models.DateTimeField(blank=True, null=True)),
+                ('university_score', models.FloatField(blank=True, help_text='Skor UTBK yang dipakai untuk status target universitas', null=True)),
+                ('expires_at', models.DateTimeField(blank=True, help_text='Kapan test tertua di jendela waktu ini keluar dari jendela (baris harus dihitung ulang)', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('display_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='otosapp.category')),
+                ('display_test', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='otosapp.test')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ranking_type', 'time_period', 'scoring_method', 'package_key', 'category_key', '-score'], name='leaderboard_rank_idx'), models.Index(fields=['expires_at'], name='leaderboard_expiry_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ranking_type', 'time_period', 'scoring_method', 'package_key', 'category_key', 'student'), name='unique_leaderboard_entry')],
+            },
+        ),
+    ]
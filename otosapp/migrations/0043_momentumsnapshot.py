@@ -0,0 +1,42 @@
+# Generated by Django 5.1.2 on 2026-10-17 01:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0042_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MomentumSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('daily_buckets', models.JSONField(blank=True, default=dict)),
+                ('total_tests', models.PositiveIntegerField(default=0)),
+                ('total_score', models.FloatField(default=0)),
+                ('max_score', models.FloatField(default=0)),
+                ('first_score', models.FloatField(blank=True, null=True)),
+                ('recent_scores', models.JSONField(blank=True, default=list, help_text='Skor 3 test terakhir, urut waktu')),
+                ('streak_run', models.PositiveIntegerField(default=0, help_text='Panjang streak yang berakhir di last_activity')),
+                ('longest_streak', models.PositiveIntegerField(default=0)),
+                ('last_activity', models.DateField(blank=True, null=True)),
+                ('best_score', models.FloatField(blank=True, null=True)),
+                ('best_taken_at', models.DateTimeField(blank=True, null=True)),
+                ('best_label', models.CharField(blank=True, max_length=200)),
+                ('last_test_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('best_test', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='otosapp.test')),
+                ('last_test', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='otosapp.test')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='momentum_snapshot', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Snapshot Momentum',
+                'verbose_name_plural': 'Snapshot Momentum',
+            },
+        ),
+    ]
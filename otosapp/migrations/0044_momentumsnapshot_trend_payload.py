@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-17 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0043_momentumsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='momentumsnapshot',
+            name='trend_payload',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-17 01:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0044_momentumsnapshot_trend_payload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='Tanggal lokal', unique=True)),
+                ('signups', models.PositiveIntegerField(default=0)),
+                ('payments_created', models.PositiveIntegerField(default=0)),
+                ('payments_pending', models.PositiveIntegerField(default=0)),
+                ('payments_rejected', models.PositiveIntegerField(default=0)),
+                ('approved_payments', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('new_subscriptions', models.PositiveIntegerField(default=0)),
+                ('active_subscriptions', models.PositiveIntegerField(blank=True, help_text='Jumlah langganan aktif saat baris ini terakhir dihitung sebagai hari berjalan', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Metrik Harian',
+                'verbose_name_plural': 'Metrik Harian',
+                'ordering': ['day'],
+            },
+        ),
+    ]
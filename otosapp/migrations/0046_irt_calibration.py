@@ -0,0 +1,48 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0045_dailymetrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='irt_calibrated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='utbk_model',
+            field=models.CharField(choices=[('linear', 'Peringkat Linear'), ('1pl', 'IRT 1PL (Rasch)'), ('2pl', 'IRT 2PL')], default='linear', help_text='Model kalibrasi skor UTBK: koefisien linear atau estimasi IRT (lihat perintah calibrate_irt)', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='irt_difficulty',
+            field=models.FloatField(blank=True, editable=False, help_text='Parameter kesulitan IRT (b)', null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='irt_discrimination',
+            field=models.FloatField(blank=True, editable=False, help_text='Parameter daya beda IRT (a)', null=True),
+        ),
+        migrations.CreateModel(
+            name='TestAbilityEstimate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('theta', models.FloatField()),
+                ('standard_error', models.FloatField(blank=True, null=True)),
+                ('estimated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ability_estimates', to='otosapp.category')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ability_estimates', to='otosapp.test')),
+            ],
+            options={
+                'unique_together': {('test', 'category')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0046_irt_calibration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThreadParticipantState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('thread', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participant_states', to='otosapp.messagethread')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thread_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Status Baca Thread',
+                'verbose_name_plural': 'Status Baca Thread',
+                'unique_together': {('thread', 'user')},
+            },
+        ),
+    ]
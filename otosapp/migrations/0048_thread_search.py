@@ -0,0 +1,102 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Indeks full-text dibuat per vendor: kolom tsvector ter-generate + GIN di Postgres,
+# tabel FTS5 (external content) + trigger di SQLite. Vendor lain memakai fallback icontains.
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE otosapp_threadsearchdocument ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX otosapp_threadsearch_vector_gin ON otosapp_threadsearchdocument USING GIN (search_vector)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS otosapp_threadsearch_vector_gin",
+    "ALTER TABLE otosapp_threadsearchdocument DROP COLUMN IF EXISTS search_vector",
+]
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE otosapp_threadsearch_fts USING fts5(
+        title, body,
+        content='otosapp_threadsearchdocument', content_rowid='thread_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER otosapp_threadsearch_ai AFTER INSERT ON otosapp_threadsearchdocument BEGIN
+        INSERT INTO otosapp_threadsearch_fts(rowid, title, body) VALUES (new.thread_id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER otosapp_threadsearch_ad AFTER DELETE ON otosapp_threadsearchdocument BEGIN
+        INSERT INTO otosapp_threadsearch_fts(otosapp_threadsearch_fts, rowid, title, body)
+        VALUES ('delete', old.thread_id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER otosapp_threadsearch_au AFTER UPDATE ON otosapp_threadsearchdocument BEGIN
+        INSERT INTO otosapp_threadsearch_fts(otosapp_threadsearch_fts, rowid, title, body)
+        VALUES ('delete', old.thread_id, old.title, old.body);
+        INSERT INTO otosapp_threadsearch_fts(rowid, title, body) VALUES (new.thread_id, new.title, new.body);
+    END
+    """,
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS otosapp_threadsearch_au",
+    "DROP TRIGGER IF EXISTS otosapp_threadsearch_ad",
+    "DROP TRIGGER IF EXISTS otosapp_threadsearch_ai",
+    "DROP TABLE IF EXISTS otosapp_threadsearch_fts",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE})
+
+
+def backfill_documents(apps, schema_editor):
+    MessageThread = apps.get_model('otosapp', 'MessageThread')
+    Message = apps.get_model('otosapp', 'Message')
+    ThreadSearchDocument = apps.get_model('otosapp', 'ThreadSearchDocument')
+    bodies = {}
+    for thread_id, content in Message.objects.order_by('thread_id', 'created_at').values_list('thread_id', 'content').iterator():
+        bodies.setdefault(thread_id, []).append(content)
+    documents = [
+        ThreadSearchDocument(thread_id=pk, title=title, body='\n'.join(bodies.get(pk, [])))
+        for pk, title in MessageThread.objects.values_list('pk', 'title').iterator()
+    ]
+    ThreadSearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0047_thread_participant_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThreadSearchDocument',
+            fields=[
+                ('thread', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='otosapp.messagethread')),
+                ('title', models.CharField(max_length=200)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
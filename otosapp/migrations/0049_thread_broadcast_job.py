@@ -0,0 +1,41 @@
+# Generated by Django 5.1.2 on 2026-10-17 02:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0048_thread_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThreadBroadcastJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('thread_type', models.CharField(choices=[('academic', 'Pertanyaan Materi'), ('technical', 'Masalah Teknis/Aplikasi'), ('report', 'Pelaporan Masalah'), ('general', 'Umum'), ('info', 'Informasi Admin')], default='general', max_length=20)),
+                ('priority', models.CharField(default='normal', max_length=10)),
+                ('content', models.TextField()),
+                ('student_ids', models.JSONField(default=list, help_text='ID siswa penerima, urut pengiriman')),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('processed_count', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('pending', 'Menunggu'), ('running', 'Diproses'), ('completed', 'Selesai'), ('failed', 'Gagal')], default='pending', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='otosapp.category')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='thread_broadcast_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Job Broadcast Thread',
+                'verbose_name_plural': 'Job Broadcast Thread',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='otosapp_thr_status_635695_idx')],
+            },
+        ),
+    ]
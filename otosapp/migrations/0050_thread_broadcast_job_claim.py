@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-17 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0049_thread_broadcast_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='threadbroadcastjob',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='threadbroadcastjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-17 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0050_thread_broadcast_job_claim'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskLock',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('holder', models.CharField(blank=True, max_length=32)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_finished_at', models.DateTimeField(blank=True, null=True)),
+                ('last_result', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'verbose_name': 'Lock Tugas Terjadwal',
+                'verbose_name_plural': 'Lock Tugas Terjadwal',
+            },
+        ),
+    ]
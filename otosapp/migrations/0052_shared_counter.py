@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-17 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0051_task_lock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SharedCounter',
+            fields=[
+                ('name', models.CharField(max_length=150, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Counter Bersama',
+                'verbose_name_plural': 'Counter Bersama',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-17 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otosapp', '0052_shared_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='access_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
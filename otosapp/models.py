@@ -6,7 +6,7 @@ from datetime import timedelta
 import re
 from django.conf import settings
 import os
-from django.db.models.signals import pre_delete
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from .utils import generate_unique_filename
 
@@ -56,6 +56,22 @@ ACCESS_LEVEL_DESCRIPTIONS = {
 }
 
 
+def _skip_version_field(instance, save_kwargs, name):
+    """Leave counter ``name`` out of an ordinary save of an existing row.
+
+    Such counters are only bumped with ``UPDATE ... F() + 1``; an instance
+    loaded before a bump must not write the old value back. Passing
+    ``update_fields`` explicitly still writes whatever it lists.
+    """
+    if save_kwargs.get('update_fields') is not None or instance._state.adding or save_kwargs.get('force_insert'):
+        return
+    deferred = instance.get_deferred_fields()
+    save_kwargs['update_fields'] = [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name != name and field.attname not in deferred
+    ]
+
+
 class User(AbstractUser):
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=20, null=True, blank=True, verbose_name='Phone Number')
@@ -64,6 +80,8 @@ class User(AbstractUser):
     role = models.ForeignKey('Role', on_delete=models.SET_NULL, null=True)
     profile_picture = models.ImageField(upload_to='profile_pictures/', null=True, blank=True, storage=get_storage, max_length=500)
     email_verified_at = models.DateTimeField(null=True, blank=True)
+    # Dinaikkan oleh mark_access_changed; profil akses di session dibandingkan dengan nilai ini
+    access_version = models.PositiveIntegerField(default=0, editable=False)
 
     groups = models.ManyToManyField(
         Group,
@@ -80,25 +98,49 @@ class User(AbstractUser):
         verbose_name="user permissions"
     )
     
+    def save(self, *args, **kwargs):
+        # access_version hanya diubah lewat UPDATE F() di mark_access_changed
+        _skip_version_field(self, kwargs, 'access_version')
+        super().save(*args, **kwargs)
+
+    @property
+    def access_profile(self):
+        """Role & subscription resolved once per instance (set by AccessProfileMiddleware for request.user)"""
+        profile = self.__dict__.get('_access_profile')
+        if profile is None or profile.role_id != self.role_id:
+            from .services.access import build_access_profile
+            profile = self._access_profile = build_access_profile(self)
+        return profile
+
+    def clear_access_profile(self):
+        self.__dict__.pop('_access_profile', None)
+
+    def _role_name(self):
+        # Cek role saja tidak perlu memuat subscription bila profil belum ada
+        profile = self.__dict__.get('_access_profile')
+        if profile is not None and profile.role_id == self.role_id:
+            return profile.role_name
+        return self.role.role_name if self.role else None
+
     def is_visitor(self):
         """Check if user has visitor role"""
-        return self.role and self.role.role_name == 'Visitor'
+        return self._role_name() == 'Visitor'
     
     def is_student(self):
         """Check if user has student role"""
-        return self.role and self.role.role_name == 'Student'
+        return self._role_name() == 'Student'
     
     def is_admin(self):
         """Check if user has admin role"""
-        return self.role and self.role.role_name == 'Admin'
+        return self._role_name() == 'Admin'
     
     def is_operator(self):
         """Check if user has operator role"""
-        return self.role and self.role.role_name == 'Operator'
+        return self._role_name() == 'Operator'
     
     def is_teacher(self):
         """Check if user has teacher role"""
-        return self.role and self.role.role_name == 'Teacher'
+        return self._role_name() == 'Teacher'
     
     @property
     def is_email_verified(self):
@@ -113,46 +155,15 @@ class User(AbstractUser):
 
     def has_active_subscription(self):
         """Check if user has active subscription"""
-        try:
-            subscription = self.subscription
-            # Subscription aktif jika: is_active=True DAN belum expired
-            return subscription.is_active and not subscription.is_expired()
-        except UserSubscription.DoesNotExist:
-            return False
+        return self.access_profile.has_active_subscription()
     
     def get_access_level(self):
         """Return the user's current access tier for gated tryouts."""
-        if getattr(self, 'is_superuser', False):
-            return AccessLevel.TUNTAS
-
-        try:
-            if self.is_admin() or self.is_operator() or self.is_teacher():
-                return AccessLevel.TUNTAS
-        except AttributeError:
-            pass
-
-        try:
-            if self.is_student():
-                if self.has_active_subscription():
-                    try:
-                        return self.subscription.package.access_level
-                    except (UserSubscription.DoesNotExist, AttributeError):
-                        pass
-                return AccessLevel.VISITOR
-        except AttributeError:
-            pass
-
-        try:
-            if self.is_visitor():
-                return AccessLevel.VISITOR
-        except AttributeError:
-            pass
-
-        return AccessLevel.SILVER
+        return self.access_profile.access_level
 
     def can_access_tryouts(self):
         """Check if user can access tryout features"""
-        return self.is_student() and self.has_active_subscription()
+        return self.access_profile.can_access_tryouts()
     
     def get_subscription_status(self):
         """Get detailed subscription status"""
@@ -237,11 +248,23 @@ class Category(models.Model):
         ('custom', 'Custom'),
         ('utbk', 'UTBK'),
     ]
+    UTBK_MODELS = [
+        ('linear', 'Peringkat Linear'),
+        ('1pl', 'IRT 1PL (Rasch)'),
+        ('2pl', 'IRT 2PL'),
+    ]
     
     category_name = models.CharField(max_length=200)
     time_limit = models.IntegerField(default=60, help_text="Time limit in minutes (default: 60 minutes)")
     scoring_method = models.CharField(max_length=10, choices=SCORING_METHODS, default='default')
     passing_score = models.FloatField(default=75.0, help_text="Minimum score required to pass (0-100)")
+    utbk_model = models.CharField(
+        max_length=10,
+        choices=UTBK_MODELS,
+        default='linear',
+        help_text="Model kalibrasi skor UTBK: koefisien linear atau estimasi IRT (lihat perintah calibrate_irt)"
+    )
+    irt_calibrated_at = models.DateTimeField(null=True, blank=True, editable=False)
     release_date = models.DateTimeField(default=timezone.now, help_text="Tanggal rilis subtest ini")
     # Optional owner (teacher) who created/maintains this category
     created_by = models.ForeignKey(
@@ -294,107 +317,15 @@ class Category(models.Model):
     
     def get_pass_rate(self):
         """Calculate pass rate percentage for this category"""
-        # Get all submitted tests for this category
-        completed_tests = Test.objects.filter(
-            categories=self,
-            is_submitted=True
-        )
-        
-        if not completed_tests.exists():
-            return None
-        
-        total_tests = completed_tests.count()
-        passed_tests = completed_tests.filter(score__gte=self.passing_score).count()
-        
-        return round((passed_tests / total_tests) * 100, 1)
+        return self.get_test_statistics()['pass_rate']
     
     def get_test_statistics(self):
-        """Get comprehensive test statistics for this category"""
-        completed_tests = Test.objects.filter(
-            categories=self,
-            is_submitted=True
-        )
-        
-        if not completed_tests.exists():
-            return {
-                'total_tests': 0,
-                'total_students': 0,
-                'passed_tests': 0,
-                'failed_tests': 0,
-                'pass_rate': None,
-                'average_score': None
-            }
-        
-        total_tests = completed_tests.count()
-        
-        # Count unique students who took the test
-        total_students = completed_tests.values('student').distinct().count()
-        
-        passed_tests = completed_tests.filter(score__gte=self.passing_score).count()
-        failed_tests = total_tests - passed_tests
-        pass_rate = round((passed_tests / total_tests) * 100, 1)
-        
-        # Calculate average score per this category
-        total_score = 0
-        for test in completed_tests:
-            # If test is a package test, compute this category's contribution
-            if test.tryout_package:
-                pkg_cat = test.tryout_package.tryoutpackagecategory_set.filter(category=self).first()
-                if not pkg_cat:
-                    # Category not part of the package for this test — try to compute from answers if any
-                    category_answers = test.answers.filter(question__category=self)
-                    if category_answers.exists():
-                        correct_answers = category_answers.filter(selected_choice__is_correct=True).count()
-                        total_questions = category_answers.count()
-                        if total_questions:
-                            # Fallback: scale to 100 (or to package unit if unknown) — use percentage * 100
-                            total_score += (correct_answers / total_questions) * 100
-                    # otherwise skip
-                    continue
-
-                # Compute contribution based on the answers for this category
-                category_answers = test.answers.filter(question__category=self)
-                if category_answers.exists():
-                    correct_answers = category_answers.filter(selected_choice__is_correct=True).count()
-                    total_questions = category_answers.count()
-                    category_score_percentage = (correct_answers / total_questions) if total_questions else 0
-                    category_contribution = category_score_percentage * pkg_cat.max_score
-                    total_score += category_contribution
-                else:
-                    # No answers for this category in this package test — treat as 0
-                    total_score += 0
-            else:
-                # Non-package test: score field already represents this category
-                total_score += test.score
-
-        average_score = round(total_score / total_tests, 1)
-
-        # Calculate average completion time (in minutes) for submitted tests
-        durations_seconds = []
-        for t in completed_tests:
-            if t.start_time and t.end_time:
-                try:
-                    delta = t.end_time - t.start_time
-                    seconds = delta.total_seconds()
-                    if seconds and seconds > 0:
-                        durations_seconds.append(seconds)
-                except Exception:
-                    # Skip any problematic timestamps
-                    continue
-
-        average_completion_minutes = None
-        if durations_seconds:
-            average_completion_minutes = round((sum(durations_seconds) / len(durations_seconds)) / 60, 1)
-
-        return {
-            'total_tests': total_tests,
-            'total_students': total_students,
-            'passed_tests': passed_tests,
-            'failed_tests': failed_tests,
-            'pass_rate': pass_rate,
-            'average_score': average_score,
-            'average_completion_minutes': average_completion_minutes
-        }
+        """Get comprehensive test statistics for this category (memoized, see services.category_stats)"""
+        stats = getattr(self, '_test_statistics', None)
+        if stats is None:
+            from .services.category_stats import get_category_statistics
+            stats = self._test_statistics = get_category_statistics([self.pk])[self.pk]
+        return stats
     
     def get_passing_score(self):
         """Get passing score for this category"""
@@ -446,6 +377,9 @@ class TryoutPackage(models.Model):
     
     # Categories in this package
     categories = models.ManyToManyField(Category, through='TryoutPackageCategory')
+
+    # Dinaikkan setiap kali urutan soal paket berubah (kunci cache layout paket)
+    layout_version = models.PositiveIntegerField(default=0, editable=False)
     
     def __str__(self):
         return self.package_name
@@ -485,53 +419,15 @@ class TryoutPackage(models.Model):
         elif self.is_free_for_visitors and self.required_access_level != AccessLevel.VISITOR:
             # Prevent mismatched state where checkbox is True but tier isn't visitor
             self.is_free_for_visitors = False
+        # layout_version hanya diubah lewat bump_layout_version
+        _skip_version_field(self, kwargs, 'layout_version')
         super().save(*args, **kwargs)
 
     def is_accessible_by(self, user):
         """Determine if a given user can access this tryout package"""
         if user is None or not getattr(user, 'is_authenticated', False):
             return False
-
-        # Superuser or staff fallback
-        if getattr(user, 'is_superuser', False):
-            return True
-
-        # Admin/operator/teacher roles retain access to manage/testing purposes
-        try:
-            if user.is_admin() or user.is_operator() or user.is_teacher():
-                return True
-        except AttributeError:
-            pass
-
-        required_level = getattr(self, 'required_access_level', AccessLevel.SILVER)
-
-        # Determine the user's current tier
-        try:
-            user_level = user.get_access_level()
-        except AttributeError:
-            user_level = AccessLevel.VISITOR
-
-        # Students require sufficient subscription tier
-        try:
-            if user.is_student() and user.can_access_tryouts():
-                if AccessLevel.meets_requirement(user_level, required_level):
-                    return True
-        except AttributeError:
-            pass
-
-        # Visitors may access only if tier requirement aligns and package is free
-        try:
-            if user.is_visitor():
-                if required_level == AccessLevel.VISITOR and self.is_free_for_visitors:
-                    return True
-        except AttributeError:
-            pass
-
-        # Fallback: allow higher-tier subscribers (e.g., Gold accessing Silver)
-        if AccessLevel.meets_requirement(user_level, required_level) and user_level != AccessLevel.VISITOR:
-            return True
-
-        return False
+        return user.access_profile.can_access_package(self.required_access_level, self.is_free_for_visitors)
 
     def is_locked_for(self, user):
         """Helper for templates: package locked state for a user"""
@@ -574,6 +470,8 @@ class Question(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     custom_weight = models.FloatField(default=0, help_text="Custom weight for scoring (0-100)")
     difficulty_coefficient = models.FloatField(default=1.0, help_text="UTBK difficulty coefficient (auto-calculated)")
+    irt_difficulty = models.FloatField(null=True, blank=True, editable=False, help_text="Parameter kesulitan IRT (b)")
+    irt_discrimination = models.FloatField(null=True, blank=True, editable=False, help_text="Parameter daya beda IRT (a)")
     question_type = models.CharField(max_length=20, choices=QUESTION_TYPES, default='multiple_choice', help_text="Tipe soal: pilihan ganda atau isian")
     correct_answer_text = models.TextField(blank=True, null=True, help_text="Jawaban benar untuk soal isian (pisahkan dengan koma jika ada beberapa jawaban yang benar)")
     explanation = models.TextField(blank=True, null=True, help_text="Pembahasan atau penjelasan mengapa jawabannya demikian (opsional)")
@@ -619,11 +517,16 @@ class Question(models.Model):
     
     def check_essay_answer(self, user_answer):
         """Check if user's essay answer is correct"""
-        if not user_answer or not self.correct_answer_text:
+        return self.essay_answer_matches(self.correct_answer_text, user_answer)
+
+    @staticmethod
+    def essay_answer_matches(correct_answer_text, user_answer):
+        """Compare an essay answer against comma separated correct answers (no instance needed)"""
+        if not user_answer or not correct_answer_text:
             return False
         
         user_answer_clean = user_answer.strip().lower()
-        correct_answers = self.get_correct_answers_list()
+        correct_answers = [answer.strip().lower() for answer in correct_answer_text.split(',') if answer.strip()]
         
         return user_answer_clean in correct_answers
 
@@ -673,6 +576,9 @@ class Choice(models.Model):
         super().delete(*args, **kwargs)
 
 class Test(models.Model):
+    # Batas lulus tryout paket: 60% dari 7000
+    PACKAGE_PASSING_SCORE = 4200
+
     student = models.ForeignKey(
         User, on_delete=models.CASCADE,
         limit_choices_to={'userprofile__role__role_name': 'Student'},
@@ -698,92 +604,39 @@ class Test(models.Model):
     # Track current question position
     current_question = models.IntegerField(default=1, verbose_name="Current Question Index")
 
+    # Versi engine penilaian yang menghasilkan `score`; 0 berarti perlu dihitung ulang
+    scoring_version = models.PositiveIntegerField(default=0, verbose_name="Scoring Version")
+    scored_at = models.DateTimeField(null=True, blank=True, verbose_name="Scored At")
+
     def __str__(self):
         return f"Test by {self.student.username} on {self.date_taken}"
 
     def calculate_score(self):
         """Calculate score based on category scoring method or package scoring"""
-        answers = self.answers.all()
-        if not answers.exists():
-            self.score = 0
-            self.save()
-            return
+        from .services.scoring import SCORING_VERSION, score_test
 
-        # If this is a package test, use package scoring
-        if self.tryout_package:
-            self._calculate_package_score()
-        else:
-            # Single category test
-            category = answers.first().question.category
-            
-            if category.scoring_method == 'default':
-                self._calculate_default_score()
-            elif category.scoring_method == 'custom':
-                self._calculate_custom_score()
-            elif category.scoring_method == 'utbk':
-                self._calculate_utbk_score()
-        
+        result = score_test(self)
+        if result.score is not None:
+            self.score = result.score
+        self.scoring_version = SCORING_VERSION
+        self.scored_at = timezone.now()
         self.save()
-    
-    def _calculate_package_score(self):
-        """Calculate score for package-based test with weighted categories"""
-        total_score = 0
-        
-        # Calculate score for each category in the package
-        for package_category in self.tryout_package.tryoutpackagecategory_set.all():
-            category = package_category.category
-            
-            # Get answers for this specific category
-            category_answers = self.answers.filter(question__category=category)
-            if not category_answers.exists():
-                continue
-            
-            # Calculate correct answers for this category
-            correct_answers = sum(1 for answer in category_answers if answer.is_correct())
-            total_questions = category_answers.count()
-            
-            if total_questions > 0:
-                # Calculate score for this category based on package configuration
-                category_score_percentage = correct_answers / total_questions
-                category_contribution = category_score_percentage * package_category.max_score
-                total_score += category_contribution
-        
-        self.score = total_score
-    
-    def _calculate_default_score(self):
-        """Default scoring: 100 points divided equally among questions"""
-        total_answered = self.answers.count()
-        if total_answered == 0:
-            self.score = 0
-        else:
-            correct_answers = sum(1 for answer in self.answers.all() if answer.is_correct())
-            self.score = (correct_answers / total_answered) * 100
-    
-    def _calculate_custom_score(self):
-        """Custom scoring: Each question has custom weight"""
-        total_score = 0
-        for answer in self.answers.all():
-            if answer.is_correct():
-                total_score += answer.question.custom_weight
-        self.score = total_score
-    
-    def _calculate_utbk_score(self):
-        """UTBK scoring: Difficulty-based scoring with 1000 max score"""
-        total_score = 0
-        total_possible_score = 0
-        
-        for answer in self.answers.all():
-            question_weight = answer.question.difficulty_coefficient
-            total_possible_score += question_weight
-            
-            if answer.is_correct():
-                total_score += question_weight
-        
-        if total_possible_score > 0:
-            # Normalize to 1000 scale for UTBK
-            self.score = (total_score / total_possible_score) * 1000
-        else:
-            self.score = 0
+        if self.is_submitted:
+            from .services.leaderboard import refresh_student_leaderboard
+            from .services.scoring import record_category_scores
+            from .services.student_momentum import record_test_submission
+            from .services.category_stats import invalidate_category_statistics
+            record_category_scores(self, result)
+            refresh_student_leaderboard(self.student_id)
+            record_test_submission(self)
+            invalidate_category_statistics(self.categories.values_list('id', flat=True))
+        return result
+
+    @property
+    def needs_rescore(self):
+        """True when a submitted test was scored by an older engine or its scoring inputs changed"""
+        from .services.scoring import SCORING_VERSION
+        return self.is_submitted and self.scoring_version != SCORING_VERSION
         
     def is_time_up(self):
         """Check if test time is up"""
@@ -839,7 +692,7 @@ class Test(models.Model):
         """Check if test score meets the category's passing requirement"""
         if self.tryout_package:
             # For package tests, use 60% of 7000 as passing score
-            return self.score >= 4200
+            return self.score >= self.PACKAGE_PASSING_SCORE
         
         answers = self.answers.all()
         if not answers.exists():
@@ -851,28 +704,37 @@ class Test(models.Model):
     
     def get_package_score_breakdown(self):
         """Get detailed score breakdown for package tests"""
-        if not self.tryout_package:
+        if not self.tryout_package_id:
             return None
-        
+
+        package_order = TryoutPackageCategory.objects.filter(
+            package_id=self.tryout_package_id,
+            category_id=models.OuterRef('category_id')
+        ).values('order')[:1]
+        rows = list(
+            self.category_scores.filter(max_score__isnull=False, answered__gt=0)
+            .select_related('category')
+            .annotate(package_order=models.Subquery(package_order))
+            .order_by('package_order', 'pk')
+        )
+        if not rows and not self.is_submitted:
+            # Ongoing tests have no persisted breakdown yet
+            from .services.scoring import build_category_scores, score_test
+            rows = [
+                row for row in build_category_scores(self, score_test(self))
+                if row.max_score is not None and row.answered
+            ]
+
         breakdown = []
-        for package_category in self.tryout_package.tryoutpackagecategory_set.all():
-            category = package_category.category
-            category_answers = self.answers.filter(question__category=category)
-            
-            if category_answers.exists():
-                correct_answers = sum(1 for answer in category_answers if answer.is_correct())
-                total_questions = category_answers.count()
-                score_percentage = correct_answers / total_questions if total_questions > 0 else 0
-                category_score = score_percentage * package_category.max_score
-                
-                breakdown.append({
-                    'category_name': category.category_name,
-                    'correct_answers': correct_answers,
-                    'total_questions': total_questions,
-                    'max_score': package_category.max_score,
-                    'achieved_score': round(category_score, 1),
-                    'percentage': round(score_percentage * 100, 1)
-                })
+        for row in rows:
+            breakdown.append({
+                'category_name': row.category.category_name,
+                'correct_answers': row.correct,
+                'total_questions': row.answered,
+                'max_score': row.max_score,
+                'achieved_score': round(row.contribution, 1),
+                'percentage': round(row.percentage, 1)
+            })
         
         return breakdown
     
@@ -1049,50 +911,10 @@ class Test(models.Model):
             return "Poor. Perlu fokus belajar yang intensif."
     
     @classmethod
-    def update_utbk_difficulty_coefficients(cls, category_id):
-        """Update UTBK difficulty coefficients for all questions in a category"""
-        from django.db.models import Count, F
-        
-        # Get all questions in the category with answer statistics
-        questions = Question.objects.filter(category_id=category_id).annotate(
-            total_answers=Count('answer'),
-            correct_answers=Count('answer', filter=models.Q(answer__selected_choice__is_correct=True))
-        ).filter(total_answers__gt=0)
-        
-        if not questions.exists():
-            return
-        
-        # Calculate success rates
-        question_stats = []
-        for question in questions:
-            success_rate = question.correct_answers / question.total_answers if question.total_answers > 0 else 0
-            question_stats.append({
-                'question': question,
-                'success_rate': success_rate,
-                'difficulty': 1 - success_rate  # Higher difficulty = lower success rate
-            })
-        
-        # Sort by difficulty (hardest first)
-        question_stats.sort(key=lambda x: x['difficulty'], reverse=True)
-        
-        # Assign coefficients based on difficulty ranking
-        total_questions = len(question_stats)
-        total_coefficient = total_questions  # Base coefficient sum
-        
-        for i, stat in enumerate(question_stats):
-            # More difficult questions get higher coefficients
-            # Linear distribution from 1.5 (hardest) to 0.5 (easiest)
-            coefficient = 1.5 - (i / (total_questions - 1)) if total_questions > 1 else 1.0
-            stat['question'].difficulty_coefficient = coefficient
-            stat['question'].save()
-        
-        # Normalize coefficients so total equals 1000 when all questions answered correctly
-        current_total = sum(q.difficulty_coefficient for q in questions)
-        if current_total > 0:
-            normalization_factor = 1000 / current_total
-            for question in questions:
-                question.difficulty_coefficient *= normalization_factor
-                question.save()
+    def update_utbk_difficulty_coefficients(cls, category_id, dry_run=False):
+        """Update UTBK difficulty coefficients for all questions in a category (see services.utbk_calibration)"""
+        from .services.utbk_calibration import calibrate_category
+        return calibrate_category(category_id, dry_run=dry_run)
 
 class Answer(models.Model):
     test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name="answers")
@@ -1100,6 +922,11 @@ class Answer(models.Model):
     selected_choice = models.ForeignKey(Choice, on_delete=models.CASCADE, null=True, blank=True)
     text_answer = models.TextField(blank=True, null=True, help_text="Jawaban teks untuk soal isian")
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['test', 'question'], name='unique_answer_per_test_question'),
+        ]
+
     def __str__(self):
         return f"Answer by {self.test.student.username} for {self.question.question_text}"
     
@@ -1119,6 +946,103 @@ class Answer(models.Model):
             return self.text_answer or ""
         return ""
 
+class TestCategoryScore(models.Model):
+    """Per-category score breakdown of a submitted test, written once at submit time"""
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='category_scores')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='test_scores')
+    correct = models.PositiveIntegerField(default=0)
+    answered = models.PositiveIntegerField(default=0)
+    max_score = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Skor maksimum kategori di paket (kosong jika bukan bagian paket)"
+    )
+    contribution = models.FloatField(default=0, help_text="Kontribusi kategori terhadap skor test")
+    percentage = models.FloatField(default=0, help_text="Persentase jawaban benar (0-100)")
+
+    class Meta:
+        unique_together = ('test', 'category')
+        indexes = [
+            models.Index(fields=['category', 'test']),
+        ]
+
+    def __str__(self):
+        return f"{self.test_id} - {self.category_id}: {self.contribution}"
+
+class TestAbilityEstimate(models.Model):
+    """Estimasi kemampuan (theta) IRT sebuah test pada satu kategori UTBK"""
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='ability_estimates')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='ability_estimates')
+    theta = models.FloatField()
+    standard_error = models.FloatField(null=True, blank=True)
+    estimated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('test', 'category')
+
+    def __str__(self):
+        return f"{self.test_id} - {self.category_id}: {self.theta:.2f}"
+
+class LeaderboardEntry(models.Model):
+    """Materialized per-student ranking row for student_rankings, refreshed when a test is submitted"""
+    RANKING_TYPES = [
+        ('utbk_package_best', 'Skor Terbaik Paket UTBK'),
+        ('overall_average', 'Rata-rata Keseluruhan'),
+        ('category_best', 'Skor Terbaik Kategori'),
+        ('category_average', 'Rata-rata Kategori'),
+    ]
+    TIME_PERIODS = [
+        ('all', 'Semua Waktu'),
+        ('week', '7 Hari'),
+        ('month', '30 Hari'),
+        ('year', '365 Hari'),
+    ]
+
+    ranking_type = models.CharField(max_length=30, choices=RANKING_TYPES)
+    time_period = models.CharField(max_length=10, choices=TIME_PERIODS, default='all')
+    scoring_method = models.CharField(max_length=20, default='all')
+    # 0 berarti "semua paket" / "tanpa filter kategori" agar bisa dipakai di unique constraint
+    package_key = models.PositiveIntegerField(default=0)
+    category_key = models.PositiveIntegerField(default=0)
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+
+    score = models.FloatField(help_text="Nilai yang diurutkan (skor terbaik atau rata-rata sesuai tipe ranking)")
+    avg_score = models.FloatField(default=0)
+    max_score = models.FloatField(default=0)
+    total_tests = models.PositiveIntegerField(default=0)
+    latest_test_at = models.DateTimeField(null=True, blank=True)
+    display_test = models.ForeignKey(Test, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    display_category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    university_score = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Skor UTBK yang dipakai untuk status target universitas"
+    )
+    expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Kapan test tertua di jendela waktu ini keluar dari jendela (baris harus dihitung ulang)"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ranking_type', 'time_period', 'scoring_method', 'package_key', 'category_key', 'student'],
+                name='unique_leaderboard_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['ranking_type', 'time_period', 'scoring_method', 'package_key', 'category_key', '-score'],
+                name='leaderboard_rank_idx',
+            ),
+            models.Index(fields=['expires_at'], name='leaderboard_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ranking_type}/{self.time_period} {self.student_id}: {self.score}"
+
 @receiver(pre_delete, sender=Question)
 def question_pre_delete(sender, instance, **kwargs):
     """Handle file deletion before the question is deleted"""
@@ -1129,6 +1053,124 @@ def choice_pre_delete(sender, instance, **kwargs):
     """Handle file deletion before the choice is deleted"""
     instance.delete_media_files()
 
+def _scoring_fields_changed(instance, fields):
+    """Compare scoring-relevant fields against the stored row"""
+    if not instance.pk:
+        return False
+    stored = type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+    if stored is None:
+        return False
+    return any(stored[name] != getattr(instance, name) for name in fields)
+
+@receiver(pre_save, sender=Question)
+def question_scoring_inputs_changed(sender, instance, **kwargs):
+    """Mark submitted tests stale when a question's scoring inputs change"""
+    fields = ('question_type', 'correct_answer_text', 'custom_weight', 'difficulty_coefficient')
+    if _scoring_fields_changed(instance, fields):
+        from .services.scoring import mark_tests_stale
+        mark_tests_stale(question_ids=[instance.pk])
+
+@receiver(pre_save, sender=Choice)
+def choice_scoring_inputs_changed(sender, instance, **kwargs):
+    """Mark submitted tests stale when a choice's correctness changes"""
+    if _scoring_fields_changed(instance, ('is_correct',)):
+        from .services.scoring import mark_tests_stale
+        mark_tests_stale(question_ids=[instance.question_id])
+
+@receiver(pre_save, sender=TryoutPackageCategory)
+def package_category_scoring_inputs_changed(sender, instance, **kwargs):
+    """Mark submitted package tests stale when a subtest's max score changes"""
+    if _scoring_fields_changed(instance, ('max_score',)):
+        from .services.scoring import mark_tests_stale
+        mark_tests_stale(package_ids=[instance.package_id])
+
+@receiver(post_save, sender=Choice)
+def choice_created_scoring_inputs(sender, instance, created, **kwargs):
+    """Edit views delete and recreate every choice; the new key can change existing answers"""
+    if created:
+        from .services.scoring import mark_tests_stale
+        mark_tests_stale(question_ids=[instance.question_id])
+
+@receiver(pre_delete, sender=Choice)
+@receiver(pre_delete, sender=Question)
+def scoring_inputs_deleted(sender, instance, **kwargs):
+    """Deleting a choice or question cascades to its answers; mark tests while they still reach them"""
+    from .services.scoring import mark_tests_stale
+    mark_tests_stale(question_ids=[instance.pk if sender is Question else instance.question_id])
+
+@receiver(post_save, sender=TryoutPackageCategory)
+def package_category_added(sender, instance, created, **kwargs):
+    """A new subtest changes which answers count towards package scores"""
+    if created:
+        from .services.scoring import mark_tests_stale
+        mark_tests_stale(package_ids=[instance.package_id])
+
+@receiver(post_delete, sender=TryoutPackageCategory)
+def package_category_removed(sender, instance, **kwargs):
+    from .services.scoring import mark_tests_stale
+    mark_tests_stale(package_ids=[instance.package_id])
+
+@receiver(pre_save, sender=Question)
+def question_moved_category(sender, instance, **kwargs):
+    """Invalidate package layouts when a question moves to another category"""
+    if not instance.pk:
+        return
+    stored_category_id = Question.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+    if stored_category_id is not None and stored_category_id != instance.category_id:
+        from .services.package_layout import bump_layout_version
+        bump_layout_version(category_ids=[stored_category_id, instance.category_id])
+
+@receiver(pre_delete, sender=Test)
+def test_remember_categories(sender, instance, **kwargs):
+    """Simpan kategori tes sebelum relasinya ikut terhapus"""
+    instance._category_ids = list(instance.categories.values_list('id', flat=True)) if instance.is_submitted else []
+
+@receiver(post_delete, sender=Test)
+def test_deleted(sender, instance, **kwargs):
+    """Keep the student's leaderboard rows and momentum snapshot in sync when a submitted test is removed"""
+    if instance.is_submitted:
+        from .services.leaderboard import refresh_student_leaderboard
+        from .services.student_momentum import discard_momentum_snapshot
+        from .services.category_stats import invalidate_category_statistics
+        refresh_student_leaderboard(instance.student_id)
+        discard_momentum_snapshot(instance.student_id)
+        invalidate_category_statistics(getattr(instance, '_category_ids', []))
+
+@receiver(post_save, sender=Category)
+def category_statistics_changed(sender, instance, **kwargs):
+    """Batas lulus kategori bisa berubah; statistik yang di-cache ikut dibuang"""
+    from .services.category_stats import invalidate_category_statistics
+    invalidate_category_statistics([instance.pk])
+
+@receiver(post_save, sender=Question)
+def question_created(sender, instance, created, **kwargs):
+    """New questions shift the question order of every package using the category"""
+    if created:
+        from .services.package_layout import bump_layout_version
+        bump_layout_version(category_ids=[instance.category_id])
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, **kwargs):
+    """Deleted questions shift the question order of every package using the category"""
+    from .services.package_layout import bump_layout_version
+    bump_layout_version(category_ids=[instance.category_id])
+
+@receiver(post_save, sender=Category)
+def category_layout_changed(sender, instance, created, **kwargs):
+    """Subtest names are part of the cached package layout"""
+    if not created:
+        from .services.package_layout import bump_layout_version
+        bump_layout_version(category_ids=[instance.pk])
+
+@receiver(post_save, sender=TryoutPackage)
+@receiver(post_save, sender=TryoutPackageCategory)
+@receiver(post_delete, sender=TryoutPackageCategory)
+def package_layout_changed(sender, instance, **kwargs):
+    """Invalidate the cached layout when a package or one of its subtests changes"""
+    from .services.package_layout import bump_layout_version
+    package_id = instance.pk if sender is TryoutPackage else instance.package_id
+    bump_layout_version(package_ids=[package_id])
+
 
 class MessageThread(models.Model):
     """Model untuk thread pesan antara siswa dan guru/admin"""
@@ -1218,11 +1260,13 @@ class MessageThread(models.Model):
     
     def get_unread_count_for_user(self, user):
         """Hitung pesan yang belum dibaca oleh user tertentu"""
-        return self.messages.filter(is_read=False).exclude(sender=user).count()
+        from .services.message_threads import unread_count_for
+        return unread_count_for(self, user)
     
     def mark_as_read_for_user(self, user):
-        """Tandai semua pesan sebagai sudah dibaca untuk user tertentu"""
-        self.messages.exclude(sender=user).update(is_read=True)
+        """Tandai thread sudah dibaca oleh user tertentu (satu baris ThreadParticipantState)"""
+        from .services.message_threads import mark_thread_read
+        mark_thread_read(self, user)
     
     def get_participants(self):
         """Ambil semua participant dalam thread"""
@@ -1248,6 +1292,40 @@ class ThreadStatusLog(models.Model):
         return f"[{self.created_at}] {self.thread.title} : {self.old_status} -> {self.new_status}"
 
 
+class ThreadParticipantState(models.Model):
+    """Status baca per peserta thread (lihat services.message_threads)"""
+    thread = models.ForeignKey(MessageThread, on_delete=models.CASCADE, related_name='participant_states')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='thread_states')
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    # Pesan dari peserta lain sejak last_read_at; dinaikkan saat pesan baru dibuat
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('thread', 'user')
+        verbose_name = "Status Baca Thread"
+        verbose_name_plural = "Status Baca Thread"
+
+    def __str__(self):
+        return f"{self.user} - {self.thread_id}: {self.unread_count} belum dibaca"
+
+
+class ThreadSearchDocument(models.Model):
+    """Teks pencarian per thread (judul + isi pesan).
+
+    Indeks full-text dibuat oleh migrasi 0048: kolom tsvector + GIN di
+    Postgres, tabel FTS5 di SQLite (lihat services.thread_search).
+    """
+    thread = models.OneToOneField(
+        MessageThread, on_delete=models.CASCADE, primary_key=True, related_name='search_document'
+    )
+    title = models.CharField(max_length=200)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title
+
+
 class Message(models.Model):
     """Model untuk pesan individual dalam thread"""
     thread = models.ForeignKey(MessageThread, on_delete=models.CASCADE, related_name='messages')
@@ -1258,7 +1336,7 @@ class Message(models.Model):
     attachment = models.FileField(upload_to='message_attachments/', null=True, blank=True,
                                 help_text="File lampiran (opsional)")
     
-    # Status
+    # Status; sejak ThreadParticipantState hanya dipakai untuk peserta yang belum pernah membuka thread
     is_read = models.BooleanField(default=False)
     is_edited = models.BooleanField(default=False)
     
@@ -1296,6 +1374,111 @@ def message_pre_delete(sender, instance, **kwargs):
     instance.delete_attachment()
 
 
+@receiver(pre_save, sender=MessageThread)
+def thread_remember_badge_state(sender, instance, **kwargs):
+    """Simpan penugasan lama agar counter belum-dibaca penanggung jawab sebelumnya ikut dibatalkan"""
+    instance._previous_badge_state = None
+    if instance.pk:
+        instance._previous_badge_state = (
+            MessageThread.objects.filter(pk=instance.pk)
+            .values_list('teacher_or_admin_id', 'thread_type', 'close_requested_by_id')
+            .first()
+        )
+
+@receiver(post_save, sender=MessageThread)
+def thread_search_document(sender, instance, created, **kwargs):
+    from .services.thread_search import refresh_thread_document, sync_thread_title
+    if created:
+        refresh_thread_document(instance)
+    else:
+        sync_thread_title(instance)
+
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def message_search_document(sender, instance, **kwargs):
+    """Pesan baru ditambahkan ke indeks pencarian thread; pesan diubah/dihapus membangun ulang isinya"""
+    from .services.thread_search import append_thread_message, refresh_thread_document
+    try:
+        thread = instance.thread
+    except MessageThread.DoesNotExist:
+        return
+    if kwargs.get('created'):
+        append_thread_message(thread, instance.content)
+    else:
+        refresh_thread_document(thread, create='created' in kwargs)
+
+@receiver(post_save, sender=MessageThread)
+@receiver(post_delete, sender=MessageThread)
+def thread_badges_changed(sender, instance, **kwargs):
+    from .services.inbox_badges import invalidate_thread_badges
+    invalidate_thread_badges(instance, getattr(instance, '_previous_badge_state', None))
+
+@receiver(post_save, sender=Message)
+def message_participant_state(sender, instance, created, **kwargs):
+    if created:
+        from .services.message_threads import record_message
+        record_message(instance)
+
+@receiver(post_delete, sender=Message)
+def message_participant_state_deleted(sender, instance, **kwargs):
+    from .services.message_threads import forget_message
+    forget_message(instance)
+
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def message_badges_changed(sender, instance, **kwargs):
+    from .services.inbox_badges import invalidate_thread_badges
+    try:
+        thread = instance.thread
+    except MessageThread.DoesNotExist:
+        return
+    invalidate_thread_badges(thread)
+
+
+class ThreadBroadcastJob(models.Model):
+    """Antrian broadcast thread ke banyak siswa (lihat services.thread_broadcast)"""
+    STATUS_CHOICES = [
+        ('pending', 'Menunggu'),
+        ('running', 'Diproses'),
+        ('completed', 'Selesai'),
+        ('failed', 'Gagal'),
+    ]
+
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='thread_broadcast_jobs')
+    title = models.CharField(max_length=200)
+    thread_type = models.CharField(max_length=20, choices=MessageThread.THREAD_TYPES, default='general')
+    priority = models.CharField(max_length=10, default='normal')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    content = models.TextField()
+    student_ids = models.JSONField(default=list, help_text="ID siswa penerima, urut pengiriman")
+    total_count = models.PositiveIntegerField(default=0)
+    # Jumlah siswa yang thread-nya sudah dibuat; job yang terputus dilanjutkan dari sini
+    processed_count = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Runner yang sedang memegang job; heartbeat diperbarui tiap chunk
+    claimed_by = models.CharField(max_length=32, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+        verbose_name = "Job Broadcast Thread"
+        verbose_name_plural = "Job Broadcast Thread"
+
+    def __str__(self):
+        return f"{self.title} ({self.processed_count}/{self.total_count}, {self.status})"
+
+    @property
+    def progress_percent(self):
+        if not self.total_count:
+            return 100
+        return round(self.processed_count * 100 / self.total_count)
+
+
 class BroadcastMessageQuerySet(models.QuerySet):
     """Custom queryset helpers for broadcast messages"""
 
@@ -1307,26 +1490,24 @@ class BroadcastMessageQuerySet(models.QuerySet):
         ).filter(Q(expires_at__isnull=True) | Q(expires_at__gt=now))
 
     def visible_for_user(self, user):
+        """Uncached variant of ``BroadcastMessage.objects.visible_for_user``."""
         if not user.is_authenticated:
             return []
 
         base_qs = self.live()
-        role_id = getattr(getattr(user, 'role', None), 'id', None)
+        profile = user.access_profile
 
-        if role_id:
+        if profile.role_id:
             base_qs = base_qs.filter(
-                Q(target_roles__isnull=True) | Q(target_roles__id=role_id)
+                Q(target_roles__isnull=True) | Q(target_roles__id=profile.role_id)
             ).distinct()
         else:
             base_qs = base_qs.filter(target_roles__isnull=True)
 
-        broadcasts = list(base_qs)
+        if profile.role_name == 'Student' and not profile.has_active_subscription():
+            base_qs = base_qs.exclude(students_require_active_subscription=True)
 
-        if getattr(user, 'is_student', None) and user.is_student():
-            if not user.has_active_subscription():
-                broadcasts = [b for b in broadcasts if not b.students_require_active_subscription]
-
-        return broadcasts
+        return list(base_qs.prefetch_related('target_roles'))
 
 
 class BroadcastMessageManager(models.Manager):
@@ -1337,7 +1518,9 @@ class BroadcastMessageManager(models.Manager):
         return self.get_queryset().live()
 
     def visible_for_user(self, user):
-        return self.get_queryset().visible_for_user(user)
+        """Live broadcasts for ``user``, cached per role x subscription class"""
+        from .services.broadcast_visibility import visible_broadcasts
+        return visible_broadcasts(user)
 
 
 class BroadcastMessage(models.Model):
@@ -1452,8 +1635,10 @@ class BroadcastMessage(models.Model):
         return 'live'
 
     def target_role_names(self):
-        if self.target_roles.exists():
-            return ', '.join(self.target_roles.values_list('role_name', flat=True))
+        # .all() memakai hasil prefetch (mis. dari cache visibilitas) bila ada
+        names = [role.role_name for role in self.target_roles.all()]
+        if names:
+            return ', '.join(names)
         return 'Semua pengguna'
 
     def remaining_minutes(self):
@@ -1466,20 +1651,32 @@ class BroadcastMessage(models.Model):
         if not user.is_authenticated:
             return False
 
-        if self.target_roles.exists():
-            user_role = getattr(user, 'role', None)
-            if not user_role:
-                return False
-            if not self.target_roles.filter(pk=user_role.pk).exists():
-                return False
+        profile = user.access_profile
+        target_role_ids = {role.pk for role in self.target_roles.all()}
+        if target_role_ids and profile.role_id not in target_role_ids:
+            return False
 
-        if getattr(user, 'is_student', None) and user.is_student():
-            if self.students_require_active_subscription and not user.has_active_subscription():
+        if profile.role_name == 'Student':
+            if self.students_require_active_subscription and not profile.has_active_subscription():
                 return False
 
         return self.is_live
 
 
+@receiver(post_save, sender=BroadcastMessage)
+@receiver(post_delete, sender=BroadcastMessage)
+def broadcast_visibility_changed(sender, instance, **kwargs):
+    """Simpan, hapus, nonaktifkan, atau aktifkan ulang broadcast membatalkan cache visibilitas"""
+    from .services.broadcast_visibility import invalidate_broadcast_visibility
+    invalidate_broadcast_visibility()
+
+@receiver(m2m_changed, sender=BroadcastMessage.target_roles.through)
+def broadcast_targets_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        from .services.broadcast_visibility import invalidate_broadcast_visibility
+        invalidate_broadcast_visibility()
+
+
 # ======================= SUBSCRIPTION & PAYMENT MODELS =======================
 
 class PaymentMethod(models.Model):
@@ -1656,6 +1853,65 @@ class UserSubscription(models.Model):
         self.save()
 
 
+class DailyMetrics(models.Model):
+    """Rollup harian untuk kartu & grafik dashboard admin/operator (lihat services.admin_metrics)"""
+    day = models.DateField(unique=True, help_text="Tanggal lokal")
+    signups = models.PositiveIntegerField(default=0)
+    # Dikelompokkan per tanggal upload bukti, dengan status terkini
+    payments_created = models.PositiveIntegerField(default=0)
+    payments_pending = models.PositiveIntegerField(default=0)
+    payments_rejected = models.PositiveIntegerField(default=0)
+    # Dikelompokkan per tanggal verifikasi (tanggal upload jika verified_at kosong)
+    approved_payments = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    new_subscriptions = models.PositiveIntegerField(default=0)
+    active_subscriptions = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Jumlah langganan aktif saat baris ini terakhir dihitung sebagai hari berjalan"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['day']
+        verbose_name = 'Metrik Harian'
+        verbose_name_plural = 'Metrik Harian'
+
+    def __str__(self):
+        return f"{self.day}: {self.signups} daftar, {self.approved_payments} pembayaran"
+
+
+class TaskLock(models.Model):
+    """Lease lintas proses untuk command terjadwal, plus ringkasan run terakhir (lihat services.task_locks)"""
+    name = models.CharField(max_length=100, primary_key=True)
+    holder = models.CharField(max_length=32, blank=True)
+    # Lease kedaluwarsa sendiri bila proses pemegang mati di tengah jalan
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_finished_at = models.DateTimeField(null=True, blank=True)
+    last_result = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        verbose_name = 'Lock Tugas Terjadwal'
+        verbose_name_plural = 'Lock Tugas Terjadwal'
+
+    def __str__(self):
+        return self.name
+
+
+class SharedCounter(models.Model):
+    """Versi cache dan counter yang harus sama di semua proses (lihat services.shared_counters)"""
+    name = models.CharField(max_length=150, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Counter Bersama'
+        verbose_name_plural = 'Counter Bersama'
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+
 class StudentGoalQuerySet(models.QuerySet):
     def active(self):
         today = timezone.localdate()
@@ -1770,12 +2026,143 @@ class StudentGoal(models.Model):
             self.save(update_fields=['archived_at'])
 
 
+class MomentumSnapshot(models.Model):
+    """Ringkasan momentum siswa yang diperbarui setiap kali test disubmit (lihat services.student_momentum)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='momentum_snapshot')
+    # {"YYYY-MM-DD": {"count": n, "score_sum": x, "categories": [id, ...]}} dalam zona waktu lokal
+    daily_buckets = models.JSONField(default=dict, blank=True)
+    total_tests = models.PositiveIntegerField(default=0)
+    total_score = models.FloatField(default=0)
+    max_score = models.FloatField(default=0)
+    first_score = models.FloatField(null=True, blank=True)
+    recent_scores = models.JSONField(default=list, blank=True, help_text="Skor 3 test terakhir, urut waktu")
+    streak_run = models.PositiveIntegerField(default=0, help_text="Panjang streak yang berakhir di last_activity")
+    longest_streak = models.PositiveIntegerField(default=0)
+    last_activity = models.DateField(null=True, blank=True)
+    best_test = models.ForeignKey(Test, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    best_score = models.FloatField(null=True, blank=True)
+    best_taken_at = models.DateTimeField(null=True, blank=True)
+    best_label = models.CharField(max_length=200, blank=True)
+    last_test = models.ForeignKey(Test, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_test_at = models.DateTimeField(null=True, blank=True)
+    # Grafik tren 7/30/90 hari yang sudah diserialisasi untuk tanggal "day"
+    trend_payload = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Snapshot Momentum'
+        verbose_name_plural = 'Snapshot Momentum'
+
+    def __str__(self):
+        return f"{self.user_id} - {self.total_tests} test"
+
+
 @receiver(pre_delete, sender=PaymentProof)
 def payment_proof_pre_delete(sender, instance, **kwargs):
     """Handle file deletion sebelum PaymentProof dihapus"""
     instance.delete_proof_image()
 
 
+@receiver(post_save, sender=User)
+def user_created_metrics(sender, instance, created, **kwargs):
+    """Perbarui rollup pendaftaran hanya saat user dibuat (bukan setiap login)"""
+    if created:
+        from .services.admin_metrics import refresh_metrics_for
+        refresh_metrics_for(instance.date_joined)
+
+@receiver(pre_save, sender=User)
+def user_remember_access(sender, instance, update_fields=None, **kwargs):
+    """Simpan role/superuser lama agar versi akses hanya naik saat keduanya benar-benar berubah"""
+    instance._previous_access = None
+    if instance.pk and (update_fields is None or {'role', 'is_superuser'} & set(update_fields)):
+        instance._previous_access = (
+            User.objects.filter(pk=instance.pk).values_list('role_id', 'is_superuser').first()
+        )
+
+@receiver(post_save, sender=User)
+def user_access_changed(sender, instance, created, **kwargs):
+    """Profil akses di session basi saat role/superuser berubah (simpan profil biasa tidak ikut)"""
+    previous = getattr(instance, '_previous_access', None)
+    if created or previous is None or previous == (instance.role_id, instance.is_superuser):
+        return
+    instance.clear_access_profile()
+    from .services.access import mark_access_changed
+    mark_access_changed(instance.pk)
+
+@receiver(post_delete, sender=User)
+def user_deleted_metrics(sender, instance, **kwargs):
+    from .services.admin_metrics import refresh_metrics_for
+    refresh_metrics_for(instance.date_joined)
+
+@receiver(pre_save, sender=PaymentProof)
+def payment_proof_remember_verification(sender, instance, **kwargs):
+    """Simpan status dan verified_at lama agar rollup hari verifikasi sebelumnya ikut diperbarui"""
+    instance._previous_status = instance._previous_verified_at = None
+    if instance.pk:
+        previous = PaymentProof.objects.filter(pk=instance.pk).values_list('status', 'verified_at').first()
+        if previous:
+            instance._previous_status, instance._previous_verified_at = previous
+
+@receiver(post_save, sender=PaymentProof)
+@receiver(post_delete, sender=PaymentProof)
+def payment_proof_metrics_changed(sender, instance, **kwargs):
+    from .services.admin_metrics import refresh_metrics_for
+    refresh_metrics_for(
+        instance.created_at,
+        instance.verified_at,
+        getattr(instance, '_previous_verified_at', None),
+    )
+
+@receiver(post_save, sender=PaymentProof)
+def payment_proof_pending_badge_changed(sender, instance, **kwargs):
+    from .services.inbox_badges import adjust_pending_payments
+    adjust_pending_payments(getattr(instance, '_previous_status', None), instance.status)
+
+@receiver(post_delete, sender=PaymentProof)
+def payment_proof_pending_badge_deleted(sender, instance, **kwargs):
+    from .services.inbox_badges import adjust_pending_payments
+    adjust_pending_payments(instance.status, None)
+
+@receiver(post_save, sender=PaymentProof)
+def payment_proof_sales_report_changed(sender, instance, created, **kwargs):
+    """Laporan penjualan yang di-cache basi saat pembayaran disetujui/ditolak"""
+    status_changed = instance.status != getattr(instance, '_previous_status', None)
+    verification_moved = instance.verified_at != getattr(instance, '_previous_verified_at', None)
+    if (created and instance.status != 'pending') or (not created and (status_changed or verification_moved)):
+        from .services.sales_report import invalidate_sales_reports
+        invalidate_sales_reports()
+
+@receiver(post_delete, sender=PaymentProof)
+@receiver(post_save, sender=SubscriptionPackage)
+@receiver(post_delete, sender=SubscriptionPackage)
+@receiver(post_save, sender=SubscriptionPackagePriceHistory)
+def sales_report_source_changed(sender, **kwargs):
+    from .services.sales_report import invalidate_sales_reports
+    invalidate_sales_reports()
+
+@receiver(post_save, sender=UserSubscription)
+@receiver(post_delete, sender=UserSubscription)
+def subscription_metrics_changed(sender, instance, **kwargs):
+    from .services.admin_metrics import refresh_metrics_for
+    refresh_metrics_for(instance.created_at, timezone.now())
+
+
+@receiver(post_save, sender=UserSubscription)
+@receiver(post_delete, sender=UserSubscription)
+def subscription_access_changed(sender, instance, **kwargs):
+    user = instance._state.fields_cache.get('user')
+    if user is not None:
+        user.clear_access_profile()
+    from .services.access import mark_access_changed
+    mark_access_changed(instance.user_id)
+
+@receiver(post_save, sender=SubscriptionPackage)
+def subscription_package_access_changed(sender, instance, created, **kwargs):
+    """Tier paket bisa berubah; profil semua pelanggannya ikut basi"""
+    if not created:
+        from .services.access import mark_access_changed
+        mark_access_changed(*instance.usersubscription_set.values_list('user_id', flat=True))
+
 # ======================= UNIVERSITY & TARGET MODELS =======================
 
 class University(models.Model):
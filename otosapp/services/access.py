@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db.models import F, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import AccessLevel, Role, Test, User, UserSubscription
+
+SESSION_KEY = "_access_profile"
+# Umur maksimum profil di session (detik); 0 mematikan cache session
+DEFAULT_SESSION_TTL = 60
+STAFF_ROLES = ("Admin", "Operator", "Teacher")
+
+
+@dataclass(frozen=True)
+class AccessProfile:
+    """Role, subscription and access tier of one user, resolved once per request."""
+
+    user_id: int
+    role_id: Optional[int]
+    role_name: Optional[str]
+    is_superuser: bool
+    # none / active / deactivated; "expired" is derived from ``expires_at`` at check time
+    subscription_state: str
+    subscription_tier: Optional[str]
+    expires_at: Optional[datetime]
+
+    @property
+    def is_staff_role(self) -> bool:
+        return self.role_name in STAFF_ROLES
+
+    def has_active_subscription(self, now: Optional[datetime] = None) -> bool:
+        return (
+            self.subscription_state == "active"
+            and self.expires_at is not None
+            and (now or timezone.now()) <= self.expires_at
+        )
+
+    def can_access_tryouts(self) -> bool:
+        return self.role_name == "Student" and self.has_active_subscription()
+
+    @property
+    def access_level(self) -> str:
+        """Mirror of the old ``User.get_access_level`` rules."""
+        if self.is_superuser or self.is_staff_role:
+            return AccessLevel.TUNTAS
+        if self.role_name == "Student":
+            if self.has_active_subscription() and self.subscription_tier:
+                return self.subscription_tier
+            return AccessLevel.VISITOR
+        if self.role_name == "Visitor":
+            return AccessLevel.VISITOR
+        return AccessLevel.SILVER
+
+    def can_access_package(self, required_level: Optional[str], is_free_for_visitors: bool = False) -> bool:
+        """Rules of ``TryoutPackage.is_accessible_by`` evaluated on the profile, without queries."""
+        if self.is_superuser or self.is_staff_role:
+            return True
+        required_level = required_level or AccessLevel.SILVER
+        level = self.access_level
+        if self.can_access_tryouts() and AccessLevel.meets_requirement(level, required_level):
+            return True
+        if self.role_name == "Visitor" and required_level == AccessLevel.VISITOR and is_free_for_visitors:
+            return True
+        # Tier lebih tinggi tetap membuka paket di bawahnya (mis. Gold membuka Silver)
+        return level != AccessLevel.VISITOR and AccessLevel.meets_requirement(level, required_level)
+
+    def to_session(self) -> Dict:
+        data = asdict(self)
+        data["expires_at"] = self.expires_at.isoformat() if self.expires_at else None
+        return data
+
+    @classmethod
+    def from_session(cls, data: Dict) -> "AccessProfile":
+        values = dict(data)
+        values["expires_at"] = parse_datetime(values["expires_at"]) if values.get("expires_at") else None
+        return cls(**values)
+
+
+def build_access_profile(user: User) -> AccessProfile:
+    """Profile from ``user``; free when ``role`` and ``subscription__package`` were select_related."""
+    role = user.role
+    state, tier, expires_at = "none", None, None
+    try:
+        subscription = user.subscription
+    except UserSubscription.DoesNotExist:
+        subscription = None
+    if subscription is not None:
+        state = "active" if subscription.is_active else "deactivated"
+        tier = subscription.package.access_level
+        expires_at = subscription.end_date
+    return AccessProfile(
+        user_id=user.pk,
+        role_id=role.pk if role else None,
+        role_name=role.role_name if role else None,
+        is_superuser=bool(user.is_superuser),
+        subscription_state=state,
+        subscription_tier=tier,
+        expires_at=expires_at,
+    )
+
+
+def _session_ttl() -> int:
+    return getattr(settings, "ACCESS_PROFILE_SESSION_TTL", DEFAULT_SESSION_TTL)
+
+
+def mark_access_changed(*user_ids: int) -> None:
+    """Make profiles cached in the sessions of ``user_ids`` stale (role or subscription changed).
+
+    Bumps ``User.access_version`` in the database, so every process sees it
+    on the user row that ``AuthenticationMiddleware`` loads anyway.
+    """
+    if user_ids:
+        User.objects.filter(pk__in=user_ids).update(access_version=F("access_version") + 1)
+
+
+def _from_session(request, user: User, ttl: int) -> Optional[AccessProfile]:
+    entry = request.session.get(SESSION_KEY)
+    if not entry or entry.get("profile", {}).get("user_id") != user.pk:
+        return None
+    if time.time() - entry.get("cached_at", 0) > ttl or entry.get("access_version") != user.access_version:
+        return None
+    try:
+        profile = AccessProfile.from_session(entry["profile"])
+    except (KeyError, TypeError):
+        return None
+    # Baris user sudah dimuat oleh AuthenticationMiddleware; perubahan role langsung terdeteksi
+    if profile.role_id != user.role_id or profile.is_superuser != bool(user.is_superuser):
+        return None
+    return profile
+
+
+def _adopt_relations(user: User, source: User) -> None:
+    # Relasi yang sudah dimuat ikut dipakai request.user agar user.role / user.subscription tidak query lagi
+    for name in ("role", "subscription"):
+        if name in source._state.fields_cache:
+            user._state.fields_cache[name] = source._state.fields_cache[name]
+
+
+def resolve_request_profile(request) -> Optional[AccessProfile]:
+    """Access profile of the request's user: from the session when fresh, else one joined query."""
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    ttl = _session_ttl()
+    profile = _from_session(request, user, ttl) if ttl else None
+    if profile is None:
+        loaded = User.objects.select_related("role", "subscription__package").filter(pk=user.pk).first()
+        if loaded is None:
+            return None
+        _adopt_relations(user, loaded)
+        profile = build_access_profile(loaded)
+        if ttl:
+            request.session[SESSION_KEY] = {
+                "cached_at": time.time(),
+                # Versi dari baris yang sama dengan profil; perubahan setelahnya menaikkan versi di DB
+                "access_version": loaded.access_version,
+                "profile": profile.to_session(),
+            }
+    elif "role" not in user._state.fields_cache:
+        user._state.fields_cache["role"] = (
+            Role(pk=profile.role_id, role_name=profile.role_name) if profile.role_id else None
+        )
+    user._access_profile = profile
+    return profile
+
+
+@dataclass(frozen=True)
+class PackageAccess:
+    locked: bool
+    required_level: str
+    required_label: str
+    meets_required_level: bool
+    best_score: Optional[float]
+
+
+@dataclass
+class TryoutListAccess:
+    """Lock state and personal bests for every card of the tryout list."""
+
+    packages: Dict[int, PackageAccess] = field(default_factory=dict)
+    category_best_scores: Dict[int, Optional[float]] = field(default_factory=dict)
+    categories_locked: bool = True
+
+
+def _best_scores(user_id: int, package_ids, category_ids):
+    """Best submitted score per package and per category of one student, in two grouped queries."""
+    submitted = Test.objects.filter(student_id=user_id, is_submitted=True).order_by()
+    package_best = dict(
+        submitted.filter(tryout_package_id__in=package_ids)
+        .values("tryout_package_id")
+        .annotate(best=Max("score"))
+        .values_list("tryout_package_id", "best")
+    ) if package_ids else {}
+    category_best = dict(
+        submitted.filter(categories__in=category_ids)
+        .values("categories")
+        .annotate(best=Max("score"))
+        .values_list("categories", "best")
+    ) if category_ids else {}
+    return package_best, category_best
+
+
+def evaluate_tryout_list(profile: AccessProfile, packages: Iterable, categories: Iterable = ()) -> TryoutListAccess:
+    """Evaluate access for many packages/categories against one resolved profile.
+
+    Lock state comes from the profile alone; the user's best scores are read
+    with at most two queries regardless of the number of cards.
+    """
+    packages, categories = list(packages), list(categories)
+    package_best, category_best = _best_scores(
+        profile.user_id, [package.pk for package in packages], [category.pk for category in categories]
+    )
+    level = profile.access_level
+    result = TryoutListAccess(categories_locked=not (profile.can_access_tryouts() or profile.is_superuser or profile.is_staff_role))
+    for package in packages:
+        required = package.required_access_level or AccessLevel.SILVER
+        result.packages[package.pk] = PackageAccess(
+            locked=not profile.can_access_package(required, package.is_free_for_visitors),
+            required_level=required,
+            required_label=package.get_required_access_level_display(),
+            meets_required_level=AccessLevel.meets_requirement(level, required),
+            best_score=package_best.get(package.pk),
+        )
+    result.category_best_scores = {category.pk: category_best.get(category.pk) for category in categories}
+    return result
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from ..models import DailyMetrics, PaymentProof, User, UserSubscription
+
+SALES_WINDOWS = (7, 30, 90, 180)
+MONTHLY_TREND_MONTHS = 6
+
+_COUNTER_FIELDS = [
+    "signups",
+    "payments_created",
+    "payments_pending",
+    "payments_rejected",
+    "approved_payments",
+    "revenue",
+    "new_subscriptions",
+]
+
+
+def _local_day(moment: datetime) -> date:
+    return timezone.localtime(moment).date() if timezone.is_aware(moment) else moment.date()
+
+
+def _day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def refresh_daily_metrics(start: date, end: Optional[date] = None) -> int:
+    """Recompute the rollup rows of ``start``..``end`` from the source tables.
+
+    Each source table is read with one grouped query over the range, so a
+    nightly reconcile of any length costs five queries plus the upsert. The
+    active-subscription snapshot is only taken for the current day.
+    """
+    end = end or start
+    lower, upper = _day_start(start), _day_start(end + timedelta(days=1))
+    rows = OrderedDict()
+    day = start
+    while day <= end:
+        rows[day] = DailyMetrics(day=day)
+        day += timedelta(days=1)
+
+    for entry in (
+        User.objects.filter(date_joined__gte=lower, date_joined__lt=upper)
+        .annotate(day=TruncDate("date_joined")).values("day").annotate(total=Count("id")).order_by()
+    ):
+        rows[entry["day"]].signups = entry["total"]
+
+    for entry in (
+        PaymentProof.objects.filter(created_at__gte=lower, created_at__lt=upper)
+        .annotate(day=TruncDate("created_at")).values("day")
+        .annotate(
+            total=Count("id"),
+            pending=Count("id", filter=Q(status="pending")),
+            rejected=Count("id", filter=Q(status="rejected")),
+        ).order_by()
+    ):
+        row = rows[entry["day"]]
+        row.payments_created = entry["total"]
+        row.payments_pending = entry["pending"]
+        row.payments_rejected = entry["rejected"]
+
+    for entry in (
+        PaymentProof.objects.filter(status="approved")
+        .annotate(settled_at=Coalesce("verified_at", "created_at"))
+        .filter(settled_at__gte=lower, settled_at__lt=upper)
+        .annotate(day=TruncDate("settled_at")).values("day")
+        .annotate(total=Count("id"), amount=Sum("amount_paid")).order_by()
+    ):
+        row = rows[entry["day"]]
+        row.approved_payments = entry["total"]
+        row.revenue = entry["amount"] or Decimal("0")
+
+    for entry in (
+        UserSubscription.objects.filter(created_at__gte=lower, created_at__lt=upper)
+        .annotate(day=TruncDate("created_at")).values("day").annotate(total=Count("id")).order_by()
+    ):
+        rows[entry["day"]].new_subscriptions = entry["total"]
+
+    DailyMetrics.objects.bulk_create(
+        list(rows.values()),
+        update_conflicts=True,
+        unique_fields=["day"],
+        update_fields=_COUNTER_FIELDS + ["updated_at"],
+    )
+
+    today = timezone.localdate()
+    if start <= today <= end:
+        DailyMetrics.objects.filter(day=today).update(
+            active_subscriptions=UserSubscription.objects.filter(is_active=True, end_date__gt=timezone.now()).count()
+        )
+    return len(rows)
+
+
+def refresh_metrics_for(*moments: Optional[datetime]) -> None:
+    """Refresh the rollup days touched by the given timestamps (None values are ignored)."""
+    for day in sorted({_local_day(moment) for moment in moments if moment}):
+        refresh_daily_metrics(day)
+
+
+def _daily_chart(rows: List[DailyMetrics], days: int, today: date) -> List[Dict]:
+    start = today - timedelta(days=days - 1)
+    chart = [
+        {"label": row.day.strftime("%d %b"), "value": row.approved_payments}
+        for row in rows
+        if row.day >= start and row.approved_payments
+    ]
+    if not chart:
+        # Grafik kosong tetap diberi sumbu: harian untuk 7 hari, sampel mingguan untuk 30 hari
+        sample = 1 if days <= 7 else 7
+        chart = [
+            {"label": (today - timedelta(days=offset)).strftime("%d %b"), "value": 0}
+            for offset in range(days - 1, -1, -sample)
+        ]
+    return chart
+
+
+def _monthly_chart(rows: List[DailyMetrics], days: int, today: date) -> List[Dict]:
+    start = today - timedelta(days=days - 1)
+    months: Dict[date, int] = OrderedDict()
+    for row in rows:
+        if row.day >= start and row.approved_payments:
+            month = row.day.replace(day=1)
+            months[month] = months.get(month, 0) + row.approved_payments
+    chart = [{"label": month.strftime("%b %Y"), "value": value} for month, value in months.items()]
+    if not chart:
+        chart = [
+            {"label": (today.replace(day=1) - timedelta(days=step * 30)).strftime("%b %Y"), "value": 0}
+            for step in range(days // 30 - 1, -1, -1)
+        ]
+    return chart
+
+
+def _monthly_trend(rows: List[DailyMetrics], now: datetime, include_revenue: bool) -> List[Dict]:
+    monthly_data = []
+    for step in range(MONTHLY_TREND_MONTHS - 1, -1, -1):
+        month_date = timezone.localtime(now - timedelta(days=30 * step))
+        month_rows = [row for row in rows if (row.day.year, row.day.month) == (month_date.year, month_date.month)]
+        entry = {
+            "month": month_date.strftime("%B %Y"),
+            "month_short": month_date.strftime("%b"),
+        }
+        if include_revenue:
+            entry["revenue"] = float(sum((row.revenue for row in month_rows), Decimal("0")))
+        entry["subscriptions"] = sum(row.new_subscriptions for row in month_rows)
+        entry["sales_count"] = sum(row.approved_payments for row in month_rows)
+        monthly_data.append(entry)
+    return monthly_data
+
+
+def dashboard_metrics(include_revenue: bool = True, now: Optional[datetime] = None) -> Dict:
+    """Cards and charts of the admin/operator dashboard, read from the DailyMetrics rollup.
+
+    One aggregate over all rows for the lifetime totals and one fetch of the
+    recent rows for the charts. Today's row is rebuilt first when missing,
+    and an empty table is backfilled from the whole history. Active
+    subscriptions are counted live, since they lapse without any write.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    if not DailyMetrics.objects.filter(day=today).exists():
+        # Tabel kosong (baru dimigrasi): isi seluruh riwayat sekali
+        start = today if DailyMetrics.objects.exists() else reconcile_range()[0]
+        refresh_daily_metrics(start, today)
+
+    totals = DailyMetrics.objects.aggregate(
+        users=Sum("signups"),
+        payments=Sum("payments_created"),
+        pending=Sum("payments_pending"),
+        rejected=Sum("payments_rejected"),
+        approved=Sum("approved_payments"),
+        revenue=Sum("revenue"),
+        subscriptions=Sum("new_subscriptions"),
+    )
+    oldest_month = timezone.localtime(now - timedelta(days=30 * (MONTHLY_TREND_MONTHS - 1))).date().replace(day=1)
+    window_start = min(oldest_month, today - timedelta(days=max(SALES_WINDOWS) - 1))
+    rows = list(DailyMetrics.objects.filter(day__gte=window_start, day__lte=today).order_by("day"))
+    today_row = next((row for row in rows if row.day == today), None)
+    this_month = [row for row in rows if (row.day.year, row.day.month) == (today.year, today.month)]
+
+    total_subscriptions = totals["subscriptions"] or 0
+    # Snapshot di baris hari ini basi begitu end_date terlewati; satu COUNT langsung ke tabel sumber
+    active_subscriptions = UserSubscription.objects.filter(is_active=True, end_date__gt=now).count()
+    monthly_data = _monthly_trend(rows, now, include_revenue)
+
+    growth_percent = 0
+    if len(monthly_data) >= 2:
+        last = monthly_data[-1]["sales_count"]
+        prev = monthly_data[-2]["sales_count"]
+        if prev:
+            growth_percent = round((last - prev) / prev * 100, 1)
+
+    metrics = {
+        "total_users": totals["users"] or 0,
+        "new_users_today": today_row.signups if today_row else 0,
+        "new_users_this_month": sum(row.signups for row in this_month),
+        "total_payments": totals["payments"] or 0,
+        "pending_payments": totals["pending"] or 0,
+        "approved_payments": totals["approved"] or 0,
+        "rejected_payments": totals["rejected"] or 0,
+        "total_subscriptions": total_subscriptions,
+        "active_subscriptions": active_subscriptions,
+        "expired_subscriptions": max(0, total_subscriptions - active_subscriptions),
+        "monthly_data": monthly_data,
+        "growth_percent": growth_percent,
+    }
+    if include_revenue:
+        metrics["total_revenue"] = float(totals["revenue"] or 0)
+        metrics["current_month_revenue"] = float(sum((row.revenue for row in this_month), Decimal("0")))
+
+    for days in SALES_WINDOWS:
+        start = today - timedelta(days=days - 1)
+        metrics[f"sales_{days}d"] = sum(row.approved_payments for row in rows if row.day >= start)
+    metrics["sales_7d_chart"] = _daily_chart(rows, 7, today)
+    metrics["sales_30d_chart"] = _daily_chart(rows, 30, today)
+    metrics["sales_90d_chart"] = _monthly_chart(rows, 90, today)
+    metrics["sales_180d_chart"] = _monthly_chart(rows, 180, today)
+    return metrics
+
+
+def reconcile_range(days: Optional[int] = None) -> Tuple[date, date]:
+    """(start, end) for the reconcile command: the last ``days`` days, or the whole history."""
+    today = timezone.localdate()
+    if days:
+        return today - timedelta(days=days - 1), today
+    earliest = [
+        moment for moment in (
+            User.objects.order_by("date_joined").values_list("date_joined", flat=True).first(),
+            PaymentProof.objects.order_by("created_at").values_list("created_at", flat=True).first(),
+            UserSubscription.objects.order_by("created_at").values_list("created_at", flat=True).first(),
+        ) if moment
+    ]
+    start = min(_local_day(moment) for moment in earliest) if earliest else today
+    return start, today
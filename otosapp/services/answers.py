@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from django.db import transaction
+
+from ..models import Answer, Choice, Question, Test
+
+# Batas jumlah entri per permintaan sinkronisasi (satu paket UTBK penuh muat dalam satu batch)
+MAX_SYNC_ENTRIES = 200
+
+
+def save_answer(test_id: int, question_id: int, selected_choice_id: Optional[int] = None,
+                text_answer: Optional[str] = None) -> None:
+    """Insert or overwrite the answer for (test, question) in a single statement.
+
+    Relies on the ``unique_answer_per_test_question`` constraint and compiles to
+    ``INSERT ... ON CONFLICT (test_id, question_id) DO UPDATE`` on PostgreSQL and
+    SQLite, so concurrent saves for the same question can never create duplicates.
+    Multiple choice answers clear ``text_answer`` and essay answers clear
+    ``selected_choice``, matching the previous update paths.
+    """
+    Answer.objects.bulk_create(
+        [
+            Answer(
+                test_id=test_id,
+                question_id=question_id,
+                selected_choice_id=selected_choice_id,
+                text_answer=text_answer,
+            )
+        ],
+        update_conflicts=True,
+        unique_fields=["test", "question"],
+        update_fields=["selected_choice", "text_answer"],
+    )
+
+
+def clear_answer(test_id: int, question_id: int) -> int:
+    """Remove the stored answer for (test, question); returns the number of deleted rows."""
+    deleted, _ = Answer.objects.filter(test_id=test_id, question_id=question_id).delete()
+    return deleted
+
+
+class AnswerSyncError(ValueError):
+    """Raised when a sync payload is malformed."""
+
+
+@dataclass
+class AnswerSyncResult:
+    saved: int = 0
+    cleared: int = 0
+    rejected: List[Dict] = field(default_factory=list)
+    answered_question_ids: List[int] = field(default_factory=list)
+
+
+def _entry_sort_key(indexed_entry):
+    index, entry = indexed_entry
+    client_ts = entry.get("client_ts") if isinstance(entry, dict) else None
+    return (client_ts if isinstance(client_ts, (int, float)) else float("-inf"), index)
+
+
+def _question_types_in_test(test: Test, question_ids) -> Dict[int, str]:
+    """Map question ID -> question type for the IDs that belong to ``test``."""
+    questions = Question.objects.filter(id__in=question_ids)
+    if test.tryout_package_id:
+        from .package_layout import get_package_layout
+
+        layout_ids = set(get_package_layout(test.tryout_package).question_ids)
+        return {
+            question_id: question_type
+            for question_id, question_type in questions.values_list("id", "question_type")
+            if question_id in layout_ids
+        }
+    return dict(
+        questions.filter(category__in=test.categories.all()).values_list("id", "question_type")
+    )
+
+
+def sync_answers(test: Test, entries) -> AnswerSyncResult:
+    """Apply a batch of client answer entries to ``test`` in one transaction.
+
+    Each entry is ``{"question_id", "choice_id" | "text_answer" | "clear", "client_ts"}``.
+    Entries are applied in ``client_ts`` order, so when a question appears more
+    than once the latest client write wins. Entries for questions outside the
+    test or with a choice of another question are returned in ``rejected``.
+    """
+    if not isinstance(entries, list):
+        raise AnswerSyncError("answers harus berupa list")
+    if len(entries) > MAX_SYNC_ENTRIES:
+        raise AnswerSyncError(f"Maksimal {MAX_SYNC_ENTRIES} jawaban per sinkronisasi")
+
+    result = AnswerSyncResult()
+    latest: Dict[int, Dict] = {}
+    for index, entry in sorted(enumerate(entries), key=_entry_sort_key):
+        if not isinstance(entry, dict):
+            result.rejected.append({"index": index, "reason": "invalid_entry"})
+            continue
+        try:
+            question_id = int(entry.get("question_id"))
+        except (TypeError, ValueError):
+            result.rejected.append({"index": index, "reason": "invalid_question"})
+            continue
+        latest[question_id] = entry
+
+    question_types = _question_types_in_test(test, list(latest)) if latest else {}
+    choice_ids = []
+    for entry in latest.values():
+        try:
+            choice_ids.append(int(entry["choice_id"]))
+        except (KeyError, TypeError, ValueError):
+            pass
+    choice_questions = dict(
+        Choice.objects.filter(id__in=choice_ids, question_id__in=list(question_types)).values_list("id", "question_id")
+    ) if choice_ids else {}
+
+    to_save: List[Answer] = []
+    to_clear: List[int] = []
+    for question_id, entry in latest.items():
+        question_type = question_types.get(question_id)
+        if question_type is None:
+            result.rejected.append({"question_id": question_id, "reason": "not_in_test"})
+            continue
+        if entry.get("clear"):
+            to_clear.append(question_id)
+        elif question_type == "multiple_choice" and entry.get("choice_id") is not None:
+            try:
+                choice_id = int(entry["choice_id"])
+            except (TypeError, ValueError):
+                choice_id = None
+            if choice_questions.get(choice_id) != question_id:
+                result.rejected.append({"question_id": question_id, "reason": "invalid_choice"})
+                continue
+            to_save.append(Answer(test_id=test.pk, question_id=question_id, selected_choice_id=choice_id))
+        elif question_type == "essay" and isinstance(entry.get("text_answer"), str):
+            to_save.append(Answer(test_id=test.pk, question_id=question_id, text_answer=entry["text_answer"]))
+        else:
+            result.rejected.append({"question_id": question_id, "reason": "invalid_answer"})
+
+    with transaction.atomic():
+        if to_save:
+            Answer.objects.bulk_create(
+                to_save,
+                update_conflicts=True,
+                unique_fields=["test", "question"],
+                update_fields=["selected_choice", "text_answer"],
+            )
+        if to_clear:
+            result.cleared, _ = Answer.objects.filter(test_id=test.pk, question_id__in=to_clear).delete()
+        result.answered_question_ids = list(
+            Answer.objects.filter(test_id=test.pk).order_by("question_id").values_list("question_id", flat=True)
+        )
+    result.saved = len(to_save)
+    return result
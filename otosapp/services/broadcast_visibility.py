@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import math
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import BroadcastMessage
+from . import shared_counters
+
+SCHEMA = 2
+# Versi di database (SharedCounter) agar perubahan broadcast terlihat di semua proses
+VERSION_COUNTER = "broadcast_visibility:version"
+# Batas umur entri; dipersingkat sampai batas publish_at/expires_at berikutnya
+VISIBILITY_TTL = 5 * 60
+
+
+def _class_key(role_id: Optional[int], subscribed: Optional[bool]) -> str:
+    # None: status langganan tidak berpengaruh (bukan siswa)
+    state = "-" if subscribed is None else int(subscribed)
+    version = shared_counters.read([VERSION_COUNTER]).get(VERSION_COUNTER, 0)
+    return f"broadcast_visibility:{SCHEMA}:{version}:{role_id or 'none'}:{state}"
+
+
+def visibility_class(user) -> Tuple[Optional[int], Optional[bool]]:
+    """(role id, subscribed) of ``user``; only students are split by subscription."""
+    profile = user.access_profile
+    subscribed = profile.has_active_subscription() if profile.role_name == "Student" else None
+    return profile.role_id, subscribed
+
+
+def _candidates(role_id: Optional[int], now: datetime):
+    """Active, not yet expired broadcasts targeting ``role_id`` (live and upcoming)."""
+    qs = BroadcastMessage.objects.filter(is_active=True).filter(Q(expires_at__isnull=True) | Q(expires_at__gt=now))
+    if role_id:
+        return qs.filter(Q(target_roles__isnull=True) | Q(target_roles__id=role_id)).distinct()
+    return qs.filter(target_roles__isnull=True)
+
+
+def _timeout(broadcasts: List[BroadcastMessage], now: datetime) -> int:
+    """Seconds until the next publish or expiry among ``broadcasts``, capped at the TTL."""
+    boundaries = [b.publish_at for b in broadcasts if b.publish_at > now]
+    boundaries += [b.expires_at for b in broadcasts if b.expires_at]
+    if not boundaries:
+        return VISIBILITY_TTL
+    return max(1, min(VISIBILITY_TTL, math.ceil((min(boundaries) - now).total_seconds())))
+
+
+def live_broadcasts_for_class(role_id: Optional[int], subscribed: Optional[bool]) -> List[BroadcastMessage]:
+    """Live broadcasts of one visibility class, from the cache when possible.
+
+    Entries carry their prefetched ``target_roles`` and expire at the next
+    publish/expiry boundary, so a cached list is never stale by time.
+    """
+    key = _class_key(role_id, subscribed)
+    broadcasts = cache.get(key)
+    if broadcasts is not None:
+        return broadcasts
+    now = timezone.now()
+    candidates = list(_candidates(role_id, now).prefetch_related("target_roles"))
+    broadcasts = [
+        b for b in candidates
+        if b.publish_at <= now and not (subscribed is False and b.students_require_active_subscription)
+    ]
+    cache.set(key, broadcasts, _timeout(candidates, now))
+    return broadcasts
+
+
+def visible_broadcasts(user) -> List[BroadcastMessage]:
+    """Live broadcasts shown on ``user``'s dashboard; a version lookup and one cache read when warm."""
+    if not user.is_authenticated:
+        return []
+    return live_broadcasts_for_class(*visibility_class(user))
+
+
+def invalidate_broadcast_visibility() -> None:
+    """Drop the cached list of every visibility class, in every process (a broadcast or its targets changed)."""
+    shared_counters.stamp([VERSION_COUNTER])
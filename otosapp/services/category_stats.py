@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Dict, Iterable, List
+
+from django.core.cache import cache
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+
+from ..models import Test, TestCategoryScore
+
+# Naikkan bila bentuk statistik berubah agar entri cache lama tidak terbaca
+STATS_SCHEMA = 1
+# Tes yang disubmit tanpa calculate_score() tidak menginvalidasi cache; TTL ini batas basinya
+STATS_CACHE_TIMEOUT = 60 * 30
+
+EMPTY_STATISTICS = {
+    "total_tests": 0,
+    "total_students": 0,
+    "passed_tests": 0,
+    "failed_tests": 0,
+    "pass_rate": None,
+    "average_score": None,
+    "average_completion_minutes": None,
+}
+
+
+def _cache_key(category_id: int) -> str:
+    return f"category_stats:{STATS_SCHEMA}:{category_id}"
+
+
+def compute_category_statistics(category_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Statistics of ``Category.get_test_statistics`` for many categories in two queries.
+
+    Test counts, unique students, passes and completion time come from one
+    aggregate over the test/category link table; the average contribution
+    comes from the persisted per-category scores.
+    """
+    category_ids = list(category_ids)
+    stats = {category_id: dict(EMPTY_STATISTICS) for category_id in category_ids}
+    if not category_ids:
+        return stats
+
+    duration = ExpressionWrapper(F("test__end_time") - F("test__start_time"), output_field=DurationField())
+    timed = Q(test__start_time__isnull=False, test__end_time__gt=F("test__start_time"))
+    rows = (
+        Test.categories.through.objects.filter(category_id__in=category_ids, test__is_submitted=True)
+        .values("category_id")
+        .annotate(
+            total=Count("test_id"),
+            students=Count("test__student_id", distinct=True),
+            passed=Count("test_id", filter=Q(test__score__gte=F("category__passing_score"))),
+            duration_total=Sum(duration, filter=timed),
+            duration_count=Count("test_id", filter=timed),
+        )
+        .order_by()
+    )
+    contributions = dict(
+        TestCategoryScore.objects.filter(category_id__in=category_ids, test__is_submitted=True)
+        .values("category_id")
+        .annotate(total=Sum("contribution"))
+        .order_by()
+        .values_list("category_id", "total")
+    )
+
+    for row in rows:
+        total_tests = row["total"]
+        if not total_tests:
+            continue
+        average_minutes = None
+        if row["duration_count"]:
+            seconds = (row["duration_total"] or timedelta()).total_seconds()
+            average_minutes = round(seconds / row["duration_count"] / 60, 1)
+        stats[row["category_id"]] = {
+            "total_tests": total_tests,
+            "total_students": row["students"],
+            "passed_tests": row["passed"],
+            "failed_tests": total_tests - row["passed"],
+            "pass_rate": round((row["passed"] / total_tests) * 100, 1),
+            "average_score": round((contributions.get(row["category_id"]) or 0) / total_tests, 1),
+            "average_completion_minutes": average_minutes,
+        }
+    return stats
+
+
+def get_category_statistics(category_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Memoized statistics per category; only categories missing from the cache are computed."""
+    category_ids = list(dict.fromkeys(category_ids))
+    cached = cache.get_many([_cache_key(category_id) for category_id in category_ids])
+    stats = {}
+    missing = []
+    for category_id in category_ids:
+        entry = cached.get(_cache_key(category_id))
+        if entry is None:
+            missing.append(category_id)
+        else:
+            stats[category_id] = entry
+    if missing:
+        fresh = compute_category_statistics(missing)
+        cache.set_many({_cache_key(category_id): entry for category_id, entry in fresh.items()}, STATS_CACHE_TIMEOUT)
+        stats.update(fresh)
+    return stats
+
+
+def attach_category_statistics(categories: List) -> List:
+    """Load statistics for a list of categories at once and keep them on the instances.
+
+    Later calls to ``get_test_statistics``/``get_pass_rate``/``get_difficulty_level``
+    on those instances then need no query or cache lookup.
+    """
+    stats = get_category_statistics(category.pk for category in categories)
+    for category in categories:
+        category._test_statistics = stats[category.pk]
+    return categories
+
+
+def invalidate_category_statistics(category_ids: Iterable[int]) -> None:
+    cache.delete_many([_cache_key(category_id) for category_id in set(category_ids)])
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from typing import Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+
+from ..models import MessageThread, PaymentProof
+from . import shared_counters
+
+SCHEMA = 2
+# Batas umur counter; sekaligus rekonsiliasi berkala bila ada perubahan yang lolos dari sinyal
+BADGE_TTL = 10 * 60
+# Versi dan counter pending disimpan di database (SharedCounter) agar sama di semua proses;
+# cache hanya menyimpan hasil hitungan per versi, jadi boleh lokal dan boleh dibuang kapan saja.
+# Artinya render badge TIDAK bebas database: tiap render membaca SharedCounter sekali lewat
+# index unik pada name. Ini disengaja: di Vercel setiap instance serverless punya LocMemCache
+# sendiri dan tidak ada cache bersama (Redis), sehingga versi yang hanya ada di cache lokal
+# akan basi di instance lain. Satu lookup berindeks menggantikan COUNT thread/pesan per render.
+PENDING_PAYMENTS_COUNTER = "inbox_badges:pending_payments"
+# "all" membatalkan seluruh counter (rekonsiliasi); "staff" hanya counter guru/operator/admin
+ALL_VERSION = "inbox_badges:version:all"
+STAFF_VERSION = "inbox_badges:version:staff"
+
+
+def _user_version(user_id: int) -> str:
+    return f"inbox_badges:version:user:{user_id}"
+
+
+def _unread_key(user_id: int, staff: bool, versions: dict) -> str:
+    scope = f"staff{versions.get(STAFF_VERSION, 0)}" if staff else "student"
+    return (
+        f"inbox_badges:{SCHEMA}:{versions.get(ALL_VERSION, 0)}:{scope}:"
+        f"{versions.get(_user_version(user_id), 0)}:unread:{user_id}"
+    )
+
+
+def unread_message_count(user) -> int:
+    """Unread inbox badge of ``user``: one indexed SharedCounter read, then the cached count."""
+    staff = user.access_profile.role_name != "Student"
+    names = [ALL_VERSION, _user_version(user.pk)] + ([STAFF_VERSION] if staff else [])
+    key = _unread_key(user.pk, staff, shared_counters.read(names))
+    count = cache.get(key)
+    if count is None:
+        from .message_threads import total_unread
+
+        count = total_unread(user)
+        cache.set(key, count, BADGE_TTL)
+    return count
+
+
+def invalidate_user_badge(user) -> None:
+    """Drop only ``user``'s unread counter (they opened a thread)."""
+    shared_counters.stamp([_user_version(user.pk)])
+
+
+def pending_payments_count() -> int:
+    """Global pending payment-proof badge for admins: one indexed SharedCounter read."""
+    count = shared_counters.read([PENDING_PAYMENTS_COUNTER]).get(PENDING_PAYMENTS_COUNTER)
+    if count is None:
+        count = PaymentProof.objects.filter(status="pending").count()
+        shared_counters.put(PENDING_PAYMENTS_COUNTER, count)
+    return count
+
+
+def adjust_pending_payments(previous_status: Optional[str], status: Optional[str]) -> None:
+    """Move the pending counter by the status transition of one payment proof."""
+    delta = (status == "pending") - (previous_status == "pending")
+    if delta:
+        # Counter belum ada; dihitung ulang saat dibaca
+        shared_counters.add(PENDING_PAYMENTS_COUNTER, delta)
+
+
+def _affects_all_staff(assignee_id: Optional[int], thread_type: str, close_requested_by_id: Optional[int]) -> bool:
+    return assignee_id is None or thread_type != "academic" or close_requested_by_id is not None
+
+
+def _badge_state(thread: MessageThread) -> Tuple[Optional[int], str, Optional[int]]:
+    """The thread fields that decide who sees its messages in their unread badge."""
+    return thread.teacher_or_admin_id, thread.thread_type, thread.close_requested_by_id
+
+
+def invalidate_thread_badges(thread: MessageThread, previous_state: Optional[Tuple] = None) -> None:
+    """Drop the unread counters a change in ``thread`` can affect.
+
+    The student and the assignee lose their own counter; threads that are
+    (or were, per ``previous_state``) unassigned, non-academic or awaiting a
+    close decision are visible to every staff member, so the staff-wide
+    version is bumped instead.
+    """
+    names: List[str] = [_user_version(thread.student_id)]
+    states = [_badge_state(thread)] + ([previous_state] if previous_state else [])
+    if any(_affects_all_staff(*state) for state in states):
+        names.append(STAFF_VERSION)
+    else:
+        names.extend(_user_version(assignee_id) for assignee_id in {state[0] for state in states})
+    shared_counters.stamp(names)
+
+
+def invalidate_fan_out_badges(student_ids: Iterable[int], assignee_id: int, thread_type: str) -> None:
+    """Drop the counters touched by one new thread per student, all assigned to ``assignee_id``."""
+    names = [_user_version(student_id) for student_id in student_ids]
+    if _affects_all_staff(assignee_id, thread_type, None):
+        names.append(STAFF_VERSION)
+    else:
+        names.append(_user_version(assignee_id))
+    shared_counters.stamp(names)
+
+
+def reconcile_badges() -> int:
+    """Recount the pending badge and drop every unread counter; returns the pending count."""
+    shared_counters.stamp([ALL_VERSION])
+    count = PaymentProof.objects.filter(status="pending").count()
+    shared_counters.put(PENDING_PAYMENTS_COUNTER, count)
+    return count
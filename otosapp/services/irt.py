@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Answer, Category, Question, TestAbilityEstimate
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # numpy/scipy hanya dibutuhkan untuk kalibrasi, bukan untuk penilaian
+    np = None
+    sparse = None
+
+IRT_MODELS = ("1pl", "2pl")
+# Titik kuadratur theta (-4..4) dengan prior normal baku; dipakai kalibrasi dan penilaian
+QUADRATURE_POINTS = 41
+THETA_RANGE = 4.0
+MAX_ITERATIONS = 200
+# EM berhenti saat perubahan parameter soal terbesar di bawah batas ini
+TOLERANCE = 1e-3
+NEWTON_STEPS = 3
+# Prior lemah agar soal yang selalu benar/salah tetap punya parameter hingga
+DISCRIMINATION_PRIOR_SD = 1.0
+INTERCEPT_PRIOR_SD = 5.0
+DISCRIMINATION_BOUNDS = (0.05, 5.0)
+INTERCEPT_BOUNDS = (-15.0, 15.0)
+
+
+class CalibrationError(Exception):
+    """Raised when an IRT calibration cannot run (missing dependency or no data)."""
+
+
+def quadrature() -> Tuple[List[float], List[float]]:
+    """Theta grid and normalised log prior weights (pure Python, shared with scoring)."""
+    step = 2 * THETA_RANGE / (QUADRATURE_POINTS - 1)
+    points = [-THETA_RANGE + index * step for index in range(QUADRATURE_POINTS)]
+    densities = [-0.5 * point * point for point in points]
+    log_total = math.log(sum(math.exp(value) for value in densities))
+    return points, [value - log_total for value in densities]
+
+
+@dataclass
+class ItemFit:
+    discrimination: "np.ndarray"
+    difficulty: "np.ndarray"
+    theta: "np.ndarray"
+    standard_error: "np.ndarray"
+    log_likelihood: float
+    iterations: int
+
+
+def _log_sigmoid(values):
+    return -np.logaddexp(0.0, -values)
+
+
+def fit_irt(persons, items, correct, n_persons: int, n_items: int, model: str = "2pl",
+            max_iterations: int = MAX_ITERATIONS, tolerance: float = TOLERANCE) -> ItemFit:
+    """Marginal maximum likelihood (Bock-Aitkin EM) fit of a 1PL/2PL model.
+
+    ``persons``/``items``/``correct`` are parallel arrays of observed
+    responses. They are kept as sparse person x item matrices, so every EM
+    step is two sparse-dense products over the quadrature grid and memory
+    stays proportional to the number of responses.
+    """
+    if np is None:
+        raise CalibrationError("Kalibrasi IRT membutuhkan numpy dan scipy.")
+    if model not in IRT_MODELS:
+        raise CalibrationError(f"Model IRT tidak dikenal: {model}")
+
+    shape = (n_persons, n_items)
+    answered = sparse.csr_matrix((np.ones(len(persons)), (persons, items)), shape=shape)
+    right = sparse.csr_matrix((np.asarray(correct, dtype=float), (persons, items)), shape=shape)
+    wrong = answered - right
+    answered_t, right_t = answered.T.tocsr(), right.T.tocsr()
+
+    points, log_prior = (np.array(values) for values in quadrature())
+    slope = np.ones(n_items)
+    answered_counts = np.maximum(np.asarray(answered_t.sum(axis=1)).ravel(), 1)
+    proportion = np.clip(np.asarray(right_t.sum(axis=1)).ravel() / answered_counts, 0.02, 0.98)
+    intercept = np.log(proportion / (1 - proportion))
+
+    iterations = 0
+    for iterations in range(1, max_iterations + 1):
+        # E-step: posterior of every person over the theta grid
+        logits = slope[:, None] * points[None, :] + intercept[:, None]
+        log_likelihood = right @ _log_sigmoid(logits) + wrong @ _log_sigmoid(-logits) + log_prior
+        normaliser = np.logaddexp.reduce(log_likelihood, axis=1)
+        posterior = np.exp(log_likelihood - normaliser[:, None])
+        expected_answered = answered_t @ posterior
+        expected_right = right_t @ posterior
+
+        # M-step: a few vectorised Newton steps per item
+        previous_slope, previous_intercept = slope.copy(), intercept.copy()
+        for _ in range(NEWTON_STEPS):
+            probability = 1.0 / (1.0 + np.exp(-(slope[:, None] * points[None, :] + intercept[:, None])))
+            residual = expected_right - expected_answered * probability
+            information = expected_answered * probability * (1 - probability)
+            grad_c = residual.sum(axis=1) - intercept / INTERCEPT_PRIOR_SD ** 2
+            info_cc = information.sum(axis=1) + 1 / INTERCEPT_PRIOR_SD ** 2
+            if model == "1pl":
+                step_c = grad_c / info_cc
+            else:
+                grad_a = (residual * points).sum(axis=1) - (slope - 1) / DISCRIMINATION_PRIOR_SD ** 2
+                info_aa = (information * points ** 2).sum(axis=1) + 1 / DISCRIMINATION_PRIOR_SD ** 2
+                info_ac = (information * points).sum(axis=1)
+                determinant = np.maximum(info_aa * info_cc - info_ac ** 2, 1e-12)
+                step_a = np.clip((info_cc * grad_a - info_ac * grad_c) / determinant, -1, 1)
+                step_c = (info_aa * grad_c - info_ac * grad_a) / determinant
+                slope = np.clip(slope + step_a, *DISCRIMINATION_BOUNDS)
+            intercept = np.clip(intercept + np.clip(step_c, -2, 2), *INTERCEPT_BOUNDS)
+
+        change = max(np.abs(slope - previous_slope).max(), np.abs(intercept - previous_intercept).max())
+        if change < tolerance:
+            break
+
+    theta = posterior @ points
+    variance = np.maximum(posterior @ points ** 2 - theta ** 2, 0)
+    return ItemFit(
+        discrimination=slope,
+        difficulty=-intercept / slope,
+        theta=theta,
+        standard_error=np.sqrt(variance),
+        log_likelihood=float(normaliser.sum()),
+        iterations=iterations,
+    )
+
+
+def _category_responses(category_id: int):
+    """(test ids, question ids, person index, item index, correct) of a category's submitted answers."""
+    from .scoring import _is_correct
+
+    rows = (
+        Answer.objects.filter(question__category_id=category_id, test__is_submitted=True)
+        .order_by()
+        .values_list(
+            "test_id", "question_id", "question__question_type", "selected_choice__is_correct",
+            "question__correct_answer_text", "text_answer",
+        )
+        .iterator(chunk_size=10000)
+    )
+    test_ids, question_ids, correct = [], [], []
+    for test_id, question_id, question_type, selected_is_correct, answer_text, text_answer in rows:
+        test_ids.append(test_id)
+        question_ids.append(question_id)
+        if question_type == "multiple_choice":
+            correct.append(bool(selected_is_correct))
+        else:
+            correct.append(_is_correct(question_type, selected_is_correct, answer_text, text_answer))
+    if not test_ids:
+        return None
+
+    tests, persons = np.unique(np.array(test_ids), return_inverse=True)
+    questions, items = np.unique(np.array(question_ids), return_inverse=True)
+    # Jawaban ganda untuk pasangan test/soal yang sama hanya dihitung sekali
+    _, first = np.unique(persons.astype(np.int64) * len(questions) + items, return_index=True)
+    return tests, questions, persons[first], items[first], np.array(correct)[first]
+
+
+@dataclass
+class IrtCalibrationResult:
+    category_id: int
+    model: str
+    responses: int
+    questions: int
+    tests: int
+    log_likelihood: float
+    iterations: int
+
+
+def calibrate_irt_category(category_id: int, model: Optional[str] = None, **fit_options) -> IrtCalibrationResult:
+    """Fit the category's IRT model and store item parameters and per-test abilities.
+
+    The category switches to ``model`` (or keeps its configured IRT model),
+    and its submitted tests are flagged for rescoring in one update.
+    """
+    category = Category.objects.get(pk=category_id)
+    model = model or (category.utbk_model if category.utbk_model in IRT_MODELS else "2pl")
+    if np is None:
+        raise CalibrationError("Kalibrasi IRT membutuhkan numpy dan scipy.")
+    data = _category_responses(category_id)
+    if data is None:
+        raise CalibrationError(f"Kategori {category.category_name} belum memiliki jawaban untuk dikalibrasi.")
+    tests, questions, persons, items, correct = data
+    fit = fit_irt(persons, items, correct, len(tests), len(questions), model=model, **fit_options)
+
+    from .scoring import mark_tests_stale
+
+    question_rows = [
+        Question(pk=int(pk), irt_discrimination=float(a), irt_difficulty=float(b))
+        for pk, a, b in zip(questions, fit.discrimination, fit.difficulty)
+    ]
+    estimates = [
+        TestAbilityEstimate(test_id=int(test_id), category_id=category_id, theta=float(theta), standard_error=float(se))
+        for test_id, theta, se in zip(tests, fit.theta, fit.standard_error)
+    ]
+    with transaction.atomic():
+        Question.objects.filter(category_id=category_id).update(irt_discrimination=None, irt_difficulty=None)
+        Question.objects.bulk_update(question_rows, ["irt_discrimination", "irt_difficulty"], batch_size=1000)
+        TestAbilityEstimate.objects.bulk_create(
+            estimates,
+            batch_size=2000,
+            update_conflicts=True,
+            unique_fields=["test", "category"],
+            update_fields=["theta", "standard_error", "estimated_at"],
+        )
+        Category.objects.filter(pk=category_id).update(utbk_model=model, irt_calibrated_at=timezone.now())
+        mark_tests_stale(question_ids=[int(pk) for pk in questions])
+
+    return IrtCalibrationResult(
+        category_id=category_id,
+        model=model,
+        responses=len(persons),
+        questions=len(questions),
+        tests=len(tests),
+        log_likelihood=fit.log_likelihood,
+        iterations=fit.iterations,
+    )
+
+
+def _probability(theta: float, discrimination: float, difficulty: float) -> float:
+    value = discrimination * (theta - difficulty)
+    if value >= 0:
+        return 1.0 / (1.0 + math.exp(-value))
+    exp_value = math.exp(value)
+    return exp_value / (1.0 + exp_value)
+
+
+def estimate_ability(responses: Iterable[Tuple[float, float, bool]]) -> Tuple[float, float]:
+    """EAP ability and its standard error for (discrimination, difficulty, correct) responses.
+
+    Uses the same grid and prior as the calibration, in plain Python, so
+    scoring a single test does not need numpy.
+    """
+    points, log_weights = quadrature()
+    log_posterior = list(log_weights)
+    for discrimination, difficulty, correct in responses:
+        for index, point in enumerate(points):
+            probability = min(max(_probability(point, discrimination, difficulty), 1e-12), 1 - 1e-12)
+            log_posterior[index] += math.log(probability if correct else 1 - probability)
+    peak = max(log_posterior)
+    weights = [math.exp(value - peak) for value in log_posterior]
+    total = sum(weights)
+    theta = sum(weight * point for weight, point in zip(weights, points)) / total
+    variance = sum(weight * point * point for weight, point in zip(weights, points)) / total - theta * theta
+    return theta, math.sqrt(max(variance, 0.0))
+
+
+def expected_score(theta: float, items: Sequence[Tuple[float, float]]) -> float:
+    """Expected share of ``items`` answered correctly at ``theta``, on the 0-1000 UTBK scale."""
+    if not items:
+        return 0
+    return sum(_probability(theta, a, b) for a, b in items) / len(items) * 1000
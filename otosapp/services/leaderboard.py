@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.functions import Rank
+from django.utils import timezone
+
+from ..models import LeaderboardEntry, Test
+
+TIME_WINDOWS: Dict[str, Optional[timedelta]] = {
+    "all": None,
+    "week": timedelta(days=7),
+    "month": timedelta(days=30),
+    "year": timedelta(days=365),
+}
+
+# Tipe ranking yang diurutkan berdasarkan skor terbaik; sisanya berdasarkan rata-rata
+BEST_SCORE_TYPES = {"utbk_package_best", "category_best"}
+
+# Ranking paket UTBK selalu dihitung dari semua tes; filter periode tidak berlaku
+ALL_TIME_TYPES = {"utbk_package_best"}
+
+# (ranking_type, scoring_method, package_key, category_key)
+EntryKey = Tuple[str, str, int, int]
+
+
+@dataclass
+class _TestRow:
+    test_id: int
+    score: float
+    date_taken: object
+    package_id: Optional[int]
+    categories: List[Tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def first_category_id(self) -> Optional[int]:
+        return min(category_id for category_id, _ in self.categories) if self.categories else None
+
+    @property
+    def is_utbk(self) -> bool:
+        return any(method == "utbk" for _, method in self.categories)
+
+
+@dataclass
+class _Aggregate:
+    total: int = 0
+    score_sum: float = 0
+    best: Optional[_TestRow] = None
+    latest_at: object = None
+    oldest_at: object = None
+
+    def add(self, row: _TestRow):
+        self.total += 1
+        self.score_sum += row.score
+        if self.best is None or row.score > self.best.score:
+            self.best = row
+        if self.latest_at is None or row.date_taken > self.latest_at:
+            self.latest_at = row.date_taken
+        if self.oldest_at is None or row.date_taken < self.oldest_at:
+            self.oldest_at = row.date_taken
+
+
+def _load_student_tests(student_id: int) -> List[_TestRow]:
+    rows: Dict[int, _TestRow] = {}
+    for test_id, score, date_taken, package_id, category_id, method in (
+        Test.objects.filter(student_id=student_id, is_submitted=True)
+        .order_by("-date_taken", "-pk")
+        .values_list("id", "score", "date_taken", "tryout_package_id", "categories__id", "categories__scoring_method")
+    ):
+        row = rows.get(test_id)
+        if row is None:
+            row = rows[test_id] = _TestRow(test_id, score or 0, date_taken, package_id)
+        if category_id is not None:
+            row.categories.append((category_id, method))
+    return list(rows.values())
+
+
+def _keys_for(row: _TestRow) -> Iterable[EntryKey]:
+    yield ("overall_average", "all", 0, 0)
+    for method in {method for _, method in row.categories}:
+        yield ("overall_average", method, 0, 0)
+    for category_id, _ in row.categories:
+        yield ("category_best", "all", 0, category_id)
+        yield ("category_average", "all", 0, category_id)
+    if row.package_id and row.is_utbk:
+        yield ("utbk_package_best", "all", 0, 0)
+        yield ("utbk_package_best", "all", row.package_id, 0)
+
+
+def build_student_entries(student_id: int, now=None) -> List[LeaderboardEntry]:
+    """Unsaved leaderboard rows of one student across every ranking key and time window."""
+    now = now or timezone.now()
+    tests = _load_student_tests(student_id)
+    if not tests:
+        return []
+
+    # Tests are ordered newest first, so the first match is the latest one
+    latest_test = tests[0]
+    latest_utbk = next((row for row in tests if row.is_utbk), None)
+
+    aggregates: Dict[Tuple[EntryKey, str], _Aggregate] = {}
+    for row in tests:
+        windows = [
+            period for period, length in TIME_WINDOWS.items()
+            if length is None or row.date_taken >= now - length
+        ]
+        for key in set(_keys_for(row)):
+            for period in (["all"] if key[0] in ALL_TIME_TYPES else windows):
+                aggregates.setdefault((key, period), _Aggregate()).add(row)
+
+    entries: List[LeaderboardEntry] = []
+    for ((ranking_type, scoring_method, package_key, category_key), period), aggregate in aggregates.items():
+        average = aggregate.score_sum / aggregate.total
+        uses_best = ranking_type in BEST_SCORE_TYPES
+        display = aggregate.best if ranking_type == "utbk_package_best" else latest_test
+        if ranking_type == "utbk_package_best":
+            university_score = aggregate.best.score
+        else:
+            university_score = latest_utbk.score if latest_utbk else None
+        length = TIME_WINDOWS[period]
+        entries.append(
+            LeaderboardEntry(
+                ranking_type=ranking_type,
+                time_period=period,
+                scoring_method=scoring_method,
+                package_key=package_key,
+                category_key=category_key,
+                student_id=student_id,
+                score=aggregate.best.score if uses_best else average,
+                avg_score=average,
+                max_score=aggregate.best.score,
+                total_tests=aggregate.total,
+                latest_test_at=aggregate.latest_at,
+                display_test_id=display.test_id,
+                display_category_id=display.first_category_id,
+                university_score=university_score,
+                expires_at=aggregate.oldest_at + length if length else None,
+            )
+        )
+    return entries
+
+
+_KEY_FIELDS = ["ranking_type", "time_period", "scoring_method", "package_key", "category_key", "student"]
+
+_UPDATE_FIELDS = [
+    "score",
+    "avg_score",
+    "max_score",
+    "total_tests",
+    "latest_test_at",
+    "display_test",
+    "display_category",
+    "university_score",
+    "expires_at",
+    "updated_at",
+]
+
+
+def _entry_key(entry) -> Tuple:
+    return (entry.ranking_type, entry.time_period, entry.scoring_method, entry.package_key, entry.category_key)
+
+
+def refresh_student_leaderboard(student_id: int, now=None) -> int:
+    """Recompute every leaderboard row of one student (upsert + delete of rows that no longer apply)."""
+    entries = build_student_entries(student_id, now=now)
+    fresh_keys = {_entry_key(entry) for entry in entries}
+
+    with transaction.atomic():
+        existing = LeaderboardEntry.objects.filter(student_id=student_id).only(*_KEY_FIELDS[:-1])
+        obsolete_ids = [entry.pk for entry in existing if _entry_key(entry) not in fresh_keys]
+        if obsolete_ids:
+            LeaderboardEntry.objects.filter(pk__in=obsolete_ids).delete()
+        if entries:
+            LeaderboardEntry.objects.bulk_create(
+                entries,
+                update_conflicts=True,
+                unique_fields=_KEY_FIELDS,
+                update_fields=_UPDATE_FIELDS,
+            )
+    return len(entries)
+
+
+def refresh_expired_entries(limit: Optional[int] = None, now=None, **key_filters) -> int:
+    """Refresh students whose rolling-window rows have aged out; returns the number of students."""
+    now = now or timezone.now()
+    student_ids = (
+        LeaderboardEntry.objects.filter(expires_at__lte=now, **key_filters)
+        .order_by()
+        .values_list("student_id", flat=True)
+        .distinct()
+    )
+    if limit:
+        student_ids = student_ids[:limit]
+    student_ids = list(student_ids)
+    for student_id in student_ids:
+        refresh_student_leaderboard(student_id, now=now)
+    return len(student_ids)
+
+
+@dataclass
+class LeaderboardQuery:
+    ranking_type: str
+    time_period: str = "all"
+    scoring_method: str = "all"
+    package_key: int = 0
+    category_key: int = 0
+    min_tests: int = 0
+    university_id: Optional[int] = None
+
+    @property
+    def period(self) -> str:
+        return "all" if self.ranking_type in ALL_TIME_TYPES else self.time_period
+
+    def key_filters(self) -> Dict:
+        return {
+            "ranking_type": self.ranking_type,
+            "time_period": self.period,
+            "scoring_method": self.scoring_method,
+            "package_key": self.package_key,
+            "category_key": self.category_key,
+        }
+
+    def queryset(self):
+        entries = LeaderboardEntry.objects.filter(**self.key_filters())
+        if self.min_tests:
+            entries = entries.filter(total_tests__gte=self.min_tests)
+        if self.university_id:
+            entries = entries.filter(
+                Q(student__university_target__primary_university_id=self.university_id)
+                | Q(student__university_target__backup_university_id=self.university_id)
+                | Q(student__university_target__secondary_university_id=self.university_id)
+            )
+        return entries
+
+    @property
+    def ordering(self) -> List[str]:
+        if self.ranking_type in BEST_SCORE_TYPES:
+            return ["-score", "-avg_score", "student_id"]
+        return ["-score", "-total_tests", "student_id"]
+
+
+def leaderboard_page(query: LeaderboardQuery, limit: int = 50, student_id: Optional[int] = None):
+    """Top ``limit`` rows of the requested leaderboard.
+
+    A rolling-window row whose oldest test has aged out stays listed with its
+    previous totals until the scheduled ``refresh_leaderboard`` run recomputes
+    it; only ``student_id`` (the viewer) is refreshed inline.
+    """
+    if student_id and query.period != "all":
+        refresh_expired_entries(student_id=student_id, **query.key_filters())
+    return list(
+        query.queryset()
+        .select_related("student", "display_test__tryout_package", "display_category")
+        .order_by(*query.ordering)[:limit]
+    )
+
+
+def _rank_payload(rank: int, total: int, lower: int, score: float, total_tests: int) -> Dict:
+    # Persentil = porsi peserta dengan skor lebih rendah; peserta dengan skor sama tidak dihitung
+    percentile = round(lower / total * 100, 1) if total else 0
+    return {
+        "rank": rank,
+        "total": total,
+        "percentile": percentile,
+        "score": round(score, 1),
+        "total_tests": total_tests,
+    }
+
+
+def _student_rank_window(query: LeaderboardQuery, student_id: int) -> Optional[Dict]:
+    """Single query: RANK() and COUNT(*) windows over the key, filtered to one student outside."""
+    key = [F(name) for name in _KEY_FIELDS[:-1]]
+    ranked = query.queryset().annotate(
+        position=Window(expression=Rank(), partition_by=key, order_by=[F("score").desc()]),
+        population=Window(expression=Count("id"), partition_by=key),
+        ties=Window(expression=Count("id"), partition_by=[*key, F("score")]),
+    ).order_by().values("student_id", "position", "population", "ties", "score", "total_tests")
+    inner_sql, params = ranked.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT ranked.position, ranked.population, ranked.ties, ranked.score, ranked.total_tests "
+            f"FROM ({inner_sql}) ranked WHERE ranked.student_id = %s",
+            (*params, student_id),
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    position, population, ties, score, total_tests = row
+    # position - 1 peserta lebih baik, ties (termasuk siswa ini) sama skornya; sisanya lebih rendah
+    return _rank_payload(position, population, population - (position - 1) - ties, score, total_tests)
+
+
+def _student_rank_count(query: LeaderboardQuery, student_id: int) -> Optional[Dict]:
+    """Fallback for databases without window functions: rank = strictly better rows + 1."""
+    entry = query.queryset().filter(student_id=student_id).first()
+    if entry is None:
+        return None
+    counts = query.queryset().aggregate(
+        better=Count("id", filter=Q(score__gt=entry.score)),
+        lower=Count("id", filter=Q(score__lt=entry.score)),
+        total=Count("id"),
+    )
+    return _rank_payload(counts["better"] + 1, counts["total"], counts["lower"], entry.score, entry.total_tests)
+
+
+def student_rank(query: LeaderboardQuery, student_id: int) -> Optional[Dict]:
+    """Rank, population and percentile of one student for any ranking type (ties share a rank)."""
+    if connection.features.supports_over_clause:
+        return _student_rank_window(query, student_id)
+    return _student_rank_count(query, student_id)
+
+
+def leaderboard_totals(time_period: str, scoring_method: str = "all", category_key: int = 0) -> Dict:
+    """Students and submitted tests covered by the matching average leaderboard."""
+    ranking_type = "category_average" if category_key else "overall_average"
+    entries = LeaderboardEntry.objects.filter(
+        ranking_type=ranking_type,
+        time_period=time_period,
+        scoring_method="all" if category_key else scoring_method,
+        package_key=0,
+        category_key=category_key,
+    )
+    totals = entries.aggregate(total_tests=Sum("total_tests"))
+    return {"total_students": entries.count(), "total_tests": totals["total_tests"] or 0}
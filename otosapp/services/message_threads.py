@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from django.db.models import Count, F, FilteredRelation, IntegerField, OuterRef, Q, QuerySet, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import Message, MessageThread, ThreadParticipantState
+
+
+def visible_threads(user) -> QuerySet:
+    """Threads that appear in ``user``'s inbox, by role."""
+    profile = user.access_profile
+    if profile.role_name == "Student":
+        # Siswa: thread yang mereka buat
+        return MessageThread.objects.filter(student=user)
+    if profile.role_name == "Admin" or profile.is_superuser:
+        # Admin: permintaan tutup, thread yang ditugaskan kepadanya, dan semua thread non-akademik
+        return MessageThread.objects.filter(
+            Q(close_requested_by__isnull=False) | Q(teacher_or_admin=user) | ~Q(thread_type="academic")
+        )
+    # Guru/operator: thread yang ditugaskan kepadanya atau belum ditugaskan
+    return MessageThread.objects.filter(Q(teacher_or_admin=user) | Q(teacher_or_admin=None))
+
+
+def with_unread_counts(threads: QuerySet, user) -> QuerySet:
+    """Annotate ``unread_count`` for ``user`` in the thread query itself.
+
+    Participants read their denormalized counter through a filtered join.
+    Users who never opened a thread have no state row yet; for them the
+    legacy ``Message.is_read`` flag of other senders' messages is counted.
+    """
+    legacy_unread = (
+        Message.objects.filter(thread=OuterRef("pk"), is_read=False)
+        .exclude(sender=user)
+        .order_by()
+        .values("thread")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return threads.annotate(
+        my_state=FilteredRelation("participant_states", condition=Q(participant_states__user=user)),
+    ).annotate(
+        unread_count=Coalesce(
+            F("my_state__unread_count"),
+            Subquery(legacy_unread, output_field=IntegerField()),
+            Value(0),
+        )
+    )
+
+
+def unread_count_for(thread: MessageThread, user) -> int:
+    return with_unread_counts(MessageThread.objects.filter(pk=thread.pk), user).values_list(
+        "unread_count", flat=True
+    ).first() or 0
+
+
+def total_unread(user) -> int:
+    """Sum of ``user``'s unread counts over every thread in their inbox."""
+    return with_unread_counts(visible_threads(user), user).aggregate(total=Sum("unread_count"))["total"] or 0
+
+
+def record_message(message: Message) -> None:
+    """Count a new message as unread for every other participant; the sender has read up to it."""
+    ThreadParticipantState.objects.filter(thread_id=message.thread_id).exclude(user_id=message.sender_id).update(
+        unread_count=F("unread_count") + 1
+    )
+    _reset(message.thread_id, message.sender_id, message.created_at)
+
+
+def forget_message(message: Message) -> None:
+    """Take a deleted message back out of the counters of participants who had not read it yet."""
+    ThreadParticipantState.objects.filter(thread_id=message.thread_id, unread_count__gt=0).filter(
+        Q(last_read_at__isnull=True) | Q(last_read_at__lt=message.created_at)
+    ).exclude(user_id=message.sender_id).update(unread_count=F("unread_count") - 1)
+
+
+def _reset(thread_id: int, user_id: int, at: datetime) -> None:
+    ThreadParticipantState.objects.bulk_create(
+        [ThreadParticipantState(thread_id=thread_id, user_id=user_id, last_read_at=at, unread_count=0)],
+        update_conflicts=True,
+        unique_fields=["thread", "user"],
+        update_fields=["last_read_at", "unread_count"],
+    )
+
+
+def mark_thread_read(thread: MessageThread, user, at: Optional[datetime] = None) -> None:
+    """Reset ``user``'s unread state of ``thread`` with one single-row upsert, however long the thread is."""
+    _reset(thread.pk, user.pk, at or timezone.now())
+
+    from .inbox_badges import invalidate_user_badge
+    invalidate_user_badge(user)
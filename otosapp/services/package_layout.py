@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db.models import F
+
+from ..models import Question, TryoutPackage, TryoutPackageCategory
+
+# Naikkan bila bentuk data layout berubah agar entri cache lama tidak terbaca
+LAYOUT_SCHEMA = 1
+LAYOUT_CACHE_TIMEOUT = 60 * 60 * 6
+
+
+@dataclass(frozen=True)
+class PackageSubtest:
+    category_id: int
+    category_name: str
+    start: int
+    count: int
+
+
+@dataclass(frozen=True)
+class PackageLayout:
+    """Ordered question IDs of a package plus 1-based subtest offsets."""
+
+    package_id: int
+    version: int
+    question_ids: Tuple[int, ...]
+    subtests: Tuple[PackageSubtest, ...]
+
+    @property
+    def total_questions(self) -> int:
+        return len(self.question_ids)
+
+    def question_id_at(self, number: int) -> Optional[int]:
+        """Question ID for a 1-based question number, or None when out of range."""
+        if 1 <= number <= len(self.question_ids):
+            return self.question_ids[number - 1]
+        return None
+
+    def numbers_for(self, question_ids: Iterable[int]) -> List[int]:
+        """Sorted 1-based question numbers for the given question IDs."""
+        wanted = set(question_ids)
+        return [index + 1 for index, question_id in enumerate(self.question_ids) if question_id in wanted]
+
+    def subtests_as_dicts(self) -> List[Dict]:
+        return [
+            {
+                "category_id": subtest.category_id,
+                "category_name": subtest.category_name,
+                "start": subtest.start,
+                "count": subtest.count,
+            }
+            for subtest in self.subtests
+        ]
+
+
+def _cache_key(package_id: int, version: int) -> str:
+    return f"package_layout:{LAYOUT_SCHEMA}:{package_id}:{version}"
+
+
+def build_package_layout(package: TryoutPackage) -> PackageLayout:
+    """Build the layout from the database with two queries."""
+    package_categories = list(
+        TryoutPackageCategory.objects.filter(package_id=package.pk)
+        .order_by("order")
+        .values_list("category_id", "category__category_name")
+    )
+    category_ids = [category_id for category_id, _ in package_categories]
+
+    by_category: Dict[int, List[int]] = {category_id: [] for category_id in category_ids}
+    for question_id, category_id in (
+        Question.objects.filter(category_id__in=category_ids).order_by("id").values_list("id", "category_id")
+    ):
+        by_category[category_id].append(question_id)
+
+    question_ids: List[int] = []
+    subtests: List[PackageSubtest] = []
+    for category_id, category_name in package_categories:
+        ids = by_category[category_id]
+        subtests.append(
+            PackageSubtest(
+                category_id=category_id,
+                category_name=category_name,
+                start=len(question_ids) + 1,
+                count=len(ids),
+            )
+        )
+        question_ids.extend(ids)
+
+    return PackageLayout(
+        package_id=package.pk,
+        version=package.layout_version,
+        question_ids=tuple(question_ids),
+        subtests=tuple(subtests),
+    )
+
+
+def get_package_layout(package: TryoutPackage) -> PackageLayout:
+    """Cached layout keyed by ``package.layout_version``; a bump makes old entries unreachable."""
+    key = _cache_key(package.pk, package.layout_version)
+    layout = cache.get(key)
+    if layout is None:
+        layout = build_package_layout(package)
+        cache.set(key, layout, LAYOUT_CACHE_TIMEOUT)
+    return layout
+
+
+def bump_layout_version(package_ids=None, category_ids=None) -> int:
+    """Invalidate cached layouts of the given packages and of packages containing the categories."""
+    packages = TryoutPackage.objects.none()
+    if package_ids:
+        packages = TryoutPackage.objects.filter(pk__in=package_ids)
+    if category_ids:
+        packages = packages | TryoutPackage.objects.filter(tryoutpackagecategory__category_id__in=category_ids)
+    if not package_ids and not category_ids:
+        return 0
+    # update() leaves updated_at alone so admin "last updated" stays meaningful
+    return TryoutPackage.objects.filter(pk__in=packages.values("pk")).update(layout_version=F("layout_version") + 1)
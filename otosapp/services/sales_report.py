@@ -0,0 +1,482 @@
+from __future__ import annotations
+
+import csv
+import json
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import PaymentProof, SubscriptionPackage, SubscriptionPackagePriceHistory
+from . import shared_counters
+
+# Naikkan bila bentuk data laporan berubah agar entri cache lama tidak terbaca
+REPORT_SCHEMA = 1
+# Unggahan bukti baru (pending) tidak menginvalidasi cache; TTL ini batas basinya
+REPORT_CACHE_TIMEOUT = 60 * 15
+# Versi di database (SharedCounter) agar approval di satu proses membatalkan cache semua proses
+VERSION_COUNTER = "sales_report:version"
+
+DEFAULT_PERIOD = "30d"
+PERIOD_DAYS = {"7d": 7, "30d": 30, "90d": 90, "180d": 180}
+PERIOD_LABELS = {
+    "7d": "7 Hari Terakhir",
+    "30d": "30 Hari Terakhir",
+    "90d": "90 Hari Terakhir",
+    "180d": "180 Hari Terakhir",
+}
+TOP_CUSTOMERS = 8
+RECENT_PAYMENTS = 10
+PRICE_CHANGE_ROWS = 10
+
+
+@dataclass(frozen=True)
+class SalesPeriod:
+    """Reporting window in whole local days: ``start`` inclusive, ``end`` exclusive."""
+
+    key: str
+    label: str
+    start: Optional[datetime]
+    end: datetime
+
+    @property
+    def start_date(self) -> Optional[date]:
+        return timezone.localdate(self.start) if self.start else None
+
+    @property
+    def end_date(self) -> date:
+        return timezone.localdate(self.end - timedelta(microseconds=1))
+
+    @property
+    def range_days(self) -> Optional[int]:
+        if not self.start_date:
+            return None
+        return max(1, (self.end_date - self.start_date).days + 1)
+
+    @property
+    def cache_key(self) -> str:
+        start = self.start_date.isoformat() if self.start_date else "-"
+        return f"{self.key}:{start}:{self.end_date.isoformat()}"
+
+
+def _day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def resolve_period(period_key: Optional[str], start_param: Optional[str] = None,
+                   end_param: Optional[str] = None, now: Optional[datetime] = None) -> SalesPeriod:
+    """Turn the ``period``/``start_date``/``end_date`` query parameters into a SalesPeriod.
+
+    Unknown keys fall back to the last 30 days. Only ``all`` touches the
+    database (to find the first approved sale).
+    """
+    today = timezone.localdate(now or timezone.now())
+    tomorrow = _day_start(today + timedelta(days=1))
+    key = (period_key or DEFAULT_PERIOD).lower()
+
+    if key == "ytd":
+        return SalesPeriod(key, f"Tahun Berjalan {today.year}", _day_start(today.replace(month=1, day=1)), tomorrow)
+    if key == "all":
+        first_sale = (
+            PaymentProof.objects.filter(status="approved", verified_at__isnull=False)
+            .aggregate(first=Min("verified_at"))["first"]
+        )
+        start = _day_start(timezone.localdate(first_sale)) if first_sale else None
+        return SalesPeriod(key, "Sepanjang Waktu", start, tomorrow)
+    if key == "custom":
+        start_day, end_day = _parse_date(start_param), _parse_date(end_param)
+        if start_day and end_day and start_day > end_day:
+            start_day, end_day = end_day, start_day
+        end = _day_start(end_day + timedelta(days=1)) if end_day else tomorrow
+        return SalesPeriod(key, "Rentang Kustom", _day_start(start_day) if start_day else None, end)
+
+    if key not in PERIOD_DAYS:
+        key = DEFAULT_PERIOD
+    start = _day_start(today - timedelta(days=PERIOD_DAYS[key] - 1))
+    return SalesPeriod(key, PERIOD_LABELS[key], start, tomorrow)
+
+
+def _to_float(value) -> float:
+    if value is None:
+        return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _growth_pct(current, previous) -> Optional[float]:
+    previous_val = _to_float(previous)
+    if previous_val == 0.0:
+        return None
+    return round(((_to_float(current) - previous_val) / previous_val) * 100, 2)
+
+
+def _minutes_to_label(value: Optional[float]) -> str:
+    if value is None:
+        return "N/A"
+    hours, minutes = divmod(int(round(value)), 60)
+    if hours and minutes:
+        return f"{hours}j {minutes}m"
+    if hours:
+        return f"{hours}j"
+    return f"{minutes}m"
+
+
+def _in_period(queryset, field: str, period: SalesPeriod):
+    if period.start:
+        queryset = queryset.filter(**{f"{field}__gte": period.start})
+    return queryset.filter(**{f"{field}__lt": period.end})
+
+
+def _sales_extract(period: SalesPeriod) -> List[Dict]:
+    """Approved sales grouped by (local day, customer, package, method) in one query.
+
+    Every breakdown of the report is a re-aggregation of these rows, so no
+    other query over the period's sales is needed.
+    """
+    processing = ExpressionWrapper(F("verified_at") - F("created_at"), output_field=DurationField())
+    processed = Q(verified_at__gte=F("created_at"))
+    sales = PaymentProof.objects.filter(status="approved", verified_at__isnull=False)
+    return list(
+        _in_period(sales, "verified_at", period)
+        .annotate(day=TruncDate("verified_at"))
+        .values(
+            "day", "user_id", "user__first_name", "user__last_name", "user__email",
+            "package_id", "package__name", "package__access_level", "payment_method",
+        )
+        .annotate(
+            total=Sum("amount_paid"),
+            count=Count("id"),
+            largest=Max("amount_paid"),
+            smallest=Min("amount_paid"),
+            processing_total=Sum(processing, filter=processed),
+            processing_count=Count("id", filter=processed),
+            processing_min=Min(processing, filter=processed),
+            processing_max=Max(processing, filter=processed),
+        )
+        .order_by()
+    )
+
+
+def _accumulate(rows: List[Dict], key) -> Dict:
+    groups: Dict = OrderedDict()
+    for row in rows:
+        group = groups.setdefault(key(row), {"total": Decimal("0"), "count": 0, "row": row})
+        group["total"] += row["total"] or 0
+        group["count"] += row["count"]
+    return groups
+
+
+def _by_revenue(groups: Dict) -> List:
+    return sorted(groups.items(), key=lambda item: item[1]["total"], reverse=True)
+
+
+def _average_order(group: Dict) -> float:
+    return round(_to_float(group["total"]) / group["count"], 2) if group["count"] else 0.0
+
+
+def _processing_metrics(rows: List[Dict]) -> Dict:
+    count = sum(row["processing_count"] for row in rows)
+    metrics = {
+        "avg_minutes": None,
+        "fastest_minutes": None,
+        "slowest_minutes": None,
+        "avg_display": "N/A",
+        "fastest_display": "N/A",
+        "slowest_display": "N/A",
+    }
+    if not count:
+        return metrics
+    timed = [row for row in rows if row["processing_count"]]
+    avg_minutes = sum((row["processing_total"] for row in timed), timedelta()).total_seconds() / 60 / count
+    fastest = min(row["processing_min"] for row in timed).total_seconds() / 60
+    slowest = max(row["processing_max"] for row in timed).total_seconds() / 60
+    metrics.update({
+        "avg_minutes": round(avg_minutes, 1),
+        "fastest_minutes": round(fastest, 1),
+        "slowest_minutes": round(slowest, 1),
+        "avg_display": _minutes_to_label(avg_minutes),
+        "fastest_display": _minutes_to_label(fastest),
+        "slowest_display": _minutes_to_label(slowest),
+    })
+    return metrics
+
+
+def _price_history(period: SalesPeriod):
+    """(chart series, latest change rows) for the package price chart."""
+    series: Dict[int, Dict] = OrderedDict()
+    seen = defaultdict(set)
+
+    def add_point(package_id, package_name, day: date, price) -> None:
+        point = (day.strftime("%Y-%m-%d"), round(_to_float(price), 2))
+        if point in seen[package_id]:
+            return
+        seen[package_id].add(point)
+        series.setdefault(package_id, {"name": package_name, "data": []})["data"].append(
+            {"x": point[0], "y": point[1]}
+        )
+
+    changes = list(
+        _in_period(SubscriptionPackagePriceHistory.objects.select_related("package", "changed_by"), "changed_at", period)
+        .order_by("changed_at")
+    )
+    for change in changes:
+        add_point(change.package_id, change.package.name, timezone.localdate(change.changed_at), change.new_price)
+
+    if period.start:
+        # Harga terakhir sebelum periode menjadi titik awal tiap paket
+        tracked = set()
+        for package_id, package_name, new_price in (
+            SubscriptionPackagePriceHistory.objects.filter(changed_at__lt=period.start)
+            .order_by("package_id", "-changed_at")
+            .values_list("package_id", "package__name", "new_price")
+        ):
+            if package_id not in tracked:
+                tracked.add(package_id)
+                add_point(package_id, package_name, period.start_date, new_price)
+
+    for package in SubscriptionPackage.objects.all():
+        baseline = period.start_date or timezone.localdate(package.created_at or timezone.now())
+        add_point(package.id, package.name, baseline, package.price)
+
+    for entry in series.values():
+        entry["data"].sort(key=lambda item: item["x"])
+
+    rows = []
+    for change in sorted(changes, key=lambda change: change.changed_at, reverse=True)[:PRICE_CHANGE_ROWS]:
+        old_price = round(_to_float(change.old_price), 2) if change.old_price is not None else None
+        new_price = round(_to_float(change.new_price), 2)
+        delta = delta_abs = None
+        direction = "flat"
+        if old_price is not None:
+            delta = round(new_price - old_price, 2)
+            delta_abs = round(abs(delta), 2)
+            direction = "up" if delta > 0 else "down" if delta < 0 else "flat"
+        changer = change.changed_by
+        rows.append({
+            "package_name": change.package.name,
+            "changed_at": timezone.localtime(change.changed_at) if change.changed_at else None,
+            "old_price": old_price,
+            "new_price": new_price,
+            "delta": delta,
+            "delta_abs": delta_abs,
+            "direction": direction,
+            "changed_by_name": (changer.get_full_name() or changer.email) if changer else None,
+            "changed_by_email": changer.email if changer else None,
+        })
+    return list(series.values()), rows
+
+
+def build_sales_report(period: SalesPeriod) -> Dict:
+    """Compute every section of the sales report for ``period``.
+
+    Sales come from one grouped extract; the previous period, status mix,
+    recent payments and price history add a fixed number of small queries.
+    """
+    rows = _sales_extract(period)
+    total_revenue = sum((row["total"] or 0 for row in rows), Decimal("0"))
+    total_orders = sum(row["count"] for row in rows)
+    unique_customers = len({row["user_id"] for row in rows})
+
+    repeat_purchase_rate = None
+    if total_orders > 1 and unique_customers:
+        repeat_purchase_rate = round(((total_orders - unique_customers) / total_orders) * 100, 2)
+
+    previous = {"total": 0, "count": 0}
+    if period.start:
+        span = period.end - period.start
+        previous = PaymentProof.objects.filter(
+            status="approved", verified_at__gte=period.start - span, verified_at__lt=period.start
+        ).aggregate(total=Sum("amount_paid"), count=Count("id"))
+
+    daily_series = []
+    for day, group in sorted(_accumulate(rows, lambda row: row["day"]).items()):
+        daily_series.append({
+            "date": day.isoformat(),
+            "label": day.strftime("%d %b"),
+            "revenue": round(_to_float(group["total"]), 2),
+            "orders": group["count"],
+        })
+    monthly_series = [
+        {"label": date(year, month, 1).strftime("%b %Y"), "revenue": round(_to_float(group["total"]), 2),
+         "orders": group["count"]}
+        for (year, month), group in sorted(_accumulate(rows, lambda row: (row["day"].year, row["day"].month)).items())
+    ]
+
+    payment_methods = [
+        {
+            "label": method or "Lainnya",
+            "count": group["count"],
+            "revenue": round(_to_float(group["total"]), 2),
+            "avg_order": _average_order(group),
+        }
+        for method, group in _by_revenue(_accumulate(rows, lambda row: row["payment_method"]))
+    ]
+    package_breakdown = [
+        {
+            "package_id": package_id,
+            "package_name": group["row"]["package__name"] or "Tidak Diketahui",
+            "access_level": group["row"]["package__access_level"],
+            "revenue": round(_to_float(group["total"]), 2),
+            "count": group["count"],
+            "avg_order": _average_order(group),
+        }
+        for package_id, group in _by_revenue(_accumulate(rows, lambda row: row["package_id"]))
+    ]
+    top_customers = []
+    for user_id, group in _by_revenue(_accumulate(rows, lambda row: row["user_id"]))[:TOP_CUSTOMERS]:
+        row = group["row"]
+        name = f"{row['user__first_name'] or ''} {row['user__last_name'] or ''}".strip() or row["user__email"]
+        top_customers.append({
+            "user_id": user_id,
+            "name": name,
+            "email": row["user__email"],
+            "orders": group["count"],
+            "revenue": round(_to_float(group["total"]), 2),
+            "avg_order": _average_order(group),
+        })
+
+    status_labels = dict(PaymentProof.STATUS_CHOICES)
+    status_breakdown = []
+    pending = {"total": 0, "count": 0}
+    for entry in (
+        _in_period(PaymentProof.objects.all(), "created_at", period)
+        .values("status").annotate(total=Sum("amount_paid"), count=Count("id")).order_by("-count")
+    ):
+        status_breakdown.append({
+            "status": entry["status"],
+            "label": status_labels.get(entry["status"], entry["status"].title()),
+            "count": entry["count"],
+            "revenue": round(_to_float(entry["total"]), 2),
+        })
+        if entry["status"] == "pending":
+            pending = entry
+
+    recent_payments = list(
+        _in_period(PaymentProof.objects.filter(status="approved", verified_at__isnull=False), "verified_at", period)
+        .select_related("user", "package")
+        .order_by("-verified_at")[:RECENT_PAYMENTS]
+    )
+    price_series, price_change_rows = _price_history(period)
+
+    report = {
+        "has_data": total_orders > 0,
+        "period_label": period.label,
+        "period_key": period.key,
+        "start_date": period.start_date,
+        "end_date": period.end_date,
+        "range_days": period.range_days,
+        "total_revenue": round(_to_float(total_revenue), 2),
+        "total_orders": total_orders,
+        "unique_customers": unique_customers,
+        "repeat_purchase_rate": repeat_purchase_rate,
+        "avg_order_value": round(_to_float(total_revenue) / total_orders, 2) if total_orders else 0.0,
+        "max_order_value": round(_to_float(max((row["largest"] for row in rows), default=0)), 2),
+        "min_order_value": round(_to_float(min((row["smallest"] for row in rows), default=0)), 2),
+        "average_daily_revenue": round(_to_float(total_revenue) / (len(daily_series) or 1), 2),
+        "growth": {
+            "revenue_pct": _growth_pct(total_revenue, previous.get("total")),
+            "orders_pct": _growth_pct(total_orders, previous.get("count")),
+            "previous_revenue": round(_to_float(previous.get("total")), 2),
+            "previous_orders": previous.get("count") or 0,
+        },
+        "pending_revenue": round(_to_float(pending["total"]), 2),
+        "pending_orders": pending["count"] or 0,
+        "peak_day": max(daily_series, key=lambda item: item["revenue"]) if daily_series else None,
+        "peak_package": package_breakdown[0] if package_breakdown else None,
+        "processing": _processing_metrics(rows),
+    }
+    chart_payload = {
+        "daily": daily_series,
+        "monthly": monthly_series,
+        "paymentMethods": [{"label": item["label"], "value": item["revenue"]} for item in payment_methods],
+        "packageShare": [{"label": item["package_name"], "value": item["revenue"]} for item in package_breakdown],
+        "priceChanges": price_series,
+    }
+    return {
+        "report": report,
+        "daily_series": daily_series,
+        "payment_methods": payment_methods,
+        "package_breakdown": package_breakdown,
+        "top_customers": top_customers,
+        "recent_payments": recent_payments,
+        "status_breakdown": status_breakdown,
+        "price_change_rows": price_change_rows,
+        "chart_data_json": json.dumps(chart_payload),
+    }
+
+
+def _cache_key(period: SalesPeriod) -> str:
+    version = shared_counters.read([VERSION_COUNTER]).get(VERSION_COUNTER, 0)
+    return f"sales_report:{REPORT_SCHEMA}:{version}:{period.cache_key}"
+
+
+def get_sales_report(period: SalesPeriod) -> Dict:
+    """Cached ``build_sales_report``, keyed by (period, start date, end date)."""
+    key = _cache_key(period)
+    report = cache.get(key)
+    if report is None:
+        report = build_sales_report(period)
+        cache.set(key, report, REPORT_CACHE_TIMEOUT)
+    return report
+
+
+def invalidate_sales_reports() -> None:
+    """Drop every cached report at once, in every process, by stamping a new version."""
+    shared_counters.stamp([VERSION_COUNTER])
+
+
+def write_sales_report_csv(report: Dict, stream) -> None:
+    """Write the summary, daily, payment-method and package sections of a report as CSV."""
+    writer = csv.writer(stream)
+    summary = report["report"]
+    writer.writerow(["Laporan Penjualan", summary["period_label"]])
+    writer.writerow([
+        "Periode",
+        summary["start_date"].isoformat() if summary["start_date"] else "",
+        summary["end_date"].isoformat(),
+    ])
+    writer.writerow([])
+    writer.writerow(["Ringkasan", "Nilai"])
+    for label, value in (
+        ("Total Pendapatan", summary["total_revenue"]),
+        ("Total Transaksi", summary["total_orders"]),
+        ("Pelanggan Unik", summary["unique_customers"]),
+        ("Rata-rata Transaksi", summary["avg_order_value"]),
+        ("Pendapatan Periode Sebelumnya", summary["growth"]["previous_revenue"]),
+        ("Transaksi Periode Sebelumnya", summary["growth"]["previous_orders"]),
+        ("Pembayaran Pending", summary["pending_orders"]),
+        ("Nilai Pending", summary["pending_revenue"]),
+    ):
+        writer.writerow([label, value])
+
+    writer.writerow([])
+    writer.writerow(["Tanggal", "Transaksi", "Pendapatan"])
+    for entry in report["daily_series"]:
+        writer.writerow([entry["date"], entry["orders"], entry["revenue"]])
+
+    writer.writerow([])
+    writer.writerow(["Metode Pembayaran", "Transaksi", "Pendapatan", "Rata-rata"])
+    for entry in report["payment_methods"]:
+        writer.writerow([entry["label"], entry["count"], entry["revenue"], entry["avg_order"]])
+
+    writer.writerow([])
+    writer.writerow(["Paket", "Transaksi", "Pendapatan", "Rata-rata"])
+    for entry in report["package_breakdown"]:
+        writer.writerow([entry["package_name"], entry["count"], entry["revenue"], entry["avg_order"]])
@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+
+from ..models import Question, Test, TestAbilityEstimate, TestCategoryScore, TryoutPackageCategory
+
+# Naikkan setiap kali aturan penilaian berubah; test dengan versi lain dianggap stale
+SCORING_VERSION = 1
+
+
+@dataclass
+class AnswerOutcome:
+    question_id: int
+    category_id: int
+    is_correct: bool
+    custom_weight: float
+    difficulty_coefficient: float
+    utbk_model: str = "linear"
+    irt_discrimination: Optional[float] = None
+    irt_difficulty: Optional[float] = None
+
+
+@dataclass
+class CategoryTally:
+    category_id: int
+    correct: int = 0
+    answered: int = 0
+
+
+@dataclass
+class PackageCategoryResult:
+    category_id: int
+    max_score: float
+    correct: int
+    answered: int
+    contribution: float
+    percentage: float
+
+
+@dataclass
+class ScoreResult:
+    # ``score`` is None when the scoring method is unknown and the stored
+    # score must be left untouched (legacy behaviour).
+    score: Optional[float]
+    method: Optional[str]
+    outcomes: List[AnswerOutcome] = field(default_factory=list)
+    tallies: Dict[int, CategoryTally] = field(default_factory=dict)
+    package_categories: List[PackageCategoryResult] = field(default_factory=list)
+    # IRT ability (theta, standard error) when a calibrated UTBK category was scored by IRT
+    ability: Optional[Tuple[float, float]] = None
+
+
+_ANSWER_FIELDS = (
+    "question_id",
+    "question__category_id",
+    "question__category__scoring_method",
+    "question__question_type",
+    "question__correct_answer_text",
+    "question__custom_weight",
+    "question__difficulty_coefficient",
+    "selected_choice__is_correct",
+    "text_answer",
+    "question__category__utbk_model",
+    "question__irt_discrimination",
+    "question__irt_difficulty",
+)
+
+
+def _is_correct(question_type, selected_is_correct, correct_answer_text, text_answer) -> bool:
+    """Mirror ``Answer.is_correct`` on plain column values."""
+    if question_type == "multiple_choice":
+        return bool(selected_is_correct)
+    if question_type == "essay":
+        return Question.essay_answer_matches(correct_answer_text, text_answer)
+    return False
+
+
+def load_answer_outcomes(test: Test):
+    """Fetch every answer of ``test`` with its question data in one joined query.
+
+    Returns the outcomes in answer order together with the scoring method of
+    the first answer's category (used for single-category tests).
+    """
+    rows = test.answers.order_by("pk").values_list(*_ANSWER_FIELDS)
+
+    outcomes: List[AnswerOutcome] = []
+    first_method: Optional[str] = None
+    for (
+        question_id,
+        category_id,
+        scoring_method,
+        question_type,
+        correct_answer_text,
+        custom_weight,
+        difficulty_coefficient,
+        selected_is_correct,
+        text_answer,
+        utbk_model,
+        irt_discrimination,
+        irt_difficulty,
+    ) in rows:
+        if not outcomes:
+            first_method = scoring_method
+        outcomes.append(
+            AnswerOutcome(
+                question_id=question_id,
+                category_id=category_id,
+                is_correct=_is_correct(question_type, selected_is_correct, correct_answer_text, text_answer),
+                custom_weight=custom_weight,
+                difficulty_coefficient=difficulty_coefficient,
+                utbk_model=utbk_model,
+                irt_discrimination=irt_discrimination,
+                irt_difficulty=irt_difficulty,
+            )
+        )
+    return outcomes, first_method
+
+
+def tally_by_category(outcomes: List[AnswerOutcome]) -> Dict[int, CategoryTally]:
+    tallies: Dict[int, CategoryTally] = {}
+    for outcome in outcomes:
+        tally = tallies.get(outcome.category_id)
+        if tally is None:
+            tally = tallies[outcome.category_id] = CategoryTally(category_id=outcome.category_id)
+        tally.answered += 1
+        if outcome.is_correct:
+            tally.correct += 1
+    return tallies
+
+
+def _default_score(outcomes: List[AnswerOutcome]) -> float:
+    correct = sum(1 for outcome in outcomes if outcome.is_correct)
+    return (correct / len(outcomes)) * 100
+
+
+def _custom_score(outcomes: List[AnswerOutcome]) -> float:
+    total_score = 0
+    for outcome in outcomes:
+        if outcome.is_correct:
+            total_score += outcome.custom_weight
+    return total_score
+
+
+def _utbk_score(outcomes: List[AnswerOutcome]) -> float:
+    total_score = 0
+    total_possible_score = 0
+    for outcome in outcomes:
+        total_possible_score += outcome.difficulty_coefficient
+        if outcome.is_correct:
+            total_score += outcome.difficulty_coefficient
+
+    if total_possible_score > 0:
+        return (total_score / total_possible_score) * 1000
+    return 0
+
+
+def _irt_calibrated(outcomes: List[AnswerOutcome]) -> bool:
+    return outcomes[0].utbk_model != "linear" and all(
+        outcome.irt_difficulty is not None and outcome.irt_discrimination is not None for outcome in outcomes
+    )
+
+
+def _irt_score(outcomes: List[AnswerOutcome]) -> Tuple[float, Tuple[float, float]]:
+    """UTBK score from calibrated item parameters: expected share correct at the test's ability x 1000."""
+    from .irt import estimate_ability, expected_score
+
+    ability = estimate_ability(
+        (outcome.irt_discrimination, outcome.irt_difficulty, outcome.is_correct) for outcome in outcomes
+    )
+    items = [(outcome.irt_discrimination, outcome.irt_difficulty) for outcome in outcomes]
+    return expected_score(ability[0], items), ability
+
+
+def package_category_results(package_id: int, tallies: Dict[int, CategoryTally]) -> List[PackageCategoryResult]:
+    """Per-category contributions for every category of a package, in package order.
+
+    Categories without answers are included with ``answered == 0`` and a zero
+    contribution.
+    """
+    package_rows = TryoutPackageCategory.objects.filter(package_id=package_id).values_list(
+        "category_id", "max_score"
+    )
+
+    results: List[PackageCategoryResult] = []
+    for category_id, max_score in package_rows:
+        tally = tallies.get(category_id) or CategoryTally(category_id=category_id)
+        ratio = tally.correct / tally.answered if tally.answered else 0
+        results.append(
+            PackageCategoryResult(
+                category_id=category_id,
+                max_score=max_score,
+                correct=tally.correct,
+                answered=tally.answered,
+                contribution=ratio * max_score,
+                percentage=ratio * 100,
+            )
+        )
+    return results
+
+
+def score_test(test: Test) -> ScoreResult:
+    """Score ``test`` without touching the database beyond two reads."""
+    outcomes, first_method = load_answer_outcomes(test)
+    if not outcomes:
+        return ScoreResult(score=0, method=None)
+
+    tallies = tally_by_category(outcomes)
+
+    if test.tryout_package_id:
+        package_categories = package_category_results(test.tryout_package_id, tallies)
+        total_score = 0
+        for result in package_categories:
+            if result.answered:
+                total_score += result.contribution
+        return ScoreResult(
+            score=total_score,
+            method="package",
+            outcomes=outcomes,
+            tallies=tallies,
+            package_categories=package_categories,
+        )
+
+    if first_method == "default":
+        score = _default_score(outcomes)
+    elif first_method == "custom":
+        score = _custom_score(outcomes)
+    elif first_method == "utbk" and _irt_calibrated(outcomes):
+        score, ability = _irt_score(outcomes)
+        return ScoreResult(score=score, method=first_method, outcomes=outcomes, tallies=tallies, ability=ability)
+    elif first_method == "utbk":
+        score = _utbk_score(outcomes)
+    else:
+        score = None
+
+    return ScoreResult(score=score, method=first_method, outcomes=outcomes, tallies=tallies)
+
+
+def build_category_scores(test: Test, result: ScoreResult) -> List[TestCategoryScore]:
+    """Unsaved ``TestCategoryScore`` rows for every category linked to ``test``.
+
+    Package categories contribute ``correct / answered * max_score``; categories
+    outside the package fall back to a percentage. Single-category tests carry
+    the test score itself, which already represents that category.
+    """
+    category_ids = list(test.categories.values_list("id", flat=True))
+    package_results = {item.category_id: item for item in result.package_categories}
+    if test.tryout_package_id:
+        for category_id in package_results:
+            if category_id not in category_ids:
+                category_ids.append(category_id)
+
+    rows: List[TestCategoryScore] = []
+    for category_id in category_ids:
+        tally = result.tallies.get(category_id) or CategoryTally(category_id=category_id)
+        ratio = tally.correct / tally.answered if tally.answered else 0
+        max_score = None
+        if not test.tryout_package_id:
+            contribution = test.score or 0
+        elif category_id in package_results:
+            max_score = package_results[category_id].max_score
+            contribution = package_results[category_id].contribution
+        else:
+            contribution = ratio * 100
+        rows.append(
+            TestCategoryScore(
+                test_id=test.pk,
+                category_id=category_id,
+                correct=tally.correct,
+                answered=tally.answered,
+                max_score=max_score,
+                contribution=contribution,
+                percentage=ratio * 100,
+            )
+        )
+    return rows
+
+
+def record_category_scores(test: Test, result: Optional[ScoreResult] = None) -> List[TestCategoryScore]:
+    """Replace the persisted per-category breakdown of ``test``."""
+    if result is None:
+        result = score_test(test)
+    if test.tryout_package_id and not result.package_categories:
+        # Tests without answers skip the package lookup while scoring
+        result.package_categories = package_category_results(test.tryout_package_id, result.tallies)
+
+    rows = build_category_scores(test, result)
+    with transaction.atomic():
+        TestCategoryScore.objects.filter(test_id=test.pk).delete()
+        TestCategoryScore.objects.bulk_create(rows)
+        if result.ability:
+            theta, standard_error = result.ability
+            TestAbilityEstimate.objects.update_or_create(
+                test_id=test.pk,
+                category_id=result.outcomes[0].category_id,
+                defaults={"theta": theta, "standard_error": standard_error},
+            )
+    return rows
+
+
+def mark_tests_stale(question_ids=None, package_ids=None) -> int:
+    """Flag submitted tests whose scoring inputs changed so ``rescore_tests`` picks them up."""
+    condition = Q()
+    if question_ids:
+        condition |= Q(pk__in=Test.objects.filter(answers__question_id__in=question_ids).values("pk"))
+    if package_ids:
+        condition |= Q(tryout_package_id__in=package_ids)
+    if not condition:
+        return 0
+    return (
+        Test.objects.filter(condition, is_submitted=True)
+        .exclude(scoring_version=0)
+        .update(scoring_version=0)
+    )
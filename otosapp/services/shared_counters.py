@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import time
+from typing import Dict, Iterable
+
+from django.db.models import F
+
+from ..models import SharedCounter
+
+
+def read(names: Iterable[str]) -> Dict[str, int]:
+    """Current values of ``names`` in one query; missing counters are absent."""
+    return dict(SharedCounter.objects.filter(name__in=list(names)).values_list("name", "value"))
+
+
+def stamp(names: Iterable[str]) -> None:
+    """Give every counter in ``names`` a new unique value with one upsert.
+
+    Used for cache versions: a cache key built from the stamp is
+    unreachable after the next stamp in every process, and an evicted or
+    reset cache can never bring an older version back.
+    """
+    value = time.time_ns()
+    SharedCounter.objects.bulk_create(
+        [SharedCounter(name=name, value=value) for name in dict.fromkeys(names)],
+        update_conflicts=True,
+        unique_fields=["name"],
+        update_fields=["value"],
+    )
+
+
+def put(name: str, value: int) -> None:
+    SharedCounter.objects.bulk_create(
+        [SharedCounter(name=name, value=value)],
+        update_conflicts=True,
+        unique_fields=["name"],
+        update_fields=["value"],
+    )
+
+
+def add(name: str, delta: int) -> bool:
+    """Atomically move an existing counter by ``delta``; False when it does not exist yet."""
+    return bool(SharedCounter.objects.filter(name=name).update(value=F("value") + delta))
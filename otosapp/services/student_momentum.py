@@ -1,15 +1,26 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, field
 from datetime import date, timedelta
 import json
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
+from django.db import transaction
 from django.db.models import Avg, Count, Max, QuerySet, Sum
 from django.db.models.functions import TruncDate
 from django.utils import timezone
 
-from ..models import StudentGoal, Test
+from ..models import MomentumSnapshot, StudentGoal, Test
+
+# Jumlah test terakhir yang dibandingkan dengan rata-rata sebelumnya pada ringkasan growth
+RECENT_WINDOW = 3
+# Jendela (hari) untuk sinyal cakupan materi
+COVERAGE_DAYS = 60
+# Jendela grafik tren (hari); 90 hari adalah jendela terpanjang
+TREND_WINDOWS = (7, 30, 90)
+
+# {hari lokal: (rata-rata skor, jumlah test)}
+DailySeries = Dict[date, Tuple[float, int]]
 
 
 @dataclass
@@ -79,28 +90,36 @@ def _submitted_tests(user) -> QuerySet[Test]:
     return Test.objects.filter(student=user, is_submitted=True)
 
 
-def _collect_unique_dates(tests_qs: QuerySet[Test]):
-    return list(
-        tests_qs.annotate(test_day=TruncDate("date_taken"))
-        .values_list("test_day", flat=True)
-        .distinct()
-    )
-
+def _daily_series(tests_qs: QuerySet[Test]) -> Tuple[DailySeries, float]:
+    """Average score and test count per local day plus the overall max score, in one GROUP BY."""
+    series: DailySeries = {}
+    max_score = 0
+    for entry in (
+        tests_qs.annotate(day=TruncDate("date_taken"))
+        .values("day")
+        .annotate(avg_score=Avg("score"), count=Count("id"), max_score=Max("score"))
+        .order_by("day")
+    ):
+        series[entry["day"]] = (entry["avg_score"] or 0, entry["count"])
+        max_score = max(max_score, entry["max_score"] or 0)
+    return series, max_score
 
-def _calculate_streak(dates) -> Optional[StreakStats]:
-    if not dates:
-        return None
 
-    today = timezone.localdate()
-    unique_dates = sorted(set(dates))
-    date_set = set(unique_dates)
-
-    # current streak
+def _current_streak(date_set, today: date) -> int:
     current_streak = 0
     cursor = today
     while cursor in date_set:
         current_streak += 1
         cursor -= timedelta(days=1)
+    return current_streak
+
+
+def _calculate_streak(dates) -> Optional[StreakStats]:
+    if not dates:
+        return None
+
+    unique_dates = sorted(set(dates))
+    current_streak = _current_streak(set(unique_dates), timezone.localdate())
 
     # longest streak
     longest = 0
@@ -118,17 +137,15 @@ def _calculate_streak(dates) -> Optional[StreakStats]:
     return StreakStats(current=current_streak, longest=longest, last_activity=last_activity)
 
 
-def _calculate_weekly_activity(tests_qs: QuerySet[Test]) -> Optional[WeeklyActivity]:
-    today = timezone.localdate()
+def _calculate_weekly_activity(series: DailySeries, today: date) -> Optional[WeeklyActivity]:
     current_start = today - timedelta(days=6)
     previous_start = current_start - timedelta(days=7)
     previous_end = current_start - timedelta(days=1)
 
-    current_week = tests_qs.filter(date_taken__date__gte=current_start).count()
-    previous_week = tests_qs.filter(
-        date_taken__date__gte=previous_start,
-        date_taken__date__lte=previous_end,
-    ).count()
+    current_week = sum(count for day, (_, count) in series.items() if day >= current_start)
+    previous_week = sum(
+        count for day, (_, count) in series.items() if previous_start <= day <= previous_end
+    )
     delta = current_week - previous_week
 
     if current_week == 0 and previous_week == 0:
@@ -146,8 +163,7 @@ def _get_active_goal(user) -> Optional[StudentGoal]:
     return StudentGoal.objects.active().filter(user=user).order_by("timeframe_end", "-created_at").first()
 
 
-def _score_scale(tests_qs: QuerySet[Test]) -> Tuple[str, float]:
-    max_score = tests_qs.aggregate(mx=Max("score"))['mx'] or 0
+def _scale_for(max_score: float) -> Tuple[str, float]:
     if max_score and max_score <= 1:
         return "%", 100.0
     return "pts", 1.0
@@ -156,7 +172,12 @@ def _score_scale(tests_qs: QuerySet[Test]) -> Tuple[str, float]:
 def _format_label(test: Test) -> str:
     if test.tryout_package:
         return test.tryout_package.package_name
-    categories = list(test.categories.values_list("category_name", flat=True))
+    return _label_for(None, list(test.categories.values_list("category_name", flat=True)))
+
+
+def _label_for(package_name: Optional[str], categories: List[str]) -> str:
+    if package_name:
+        return package_name
     if not categories:
         return "Tryout Tanpa Kategori"
     if len(categories) == 1:
@@ -164,11 +185,7 @@ def _format_label(test: Test) -> str:
     return f"{categories[0]} +{len(categories) - 1}"
 
 
-def _calculate_personal_best(tests_qs: QuerySet[Test]) -> Optional[PersonalBest]:
-    if not tests_qs.exists():
-        return None
-
-    unit, scale = _score_scale(tests_qs)
+def _calculate_personal_best(tests_qs: QuerySet[Test], unit: str, scale: float) -> Optional[PersonalBest]:
     best_test = tests_qs.order_by("-score", "-date_taken").first()
     if not best_test:
         return None
@@ -187,22 +204,30 @@ def _calculate_personal_best(tests_qs: QuerySet[Test]) -> Optional[PersonalBest]
     )
 
 
-def _calculate_growth(tests_qs: QuerySet[Test]) -> Optional[GrowthSummary]:
-    tests = list(tests_qs.order_by("date_taken"))
-    if len(tests) < 2:
+def _calculate_growth(tests_qs: QuerySet[Test], unit: str, scale: float) -> Optional[GrowthSummary]:
+    scores = [score or 0 for score in tests_qs.order_by("date_taken").values_list("score", flat=True)]
+    if len(scores) < 2:
         return None
 
-    unit, scale = _score_scale(tests_qs)
-
-    scores = [test.score or 0 for test in tests]
-    recent_scores = scores[-3:]
-    previous_scores = scores[:-3] or [scores[0]]
+    recent_scores = scores[-RECENT_WINDOW:]
+    previous_scores = scores[:-RECENT_WINDOW] or [scores[0]]
 
     def average(values):
         return sum(values) / len(values) if values else 0
 
-    recent_avg_raw = average(recent_scores)
-    previous_avg_raw = average(previous_scores)
+    return _growth_summary(
+        average(recent_scores), average(previous_scores), len(recent_scores), len(previous_scores), unit, scale
+    )
+
+
+def _growth_summary(
+    recent_avg_raw: float,
+    previous_avg_raw: float,
+    recent_count: int,
+    previous_count: int,
+    unit: str,
+    scale: float,
+) -> GrowthSummary:
     delta_raw = recent_avg_raw - previous_avg_raw
 
     percent_change = None
@@ -225,8 +250,8 @@ def _calculate_growth(tests_qs: QuerySet[Test]) -> Optional[GrowthSummary]:
         percent_change=percent_change,
         unit=unit,
         direction=direction,
-        recent_count=len(recent_scores),
-        previous_count=len(previous_scores),
+        recent_count=recent_count,
+        previous_count=previous_count,
     )
 
 
@@ -245,7 +270,10 @@ def _calculate_goal_progress(goal: StudentGoal, tests_qs: QuerySet[Test]) -> Goa
         current_value = scoped_tests.aggregate(total=Sum("score"))['total'] or 0.0
     else:
         current_value = 0.0
+    return _goal_progress(goal, current_value)
+
 
+def _goal_progress(goal: StudentGoal, current_value: float) -> GoalProgress:
     target = goal.target_value if goal.target_value else 0
     percent = 0.0
     if target > 0:
@@ -268,24 +296,14 @@ def _calculate_goal_progress(goal: StudentGoal, tests_qs: QuerySet[Test]) -> Goa
     )
 
 
-def _build_trend_chart(tests_qs: QuerySet[Test], days: int, unit: str, scale: float) -> Dict[str, object]:
+def _build_trend_chart(series: DailySeries, days: int, today: date, unit: str, scale: float) -> Dict[str, object]:
     if days <= 0:
         return {"categories": [], "series": []}
+    return _trend_chart(series, today - timedelta(days=days - 1), today, unit, scale)
 
-    end_date = timezone.localdate()
-    start_date = end_date - timedelta(days=days - 1)
-
-    # Aggregate average score per day
-    aggregates = (
-        tests_qs.filter(date_taken__date__gte=start_date)
-        .annotate(day=TruncDate("date_taken"))
-        .values("day")
-        .annotate(avg_score=Avg("score"), count=Count("id"))
-        .order_by("day")
-    )
-
-    score_map = {entry["day"]: (entry["avg_score"] or 0, entry["count"]) for entry in aggregates}
 
+def _trend_chart(score_map, start_date: date, end_date: date, unit: str, scale: float) -> Dict[str, object]:
+    """Chart payload from ``{day: (average_score, count)}``; days without tests become gaps."""
     categories = []
     data = []
     counts = []
@@ -315,15 +333,12 @@ def _build_trend_chart(tests_qs: QuerySet[Test], days: int, unit: str, scale: fl
     }
 
 
-def _calculate_trend_payload(tests_qs: QuerySet[Test]) -> Optional[TrendPayload]:
-    if not tests_qs.exists():
+def _calculate_trend_payload(series: DailySeries, today: date, unit: str, scale: float) -> Optional[TrendPayload]:
+    if not series:
         return None
-
-    unit, scale = _score_scale(tests_qs)
-    payload_7 = _build_trend_chart(tests_qs, 7, unit, scale)
-    payload_30 = _build_trend_chart(tests_qs, 30, unit, scale)
-    payload_90 = _build_trend_chart(tests_qs, 90, unit, scale)
-
+    payload_7, payload_30, payload_90 = (
+        _build_trend_chart(series, days, today, unit, scale) for days in TREND_WINDOWS
+    )
     return TrendPayload(
         seven_day=json.dumps(payload_7),
         thirty_day=json.dumps(payload_30),
@@ -341,9 +356,18 @@ def _format_status(level: str) -> str:
     return mapping.get(level, level)
 
 
+def _recent_category_count(tests_qs: QuerySet[Test]) -> int:
+    return (
+        tests_qs.filter(date_taken__gte=timezone.now() - timedelta(days=COVERAGE_DAYS))
+        .values("categories")
+        .distinct()
+        .count()
+    )
+
+
 def _calculate_readiness_signals(
     user,
-    tests_qs: QuerySet[Test],
+    category_count: int,
     streak: Optional[StreakStats],
     weekly: Optional[WeeklyActivity],
     goal: Optional[GoalProgress],
@@ -408,7 +432,6 @@ def _calculate_readiness_signals(
         signals.append(ReadinessSignal(title="Momentum Nilai", status=_format_status(status), message=message))
 
     # Coverage signal - variety of categories
-    category_count = tests_qs.filter(date_taken__gte=timezone.now() - timedelta(days=60)).values("categories").distinct().count()
     if category_count >= 4:
         status = "strong"
         message = "Variasi materi luas. Terus latihan agar semua topik tercover."
@@ -423,21 +446,269 @@ def _calculate_readiness_signals(
     return signals
 
 
-def get_momentum_snapshot(user) -> Dict[str, Optional[object]]:
+def compute_momentum_from_tests(user) -> Dict[str, Optional[object]]:
+    """Momentum computed straight from the Test table.
+
+    This is the original query-per-widget implementation, kept as the
+    verification path for :func:`get_momentum_snapshot`
+    (``rebuild_momentum_snapshots --verify``).
+    """
+    today = timezone.localdate()
     tests_qs = _submitted_tests(user)
-    dates = _collect_unique_dates(tests_qs)
-    streak = _calculate_streak(dates)
-    weekly = _calculate_weekly_activity(tests_qs)
-    personal_best = _calculate_personal_best(tests_qs)
-    growth = _calculate_growth(tests_qs)
-    trend = _calculate_trend_payload(tests_qs)
-    readiness = _calculate_readiness_signals(user, tests_qs, streak, weekly, goal=None, growth=growth)
+    series, max_score = _daily_series(tests_qs)
+    unit, scale = _scale_for(max_score)
+    streak = _calculate_streak(list(series))
+    weekly = _calculate_weekly_activity(series, today)
+    personal_best = _calculate_personal_best(tests_qs, unit, scale) if series else None
+    growth = _calculate_growth(tests_qs, unit, scale)
+    trend = _calculate_trend_payload(series, today, unit, scale)
 
     goal = None
     active_goal = _get_active_goal(user)
     if active_goal:
         goal = _calculate_goal_progress(active_goal, tests_qs)
-        readiness = _calculate_readiness_signals(user, tests_qs, streak, weekly, goal, growth)
+    readiness = _calculate_readiness_signals(
+        user, _recent_category_count(tests_qs), streak, weekly, goal, growth
+    )
+
+    return {
+        "streak": streak,
+        "weekly_activity": weekly,
+        "goal": goal,
+        "personal_best": personal_best,
+        "growth": growth,
+        "trend": trend,
+        "readiness": readiness,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Incremental snapshot
+# ---------------------------------------------------------------------------
+
+@dataclass
+class _SubmittedTest:
+    test_id: int
+    score: float
+    date_taken: object
+    package_name: Optional[str]
+    category_ids: List[Optional[int]] = field(default_factory=list)
+    category_names: List[str] = field(default_factory=list)
+
+
+def _load_submitted_tests(user_id: int, test_ids: Optional[Iterable[int]] = None) -> List[_SubmittedTest]:
+    """Submitted tests of one student in chronological order, in a single query."""
+    tests = Test.objects.filter(student_id=user_id, is_submitted=True)
+    if test_ids is not None:
+        tests = tests.filter(pk__in=list(test_ids))
+    rows: Dict[int, _SubmittedTest] = {}
+    for test_id, score, date_taken, package_name, category_id, category_name in (
+        tests.order_by("date_taken", "pk").values_list(
+            "id", "score", "date_taken", "tryout_package__package_name", "categories__id", "categories__category_name"
+        )
+    ):
+        row = rows.get(test_id)
+        if row is None:
+            row = rows[test_id] = _SubmittedTest(test_id, score or 0, date_taken, package_name)
+        # Tests tanpa kategori tetap dihitung sebagai satu "kategori" kosong, sama seperti values("categories")
+        row.category_ids.append(category_id)
+        if category_name is not None:
+            row.category_names.append(category_name)
+    return list(rows.values())
+
+
+def _reset_snapshot(snapshot: MomentumSnapshot) -> None:
+    for model_field in MomentumSnapshot._meta.concrete_fields:
+        if model_field.name not in ("id", "user", "updated_at"):
+            setattr(snapshot, model_field.attname, model_field.get_default())
+
+
+def _apply_test(snapshot: MomentumSnapshot, row: _SubmittedTest) -> None:
+    """Fold one test into the snapshot; tests must arrive in (date_taken, pk) order."""
+    day = timezone.localtime(row.date_taken).date()
+    bucket = snapshot.daily_buckets.setdefault(day.isoformat(), {"count": 0, "score_sum": 0.0, "categories": []})
+    bucket["count"] += 1
+    bucket["score_sum"] += row.score
+    for category_id in row.category_ids:
+        if category_id not in bucket["categories"]:
+            bucket["categories"].append(category_id)
+
+    if snapshot.total_tests == 0:
+        snapshot.first_score = row.score
+    snapshot.total_tests += 1
+    snapshot.total_score += row.score
+    snapshot.max_score = max(snapshot.max_score, row.score)
+    snapshot.recent_scores = (list(snapshot.recent_scores) + [row.score])[-RECENT_WINDOW:]
+
+    if snapshot.last_activity is None or (day - snapshot.last_activity).days > 1:
+        snapshot.streak_run = 1
+    elif (day - snapshot.last_activity).days == 1:
+        snapshot.streak_run += 1
+    snapshot.last_activity = max(day, snapshot.last_activity or day)
+    snapshot.longest_streak = max(snapshot.longest_streak, snapshot.streak_run)
+
+    # Sama dengan order_by("-score", "-date_taken"): skor seri dimenangkan test yang lebih baru
+    if snapshot.best_score is None or row.score >= snapshot.best_score:
+        snapshot.best_test_id = row.test_id
+        snapshot.best_score = row.score
+        snapshot.best_taken_at = row.date_taken
+        snapshot.best_label = _label_for(row.package_name, row.category_names)
+
+    snapshot.last_test_id = row.test_id
+    snapshot.last_test_at = row.date_taken
+
+
+def _follows_snapshot(snapshot: MomentumSnapshot, test: Test) -> bool:
+    if snapshot.last_test_at is None:
+        return snapshot.total_tests == 0
+    return (test.date_taken, test.pk) > (snapshot.last_test_at, snapshot.last_test_id or 0)
+
+
+def rebuild_momentum_snapshot(user_id: int) -> MomentumSnapshot:
+    """Recompute a student's snapshot from every submitted test (one read query)."""
+    rows = _load_submitted_tests(user_id)
+    with transaction.atomic():
+        snapshot, _ = MomentumSnapshot.objects.select_for_update().get_or_create(user_id=user_id)
+        _reset_snapshot(snapshot)
+        for row in rows:
+            _apply_test(snapshot, row)
+        _refresh_trend(snapshot, timezone.localdate())
+        snapshot.save()
+    return snapshot
+
+
+def record_test_submission(test: Test) -> MomentumSnapshot:
+    """Fold a freshly submitted test into the snapshot.
+
+    Tests newer than everything already applied are added incrementally;
+    re-scored or out-of-order tests trigger a full rebuild instead.
+    """
+    with transaction.atomic():
+        snapshot = MomentumSnapshot.objects.select_for_update().filter(user_id=test.student_id).first()
+        if snapshot is None or not _follows_snapshot(snapshot, test):
+            return rebuild_momentum_snapshot(test.student_id)
+        for row in _load_submitted_tests(test.student_id, test_ids=[test.pk]):
+            _apply_test(snapshot, row)
+        snapshot.trend_payload = {}
+        _refresh_trend(snapshot, timezone.localdate())
+        snapshot.save()
+    return snapshot
+
+
+def discard_momentum_snapshot(user_id: int) -> None:
+    """Drop the snapshot; the next read rebuilds it (used when tests are deleted)."""
+    MomentumSnapshot.objects.filter(user_id=user_id).delete()
+
+
+def _bucket_totals(buckets: Dict[date, Dict], start: Optional[date] = None, end: Optional[date] = None) -> Tuple[int, float]:
+    count = 0
+    score_sum = 0.0
+    for day, bucket in buckets.items():
+        if (start is None or day >= start) and (end is None or day <= end):
+            count += bucket["count"]
+            score_sum += bucket["score_sum"]
+    return count, score_sum
+
+
+def _snapshot_buckets(snapshot: MomentumSnapshot) -> Dict[date, Dict]:
+    return {date.fromisoformat(day): bucket for day, bucket in (snapshot.daily_buckets or {}).items()}
+
+
+def _snapshot_series(buckets: Dict[date, Dict]) -> DailySeries:
+    return {
+        day: (bucket["score_sum"] / bucket["count"], bucket["count"])
+        for day, bucket in buckets.items()
+        if bucket["count"]
+    }
+
+
+def _refresh_trend(snapshot: MomentumSnapshot, today: date) -> bool:
+    """Precompute the serialized trend charts for ``today``; False when they are already current."""
+    if (snapshot.trend_payload or {}).get("day") == today.isoformat():
+        return False
+    unit, scale = _scale_for(snapshot.max_score)
+    trend = _calculate_trend_payload(_snapshot_series(_snapshot_buckets(snapshot)), today, unit, scale)
+    snapshot.trend_payload = {"day": today.isoformat(), **(asdict(trend) if trend else {})}
+    return True
+
+
+def _stored_trend(snapshot: MomentumSnapshot) -> Optional[TrendPayload]:
+    payload = snapshot.trend_payload or {}
+    if "seven_day" not in payload:
+        return None
+    return TrendPayload(
+        seven_day=payload["seven_day"],
+        thirty_day=payload["thirty_day"],
+        ninety_day=payload["ninety_day"],
+        unit=payload["unit"],
+    )
+
+
+def _snapshot_goal_progress(goal: StudentGoal, buckets: Dict[date, Dict]) -> GoalProgress:
+    count, score_sum = _bucket_totals(buckets, goal.timeframe_start, goal.timeframe_end)
+    if goal.goal_type == StudentGoal.TEST_COUNT:
+        current_value = float(count)
+    elif goal.goal_type == StudentGoal.AVERAGE_SCORE:
+        current_value = score_sum / count if count else 0.0
+    elif goal.goal_type == StudentGoal.TOTAL_SCORE:
+        current_value = score_sum
+    else:
+        current_value = 0.0
+    return _goal_progress(goal, current_value)
+
+
+def momentum_from_snapshot(user, snapshot: MomentumSnapshot) -> Dict[str, Optional[object]]:
+    """Build the dashboard payload from a stored snapshot; only the active goal is queried."""
+    today = timezone.localdate()
+    buckets = _snapshot_buckets(snapshot)
+    unit, scale = _scale_for(snapshot.max_score)
+
+    streak = None
+    if buckets:
+        streak = StreakStats(
+            current=_current_streak(set(buckets), today),
+            longest=snapshot.longest_streak,
+            last_activity=snapshot.last_activity,
+        )
+
+    weekly = _calculate_weekly_activity(_snapshot_series(buckets), today)
+
+    personal_best = None
+    if snapshot.total_tests and snapshot.best_test_id:
+        personal_best = PersonalBest(
+            display_score=round((snapshot.best_score or 0) * scale, 1),
+            unit=unit,
+            label=snapshot.best_label,
+            occurred_on=timezone.localtime(snapshot.best_taken_at).date() if snapshot.best_taken_at else None,
+            test_id=snapshot.best_test_id,
+        )
+
+    growth = None
+    if snapshot.total_tests >= 2:
+        recent = list(snapshot.recent_scores)
+        previous_count = snapshot.total_tests - len(recent)
+        if previous_count > 0:
+            previous_average = (snapshot.total_score - sum(recent)) / previous_count
+        else:
+            previous_count, previous_average = 1, snapshot.first_score or 0
+        growth = _growth_summary(sum(recent) / len(recent), previous_average, len(recent), previous_count, unit, scale)
+
+    _refresh_trend(snapshot, today)
+    trend = _stored_trend(snapshot)
+
+    goal = None
+    active_goal = _get_active_goal(user)
+    if active_goal:
+        goal = _snapshot_goal_progress(active_goal, buckets)
+
+    coverage_start = today - timedelta(days=COVERAGE_DAYS)
+    recent_categories = {
+        category_id
+        for day, bucket in buckets.items()
+        if day >= coverage_start
+        for category_id in bucket["categories"]
+    }
+    readiness = _calculate_readiness_signals(user, len(recent_categories), streak, weekly, goal, growth)
 
     return {
         "streak": streak,
@@ -447,4 +718,19 @@ def get_momentum_snapshot(user) -> Dict[str, Optional[object]]:
         "growth": growth,
         "trend": trend,
         "readiness": readiness,
-    }
\ No newline at end of file
+    }
+
+
+def get_momentum_snapshot(user) -> Dict[str, Optional[object]]:
+    """Momentum widgets for the student dashboard, read from the stored snapshot.
+
+    Two queries in the common case (snapshot + active goal); a missing snapshot
+    is rebuilt from the Test table first, and the trend charts are
+    re-serialized at most once per day.
+    """
+    snapshot = MomentumSnapshot.objects.filter(user=user).first()
+    if snapshot is None:
+        snapshot = rebuild_momentum_snapshot(user.pk)
+    elif _refresh_trend(snapshot, timezone.localdate()):
+        MomentumSnapshot.objects.filter(pk=snapshot.pk).update(trend_payload=snapshot.trend_payload)
+    return momentum_from_snapshot(user, snapshot)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Role, User, UserSubscription
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = "subscription_expiry"
+# Lease kedaluwarsa sendiri bila proses mati di tengah jalan
+LOCK_TTL = timedelta(minutes=10)
+BATCH_SIZE = 500
+
+
+@dataclass
+class ExpirySweepResult:
+    started_at: datetime
+    expired_subscriptions: int = 0
+    downgraded_users: int = 0
+    duration_ms: float = 0.0
+    # True bila sweeper lain sedang berjalan dan run ini dilewati
+    skipped: bool = False
+    dry_run: bool = False
+
+
+def _due(now: datetime):
+    return UserSubscription.objects.filter(is_active=True, end_date__lt=now, auto_downgrade_processed=False)
+
+
+def _expire(rows: List[tuple], now: datetime) -> int:
+    """Deactivate the given (subscription id, user id) rows and move their users to Visitor.
+
+    Two UPDATE statements per batch; signals are bypassed, so the access
+    profiles and the daily rollup are refreshed explicitly afterwards.
+    Returns the number of subscriptions actually expired.
+    """
+    if not rows:
+        return 0
+    visitor_role, _ = Role.objects.get_or_create(role_name='Visitor')
+    expired = 0
+    for offset in range(0, len(rows), BATCH_SIZE):
+        batch = rows[offset:offset + BATCH_SIZE]
+        # Filter ulang agar baris yang sudah diproses proses lain tidak dihitung dua kali
+        expired += _due(now).filter(pk__in=[pk for pk, _ in batch]).update(
+            is_active=False, auto_downgrade_processed=True, updated_at=now
+        )
+        User.objects.filter(pk__in=[user_id for _, user_id in batch]).update(role=visitor_role)
+
+    from .access import mark_access_changed
+    from .admin_metrics import refresh_metrics_for
+
+    user_ids = [user_id for _, user_id in rows]
+    transaction.on_commit(lambda: mark_access_changed(*user_ids))
+    refresh_metrics_for(now)
+    return expired
+
+
+def sweep_expired_subscriptions(now: Optional[datetime] = None, dry_run: bool = False) -> ExpirySweepResult:
+    """Expire every overdue subscription in one transaction, holding a database lease.
+
+    Only one sweeper runs at a time, across processes; a concurrent call
+    returns immediately with ``skipped=True``. The outcome is logged and
+    kept as ``last_result`` of the ``TaskLock`` row for monitoring.
+    """
+    from .task_locks import acquire_lock, release_lock
+
+    now = now or timezone.now()
+    result = ExpirySweepResult(started_at=now, dry_run=dry_run)
+    token = acquire_lock(LOCK_NAME, LOCK_TTL)
+    if token is None:
+        result.skipped = True
+        logger.info("subscription expiry sweep skipped: another run holds the lock")
+        return result
+
+    started = time.monotonic()
+    summary = None
+    try:
+        with transaction.atomic():
+            rows = list(_due(now).select_for_update().order_by('pk').values_list('pk', 'user_id'))
+            if dry_run:
+                result.expired_subscriptions = len(rows)
+                result.downgraded_users = len({user_id for _, user_id in rows})
+            else:
+                result.expired_subscriptions = _expire(rows, now)
+                result.downgraded_users = len({user_id for _, user_id in rows})
+        result.duration_ms = (time.monotonic() - started) * 1000
+        summary = {
+            "started_at": now.isoformat(),
+            "expired_subscriptions": result.expired_subscriptions,
+            "downgraded_users": result.downgraded_users,
+            "duration_ms": round(result.duration_ms, 1),
+            "dry_run": dry_run,
+        }
+    finally:
+        release_lock(LOCK_NAME, token, summary)
+
+    logger.info(
+        "subscription expiry sweep: %d subscriptions expired, %d users downgraded in %.1f ms%s",
+        result.expired_subscriptions, result.downgraded_users, result.duration_ms, " (dry run)" if dry_run else "",
+    )
+    return result
+
+
+def expire_user_subscription_if_due(user, now: Optional[datetime] = None) -> bool:
+    """Lazily expire only ``user``'s own subscription; free when it is not overdue.
+
+    The check reads the user's access profile, so a dashboard request does
+    not query subscriptions at all unless this user's subscription just ran out.
+    """
+    now = now or timezone.now()
+    profile = user.access_profile
+    if profile.subscription_state != "active" or profile.expires_at is None or profile.expires_at >= now:
+        return False
+    with transaction.atomic():
+        rows = list(_due(now).filter(user_id=user.pk).values_list('pk', 'user_id'))
+        if not _expire(rows, now):
+            return False
+    user.refresh_from_db(fields=['role'])
+    user.clear_access_profile()
+    user._state.fields_cache.pop('subscription', None)
+    return True
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import uuid
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import TaskLock
+
+
+def acquire_lock(name: str, ttl: timedelta) -> Optional[str]:
+    """Take the ``name`` lease for ``ttl``; returns its token, or None while another process holds it.
+
+    The lease is one conditional UPDATE on a database row, so it holds
+    across processes and hosts. An expired lease can be taken over.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    free = TaskLock.objects.filter(Q(locked_until__isnull=True) | Q(locked_until__lte=now), name=name)
+    taken = free.update(holder=token, locked_until=now + ttl, last_started_at=now)
+    if not taken and not TaskLock.objects.filter(name=name).exists():
+        # Run pertama: baris lock belum ada
+        TaskLock.objects.get_or_create(name=name)
+        taken = free.update(holder=token, locked_until=now + ttl, last_started_at=now)
+    return token if taken else None
+
+
+def release_lock(name: str, token: str, result: Optional[Dict] = None) -> None:
+    """Free the lease held by ``token`` and keep ``result`` as the last run summary."""
+    changes = {"holder": "", "locked_until": None, "last_finished_at": timezone.now()}
+    if result is not None:
+        changes["last_result"] = result
+    TaskLock.objects.filter(name=name, holder=token).update(**changes)
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.db import connection
+from django.db.models import BooleanField, Case, Count, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import Answer, Test, TestCategoryScore
+
+# (category_id, category_name) in the order the dashboard lists them
+CategoryRef = Tuple[int, str]
+# {(category_id, day): (sum of contributions, number of tests)}
+DailyTotals = Dict[Tuple[int, date], Tuple[float, int]]
+
+DAILY_WINDOWS = (7, 30)
+MONTHLY_WINDOWS = (90, 180)
+
+
+def category_daily_totals(category_ids: Sequence[int], start: date) -> DailyTotals:
+    """Contribution sum and test count per (category, local day) since ``start``, in one query.
+
+    Package tests only count when the category is part of the package and was
+    answered, like the per-category statistics.
+    """
+    if not category_ids:
+        return {}
+    rows = (
+        TestCategoryScore.objects.filter(
+            category_id__in=category_ids,
+            test__is_submitted=True,
+            test__date_taken__date__gte=start,
+        )
+        .filter(Q(test__tryout_package__isnull=True) | Q(max_score__isnull=False, answered__gt=0))
+        .annotate(day=TruncDate("test__date_taken"))
+        .values("category_id", "day")
+        .annotate(total=Sum("contribution"), count=Count("id"))
+        .order_by()
+    )
+    return {(row["category_id"], row["day"]): (row["total"] or 0.0, row["count"]) for row in rows}
+
+
+def _average(total: float, count: int) -> float:
+    return round(total / count, 1) if count else 0
+
+
+def _daily_chart(categories: Sequence[CategoryRef], totals: DailyTotals, days: int, today: date) -> Dict:
+    days_list = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    return {
+        "categories": [day.strftime("%d %b") for day in days_list],
+        "series": [
+            {"name": name, "data": [_average(*totals.get((category_id, day), (0.0, 0))) for day in days_list]}
+            for category_id, name in categories
+        ],
+    }
+
+
+def _month_starts(days: int, today: date) -> List[date]:
+    # Label bulan mengikuti langkah 30 hari seperti sebelumnya (terlama -> terbaru)
+    return [
+        (today - timedelta(days=step * 30)).replace(day=1)
+        for step in range(max(1, int(days / 30)) - 1, -1, -1)
+    ]
+
+
+def _monthly_chart(categories: Sequence[CategoryRef], monthly: Dict, days: int, today: date) -> Dict:
+    months = _month_starts(days, today)
+    return {
+        "categories": [month.strftime("%b %Y") for month in months],
+        "series": [
+            {
+                "name": name,
+                "data": [_average(*monthly.get((category_id, month.year, month.month), (0.0, 0))) for month in months],
+            }
+            for category_id, name in categories
+        ],
+    }
+
+
+def _daily_summary(chart: Dict) -> List[Dict]:
+    """Sum of the per-category averages for each day of ``chart``."""
+    summary = []
+    for index, label in enumerate(chart["categories"]):
+        total_score = sum(series["data"][index] for series in chart["series"])
+        summary.append({"date": label, "total_score": round(total_score, 1)})
+    return summary
+
+
+def teacher_score_stats(categories: Sequence[CategoryRef], today: Optional[date] = None) -> Dict:
+    """Score trend charts (7/30 days daily, 90/180 days monthly) for the teacher dashboard.
+
+    Every window is derived from a single (category, day) aggregate, so the
+    number of queries does not depend on the number of categories or days.
+    """
+    today = today or timezone.localdate()
+    start = min(
+        [today - timedelta(days=days - 1) for days in DAILY_WINDOWS]
+        + [_month_starts(days, today)[0] for days in MONTHLY_WINDOWS]
+    )
+    totals = category_daily_totals([category_id for category_id, _ in categories], start)
+
+    monthly: Dict[Tuple[int, int, int], List] = defaultdict(lambda: [0.0, 0])
+    for (category_id, day), (total, count) in totals.items():
+        bucket = monthly[(category_id, day.year, day.month)]
+        bucket[0] += total
+        bucket[1] += count
+
+    stats = {
+        f"scores_{days}d_chart": _daily_chart(categories, totals, days, today) for days in DAILY_WINDOWS
+    }
+    stats.update({
+        f"scores_{days}d_chart": _monthly_chart(categories, monthly, days, today) for days in MONTHLY_WINDOWS
+    })
+
+    daily_summary = _daily_summary(stats["scores_7d_chart"])
+    growth_percent = 0
+    if len(daily_summary) >= 2:
+        last_total = daily_summary[-1]["total_score"]
+        prev_total = daily_summary[-2]["total_score"]
+        growth_percent = round(((last_total - prev_total) / prev_total * 100), 1) if prev_total else 0
+
+    stats.update({"daily_summary": daily_summary, "growth_percent": growth_percent})
+    return stats
+
+
+def passed_expression() -> Case:
+    """SQL version of ``Test.is_passed()``.
+
+    Package tests pass at ``Test.PACKAGE_PASSING_SCORE``; other tests use the
+    passing score of the category of their first answer and fail without answers.
+    """
+    first_answer_passing_score = (
+        Answer.objects.filter(test_id=OuterRef("pk"))
+        .order_by("pk")
+        .values("question__category__passing_score")[:1]
+    )
+    return Case(
+        When(tryout_package__isnull=False, score__gte=Test.PACKAGE_PASSING_SCORE, then=Value(True)),
+        When(tryout_package__isnull=True, score__gte=Subquery(first_answer_passing_score), then=Value(True)),
+        default=Value(False),
+        output_field=BooleanField(),
+    )
+
+
+def latest_tests_in_categories(category_ids: Sequence[int]):
+    """IDs of each student's latest submitted test touching ``category_ids`` (as a subquery)."""
+    tests = Test.objects.filter(is_submitted=True, categories__in=category_ids)
+    if connection.features.can_distinct_on_fields:
+        return tests.order_by("student_id", "-date_taken", "-pk").distinct("student_id").values("pk")
+    latest = (
+        Test.objects.filter(student_id=OuterRef("student_id"), is_submitted=True, categories__in=category_ids)
+        .order_by("-date_taken", "-pk")
+        .values("pk")[:1]
+    )
+    return tests.order_by().values("student_id").distinct().annotate(latest_pk=Subquery(latest)).values("latest_pk")
+
+
+def teacher_pass_summary(category_ids: Sequence[int]) -> Dict:
+    """Tested/passed/failed students judged by their latest test in the teacher's categories, in one query."""
+    tested_count = passed_count = 0
+    if category_ids:
+        totals = (
+            Test.objects.filter(pk__in=latest_tests_in_categories(category_ids))
+            .annotate(is_passed_flag=passed_expression())
+            .aggregate(tested=Count("id"), passed=Count("id", filter=Q(is_passed_flag=True)))
+        )
+        tested_count, passed_count = totals["tested"], totals["passed"]
+    return {
+        "tested_count": tested_count,
+        "passed_count": passed_count,
+        "failed_count": max(0, tested_count - passed_count),
+        "pass_rate": round((passed_count / tested_count) * 100, 1) if tested_count else 0,
+    }
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import Message, MessageThread, ThreadBroadcastJob, ThreadParticipantState, ThreadSearchDocument, User
+
+logger = logging.getLogger(__name__)
+
+# Satu transaksi per chunk agar lock tabel pesan tidak tertahan lama
+CHUNK_SIZE = 500
+# Audiens sampai batas ini dikirim langsung di request; di atasnya lewat ThreadBroadcastJob
+DEFAULT_INLINE_LIMIT = 200
+# Job "running" tanpa heartbeat selama ini dianggap ditinggal runner yang mati
+HEARTBEAT_TIMEOUT = timedelta(minutes=5)
+
+
+class ClaimLost(Exception):
+    """Another runner took the job over; the current chunk is rolled back."""
+
+
+@dataclass
+class BroadcastPayload:
+    title: str
+    thread_type: str
+    priority: str
+    content: str
+    category_id: Optional[int] = None
+
+
+@dataclass
+class BroadcastRunResult:
+    processed_jobs: List[int] = field(default_factory=list)
+    failed_jobs: List[int] = field(default_factory=list)
+
+
+def inline_limit() -> int:
+    return getattr(settings, "THREAD_BROADCAST_INLINE_LIMIT", DEFAULT_INLINE_LIMIT)
+
+
+def _fan_out_chunk(sender_id: int, student_ids: Sequence[int], payload: BroadcastPayload, now: datetime) -> None:
+    """Create one thread and its first message per student with a handful of bulk INSERTs.
+
+    ``last_activity`` is set on insert, so the per-message second save of
+    the thread is gone. Signals are bypassed; the read state, search
+    documents and badge counters they would maintain are written here.
+    """
+    threads = MessageThread.objects.bulk_create([
+        MessageThread(
+            title=payload.title,
+            thread_type=payload.thread_type,
+            student_id=student_id,
+            teacher_or_admin_id=sender_id,
+            priority=payload.priority,
+            category_id=payload.category_id,
+            last_activity=now,
+        )
+        for student_id in student_ids
+    ])
+    Message.objects.bulk_create([
+        Message(thread=thread, sender_id=sender_id, content=payload.content) for thread in threads
+    ])
+    # Pengirim sudah membaca pesannya sendiri; siswa belum punya baris dan terhitung lewat is_read
+    ThreadParticipantState.objects.bulk_create([
+        ThreadParticipantState(thread=thread, user_id=sender_id, last_read_at=now, unread_count=0)
+        for thread in threads
+    ])
+    ThreadSearchDocument.objects.bulk_create([
+        ThreadSearchDocument(thread=thread, title=payload.title, body=payload.content) for thread in threads
+    ])
+
+    from .inbox_badges import invalidate_fan_out_badges
+    transaction.on_commit(lambda: invalidate_fan_out_badges(student_ids, sender_id, payload.thread_type))
+
+
+def send_broadcast(sender, student_ids: Sequence[int], payload: BroadcastPayload, chunk_size: int = CHUNK_SIZE) -> int:
+    """Fan ``payload`` out to ``student_ids`` right away, one transaction per chunk."""
+    now = timezone.now()
+    for offset in range(0, len(student_ids), chunk_size):
+        with transaction.atomic():
+            _fan_out_chunk(sender.pk, student_ids[offset:offset + chunk_size], payload, now)
+    return len(student_ids)
+
+
+def queue_broadcast(sender, student_ids: Sequence[int], payload: BroadcastPayload) -> ThreadBroadcastJob:
+    """Store the broadcast as a pending job for ``process_broadcast_jobs``."""
+    return ThreadBroadcastJob.objects.create(
+        created_by=sender,
+        title=payload.title,
+        thread_type=payload.thread_type,
+        priority=payload.priority,
+        category_id=payload.category_id,
+        content=payload.content,
+        student_ids=list(student_ids),
+        total_count=len(student_ids),
+    )
+
+
+def _claimable(now: datetime) -> Q:
+    stale = now - HEARTBEAT_TIMEOUT
+    return Q(status='pending') | (Q(status='running') & (Q(heartbeat_at__isnull=True) | Q(heartbeat_at__lt=stale)))
+
+
+def claim_job(job_id: int, token: str, now: Optional[datetime] = None) -> bool:
+    """Take ``job_id`` for the runner ``token`` with one conditional UPDATE.
+
+    Only pending jobs and running jobs whose heartbeat timed out can be
+    claimed, so two runners never work on the same job.
+    """
+    now = now or timezone.now()
+    claimed = ThreadBroadcastJob.objects.filter(_claimable(now), pk=job_id).update(
+        status='running', claimed_by=token, heartbeat_at=now
+    )
+    if claimed:
+        ThreadBroadcastJob.objects.filter(pk=job_id, started_at__isnull=True).update(started_at=now)
+    return bool(claimed)
+
+
+def retry_job(job: ThreadBroadcastJob) -> bool:
+    """Put a failed job back in the queue; it resumes after its last committed chunk."""
+    return bool(ThreadBroadcastJob.objects.filter(pk=job.pk, status='failed').update(status='pending', claimed_by=''))
+
+
+def run_job(job: ThreadBroadcastJob, token: str, chunk_size: int = CHUNK_SIZE) -> ThreadBroadcastJob:
+    """Send the remaining part of ``job``, which ``token`` must have claimed.
+
+    Each chunk first advances ``processed_count`` and the heartbeat, guarded
+    by ``claimed_by``, then creates its threads in the same transaction: a
+    runner that lost the job rolls its chunk back instead of sending it
+    twice, and a job cut off mid-way resumes exactly where it stopped.
+    """
+    job.refresh_from_db()
+    payload = BroadcastPayload(
+        title=job.title, thread_type=job.thread_type, priority=job.priority,
+        content=job.content, category_id=job.category_id,
+    )
+    mine = ThreadBroadcastJob.objects.filter(pk=job.pk, claimed_by=token)
+    try:
+        while job.processed_count < job.total_count:
+            chunk = job.student_ids[job.processed_count:job.processed_count + chunk_size]
+            with transaction.atomic():
+                if not mine.update(processed_count=job.processed_count + len(chunk), heartbeat_at=timezone.now()):
+                    raise ClaimLost
+                # Siswa yang dihapus sejak job dibuat dilewati
+                existing = list(User.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+                _fan_out_chunk(job.created_by_id, existing, payload, timezone.now())
+            job.processed_count += len(chunk)
+    except ClaimLost:
+        logger.warning("thread broadcast job %s was claimed by another runner", job.pk)
+    except Exception as exc:
+        logger.exception("thread broadcast job %s failed after %d of %d students", job.pk, job.processed_count, job.total_count)
+        mine.update(status='failed', error=str(exc), finished_at=timezone.now())
+    else:
+        mine.update(status='completed', error='', finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
+
+
+def process_pending_jobs(limit: Optional[int] = None) -> BroadcastRunResult:
+    """Claim and run queued jobs oldest first.
+
+    Claims live in the database, so any number of runners in separate
+    processes can run at once; jobs left ``running`` by a runner that died
+    are taken over after ``HEARTBEAT_TIMEOUT``.
+    """
+    result = BroadcastRunResult()
+    token = uuid.uuid4().hex
+    candidates = ThreadBroadcastJob.objects.filter(_claimable(timezone.now())).order_by('created_at', 'pk')
+    for job in candidates[:limit] if limit else candidates:
+        if not claim_job(job.pk, token):
+            continue
+        job = run_job(job, token)
+        if job.status == 'failed':
+            result.failed_jobs.append(job.pk)
+        elif job.status == 'completed':
+            result.processed_jobs.append(job.pk)
+    return result
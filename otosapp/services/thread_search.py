@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import re
+from typing import List, Optional, Tuple
+
+from django.db import connection
+from django.db.models import Case, F, Q, TextField, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Concat
+
+from ..models import Message, MessageThread, ThreadSearchDocument
+from .message_threads import visible_threads
+
+# Batas hasil API; inbox tidak dibatasi karena difilter lewat subquery dan dipaginasi
+MAX_RESULTS = 50
+MAX_TERMS = 8
+# Judul lebih berbobot daripada isi pesan (FTS5 bm25; Postgres memakai setweight A/B)
+TITLE_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(query: str) -> List[str]:
+    """Word tokens of a user query; punctuation and FTS operators are dropped."""
+    return [term.lower() for term in _TERM.findall(query or "")][:MAX_TERMS]
+
+
+def refresh_thread_document(thread: MessageThread, create: bool = True) -> None:
+    """Rebuild the search text of ``thread`` from its title and messages.
+
+    With ``create=False`` an existing document is only updated, so
+    cascading deletes never recreate the row of a thread being deleted.
+    """
+    body = "\n".join(
+        Message.objects.filter(thread_id=thread.pk).order_by("created_at").values_list("content", flat=True)
+    )
+    if not create:
+        ThreadSearchDocument.objects.filter(pk=thread.pk).update(title=thread.title, body=body)
+        return
+    ThreadSearchDocument.objects.bulk_create(
+        [ThreadSearchDocument(thread_id=thread.pk, title=thread.title, body=body)],
+        update_conflicts=True,
+        unique_fields=["thread"],
+        update_fields=["title", "body", "updated_at"],
+    )
+
+
+def append_thread_message(thread: MessageThread, content: str) -> None:
+    """Add one new message to the search text of ``thread`` without reading its other messages."""
+    updated = ThreadSearchDocument.objects.filter(pk=thread.pk).update(
+        body=Case(
+            When(body="", then=Value(content)),
+            default=Concat(F("body"), Value("\n"), Value(content), output_field=TextField()),
+            output_field=TextField(),
+        )
+    )
+    if not updated:
+        refresh_thread_document(thread)
+
+
+def sync_thread_title(thread: MessageThread) -> None:
+    ThreadSearchDocument.objects.filter(pk=thread.pk).exclude(title=thread.title).update(title=thread.title)
+
+
+def _tsquery(terms) -> str:
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def _fts5_match(terms) -> str:
+    return " AND ".join(f'"{term}"*' for term in terms)
+
+
+def _ranked_postgres(terms, scope_sql, scope_params, limit):
+    sql = (
+        "SELECT d.thread_id, ts_rank(d.search_vector, q) AS rank "
+        "FROM otosapp_threadsearchdocument d, to_tsquery('simple', %s) q "
+        f"WHERE d.search_vector @@ q AND d.thread_id IN ({scope_sql}) "
+        "ORDER BY rank DESC, d.thread_id DESC LIMIT %s"
+    )
+    return sql, [_tsquery(terms), *scope_params, limit]
+
+
+def _ranked_sqlite(terms, scope_sql, scope_params, limit):
+    # "+rowid" mencegah FTS5 menjalankan satu pencarian per thread dalam cakupan inbox
+    sql = (
+        f"SELECT rowid, -bm25(otosapp_threadsearch_fts, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS rank "
+        "FROM otosapp_threadsearch_fts WHERE otosapp_threadsearch_fts MATCH %s "
+        f"AND +rowid IN ({scope_sql}) ORDER BY rank DESC, rowid DESC LIMIT %s"
+    )
+    return sql, [_fts5_match(terms), *scope_params, limit or -1]
+
+
+def _matching_postgres(terms):
+    return (
+        "SELECT thread_id FROM otosapp_threadsearchdocument WHERE search_vector @@ to_tsquery('simple', %s)",
+        [_tsquery(terms)],
+    )
+
+
+def _matching_sqlite(terms):
+    return "SELECT rowid FROM otosapp_threadsearch_fts WHERE otosapp_threadsearch_fts MATCH %s", [_fts5_match(terms)]
+
+
+_RANKED_QUERIES = {"postgresql": _ranked_postgres, "sqlite": _ranked_sqlite}
+_MATCHING_QUERIES = {"postgresql": _matching_postgres, "sqlite": _matching_sqlite}
+
+
+def _icontains(threads, terms):
+    for term in terms:
+        threads = threads.filter(Q(search_document__title__icontains=term) | Q(search_document__body__icontains=term))
+    return threads
+
+
+def search_threads(user, query: str, limit: Optional[int] = MAX_RESULTS) -> List[Tuple[int, float]]:
+    """(thread id, rank) of ``user``'s visible threads matching every term, best first.
+
+    Each term matches as a prefix. The search runs against the full-text
+    index of the database, restricted to the user's inbox in the same
+    query; backends without an index fall back to ``icontains``.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    scope = visible_threads(user)
+    builder = _RANKED_QUERIES.get(connection.vendor)
+    if builder is None:
+        ids = _icontains(scope, terms).order_by("-last_activity").values_list("pk", flat=True)
+        return [(pk, 0.0) for pk in (ids[:limit] if limit else ids)]
+
+    scope_sql, scope_params = scope.order_by().values("pk").query.sql_with_params()
+    sql, params = builder(terms, scope_sql, scope_params, limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(thread_id, float(rank)) for thread_id, rank in cursor.fetchall()]
+
+
+def filter_matching(threads, query: str):
+    """``threads`` narrowed to every match of ``query``, as a subquery without a result limit.
+
+    Used by the inbox, which orders and paginates the matches itself.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return threads.none()
+    builder = _MATCHING_QUERIES.get(connection.vendor)
+    if builder is None:
+        return _icontains(threads, terms)
+    return threads.filter(pk__in=RawSQL(*builder(terms)))
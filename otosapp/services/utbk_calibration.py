@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Count, Q
+
+from ..models import Question
+
+# Total koefisien satu kategori: semua soal benar = 1000
+COEFFICIENT_TOTAL = 1000
+HARDEST_COEFFICIENT = 1.5
+EASIEST_COEFFICIENT = 0.5
+# Selisih lebih kecil dari ini dianggap tidak berubah (sisa pembulatan float)
+TOLERANCE = 1e-9
+
+
+@dataclass(frozen=True)
+class CoefficientChange:
+    question_id: int
+    old: float
+    new: float
+    success_rate: float
+
+
+@dataclass
+class CalibrationResult:
+    category_id: int
+    calibrated_questions: int = 0
+    changes: List[CoefficientChange] = field(default_factory=list)
+    applied: bool = False
+
+
+def _success_rates(category_id: int) -> List[Tuple[int, float, float]]:
+    """(question_id, current coefficient, success rate) of every answered question, in one query."""
+    rows = (
+        Question.objects.filter(category_id=category_id)
+        .annotate(
+            total_answers=Count("answer"),
+            correct_answers=Count("answer", filter=Q(answer__selected_choice__is_correct=True)),
+        )
+        .filter(total_answers__gt=0)
+        .order_by("pk")
+        .values_list("pk", "difficulty_coefficient", "total_answers", "correct_answers")
+    )
+    return [(pk, coefficient, correct / total) for pk, coefficient, total, correct in rows]
+
+
+def build_coefficients(rates: List[Tuple[int, float, float]]) -> List[CoefficientChange]:
+    """Rank questions hardest first on a linear 1.5 -> 0.5 scale, normalised to ``COEFFICIENT_TOTAL``.
+
+    Every answered question is returned, changed or not; ties keep question order.
+    """
+    ranked = sorted(rates, key=lambda row: row[2])
+    count = len(ranked)
+    linear = [
+        HARDEST_COEFFICIENT - (index / (count - 1)) * (HARDEST_COEFFICIENT - EASIEST_COEFFICIENT) if count > 1 else 1.0
+        for index in range(count)
+    ]
+    factor = COEFFICIENT_TOTAL / sum(linear) if linear else 0
+    return [
+        CoefficientChange(question_id=pk, old=old, new=value * factor, success_rate=rate)
+        for (pk, old, rate), value in zip(ranked, linear)
+    ]
+
+
+def calibrate_category(category_id: int, dry_run: bool = False) -> CalibrationResult:
+    """Recalibrate the UTBK coefficients of one category.
+
+    Success rates come from one aggregate query; changed coefficients are
+    written with one ``bulk_update`` in a single transaction, and the
+    affected submitted tests are flagged for rescoring once. With
+    ``dry_run`` nothing is written and the result only lists the diff.
+    """
+    coefficients = build_coefficients(_success_rates(category_id))
+    result = CalibrationResult(
+        category_id=category_id,
+        calibrated_questions=len(coefficients),
+        changes=[change for change in coefficients if abs(change.new - change.old) > TOLERANCE],
+    )
+    if dry_run or not result.changes:
+        return result
+
+    from .scoring import mark_tests_stale
+
+    questions = [Question(pk=change.question_id, difficulty_coefficient=change.new) for change in result.changes]
+    with transaction.atomic():
+        # bulk_update melewati sinyal pre_save per soal; tes lama ditandai sekali di bawah
+        Question.objects.bulk_update(questions, ["difficulty_coefficient"], batch_size=500)
+        mark_tests_stale(question_ids=[change.question_id for change in result.changes])
+    result.applied = True
+    return result
+
+
+def _calibrate_in_worker(category_id: int, dry_run: bool) -> CalibrationResult:
+    close_old_connections()
+    return calibrate_category(category_id, dry_run=dry_run)
+
+
+def calibrate_categories(category_ids: Iterable[int], dry_run: bool = False,
+                         workers: Optional[int] = None) -> List[CalibrationResult]:
+    """Recalibrate several categories, optionally spread over worker processes.
+
+    Each category is independent (its own transaction), so categories can
+    be processed in parallel. Connections are closed before forking so no
+    worker inherits the parent's database socket.
+    """
+    category_ids = list(category_ids)
+    if not workers or workers <= 1 or len(category_ids) <= 1:
+        return [calibrate_category(category_id, dry_run=dry_run) for category_id in category_ids]
+
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=min(workers, len(category_ids)), initializer=connections.close_all) as pool:
+        return list(pool.map(_calibrate_in_worker, category_ids, [dry_run] * len(category_ids)))
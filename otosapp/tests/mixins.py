@@ -0,0 +1,15 @@
+from otosapp.models import Role, User
+
+
+class UserFixtureMixin:
+    def _user(self, name, role_name):
+        role, _ = Role.objects.get_or_create(role_name=role_name)
+        return User.objects.create_user(
+            email=f'{name}@example.com', username=f'{name}@example.com', password='testpass123', role=role,
+        )
+
+    def _fresh(self, user):
+        """``user`` reloaded with its access profile resolved, like ``request.user`` after the middleware."""
+        user = User.objects.get(pk=user.pk)
+        user.access_profile
+        return user
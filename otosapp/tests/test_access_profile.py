@@ -0,0 +1,241 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from otosapp.decorators import admin_required, students_required
+from otosapp.models import AccessLevel, Category, Role, SubscriptionPackage, Test, TryoutPackage, User, UserSubscription
+from otosapp.services.access import (
+    build_access_profile, evaluate_tryout_list, mark_access_changed, resolve_request_profile,
+)
+
+
+@students_required
+def student_view(request):
+    return HttpResponse('ok')
+
+
+@admin_required
+def admin_view(request):
+    return HttpResponse('ok')
+
+
+class AccessProfileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student_role = Role.objects.create(role_name='Student')
+        self.visitor_role = Role.objects.create(role_name='Visitor')
+        self.gold = SubscriptionPackage.objects.create(
+            name='Gold', description='Paket gold', price=100000, duration_days=30, access_level=AccessLevel.GOLD,
+        )
+        self.student = User.objects.create_user(
+            email='murid@example.com', username='murid@example.com', password='testpass123', role=self.student_role,
+        )
+        self.subscription = UserSubscription.objects.create(
+            user=self.student, package=self.gold, end_date=timezone.now() + timedelta(days=10),
+        )
+        self.session = SessionStore()
+
+    def _request(self):
+        """Request baru seperti setelah AuthenticationMiddleware: user dimuat ulang tanpa relasi."""
+        request = RequestFactory().get('/')
+        request.session = self.session
+        request.user = User.objects.get(pk=self.student.pk)
+        return request
+
+    def test_fresh_session_profile_needs_no_queries(self):
+        first = resolve_request_profile(self._request())
+        self.assertEqual(first.access_level, AccessLevel.GOLD)
+
+        request = self._request()
+        with self.assertNumQueries(0):
+            profile = resolve_request_profile(request)
+            self.assertTrue(request.user.can_access_tryouts())
+            self.assertTrue(request.user.is_student())
+            self.assertEqual(request.user.get_access_level(), AccessLevel.GOLD)
+            self.assertEqual(request.user.role.role_name, 'Student')
+            self.assertEqual(student_view(request).status_code, 200)
+            with self.assertRaises(PermissionDenied):
+                admin_view(request)
+        self.assertEqual(profile, first)
+
+    def test_subscription_change_invalidates_session_profile(self):
+        resolve_request_profile(self._request())
+
+        self.subscription.is_active = False
+        self.subscription.save()
+
+        profile = resolve_request_profile(self._request())
+        self.assertFalse(profile.has_active_subscription())
+        self.assertEqual(profile.access_level, AccessLevel.VISITOR)
+
+    def test_role_change_invalidates_session_profile(self):
+        resolve_request_profile(self._request())
+
+        self.student.role = self.visitor_role
+        self.student.save()
+
+        request = self._request()
+        profile = resolve_request_profile(request)
+        self.assertEqual(profile.role_name, 'Visitor')
+        with self.assertRaises(PermissionDenied):
+            student_view(request)
+
+    def test_package_tier_change_invalidates_subscribers(self):
+        resolve_request_profile(self._request())
+
+        self.gold.access_level = AccessLevel.TUNTAS
+        self.gold.save()
+
+        self.assertEqual(resolve_request_profile(self._request()).access_level, AccessLevel.TUNTAS)
+
+    def test_change_in_another_process_invalidates_session_profile(self):
+        resolve_request_profile(self._request())
+        stale_user = User.objects.get(pk=self.student.pk)
+
+        # Proses lain mengubah langganan; cache lokal proses ini tidak ikut tahu
+        UserSubscription.objects.filter(pk=self.subscription.pk).update(is_active=False)
+        mark_access_changed(self.student.pk)
+        cache.clear()
+        bumped = User.objects.get(pk=self.student.pk).access_version
+
+        self.assertGreater(bumped, stale_user.access_version)
+        self.assertEqual(resolve_request_profile(self._request()).access_level, AccessLevel.VISITOR)
+
+        # Instance yang dimuat sebelum kenaikan tidak menulis versi lama kembali
+        stale_user.first_name = 'Murid'
+        stale_user.save()
+        self.assertEqual(User.objects.get(pk=self.student.pk).access_version, bumped)
+
+    def test_profile_save_keeps_session_profile(self):
+        resolve_request_profile(self._request())
+        version = User.objects.get(pk=self.student.pk).access_version
+
+        user = User.objects.get(pk=self.student.pk)
+        user.first_name = 'Murid'
+        user.phone_number = '08123456789'
+        user.save()
+        user.role = self.student_role
+        user.save(update_fields=['role', 'first_name'])
+
+        self.assertEqual(User.objects.get(pk=self.student.pk).access_version, version)
+        request = self._request()
+        with self.assertNumQueries(0):
+            resolve_request_profile(request)
+
+    def test_expiry_is_evaluated_at_check_time(self):
+        resolve_request_profile(self._request())
+        later = timezone.now() + timedelta(days=11)
+
+        request = self._request()
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            profile = resolve_request_profile(request)
+            self.assertFalse(request.user.has_active_subscription())
+            self.assertEqual(profile.access_level, AccessLevel.VISITOR)
+
+    def test_access_level_matches_previous_rules(self):
+        staff = User.objects.create_user(
+            email='guru@example.com', username='guru@example.com', password='testpass123',
+            role=Role.objects.create(role_name='Teacher'),
+        )
+        visitor = User.objects.create_user(
+            email='tamu@example.com', username='tamu@example.com', password='testpass123', role=self.visitor_role,
+        )
+        unsubscribed = User.objects.create_user(
+            email='murid2@example.com', username='murid2@example.com', password='testpass123', role=self.student_role,
+        )
+        no_role = User.objects.create_user(email='x@example.com', username='x@example.com', password='testpass123')
+
+        self.assertEqual(staff.get_access_level(), AccessLevel.TUNTAS)
+        self.assertEqual(visitor.get_access_level(), AccessLevel.VISITOR)
+        self.assertEqual(unsubscribed.get_access_level(), AccessLevel.VISITOR)
+        self.assertFalse(unsubscribed.can_access_tryouts())
+        self.assertEqual(no_role.get_access_level(), AccessLevel.SILVER)
+        self.assertEqual(User.objects.get(pk=self.student.pk).get_access_level(), AccessLevel.GOLD)
+
+
+class TryoutListAccessTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student_role = Role.objects.create(role_name='Student')
+        self.visitor_role = Role.objects.create(role_name='Visitor')
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin@example.com', password='testpass123',
+            role=Role.objects.create(role_name='Admin'),
+        )
+        silver = SubscriptionPackage.objects.create(
+            name='Silver', description='Paket silver', price=50000, duration_days=30, access_level=AccessLevel.SILVER,
+        )
+        self.student = User.objects.create_user(
+            email='murid@example.com', username='murid@example.com', password='testpass123', role=self.student_role,
+        )
+        UserSubscription.objects.create(user=self.student, package=silver, end_date=timezone.now() + timedelta(days=5))
+        self.visitor = User.objects.create_user(
+            email='tamu@example.com', username='tamu@example.com', password='testpass123', role=self.visitor_role,
+        )
+        self.packages = [
+            TryoutPackage.objects.create(
+                package_name=f'Paket {level}', total_time=60, created_by=self.admin, required_access_level=level,
+            )
+            for level in (AccessLevel.VISITOR, AccessLevel.SILVER, AccessLevel.GOLD, AccessLevel.TUNTAS)
+        ]
+        self.categories = [Category.objects.create(category_name=name) for name in ('Matematika', 'Fisika', 'Kimia')]
+
+    def _submitted(self, user, score, package=None, category=None):
+        test = Test.objects.create(student=user, score=score, is_submitted=True, tryout_package=package)
+        if category:
+            test.categories.add(category)
+
+    def test_lock_state_matches_per_package_rules(self):
+        for user in (self.admin, self.student, self.visitor):
+            user = User.objects.get(pk=user.pk)
+            access = evaluate_tryout_list(build_access_profile(user), self.packages)
+            self.assertEqual(
+                [access.packages[package.pk].locked for package in self.packages],
+                [package.is_locked_for(user) for package in self.packages],
+            )
+        access = evaluate_tryout_list(build_access_profile(self.student), self.packages)
+        self.assertEqual([access.packages[p.pk].locked for p in self.packages], [False, False, True, True])
+        self.assertEqual(access.packages[self.packages[2].pk].required_label, 'Gold')
+
+    def test_best_scores_in_two_queries(self):
+        math, physics, _ = self.categories
+        self._submitted(self.student, 40, category=math)
+        self._submitted(self.student, 70, category=math)
+        self._submitted(self.student, 55, package=self.packages[1], category=physics)
+        self._submitted(self.student, 65, package=self.packages[1])
+        self._submitted(self.visitor, 99, category=math)
+        profile = build_access_profile(self.student)
+
+        with self.assertNumQueries(2):
+            access = evaluate_tryout_list(profile, self.packages, self.categories)
+
+        self.assertFalse(access.categories_locked)
+        self.assertEqual(access.packages[self.packages[1].pk].best_score, 65)
+        self.assertIsNone(access.packages[self.packages[0].pk].best_score)
+        self.assertEqual(
+            [access.category_best_scores[category.pk] for category in self.categories], [70, 55, None]
+        )
+
+    def test_tryout_list_queries_do_not_grow_with_cards(self):
+        self.client.force_login(self.student)
+        url = reverse('tryout_list')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        for index in range(5):
+            TryoutPackage.objects.create(package_name=f'Ekstra {index}', total_time=60, created_by=self.admin)
+            Category.objects.create(category_name=f'Ekstra {index}')
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+        self.assertEqual(len(many), len(few))
@@ -0,0 +1,140 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from otosapp.models import DailyMetrics, PaymentProof, Role, SubscriptionPackage, User, UserSubscription
+from otosapp.services.admin_metrics import dashboard_metrics
+
+
+class DailyMetricsTests(TestCase):
+    def setUp(self):
+        self.student_role = Role.objects.create(role_name='Student')
+        self.package = SubscriptionPackage.objects.create(
+            name='Premium', description='Paket', features='Semua', price=Decimal('150000'), duration_days=30
+        )
+        self.counter = 0
+
+    def _user(self, role=None):
+        self.counter += 1
+        return User.objects.create_user(
+            email=f'user{self.counter}@example.com', username=f'user{self.counter}@example.com',
+            password='testpass123', role=role or self.student_role,
+        )
+
+    def _payment(self, user, status='pending', amount='150000'):
+        return PaymentProof.objects.create(
+            user=user, package=self.package, proof_image='payment_proofs/bukti.png', payment_method='Transfer',
+            payment_date=timezone.now(), amount_paid=Decimal(amount), status=status,
+        )
+
+    def _approve(self, payment, verified_at=None):
+        payment.status = 'approved'
+        payment.verified_at = verified_at or timezone.now()
+        payment.save()
+        UserSubscription.objects.update_or_create(
+            user=payment.user,
+            defaults={'package': self.package, 'end_date': timezone.now() + timedelta(days=30), 'payment_proof': payment},
+        )
+
+    def test_signals_keep_today_row_current(self):
+        first, second = self._user(), self._user()
+        pending = self._payment(first)
+        approved = self._payment(second)
+        self._approve(approved)
+        self._payment(self._user(), status='rejected')
+
+        row = DailyMetrics.objects.get(day=timezone.localdate())
+        self.assertEqual(row.signups, 3)
+        self.assertEqual(row.payments_created, 3)
+        self.assertEqual(row.payments_pending, 1)
+        self.assertEqual(row.payments_rejected, 1)
+        self.assertEqual(row.approved_payments, 1)
+        self.assertEqual(row.revenue, Decimal('150000'))
+        self.assertEqual(row.new_subscriptions, 1)
+        self.assertEqual(row.active_subscriptions, 1)
+
+        pending.delete()
+        self.assertEqual(DailyMetrics.objects.get(day=timezone.localdate()).payments_pending, 0)
+
+    def test_verification_day_moves_between_rows(self):
+        payment = self._payment(self._user())
+        last_week = timezone.now() - timedelta(days=7)
+        self._approve(payment, verified_at=last_week)
+        self.assertEqual(DailyMetrics.objects.get(day=timezone.localdate(last_week)).approved_payments, 1)
+
+        payment.verified_at = timezone.now()
+        payment.save()
+        self.assertEqual(DailyMetrics.objects.get(day=timezone.localdate(last_week)).approved_payments, 0)
+        self.assertEqual(DailyMetrics.objects.get(day=timezone.localdate()).approved_payments, 1)
+
+    def test_dashboard_metrics_match_source_tables(self):
+        for index in range(3):
+            payment = self._payment(self._user(), amount=str(100000 * (index + 1)))
+            self._approve(payment, verified_at=timezone.now() - timedelta(days=index * 40))
+        self._payment(self._user())
+
+        metrics = dashboard_metrics()
+
+        self.assertEqual(metrics['total_users'], User.objects.count())
+        self.assertEqual(metrics['total_payments'], 4)
+        self.assertEqual(metrics['pending_payments'], 1)
+        self.assertEqual(metrics['approved_payments'], 3)
+        self.assertEqual(metrics['total_revenue'], 600000.0)
+        self.assertEqual(metrics['total_subscriptions'], 3)
+        self.assertEqual(metrics['active_subscriptions'], 3)
+        self.assertEqual(metrics['sales_7d'], 1)
+        self.assertEqual(metrics['sales_90d'], 3)
+        self.assertEqual(len(metrics['monthly_data']), 6)
+        self.assertEqual(sum(month['sales_count'] for month in metrics['monthly_data']), 3)
+        self.assertNotIn('total_revenue', dashboard_metrics(include_revenue=False))
+
+    def test_active_subscriptions_follow_end_dates_without_writes(self):
+        self._approve(self._payment(self._user()))
+        self._approve(self._payment(self._user()))
+        self.assertEqual(dashboard_metrics()['active_subscriptions'], 2)
+
+        # Masa langganan habis tanpa ada sinyal atau sweep yang memperbarui rollup
+        UserSubscription.objects.filter(pk=UserSubscription.objects.first().pk).update(
+            end_date=timezone.now() - timedelta(minutes=1)
+        )
+
+        metrics = dashboard_metrics()
+        self.assertEqual((metrics['active_subscriptions'], metrics['expired_subscriptions']), (1, 1))
+
+    def test_reconcile_command_repairs_drift(self):
+        self._approve(self._payment(self._user()))
+        DailyMetrics.objects.all().update(signups=99, approved_payments=0, revenue=0)
+
+        out = StringIO()
+        call_command('reconcile_daily_metrics', '--all', stdout=out)
+
+        row = DailyMetrics.objects.get(day=timezone.localdate())
+        self.assertEqual(row.signups, 1)
+        self.assertEqual(row.approved_payments, 1)
+        self.assertEqual(row.revenue, Decimal('150000'))
+        self.assertIn('hari diperbarui', out.getvalue())
+
+    def test_admin_home_queries_do_not_grow_with_payment_history(self):
+        admin = self._user(Role.objects.create(role_name='Admin'))
+        self.client.force_login(admin)
+
+        def home_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('home'))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('admin_stats', response.context)
+            return len(queries)
+
+        self._approve(self._payment(self._user()))
+        home_queries()  # first request creates the default Visitor role
+        baseline = home_queries()
+        for days_ago in range(10, 200, 20):
+            self._approve(self._payment(self._user()), verified_at=timezone.now() - timedelta(days=days_ago))
+        self.assertEqual(home_queries(), baseline)
@@ -0,0 +1,134 @@
+import json
+
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from otosapp.models import Answer, Category, Choice, Question, Role, Test, User
+from otosapp.services.answers import clear_answer, save_answer
+
+
+class AnswerUpsertTests(TestCase):
+    def setUp(self):
+        role = Role.objects.create(role_name='Student')
+        student = User.objects.create_user(
+            email='answers@example.com',
+            username='answers@example.com',
+            password='testpass123',
+            role=role,
+        )
+        category = Category.objects.create(category_name='Kategori')
+        self.question = Question.objects.create(question_text='Soal', pub_date=timezone.now(), category=category)
+        self.right = Choice.objects.create(question=self.question, choice_text='A', is_correct=True)
+        self.wrong = Choice.objects.create(question=self.question, choice_text='B', is_correct=False)
+        self.test = Test.objects.create(student=student)
+
+    def test_save_answer_is_single_statement_upsert(self):
+        with self.assertNumQueries(1):
+            save_answer(self.test.id, self.question.id, selected_choice_id=self.wrong.id)
+        with self.assertNumQueries(1):
+            save_answer(self.test.id, self.question.id, selected_choice_id=self.right.id)
+
+        answer = Answer.objects.get(test=self.test, question=self.question)
+        self.assertEqual(answer.selected_choice_id, self.right.id)
+
+    def test_essay_save_clears_selected_choice(self):
+        save_answer(self.test.id, self.question.id, selected_choice_id=self.right.id)
+        save_answer(self.test.id, self.question.id, text_answer='jawaban')
+
+        answer = Answer.objects.get(test=self.test, question=self.question)
+        self.assertIsNone(answer.selected_choice_id)
+        self.assertEqual(answer.text_answer, 'jawaban')
+
+    def test_duplicate_answers_are_rejected(self):
+        Answer.objects.create(test=self.test, question=self.question, selected_choice=self.right)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Answer.objects.create(test=self.test, question=self.question, selected_choice=self.wrong)
+
+    def test_clear_answer(self):
+        save_answer(self.test.id, self.question.id, selected_choice_id=self.right.id)
+        self.assertEqual(clear_answer(self.test.id, self.question.id), 1)
+        self.assertFalse(Answer.objects.filter(test=self.test).exists())
+
+
+class AnswerSyncApiTests(TestCase):
+    def setUp(self):
+        role = Role.objects.create(role_name='Student')
+        self.student = User.objects.create_user(
+            email='sync@example.com',
+            username='sync@example.com',
+            password='testpass123',
+            role=role,
+        )
+        self.category = Category.objects.create(category_name='Kategori')
+        self.questions = []
+        for index in range(3):
+            question = Question.objects.create(
+                question_text=f'Soal {index}', pub_date=timezone.now(), category=self.category
+            )
+            Choice.objects.create(question=question, choice_text='A', is_correct=True)
+            Choice.objects.create(question=question, choice_text='B', is_correct=False)
+            self.questions.append(question)
+        self.essay = Question.objects.create(
+            question_text='Isian', pub_date=timezone.now(), category=self.category, question_type='essay'
+        )
+        self.test = Test.objects.create(student=self.student, start_time=timezone.now(), time_limit=60)
+        self.test.categories.add(self.category)
+        self.client.force_login(self.student)
+        self.url = reverse('api_sync_test_answers', args=[self.test.id])
+
+    def _post(self, answers):
+        return self.client.post(self.url, data=json.dumps({'answers': answers}), content_type='application/json')
+
+    def test_batch_is_upserted_and_latest_client_write_wins(self):
+        first, second, _ = self.questions
+        response = self._post([
+            {'question_id': first.id, 'choice_id': first.choices.get(is_correct=False).id, 'client_ts': 2},
+            {'question_id': first.id, 'choice_id': first.choices.get(is_correct=True).id, 'client_ts': 1},
+            {'question_id': second.id, 'choice_id': second.choices.first().id, 'client_ts': 3},
+            {'question_id': self.essay.id, 'text_answer': 'jawaban', 'client_ts': 4},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['saved'], 3)
+        self.assertEqual(data['answered_question_ids'], sorted([first.id, second.id, self.essay.id]))
+        self.assertGreater(data['remaining_time'], 0)
+        self.assertEqual(
+            Answer.objects.get(test=self.test, question=first).selected_choice,
+            first.choices.get(is_correct=False),
+        )
+
+    def test_foreign_questions_and_choices_are_rejected(self):
+        other_category = Category.objects.create(category_name='Lain')
+        outsider = Question.objects.create(question_text='Luar', pub_date=timezone.now(), category=other_category)
+        outsider_choice = Choice.objects.create(question=outsider, choice_text='X', is_correct=True)
+
+        response = self._post([
+            {'question_id': outsider.id, 'choice_id': outsider_choice.id},
+            {'question_id': self.questions[0].id, 'choice_id': outsider_choice.id},
+        ])
+
+        data = response.json()
+        self.assertEqual(data['saved'], 0)
+        self.assertEqual(sorted(item['reason'] for item in data['rejected']), ['invalid_choice', 'not_in_test'])
+        self.assertFalse(Answer.objects.filter(test=self.test).exists())
+
+    def test_clear_entry_removes_answer(self):
+        question = self.questions[0]
+        save_answer(self.test.id, question.id, selected_choice_id=question.choices.first().id)
+        data = self._post([{'question_id': question.id, 'clear': True}]).json()
+        self.assertEqual(data['cleared'], 1)
+        self.assertEqual(data['answered_question_ids'], [])
+
+    def test_submitted_test_is_rejected(self):
+        Test.objects.filter(pk=self.test.pk).update(is_submitted=True)
+        response = self._post([])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['status'], 'submitted')
+
+    def test_other_students_test_is_not_found(self):
+        other = User.objects.create_user(email='lain@example.com', username='lain@example.com', password='x')
+        self.client.force_login(other)
+        self.assertEqual(self._post([]).status_code, 404)
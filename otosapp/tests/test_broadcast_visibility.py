@@ -0,0 +1,104 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from otosapp.models import BroadcastMessage, Role, SubscriptionPackage, UserSubscription
+from otosapp.services import broadcast_visibility
+from otosapp.tests.mixins import UserFixtureMixin
+
+
+class BroadcastVisibilityCacheTests(UserFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student_role = Role.objects.create(role_name='Student')
+        self.teacher_role = Role.objects.create(role_name='Teacher')
+        package = SubscriptionPackage.objects.create(
+            name='Silver', description='Paket silver', price=50000, duration_days=30,
+        )
+        self.subscriber = self._user('langganan', 'Student')
+        UserSubscription.objects.create(user=self.subscriber, package=package, end_date=timezone.now() + timedelta(days=7))
+        self.student = self._user('siswa', 'Student')
+        self.teacher = self._user('guru', 'Teacher')
+
+    def _broadcast(self, roles=(), **kwargs):
+        defaults = {'title': 'Info', 'content': 'Isi', 'publish_at': timezone.now() - timedelta(minutes=5)}
+        defaults.update(kwargs)
+        broadcast = BroadcastMessage.objects.create(**defaults)
+        broadcast.target_roles.set(roles)
+        return broadcast
+
+    def test_each_class_sees_its_own_broadcasts_from_the_cache(self):
+        everyone = self._broadcast(title='Semua')
+        paid = self._broadcast([self.student_role], title='Premium', students_require_active_subscription=True)
+        teachers = self._broadcast([self.teacher_role], title='Guru')
+        subscriber, student, teacher = self._fresh(self.subscriber), self._fresh(self.student), self._fresh(self.teacher)
+
+        expected = {subscriber: {everyone, paid}, student: {everyone}, teacher: {everyone, teachers}}
+        for user, broadcasts in expected.items():
+            self.assertEqual(set(BroadcastMessage.objects.visible_for_user(user)), broadcasts)
+            # Hanya lookup versi di counter bersama
+            with self.assertNumQueries(1):
+                visible = BroadcastMessage.objects.visible_for_user(user)
+                # Data yang dipakai template ikut tersimpan di cache
+                [(item.target_role_names(), list(item.target_roles.all()), item.is_live) for item in visible]
+            self.assertEqual(set(visible), set(BroadcastMessage.objects.all().visible_for_user(user)))
+
+    def test_save_remove_reactivate_and_targets_invalidate_the_cache(self):
+        broadcast = self._broadcast([self.student_role])
+        student = self._fresh(self.student)
+        self.assertEqual(BroadcastMessage.objects.visible_for_user(student), [broadcast])
+
+        broadcast.remove_now(user=self.teacher)
+        self.assertEqual(BroadcastMessage.objects.visible_for_user(student), [])
+
+        broadcast.reactivate()
+        self.assertEqual(BroadcastMessage.objects.visible_for_user(student), [broadcast])
+
+        broadcast.target_roles.set([self.teacher_role])
+        self.assertEqual(BroadcastMessage.objects.visible_for_user(student), [])
+
+        broadcast.target_roles.clear()
+        broadcast.title = 'Judul baru'
+        broadcast.save()
+        self.assertEqual([b.title for b in BroadcastMessage.objects.visible_for_user(student)], ['Judul baru'])
+
+    def test_removal_reaches_lists_cached_by_other_processes(self):
+        broadcast = self._broadcast([self.student_role])
+        student = self._fresh(self.student)
+        stale = BroadcastMessage.objects.visible_for_user(student)
+        old_key = broadcast_visibility._class_key(*broadcast_visibility.visibility_class(student))
+
+        broadcast.remove_now(user=self.teacher)
+        # Proses lain masih memegang daftar dari versi sebelum penghapusan
+        cache.set(old_key, stale)
+
+        self.assertEqual(BroadcastMessage.objects.visible_for_user(student), [])
+
+    def test_entry_expires_at_the_next_publish_or_expiry_boundary(self):
+        self._broadcast(duration_minutes=60)
+        self._broadcast(title='Nanti', publish_at=timezone.now() + timedelta(seconds=90))
+        student = self._fresh(self.student)
+
+        with mock.patch.object(broadcast_visibility.cache, 'set', wraps=cache.set) as cache_set:
+            visible = BroadcastMessage.objects.visible_for_user(student)
+
+        self.assertEqual([b.title for b in visible], ['Info'])
+        timeout = cache_set.call_args.args[2]
+        self.assertTrue(80 <= timeout <= 90, timeout)
+
+    def test_home_reads_broadcasts_from_the_cache(self):
+        self._broadcast([self.student_role], title='Jadwal Tryout')
+        self.client.force_login(self.subscriber)
+        self.client.get(reverse('home'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'))
+
+        self.assertContains(response, 'Jadwal Tryout')
+        self.assertFalse([q for q in queries if 'otosapp_broadcastmessage' in q['sql']])
@@ -0,0 +1,119 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from otosapp.models import Answer, Category, Choice, Question, Role, Test, TestCategoryScore, User
+from otosapp.services.category_stats import attach_category_statistics, compute_category_statistics
+
+
+class CategoryStatisticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(
+            email='guru@example.com', username='guru@example.com', password='testpass123',
+            role=Role.objects.create(role_name='Teacher'),
+        )
+        self.student_role = Role.objects.create(role_name='Student')
+        self.students = [
+            User.objects.create_user(
+                email=f'murid{index}@example.com', username=f'murid{index}@example.com',
+                password='testpass123', role=self.student_role,
+            )
+            for index in range(2)
+        ]
+        self.math = Category.objects.create(category_name='Matematika', created_by=self.teacher, passing_score=70)
+        self.physics = Category.objects.create(category_name='Fisika', created_by=self.teacher, passing_score=50)
+
+    def _test(self, student, category, score, minutes=None, submitted=True):
+        start = timezone.now() - timedelta(hours=1)
+        test = Test.objects.create(
+            student=student, score=score, is_submitted=submitted,
+            start_time=start if minutes else None,
+            end_time=start + timedelta(minutes=minutes) if minutes else None,
+        )
+        test.categories.add(category)
+        TestCategoryScore.objects.create(test=test, category=category, answered=1, contribution=score)
+        return test
+
+    def test_statistics_for_many_categories_in_two_queries(self):
+        first, second = self.students
+        self._test(first, self.math, 80, minutes=30)
+        self._test(first, self.math, 60, minutes=60)
+        self._test(second, self.math, 90)
+        self._test(second, self.physics, 40, minutes=10)
+        self._test(second, self.physics, 100, submitted=False)
+        empty = Category.objects.create(category_name='Kimia', created_by=self.teacher)
+
+        with self.assertNumQueries(2):
+            stats = compute_category_statistics([self.math.id, self.physics.id, empty.id])
+
+        self.assertEqual(stats[self.math.id], {
+            'total_tests': 3,
+            'total_students': 2,
+            'passed_tests': 2,
+            'failed_tests': 1,
+            'pass_rate': 66.7,
+            'average_score': 76.7,
+            'average_completion_minutes': 45.0,
+        })
+        self.assertEqual(stats[self.physics.id]['pass_rate'], 0.0)
+        self.assertEqual(stats[self.physics.id]['average_completion_minutes'], 10.0)
+        self.assertIsNone(stats[empty.id]['pass_rate'])
+
+    def test_difficulty_badges_reuse_memoized_statistics(self):
+        self._test(self.students[0], self.math, 80)
+        categories = attach_category_statistics(list(Category.objects.order_by('pk')))
+
+        with self.assertNumQueries(0):
+            levels = [category.get_difficulty_level() for category in categories]
+            colors = [category.get_difficulty_color() for category in categories]
+        self.assertEqual(levels, ['Mudah', 'Belum Ada Data'])
+        self.assertIn('green', colors[0])
+
+        # Served from the cache on the next page load
+        with self.assertNumQueries(0):
+            attach_category_statistics([self.math, self.physics])
+
+    def test_submission_invalidates_cached_statistics(self):
+        self._test(self.students[0], self.math, 80)
+        self.assertEqual(Category.objects.get(pk=self.math.pk).get_test_statistics()['total_tests'], 1)
+
+        question = Question.objects.create(question_text='2 + 2?', pub_date=timezone.now(), category=self.math)
+        choice = Choice.objects.create(question=question, choice_text='4', is_correct=True)
+        test = Test.objects.create(student=self.students[1])
+        test.categories.add(self.math)
+        Answer.objects.create(test=test, question=question, selected_choice=choice)
+        test.is_submitted = True
+        test.calculate_score()
+
+        self.assertEqual(Category.objects.get(pk=self.math.pk).get_test_statistics()['total_tests'], 2)
+
+        test.delete()
+        self.assertEqual(Category.objects.get(pk=self.math.pk).get_test_statistics()['total_tests'], 1)
+
+        self.math.passing_score = 90
+        self.math.save()
+        self.assertEqual(Category.objects.get(pk=self.math.pk).get_pass_rate(), 0.0)
+
+    def test_student_performance_list_queries_do_not_grow_with_categories(self):
+        self.client.force_login(self.teacher)
+        self._test(self.students[0], self.math, 80)
+
+        def list_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('teacher_student_list'))
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        list_queries()  # first request creates the default Visitor role
+        baseline = list_queries()
+        for index in range(4):
+            category = Category.objects.create(category_name=f'Kategori {index}', created_by=self.teacher)
+            self._test(self.students[1], category, 60, minutes=20)
+        self.assertEqual(list_queries(), baseline)
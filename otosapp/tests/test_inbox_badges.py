@@ -0,0 +1,116 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from otosapp.context_processors import sidebar_context
+from otosapp.models import Message, MessageThread, PaymentProof, SubscriptionPackage
+from otosapp.services import inbox_badges, shared_counters
+from otosapp.services.inbox_badges import pending_payments_count, unread_message_count
+from otosapp.tests.mixins import UserFixtureMixin
+
+
+class InboxBadgeTests(UserFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = self._user('murid', 'Student')
+        self.teacher = self._user('guru', 'Teacher')
+        self.other_teacher = self._user('guru2', 'Teacher')
+        self.admin = self._user('admin', 'Admin')
+        self.thread = MessageThread.objects.create(
+            title='Soal nomor 3', thread_type='academic', student=self.student,
+        )
+
+    def test_counts_are_cached_until_a_message_changes(self):
+        teacher = self._fresh(self.teacher)
+        self.assertEqual(unread_message_count(teacher), 0)
+
+        Message.objects.create(thread=self.thread, sender=self.student, content='Bagaimana caranya?')
+        self.assertEqual(unread_message_count(teacher), 1)
+        # Hanya lookup versi di counter bersama; hitungannya dari cache
+        with self.assertNumQueries(1):
+            self.assertEqual(unread_message_count(teacher), 1)
+
+        # Membalas berarti pengirim sudah membaca thread sampai pesannya sendiri
+        Message.objects.create(thread=self.thread, sender=self.teacher, content='Begini.')
+        student = self._fresh(self.student)
+        self.assertEqual(unread_message_count(student), 1)
+        self.assertEqual(unread_message_count(teacher), 0)
+
+        self.thread.mark_as_read_for_user(self.student)
+        self.assertEqual(unread_message_count(student), 0)
+
+    def test_assignment_moves_unassigned_messages_between_staff(self):
+        Message.objects.create(thread=self.thread, sender=self.student, content='Halo')
+        teacher, other = self._fresh(self.teacher), self._fresh(self.other_teacher)
+        self.assertEqual((unread_message_count(teacher), unread_message_count(other)), (1, 1))
+
+        self.thread.teacher_or_admin = self.teacher
+        self.thread.save()
+        self.assertEqual((unread_message_count(teacher), unread_message_count(other)), (1, 0))
+
+        self.thread.teacher_or_admin = self.other_teacher
+        self.thread.save()
+        self.assertEqual((unread_message_count(teacher), unread_message_count(other)), (0, 1))
+
+    def test_pending_payments_follow_status_changes_without_recounting(self):
+        package = SubscriptionPackage.objects.create(
+            name='Silver', description='Paket silver', price=50000, duration_days=30,
+        )
+        self.assertEqual(pending_payments_count(), 0)
+        proof = PaymentProof.objects.create(
+            user=self.student, package=package, proof_image='payment_proofs/bukti.png', payment_method='Transfer',
+            payment_date=timezone.now(), amount_paid=Decimal('50000'),
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(pending_payments_count(), 1)
+
+        proof.status = 'approved'
+        proof.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(pending_payments_count(), 0)
+
+        PaymentProof.objects.filter(pk=proof.pk).update(status='pending')
+        call_command('reconcile_inbox_badges', stdout=StringIO())
+        self.assertEqual(pending_payments_count(), 1)
+
+    def test_sidebar_badges_need_no_count_queries(self):
+        general = MessageThread.objects.create(title='Akun', thread_type='general', student=self.student)
+        Message.objects.create(thread=general, sender=self.student, content='Halo')
+        # Thread akademik yang belum ditugaskan bukan urusan admin
+        Message.objects.create(thread=self.thread, sender=self.student, content='Halo')
+        request = RequestFactory().get('/')
+        request.user = self._fresh(self.admin)
+        sidebar_context(request)
+
+        with CaptureQueriesContext(connection) as queries:
+            context = sidebar_context(request)
+        self.assertEqual(len(queries), 2)
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql']])
+        self.assertEqual(context['pending_payments_count'], 0)
+        self.assertEqual(context['message_unread_count'], 1)
+
+    def test_invalidation_does_not_depend_on_the_local_cache(self):
+        teacher = self._fresh(self.teacher)
+        self.assertEqual(unread_message_count(teacher), 0)
+        names = [inbox_badges.ALL_VERSION, inbox_badges.STAFF_VERSION, inbox_badges._user_version(teacher.pk)]
+        old_key = inbox_badges._unread_key(teacher.pk, True, shared_counters.read(names))
+
+        Message.objects.create(thread=self.thread, sender=self.student, content='Halo')
+        # Cache lokal dibuang (cull/restart), lalu proses lain menulis hitungan dari versi lama
+        cache.clear()
+        cache.set(old_key, 0)
+
+        self.assertEqual(unread_message_count(teacher), 1)
+
+    def test_api_matches_sidebar(self):
+        Message.objects.create(thread=self.thread, sender=self.student, content='Halo')
+        self.client.force_login(self.teacher)
+        response = self.client.get(reverse('message_api_unread_count'))
+        self.assertEqual(response.json(), {'unread_count': 1})
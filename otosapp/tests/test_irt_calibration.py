@@ -0,0 +1,121 @@
+import random
+from io import StringIO
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from otosapp.models import Answer, Category, Choice, Question, Role, Test, TestAbilityEstimate, User
+from otosapp.services import irt
+from otosapp.services.scoring import SCORING_VERSION, score_test
+
+
+@skipIf(irt.np is None, 'numpy/scipy tidak terpasang')
+class IrtFitTests(TestCase):
+    def test_recovers_simulated_item_parameters(self):
+        np = irt.np
+        rng = np.random.default_rng(7)
+        persons, items = 3000, 12
+        theta = rng.normal(size=persons)
+        discrimination = rng.uniform(0.7, 2.0, items)
+        difficulty = np.linspace(-1.5, 1.5, items)
+        # Each student answers about 70% of the questions (sparse matrix)
+        person_idx, item_idx = np.nonzero(rng.random((persons, items)) < 0.7)
+        probability = 1 / (1 + np.exp(-discrimination[item_idx] * (theta[person_idx] - difficulty[item_idx])))
+        correct = rng.random(len(probability)) < probability
+
+        fit = irt.fit_irt(person_idx, item_idx, correct, persons, items, model='2pl')
+        self.assertGreater(np.corrcoef(fit.difficulty, difficulty)[0, 1], 0.98)
+        self.assertGreater(np.corrcoef(fit.discrimination, discrimination)[0, 1], 0.8)
+        self.assertGreater(np.corrcoef(fit.theta, theta)[0, 1], 0.8)
+
+        rasch = irt.fit_irt(person_idx, item_idx, correct, persons, items, model='1pl')
+        self.assertTrue(np.all(rasch.discrimination == 1.0))
+        self.assertGreater(np.corrcoef(rasch.difficulty, difficulty)[0, 1], 0.98)
+
+    def test_pure_python_ability_matches_calibration_grid(self):
+        items = [(1.2, -0.5, True), (0.8, 0.3, True), (1.5, 1.0, False)]
+        theta, standard_error = irt.estimate_ability(items)
+        self.assertGreater(theta, 0)
+        self.assertLess(standard_error, 1)
+        self.assertLess(irt.estimate_ability([(1.0, 0.0, False)] * 3)[0], 0)
+        self.assertAlmostEqual(irt.expected_score(0.0, [(1.0, 0.0)]), 500.0)
+
+
+@skipIf(irt.np is None, 'numpy/scipy tidak terpasang')
+class IrtCategoryCalibrationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        random.seed(3)
+        role = Role.objects.create(role_name='Student')
+        cls.category = Category.objects.create(category_name='Penalaran Umum', scoring_method='utbk')
+        cls.questions = []
+        for index in range(6):
+            question = Question.objects.create(
+                question_text=f'Soal {index + 1}', pub_date=timezone.now(), category=cls.category
+            )
+            right = Choice.objects.create(question=question, choice_text='Benar', is_correct=True)
+            wrong = Choice.objects.create(question=question, choice_text='Salah', is_correct=False)
+            cls.questions.append((question, right, wrong))
+
+        cls.tests = []
+        for student_index in range(30):
+            student = User.objects.create_user(
+                email=f'irt{student_index}@example.com', username=f'irt{student_index}@example.com',
+                password='testpass123', role=role,
+            )
+            test = Test.objects.create(student=student, is_submitted=True, scoring_version=SCORING_VERSION)
+            test.categories.add(cls.category)
+            ability = student_index / 10 - 1.5
+            for question_index, (question, right, wrong) in enumerate(cls.questions):
+                chance = 1 / (1 + 2.718 ** -(ability - (question_index - 2.5) / 2))
+                Answer.objects.create(
+                    test=test, question=question, selected_choice=right if random.random() < chance else wrong
+                )
+            cls.tests.append(test)
+
+    def test_calibration_stores_parameters_and_abilities(self):
+        result = irt.calibrate_irt_category(self.category.pk, model='2pl')
+
+        self.assertEqual((result.responses, result.questions, result.tests), (180, 6, 30))
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.utbk_model, '2pl')
+        self.assertIsNotNone(self.category.irt_calibrated_at)
+        difficulties = list(
+            Question.objects.filter(category=self.category).order_by('pk').values_list('irt_difficulty', flat=True)
+        )
+        self.assertNotIn(None, difficulties)
+        self.assertLess(difficulties[0], difficulties[-1])
+        self.assertEqual(TestAbilityEstimate.objects.filter(category=self.category).count(), 30)
+        self.assertFalse(Test.objects.filter(pk__in=[t.pk for t in self.tests]).exclude(scoring_version=0).exists())
+
+    def test_scoring_uses_calibrated_parameters(self):
+        linear = score_test(self.tests[-1])
+        self.assertIsNone(linear.ability)
+
+        irt.calibrate_irt_category(self.category.pk, model='1pl')
+        stored = TestAbilityEstimate.objects.get(test=self.tests[-1], category=self.category).theta
+
+        strong = self.tests[-1]
+        strong.calculate_score()
+        result = score_test(strong)
+        self.assertIsNotNone(result.ability)
+        self.assertAlmostEqual(result.ability[0], stored, delta=0.05)
+        self.assertAlmostEqual(strong.score, result.score)
+        self.assertAlmostEqual(TestAbilityEstimate.objects.get(test=strong, category=self.category).theta, result.ability[0])
+
+        weak = self.tests[0]
+        weak.calculate_score()
+        self.assertLess(weak.score, strong.score)
+
+    def test_command_calibrates_and_reports(self):
+        out = StringIO()
+        call_command('calibrate_irt', '--category', str(self.category.pk), '--model', '2pl', stdout=out)
+        self.assertIn('2PL dari 180 jawaban', out.getvalue())
+        self.assertIn('1 kategori dikalibrasi', out.getvalue())
+
+    def test_category_without_answers_is_reported(self):
+        empty = Category.objects.create(category_name='Kosong', scoring_method='utbk', utbk_model='1pl')
+        with self.assertRaises(irt.CalibrationError):
+            irt.calibrate_irt_category(empty.pk)
@@ -0,0 +1,209 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from otosapp.models import (
+    AccessLevel,
+    Category,
+    LeaderboardEntry,
+    Role,
+    SubscriptionPackage,
+    Test,
+    TryoutPackage,
+    TryoutPackageCategory,
+    User,
+    UserSubscription,
+)
+from otosapp.services.leaderboard import (
+    LeaderboardQuery,
+    leaderboard_page,
+    leaderboard_totals,
+    refresh_expired_entries,
+    refresh_student_leaderboard,
+    student_rank,
+)
+from otosapp.services import leaderboard
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.role = Role.objects.create(role_name='Student')
+        self.category = Category.objects.create(category_name='Penalaran Umum', scoring_method='utbk')
+        self.package = TryoutPackage.objects.create(package_name='UTBK 1', total_time=60, created_by=self._student('pembuat'))
+        TryoutPackageCategory.objects.create(
+            package=self.package, category=self.category, question_count=1, max_score=1000, order=1
+        )
+
+    def _student(self, name):
+        return User.objects.create_user(
+            email=f'{name}@example.com', username=f'{name}@example.com', password='testpass123', role=self.role
+        )
+
+    def _submitted(self, student, score, days_ago=0, package=True):
+        test = Test.objects.create(
+            student=student, is_submitted=True, score=score, tryout_package=self.package if package else None
+        )
+        test.categories.add(self.category)
+        if days_ago:
+            Test.objects.filter(pk=test.pk).update(date_taken=timezone.now() - timedelta(days=days_ago))
+        refresh_student_leaderboard(student.id)
+        return test
+
+    def test_best_package_score_per_student(self):
+        alice, budi = self._student('alice'), self._student('budi')
+        self._submitted(alice, 500)
+        self._submitted(alice, 700)
+        self._submitted(budi, 650)
+
+        rows = leaderboard_page(LeaderboardQuery('utbk_package_best'))
+        self.assertEqual([(row.student_id, row.score, row.total_tests) for row in rows],
+                         [(alice.id, 700, 2), (budi.id, 650, 1)])
+
+        per_package = leaderboard_page(LeaderboardQuery('utbk_package_best', package_key=self.package.id))
+        self.assertEqual(len(per_package), 2)
+
+    def test_average_ranking_respects_min_tests_and_rank_lookup(self):
+        students = [self._student(f's{index}') for index in range(3)]
+        for index, student in enumerate(students):
+            for _ in range(index + 1):
+                self._submitted(student, 100 * (index + 1), package=False)
+
+        query = LeaderboardQuery('overall_average', min_tests=2)
+        rows = leaderboard_page(query)
+        self.assertEqual([row.student_id for row in rows], [students[2].id, students[1].id])
+        self.assertEqual(student_rank(query, students[1].id)['rank'], 2)
+        self.assertIsNone(student_rank(query, students[0].id))
+
+    def _ranked_students(self):
+        scores = [900, 700, 700, 400]
+        students = [self._student(f'r{index}') for index in range(len(scores))]
+        for student, score in zip(students, scores):
+            self._submitted(student, score)
+        return students
+
+    def test_rank_and_percentile_for_every_ranking_type(self):
+        students = self._ranked_students()
+        queries = [
+            LeaderboardQuery('utbk_package_best'),
+            LeaderboardQuery('overall_average'),
+            LeaderboardQuery('category_best', category_key=self.category.id),
+            LeaderboardQuery('category_average', category_key=self.category.id),
+        ]
+        for query in queries:
+            with self.subTest(ranking_type=query.ranking_type), self.assertNumQueries(1):
+                rank = student_rank(query, students[2].id)
+            # Ties share a rank: 900 first, both 700s second
+            self.assertEqual(rank['rank'], 2)
+            self.assertEqual(rank['total'], 4)
+            # Only the 400 scores strictly lower; the other 700 is not counted as below
+            self.assertEqual(rank['percentile'], 25.0)
+            self.assertEqual(student_rank(query, students[1].id)['percentile'], 25.0)
+            self.assertEqual(student_rank(query, students[0].id)['percentile'], 75.0)
+            last = student_rank(query, students[3].id)
+            self.assertEqual((last['rank'], last['percentile']), (4, 0.0))
+
+    def test_rank_fallback_without_window_functions(self):
+        students = self._ranked_students()
+        query = LeaderboardQuery('utbk_package_best')
+        with mock.patch.object(connection.features, 'supports_over_clause', False):
+            rank = student_rank(query, students[1].id)
+        self.assertEqual((rank['rank'], rank['total'], rank['percentile']), (2, 4, 25.0))
+        self.assertEqual(leaderboard._student_rank_window(query, students[1].id), rank)
+
+    def test_everyone_tied_is_at_the_zeroth_percentile(self):
+        students = [self._student(f'seri{index}') for index in range(3)]
+        for student in students:
+            self._submitted(student, 650)
+        rank = student_rank(LeaderboardQuery('utbk_package_best'), students[1].id)
+        self.assertEqual((rank['rank'], rank['total'], rank['percentile']), (1, 3, 0.0))
+
+    def test_rolling_window_rows_expire(self):
+        student = self._student('carla')
+        self._submitted(student, 400, days_ago=6)
+        week = LeaderboardQuery('overall_average', time_period='week')
+        self.assertEqual(len(leaderboard_page(week)), 1)
+
+        refresh_expired_entries(now=timezone.now() + timedelta(days=2))
+        self.assertFalse(LeaderboardEntry.objects.filter(student=student, time_period='week').exists())
+        self.assertTrue(LeaderboardEntry.objects.filter(student=student, time_period='all').exists())
+
+    def test_expired_rows_stay_listed_until_refreshed(self):
+        viewer, other = self._student('eka'), self._student('fajar')
+        self._submitted(viewer, 400, days_ago=3)
+        self._submitted(viewer, 600)
+        self._submitted(other, 500, days_ago=6)
+        self._submitted(other, 700, days_ago=1)
+        week = LeaderboardQuery('overall_average', time_period='week')
+        # Tes tertua keduanya dianggap sudah keluar dari jendela minggu ini
+        LeaderboardEntry.objects.filter(time_period='week').update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        rows = leaderboard_page(week, student_id=viewer.id)
+
+        # Hanya viewer yang dihitung ulang; baris siswa lain tetap tampil sampai refresh_leaderboard
+        self.assertEqual([(row.student_id, row.score) for row in rows], [(other.id, 600), (viewer.id, 500)])
+        self.assertEqual(student_rank(week, other.id)['rank'], 1)
+        self.assertEqual(leaderboard_totals('week'), {'total_students': 2, 'total_tests': 4})
+
+        refresh_expired_entries(now=timezone.now() + timedelta(days=2))
+        entry = LeaderboardEntry.objects.get(
+            student=other, ranking_type='overall_average', time_period='week', scoring_method='all'
+        )
+        self.assertEqual((entry.score, entry.total_tests), (700, 1))
+
+    @override_settings(CRON_SECRET='rahasia')
+    def test_vercel_cron_refreshes_expired_rows(self):
+        student = self._student('hana')
+        self._submitted(student, 400, days_ago=6)
+        LeaderboardEntry.objects.filter(time_period='week').update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        response = self.client.get(
+            reverse('cron_run_command', args=['refresh-leaderboard']), HTTP_AUTHORIZATION='Bearer rahasia'
+        )
+
+        self.assertIn('1 siswa diperbarui', response.json()['output'])
+        refreshed = LeaderboardEntry.objects.filter(student=student, time_period='week', expires_at__gt=timezone.now())
+        self.assertTrue(refreshed.exists())
+
+    def test_package_ranking_ignores_time_period(self):
+        student = self._student('gita')
+        self._submitted(student, 800, days_ago=40)
+
+        for period in ('all', 'week', 'month'):
+            rows = leaderboard_page(LeaderboardQuery('utbk_package_best', time_period=period))
+            self.assertEqual([(row.student_id, row.score) for row in rows], [(student.id, 800)])
+        self.assertFalse(
+            LeaderboardEntry.objects.filter(ranking_type='utbk_package_best').exclude(time_period='all').exists()
+        )
+
+    def test_deleting_test_updates_rows(self):
+        student = self._student('dodi')
+        best = self._submitted(student, 900)
+        self._submitted(student, 300)
+        best.delete()
+        entry = LeaderboardEntry.objects.get(
+            student=student, ranking_type='utbk_package_best', time_period='all', package_key=0
+        )
+        self.assertEqual(entry.score, 300)
+
+    def test_rankings_page_reads_materialized_rows(self):
+        subscription_package = SubscriptionPackage.objects.create(
+            name='Silver', description='-', features='-', price=1, duration_days=30, access_level=AccessLevel.SILVER
+        )
+        viewer = self._student('viewer')
+        UserSubscription.objects.create(
+            user=viewer, package=subscription_package, end_date=timezone.now() + timedelta(days=30), is_active=True
+        )
+        for index in range(5):
+            self._submitted(self._student(f'p{index}'), 100 * index)
+        self._submitted(viewer, 50)
+
+        self.client.force_login(viewer)
+        response = self.client.get(reverse('student_rankings'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['rankings']), 6)
+        self.assertEqual(response.context['rankings'][0]['score'], 400)
+        self.assertEqual(response.context['total_tests_taken'], 6)
@@ -0,0 +1,76 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from otosapp.models import Message, MessageThread, ThreadParticipantState, User
+from otosapp.services.message_threads import visible_threads, with_unread_counts
+from otosapp.tests.mixins import UserFixtureMixin
+
+
+class ThreadParticipantStateTests(UserFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = self._user('murid', 'Student')
+        self.teacher = self._user('guru', 'Teacher')
+        self.thread = MessageThread.objects.create(
+            title='Soal nomor 3', thread_type='academic', student=self.student, teacher_or_admin=self.teacher,
+        )
+
+    def _unread(self, user):
+        user = User.objects.get(pk=user.pk)
+        return {thread.pk: thread.unread_count for thread in with_unread_counts(visible_threads(user), user)}
+
+    def test_new_messages_bump_other_participants(self):
+        Message.objects.create(thread=self.thread, sender=self.student, content='Pertanyaan')
+        Message.objects.create(thread=self.thread, sender=self.student, content='Tambahan')
+        # Guru belum pernah membuka thread: dihitung dari pesan lama yang belum dibaca
+        self.assertEqual(self._unread(self.teacher), {self.thread.pk: 2})
+
+        self.thread.mark_as_read_for_user(self.teacher)
+        Message.objects.create(thread=self.thread, sender=self.student, content='Lagi')
+
+        self.assertEqual(self._unread(self.teacher), {self.thread.pk: 1})
+        self.assertEqual(self._unread(self.student), {self.thread.pk: 0})
+        state = ThreadParticipantState.objects.get(thread=self.thread, user=self.teacher)
+        self.assertEqual(state.unread_count, 1)
+
+    def test_deleted_messages_leave_the_unread_count(self):
+        read = Message.objects.create(thread=self.thread, sender=self.student, content='Sudah dibaca')
+        self.thread.mark_as_read_for_user(self.teacher)
+        unread = Message.objects.create(thread=self.thread, sender=self.student, content='Pertanyaan')
+        Message.objects.create(thread=self.thread, sender=self.student, content='Tambahan')
+
+        unread.delete()
+        self.assertEqual(self._unread(self.teacher), {self.thread.pk: 1})
+        # Pesan yang sudah dibaca sebelum dihapus tidak mengurangi counter
+        read.delete()
+        self.assertEqual(self._unread(self.teacher), {self.thread.pk: 1})
+        self.assertEqual(self._unread(self.student), {self.thread.pk: 0})
+
+    def test_marking_read_query_count_does_not_depend_on_length(self):
+        for index in range(20):
+            Message.objects.create(thread=self.thread, sender=self.student, content=f'Pesan {index}')
+        teacher = User.objects.get(pk=self.teacher.pk)
+        teacher.access_profile
+
+        # Satu upsert status baca + satu stamp versi badge
+        with self.assertNumQueries(2):
+            self.thread.mark_as_read_for_user(teacher)
+        self.assertEqual(self.thread.get_unread_count_for_user(teacher), 0)
+
+    def test_inbox_annotates_unread_without_per_thread_queries(self):
+        for index in range(3):
+            thread = MessageThread.objects.create(title=f'Thread {index}', student=self.student)
+            Message.objects.create(thread=thread, sender=self.teacher, content='Halo')
+        self.client.force_login(self.student)
+        url = reverse('message_inbox')
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual([thread.unread_count for thread in response.context['threads']], [1, 1, 1, 0])
+        # Tidak ada lagi COUNT belum-dibaca per thread; hanya subquery di query daftar
+        per_thread = [q['sql'] for q in queries if 'NOT "otosapp_message"."is_read"' in q['sql']]
+        self.assertEqual(per_thread, [])
@@ -0,0 +1,150 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from otosapp.models import (
+    Answer,
+    Category,
+    Choice,
+    MomentumSnapshot,
+    Question,
+    Role,
+    StudentGoal,
+    Test,
+    User,
+)
+from otosapp.services import student_momentum
+from otosapp.services.student_momentum import (
+    compute_momentum_from_tests,
+    get_momentum_snapshot,
+    record_test_submission,
+)
+
+
+class MomentumSnapshotTests(TestCase):
+    def setUp(self):
+        self.role = Role.objects.create(role_name='Student')
+        self.user = User.objects.create_user(
+            email='momentum@example.com', username='momentum@example.com', password='testpass123', role=self.role
+        )
+        self.math = Category.objects.create(category_name='Matematika', scoring_method='custom')
+        self.physics = Category.objects.create(category_name='Fisika', scoring_method='default')
+
+    def _submit(self, score, days_ago=0, category=None):
+        test = Test.objects.create(student=self.user, score=score, is_submitted=True)
+        test.categories.add(category or self.math)
+        Test.objects.filter(pk=test.pk).update(date_taken=timezone.now() - timedelta(days=days_ago))
+        test = Test.objects.get(pk=test.pk)
+        record_test_submission(test)
+        return test
+
+    def _user(self):
+        return User.objects.select_related('role').get(pk=self.user.pk)
+
+    def test_incremental_updates_match_direct_computation(self):
+        StudentGoal.objects.create(user=self.user, goal_type=StudentGoal.AVERAGE_SCORE, target_value=80)
+        self._submit(50, days_ago=20)
+        self._submit(60, days_ago=3, category=self.physics)
+        self._submit(65, days_ago=2)
+        self._submit(80, days_ago=1)
+        self._submit(70, days_ago=0)
+
+        snapshot = MomentumSnapshot.objects.get(user=self.user)
+        self.assertEqual(snapshot.total_tests, 5)
+        self.assertEqual(snapshot.longest_streak, 4)
+        self.assertEqual(snapshot.recent_scores, [65, 80, 70])
+
+        self.assertEqual(get_momentum_snapshot(self._user()), compute_momentum_from_tests(self._user()))
+
+    def test_reading_snapshot_uses_constant_queries(self):
+        for days_ago in range(10):
+            self._submit(50 + days_ago, days_ago=days_ago)
+        user = self._user()
+        # snapshot + active goal
+        with self.assertNumQueries(2):
+            momentum = get_momentum_snapshot(user)
+        self.assertEqual(momentum['streak'].current, 10)
+        self.assertEqual(momentum['weekly_activity'].current_week, 7)
+
+    def test_direct_computation_uses_one_daily_series_query(self):
+        for days_ago in (0, 1, 2, 8, 40, 95):
+            self._submit(60 + days_ago % 7, days_ago=days_ago)
+        user = self._user()
+        # daily series, best test, its categories, growth scores, active goal, category coverage
+        with self.assertNumQueries(6):
+            momentum = compute_momentum_from_tests(user)
+        self.assertEqual(momentum['streak'].current, 3)
+        self.assertEqual(momentum['weekly_activity'].previous_week, 1)
+
+    def test_trend_is_served_from_precomputed_json(self):
+        self._submit(60, days_ago=3)
+        self._submit(0, days_ago=1)
+        expected = compute_momentum_from_tests(self._user())['trend']
+
+        with mock.patch.object(student_momentum.json, 'dumps') as dumps:
+            trend = get_momentum_snapshot(self._user())['trend']
+        dumps.assert_not_called()
+        self.assertEqual(trend, expected)
+
+    def test_stale_trend_is_recomputed_once_per_day(self):
+        self._submit(60, days_ago=1)
+        MomentumSnapshot.objects.filter(user=self.user).update(trend_payload={'day': '2000-01-01'})
+
+        trend = get_momentum_snapshot(self._user())['trend']
+        self.assertEqual(trend, compute_momentum_from_tests(self._user())['trend'])
+        stored = MomentumSnapshot.objects.get(user=self.user).trend_payload
+        self.assertEqual(stored['day'], timezone.localdate().isoformat())
+        self.assertEqual(stored['seven_day'], trend.seven_day)
+
+    def test_rescoring_an_older_test_rebuilds(self):
+        first = self._submit(90, days_ago=5)
+        self._submit(60, days_ago=1)
+
+        Test.objects.filter(pk=first.pk).update(score=40)
+        record_test_submission(Test.objects.get(pk=first.pk))
+
+        snapshot = MomentumSnapshot.objects.get(user=self.user)
+        self.assertEqual(snapshot.total_tests, 2)
+        self.assertEqual(snapshot.best_score, 60)
+        self.assertEqual(get_momentum_snapshot(self._user()), compute_momentum_from_tests(self._user()))
+
+    def test_calculate_score_updates_snapshot(self):
+        question = Question.objects.create(
+            question_text='1 + 1?', pub_date=timezone.now(), category=self.math, custom_weight=40
+        )
+        choice = Choice.objects.create(question=question, choice_text='2', is_correct=True)
+        test = Test.objects.create(student=self.user)
+        test.categories.add(self.math)
+        Answer.objects.create(test=test, question=question, selected_choice=choice)
+
+        test.is_submitted = True
+        test.calculate_score()
+
+        snapshot = MomentumSnapshot.objects.get(user=self.user)
+        self.assertEqual(snapshot.total_tests, 1)
+        self.assertEqual(snapshot.best_test_id, test.pk)
+        self.assertEqual(snapshot.best_label, 'Matematika')
+
+    def test_deleting_test_discards_snapshot(self):
+        self._submit(70, days_ago=2)
+        latest = self._submit(90, days_ago=1)
+        latest.delete()
+
+        self.assertFalse(MomentumSnapshot.objects.filter(user=self.user).exists())
+        momentum = get_momentum_snapshot(self._user())
+        self.assertEqual(momentum['personal_best'].display_score, 70)
+
+    def test_rebuild_command_verifies_against_tests(self):
+        self._submit(55, days_ago=4)
+        self._submit(75, days_ago=1, category=self.physics)
+        MomentumSnapshot.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_momentum_snapshots', '--verify', stdout=out)
+
+        self.assertIn('0 siswa berbeda', out.getvalue())
+        self.assertEqual(MomentumSnapshot.objects.get(user=self.user).total_tests, 2)
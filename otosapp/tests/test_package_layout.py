@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from otosapp.models import Category, Question, Role, TryoutPackage, TryoutPackageCategory, User
+from otosapp.services.package_layout import get_package_layout
+
+
+class PackageLayoutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        role = Role.objects.create(role_name='Admin')
+        self.admin = User.objects.create_user(
+            email='layout@example.com',
+            username='layout@example.com',
+            password='testpass123',
+            role=role,
+        )
+        self.package = TryoutPackage.objects.create(package_name='Paket', total_time=60, created_by=self.admin)
+        self.categories = []
+        for order, count in enumerate((3, 2), start=1):
+            category = Category.objects.create(category_name=f'Subtes {order}')
+            for index in range(count):
+                Question.objects.create(question_text=f'S{order}-{index}', pub_date=timezone.now(), category=category)
+            TryoutPackageCategory.objects.create(
+                package=self.package, category=category, question_count=count, max_score=500, order=order
+            )
+            self.categories.append(category)
+
+    def _layout(self):
+        return get_package_layout(TryoutPackage.objects.get(pk=self.package.pk))
+
+    def test_layout_orders_questions_by_subtest(self):
+        layout = self._layout()
+        self.assertEqual(layout.total_questions, 5)
+        self.assertEqual(
+            [(s.category_id, s.start, s.count) for s in layout.subtests],
+            [(self.categories[0].id, 1, 3), (self.categories[1].id, 4, 2)],
+        )
+        second_subtest_first = Question.objects.filter(category=self.categories[1]).order_by('id').first()
+        self.assertEqual(layout.question_id_at(4), second_subtest_first.id)
+        self.assertIsNone(layout.question_id_at(6))
+        self.assertEqual(layout.numbers_for([second_subtest_first.id]), [4])
+
+    def test_layout_is_served_from_cache(self):
+        self._layout()
+        package = TryoutPackage.objects.get(pk=self.package.pk)
+        with self.assertNumQueries(0):
+            get_package_layout(package)
+
+    def test_new_question_invalidates_layout(self):
+        self.assertEqual(self._layout().total_questions, 5)
+        Question.objects.create(question_text='Baru', pub_date=timezone.now(), category=self.categories[0])
+        layout = self._layout()
+        self.assertEqual(layout.total_questions, 6)
+        self.assertEqual(layout.subtests[1].start, 5)
+
+    def test_removing_subtest_invalidates_layout(self):
+        self.assertEqual(self._layout().total_questions, 5)
+        TryoutPackageCategory.objects.filter(category=self.categories[1]).first().delete()
+        self.assertEqual(self._layout().total_questions, 3)
+
+    def test_stale_package_save_does_not_roll_the_version_back(self):
+        stale = TryoutPackage.objects.get(pk=self.package.pk)
+        Question.objects.create(question_text='Baru 1', pub_date=timezone.now(), category=self.categories[0])
+        self.assertEqual(self._layout().total_questions, 6)
+        Question.objects.create(question_text='Baru 2', pub_date=timezone.now(), category=self.categories[0])
+
+        # Form edit paket memegang instance dari sebelum kedua soal ditambahkan
+        stale.package_name = 'Paket baru'
+        stale.save()
+
+        self.assertEqual(TryoutPackage.objects.get(pk=self.package.pk).package_name, 'Paket baru')
+        # Versi lama + 1 akan menunjuk ke layout 6 soal yang masih di cache
+        self.assertEqual(self._layout().total_questions, 7)
@@ -0,0 +1,141 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from otosapp.models import PaymentProof, Role, SubscriptionPackage, User
+from otosapp.services import sales_report
+from otosapp.services.sales_report import build_sales_report, get_sales_report, resolve_period
+
+
+class SalesReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student_role = Role.objects.create(role_name='Student')
+        self.basic = SubscriptionPackage.objects.create(
+            name='Basic', description='Paket', features='Dasar', price=Decimal('100000'), duration_days=30
+        )
+        self.premium = SubscriptionPackage.objects.create(
+            name='Premium', description='Paket', features='Semua', price=Decimal('250000'), duration_days=30
+        )
+        self.counter = 0
+
+    def _user(self, role=None):
+        self.counter += 1
+        return User.objects.create_user(
+            email=f'buyer{self.counter}@example.com', username=f'buyer{self.counter}@example.com',
+            password='testpass123', role=role or self.student_role,
+        )
+
+    def _payment(self, user, package, amount, method='Transfer', status='pending'):
+        return PaymentProof.objects.create(
+            user=user, package=package, proof_image='payment_proofs/bukti.png', payment_method=method,
+            payment_date=timezone.now(), amount_paid=Decimal(amount), status=status,
+        )
+
+    def _approve(self, payment, days_ago=0, minutes=30):
+        created_at = timezone.now() - timedelta(days=days_ago, minutes=minutes)
+        PaymentProof.objects.filter(pk=payment.pk).update(created_at=created_at)
+        payment.refresh_from_db()
+        payment.status = 'approved'
+        payment.verified_at = created_at + timedelta(minutes=minutes)
+        payment.save()
+        return payment
+
+    def test_report_sections_from_grouped_extract(self):
+        alice, bob = self._user(), self._user()
+        self._approve(self._payment(alice, self.basic, '100000'), days_ago=0, minutes=30)
+        self._approve(self._payment(alice, self.premium, '250000', method='QRIS'), days_ago=1, minutes=90)
+        self._approve(self._payment(bob, self.premium, '250000'), days_ago=3, minutes=60)
+        self._approve(self._payment(bob, self.basic, '80000'), days_ago=45)
+        self._payment(self._user(), self.basic, '100000')
+
+        sales = build_sales_report(resolve_period('30d'))
+        report = sales['report']
+
+        self.assertEqual(report['total_revenue'], 600000.0)
+        self.assertEqual(report['total_orders'], 3)
+        self.assertEqual(report['unique_customers'], 2)
+        self.assertEqual(report['repeat_purchase_rate'], 33.33)
+        self.assertEqual(report['max_order_value'], 250000.0)
+        self.assertEqual(report['min_order_value'], 100000.0)
+        self.assertEqual(report['pending_orders'], 1)
+        self.assertEqual(report['growth']['previous_orders'], 1)
+        self.assertEqual(report['range_days'], 30)
+        self.assertEqual(report['processing']['avg_minutes'], 60.0)
+        self.assertEqual(report['processing']['fastest_display'], '30m')
+        self.assertEqual(report['processing']['slowest_display'], '1j 30m')
+
+        self.assertEqual([entry['orders'] for entry in sales['daily_series']], [1, 1, 1])
+        self.assertEqual(sales['package_breakdown'][0]['package_name'], 'Premium')
+        self.assertEqual(sales['package_breakdown'][0]['revenue'], 500000.0)
+        self.assertEqual(
+            {entry['label']: entry['count'] for entry in sales['payment_methods']}, {'Transfer': 2, 'QRIS': 1}
+        )
+        self.assertEqual(sales['top_customers'][0]['email'], alice.email)
+        self.assertEqual(len(sales['recent_payments']), 3)
+
+    def test_approval_invalidates_reports_cached_by_other_processes(self):
+        buyer = self._user()
+        period = resolve_period('7d')
+        stale = get_sales_report(period)
+        old_key = sales_report._cache_key(period)
+
+        self._approve(self._payment(buyer, self.basic, '100000'))
+        # Proses lain masih memegang laporan dari versi sebelum approval
+        cache.set(old_key, stale)
+
+        self.assertEqual(get_sales_report(period)['report']['total_orders'], 1)
+
+    def test_cached_report_is_reused_until_a_payment_is_verified(self):
+        buyer = self._user()
+        self._approve(self._payment(buyer, self.basic, '100000'))
+        period = resolve_period('7d')
+
+        self.assertEqual(get_sales_report(period)['report']['total_orders'], 1)
+        # Hanya lookup versi di counter bersama
+        with self.assertNumQueries(1):
+            get_sales_report(resolve_period('7d'))
+
+        pending = self._payment(buyer, self.premium, '250000')
+        self.assertEqual(get_sales_report(period)['report']['pending_orders'], 0)
+
+        self._approve(pending)
+        self.assertEqual(get_sales_report(period)['report']['total_orders'], 2)
+
+        pending = self._payment(buyer, self.basic, '100000')
+        get_sales_report(period)
+        pending.status = 'rejected'
+        pending.save()
+        statuses = {entry['status'] for entry in get_sales_report(period)['status_breakdown']}
+        self.assertIn('rejected', statuses)
+
+    def test_custom_period_normalises_reversed_dates(self):
+        today = timezone.localdate()
+        period = resolve_period(
+            'custom', today.isoformat(), (today - timedelta(days=4)).isoformat()
+        )
+        self.assertEqual(period.start_date, today - timedelta(days=4))
+        self.assertEqual(period.end_date, today)
+        self.assertEqual(period.range_days, 5)
+        self.assertEqual(resolve_period('unknown').key, '30d')
+
+    def test_admin_page_and_csv_export(self):
+        self.client.force_login(self._user(Role.objects.create(role_name='Admin')))
+        self._approve(self._payment(self._user(), self.premium, '250000', method='QRIS'))
+
+        response = self.client.get(reverse('admin_sales_report'), {'period': '7d'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['report']['total_orders'], 1)
+        self.assertContains(response, 'Unduh CSV')
+
+        response = self.client.get(reverse('admin_sales_report_export'), {'period': '7d'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('laporan-penjualan-', response['Content-Disposition'])
+        content = response.content.decode()
+        self.assertIn('Total Pendapatan,250000.0', content)
+        self.assertIn('QRIS,1,250000.0,250000.0', content)
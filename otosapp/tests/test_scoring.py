@@ -0,0 +1,274 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from otosapp.models import (
+    Answer,
+    Category,
+    Choice,
+    Question,
+    Role,
+    Test,
+    TestCategoryScore,
+    TryoutPackage,
+    TryoutPackageCategory,
+    User,
+)
+from otosapp.services.scoring import SCORING_VERSION
+
+
+class ScoringFixtureMixin:
+    def setUp(self):
+        self.student_role = Role.objects.create(role_name='Student')
+        self.student = User.objects.create_user(
+            email='scoring@example.com',
+            username='scoring@example.com',
+            password='testpass123',
+            role=self.student_role,
+        )
+
+    def _make_category(self, name, scoring_method='default', question_count=4):
+        category = Category.objects.create(category_name=name, scoring_method=scoring_method)
+        questions = []
+        for index in range(question_count):
+            question = Question.objects.create(
+                question_text=f'{name} soal {index + 1}',
+                pub_date=timezone.now(),
+                category=category,
+                custom_weight=10 * (index + 1),
+                difficulty_coefficient=0.5 + index * 0.25,
+            )
+            Choice.objects.create(question=question, choice_text='Benar', is_correct=True)
+            Choice.objects.create(question=question, choice_text='Salah', is_correct=False)
+            questions.append(question)
+        return category, questions
+
+    def _answer(self, test, question, correct):
+        choice = question.choices.get(is_correct=correct)
+        return Answer.objects.create(test=test, question=question, selected_choice=choice)
+
+
+class ScoringEngineTests(ScoringFixtureMixin, TestCase):
+    def _single_category_test(self, scoring_method):
+        category, questions = self._make_category('Kategori', scoring_method)
+        test = Test.objects.create(student=self.student)
+        test.categories.add(category)
+        self._answer(test, questions[0], True)
+        self._answer(test, questions[1], False)
+        self._answer(test, questions[2], True)
+        return test
+
+    def test_default_scoring(self):
+        test = self._single_category_test('default')
+        test.calculate_score()
+        self.assertAlmostEqual(test.score, 2 / 3 * 100)
+
+    def test_custom_scoring_sums_weights_of_correct_answers(self):
+        test = self._single_category_test('custom')
+        test.calculate_score()
+        self.assertAlmostEqual(test.score, 10 + 30)
+
+    def test_utbk_scoring_normalizes_to_thousand(self):
+        test = self._single_category_test('utbk')
+        test.calculate_score()
+        self.assertAlmostEqual(test.score, (0.5 + 1.0) / (0.5 + 0.75 + 1.0) * 1000)
+
+    def test_essay_answers_are_matched_case_insensitively(self):
+        category = Category.objects.create(category_name='Isian', scoring_method='default')
+        question = Question.objects.create(
+            question_text='Ibu kota Indonesia?',
+            pub_date=timezone.now(),
+            category=category,
+            question_type='essay',
+            correct_answer_text='Jakarta, DKI Jakarta',
+        )
+        test = Test.objects.create(student=self.student)
+        test.categories.add(category)
+        Answer.objects.create(test=test, question=question, text_answer='  jakarta ')
+
+        test.calculate_score()
+        self.assertEqual(test.score, 100)
+
+    def test_no_answers_scores_zero(self):
+        test = Test.objects.create(student=self.student, score=55)
+        test.calculate_score()
+        test.refresh_from_db()
+        self.assertEqual(test.score, 0)
+
+    def test_package_scoring_uses_constant_queries(self):
+        package = TryoutPackage.objects.create(package_name='UTBK Lengkap', total_time=195, created_by=self.student)
+        test = Test.objects.create(student=self.student, tryout_package=package)
+        expected = 0
+        for order in range(7):
+            category, questions = self._make_category(f'Subtes {order + 1}', 'utbk')
+            TryoutPackageCategory.objects.create(
+                package=package, category=category, question_count=len(questions), max_score=1000, order=order + 1
+            )
+            test.categories.add(category)
+            correct = order % len(questions) + 1
+            for index, question in enumerate(questions):
+                self._answer(test, question, index < correct)
+            expected += correct / len(questions) * 1000
+
+        test = Test.objects.get(pk=test.pk)
+        # answers + package layout + UPDATE, independent of answers or subtests
+        with self.assertNumQueries(3):
+            result = test.calculate_score()
+
+        self.assertAlmostEqual(test.score, expected)
+        self.assertEqual(len(result.package_categories), 7)
+
+
+class CategoryScoreBreakdownTests(ScoringFixtureMixin, TestCase):
+    def _package_test(self):
+        package = TryoutPackage.objects.create(package_name='Paket Mini', total_time=60, created_by=self.student)
+        test = Test.objects.create(student=self.student, tryout_package=package)
+        self.categories = []
+        for order, max_score in enumerate((600, 400), start=1):
+            category, questions = self._make_category(f'Subtes {order}', 'utbk', question_count=2)
+            TryoutPackageCategory.objects.create(
+                package=package, category=category, question_count=2, max_score=max_score, order=order
+            )
+            test.categories.add(category)
+            self.categories.append((category, questions))
+        first_category, first_questions = self.categories[0]
+        self._answer(test, first_questions[0], True)
+        self._answer(test, first_questions[1], False)
+        return test
+
+    def test_submitting_writes_category_rows(self):
+        test = self._package_test()
+        test.is_submitted = True
+        test.calculate_score()
+
+        rows = {row.category_id: row for row in TestCategoryScore.objects.filter(test=test)}
+        first, second = self.categories[0][0], self.categories[1][0]
+        self.assertEqual(rows[first.id].correct, 1)
+        self.assertEqual(rows[first.id].answered, 2)
+        self.assertAlmostEqual(rows[first.id].contribution, 300)
+        self.assertEqual(rows[second.id].answered, 0)
+        self.assertEqual(rows[second.id].contribution, 0)
+
+        breakdown = test.get_package_score_breakdown()
+        self.assertEqual(len(breakdown), 1)
+        self.assertEqual(breakdown[0]['category_name'], first.category_name)
+        self.assertEqual(breakdown[0]['achieved_score'], 300)
+
+        stats = first.get_test_statistics()
+        self.assertEqual(stats['average_score'], 300)
+        self.assertEqual(second.get_test_statistics()['average_score'], 0)
+
+    def test_backfill_command_fills_missing_rows(self):
+        test = self._package_test()
+        Test.objects.filter(pk=test.pk).update(is_submitted=True, score=300)
+
+        call_command('backfill_category_scores', stdout=StringIO())
+
+        self.assertEqual(TestCategoryScore.objects.filter(test=test).count(), 2)
+        test.refresh_from_db()
+        self.assertEqual(test.score, 300)
+
+
+class ScoringVersionTests(ScoringFixtureMixin, TestCase):
+    def _submitted_test(self):
+        category, questions = self._make_category('Kategori', 'custom', question_count=2)
+        test = Test.objects.create(student=self.student, is_submitted=True)
+        test.categories.add(category)
+        self._answer(test, questions[0], True)
+        self._answer(test, questions[1], True)
+        test.calculate_score()
+        return test, questions
+
+    def test_calculate_score_stamps_version(self):
+        test, _ = self._submitted_test()
+        test.refresh_from_db()
+        self.assertEqual(test.scoring_version, SCORING_VERSION)
+        self.assertIsNotNone(test.scored_at)
+        self.assertFalse(test.needs_rescore)
+
+    def test_changing_weight_marks_test_stale_until_rescored(self):
+        test, questions = self._submitted_test()
+        self.assertEqual(test.score, 30)
+
+        questions[1].custom_weight = 50
+        questions[1].save()
+        test.refresh_from_db()
+        self.assertTrue(test.needs_rescore)
+        self.assertEqual(test.score, 30)
+
+        call_command('rescore_tests', stdout=StringIO())
+        test.refresh_from_db()
+        self.assertFalse(test.needs_rescore)
+        self.assertEqual(test.score, 60)
+
+    def test_unrelated_edit_keeps_stamp(self):
+        test, questions = self._submitted_test()
+        questions[0].explanation = 'Pembahasan baru'
+        questions[0].save()
+        test.refresh_from_db()
+        self.assertFalse(test.needs_rescore)
+
+    def test_recreating_choices_in_the_edit_view_marks_test_stale(self):
+        test, questions = self._submitted_test()
+        teacher = User.objects.create_user(
+            email='guru@example.com', username='guru@example.com', password='testpass123',
+            role=Role.objects.create(role_name='Teacher'),
+        )
+        question = questions[1]
+        # Nilai yang sama dengan yang dikirim form, agar hanya pilihan jawaban yang berubah
+        Question.objects.filter(pk=question.pk).update(correct_answer_text='')
+        question.category.created_by = teacher
+        question.category.save()
+        self.client.force_login(teacher)
+
+        # Kunci jawaban dipindah ke pilihan B; view menghapus lalu membuat ulang semua pilihan
+        response = self.client.post(reverse('teacher_question_update', args=[question.pk]), {
+            'question_text': question.question_text,
+            'question_type': 'multiple_choice',
+            'category': question.category_id,
+            'custom_weight': question.custom_weight,
+            'correct_answer_text': '',
+            'explanation': '',
+            'choices-TOTAL_FORMS': '2',
+            'choices-INITIAL_FORMS': '0',
+            'choices-MIN_NUM_FORMS': '0',
+            'choices-MAX_NUM_FORMS': '5',
+            'choices-0-choice_text': 'Benar',
+            'choices-1-choice_text': 'Salah',
+            'choices-1-is_correct': 'on',
+        })
+
+        self.assertRedirects(response, reverse('teacher_question_list', args=[question.category_id]))
+        self.assertEqual(
+            list(question.choices.order_by('pk').values_list('choice_text', 'is_correct')[:2]),
+            [('Benar', False), ('Salah', True)],
+        )
+        test.refresh_from_db()
+        self.assertTrue(test.needs_rescore)
+
+    def test_deleting_a_question_marks_test_stale(self):
+        test, questions = self._submitted_test()
+        questions[0].delete()
+        test.refresh_from_db()
+        self.assertTrue(test.needs_rescore)
+
+    def test_adding_or_removing_a_subtest_marks_package_tests_stale(self):
+        package = TryoutPackage.objects.create(package_name='UTBK', total_time=60, created_by=self.student)
+        test = Test.objects.create(student=self.student, tryout_package=package, is_submitted=True)
+        category, questions = self._make_category('Subtes 1', 'utbk', question_count=1)
+        self._answer(test, questions[0], True)
+        test.calculate_score()
+
+        subtest = TryoutPackageCategory.objects.create(
+            package=package, category=category, question_count=1, max_score=1000, order=1
+        )
+        test.refresh_from_db()
+        self.assertTrue(test.needs_rescore)
+
+        test.calculate_score()
+        subtest.delete()
+        test.refresh_from_db()
+        self.assertTrue(test.needs_rescore)
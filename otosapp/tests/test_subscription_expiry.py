@@ -0,0 +1,126 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from otosapp.models import AccessLevel, Role, SubscriptionPackage, TaskLock, User, UserSubscription
+from otosapp.services import subscription_expiry
+from otosapp.services.subscription_expiry import expire_user_subscription_if_due, sweep_expired_subscriptions
+
+
+class SubscriptionExpiryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student_role = Role.objects.create(role_name='Student')
+        self.visitor_role = Role.objects.create(role_name='Visitor')
+        self.package = SubscriptionPackage.objects.create(
+            name='Silver', description='Paket silver', price=50000, duration_days=30, access_level=AccessLevel.SILVER,
+        )
+
+    def _subscriber(self, name, days_left):
+        user = User.objects.create_user(
+            email=f'{name}@example.com', username=f'{name}@example.com', password='testpass123', role=self.student_role,
+        )
+        UserSubscription.objects.create(user=user, package=self.package, end_date=timezone.now() + timedelta(days=days_left))
+        return user
+
+    def test_sweep_expires_overdue_subscriptions_in_bulk(self):
+        expired = [self._subscriber(f'lewat{index}', -1) for index in range(3)]
+        current = self._subscriber('aktif', 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = sweep_expired_subscriptions()
+
+        self.assertEqual((result.expired_subscriptions, result.downgraded_users), (3, 3))
+        self.assertFalse(UserSubscription.objects.filter(user__in=expired, is_active=True).exists())
+        self.assertTrue(all(
+            sub.auto_downgrade_processed for sub in UserSubscription.objects.filter(user__in=expired)
+        ))
+        self.assertEqual(set(User.objects.filter(role=self.visitor_role)), set(expired))
+        self.assertTrue(User.objects.get(pk=current.pk).has_active_subscription())
+        lock = TaskLock.objects.get(name=subscription_expiry.LOCK_NAME)
+        self.assertEqual((lock.holder, lock.last_result['expired_subscriptions']), ('', 3))
+
+        # Run berikutnya tidak menemukan apa pun lagi
+        self.assertEqual(sweep_expired_subscriptions().expired_subscriptions, 0)
+
+    def test_query_count_does_not_grow_with_expired_rows(self):
+        def sweep_queries(count):
+            for index in range(count):
+                self._subscriber(f'u{count}_{index}', -1)
+            with CaptureQueriesContext(connection) as queries:
+                sweep_expired_subscriptions()
+            return len(queries)
+
+        sweep_expired_subscriptions()
+        self.assertEqual(sweep_queries(2), sweep_queries(8))
+
+    def test_concurrent_run_is_skipped_while_locked(self):
+        self._subscriber('lewat', -1)
+        TaskLock.objects.create(
+            name=subscription_expiry.LOCK_NAME, holder='lain', locked_until=timezone.now() + timedelta(minutes=5),
+        )
+
+        result = sweep_expired_subscriptions()
+
+        self.assertTrue(result.skipped)
+        self.assertTrue(UserSubscription.objects.get().is_active)
+
+        # Lease yang kedaluwarsa (pemegangnya mati) boleh diambil alih
+        TaskLock.objects.filter(name=subscription_expiry.LOCK_NAME).update(locked_until=timezone.now())
+        self.assertEqual(sweep_expired_subscriptions().expired_subscriptions, 1)
+
+    @override_settings(CRON_SECRET='rahasia')
+    def test_vercel_cron_runs_the_sweeper(self):
+        expired = self._subscriber('lewat', -1)
+        url = reverse('cron_run_command', args=['expire-subscriptions'])
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer rahasia')
+
+        self.assertIn('1 langganan berakhir', response.json()['output'])
+        self.assertEqual(User.objects.get(pk=expired.pk).role, self.visitor_role)
+
+    def test_dry_run_changes_nothing(self):
+        self._subscriber('lewat', -1)
+
+        out = StringIO()
+        call_command('expire_subscriptions', '--dry-run', stdout=out)
+
+        self.assertIn('1 langganan berakhir', out.getvalue())
+        self.assertIn('(dry run)', out.getvalue())
+        self.assertTrue(UserSubscription.objects.get().is_active)
+        self.assertIsNone(TaskLock.objects.get(name=subscription_expiry.LOCK_NAME).locked_until)
+
+    def test_lazy_check_only_touches_own_subscription(self):
+        user = self._subscriber('saya', -1)
+        other = self._subscriber('lain', -1)
+        fresh = User.objects.get(pk=user.pk)
+
+        self.assertTrue(expire_user_subscription_if_due(fresh))
+
+        self.assertTrue(fresh.is_visitor())
+        self.assertEqual(fresh.get_access_level(), AccessLevel.VISITOR)
+        self.assertTrue(UserSubscription.objects.get(user=other).is_active)
+
+        active = User.objects.get(pk=self._subscriber('aktif', 3).pk)
+        active.access_profile
+        with self.assertNumQueries(0):
+            self.assertFalse(expire_user_subscription_if_due(active))
+
+    def test_home_downgrades_only_the_current_user(self):
+        user = self._subscriber('saya', -1)
+        other = self._subscriber('lain', -1)
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('home'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(User.objects.get(pk=user.pk).role, self.visitor_role)
+        self.assertEqual(User.objects.get(pk=other.pk).role, self.student_role)
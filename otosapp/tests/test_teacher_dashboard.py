@@ -0,0 +1,141 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from otosapp.models import Answer, Category, Choice, Question, Role, Test, TestCategoryScore, TryoutPackage, User
+from otosapp.services.teacher_dashboard import teacher_pass_summary, teacher_score_stats
+
+
+class TeacherDashboardChartTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='guru@example.com', username='guru@example.com', password='testpass123',
+            role=Role.objects.create(role_name='Teacher'),
+        )
+        self.student_role = Role.objects.create(role_name='Student')
+        self.student = User.objects.create_user(
+            email='murid@example.com', username='murid@example.com', password='testpass123', role=self.student_role
+        )
+
+    def _category(self, name):
+        return Category.objects.create(category_name=name, created_by=self.teacher)
+
+    def _scored(self, category, contribution, days_ago=0, package=None, answered=1):
+        test = Test.objects.create(student=self.student, is_submitted=True, score=contribution, tryout_package=package)
+        test.categories.add(category)
+        Test.objects.filter(pk=test.pk).update(date_taken=timezone.now() - timedelta(days=days_ago))
+        TestCategoryScore.objects.create(
+            test=test, category=category, answered=answered, contribution=contribution,
+            max_score=1000 if package else None,
+        )
+        return test
+
+    def test_daily_and_monthly_averages(self):
+        math, physics = self._category('Matematika'), self._category('Fisika')
+        self._scored(math, 60, days_ago=0)
+        self._scored(math, 80, days_ago=0)
+        self._scored(physics, 50, days_ago=1)
+        package = TryoutPackage.objects.create(package_name='Paket', total_time=60, created_by=self.teacher)
+        # Package subtests without answers are left out of the averages
+        self._scored(physics, 0, days_ago=0, package=package, answered=0)
+
+        stats = teacher_score_stats([(math.id, 'Matematika'), (physics.id, 'Fisika')])
+
+        chart = stats['scores_7d_chart']
+        self.assertEqual(len(chart['categories']), 7)
+        self.assertEqual([series['name'] for series in chart['series']], ['Matematika', 'Fisika'])
+        self.assertEqual(chart['series'][0]['data'][-1], 70.0)
+        self.assertEqual(chart['series'][1]['data'][-2:], [50.0, 0])
+        self.assertEqual(stats['daily_summary'][-1]['total_score'], 70.0)
+        self.assertEqual(stats['growth_percent'], 40.0)
+
+        monthly = stats['scores_180d_chart']
+        self.assertEqual(len(monthly['categories']), 6)
+        self.assertEqual(monthly['categories'][-1], timezone.localdate().strftime('%b %Y'))
+        this_month = [series['data'][-1] for series in monthly['series']]
+        today = timezone.localdate()
+        if (today - timedelta(days=1)).month == today.month:
+            self.assertEqual(this_month, [70.0, 50.0])
+
+    def test_query_count_does_not_depend_on_categories(self):
+        categories = []
+        for index in range(5):
+            category = self._category(f'Kategori {index}')
+            self._scored(category, 10 * index, days_ago=index * 20)
+            categories.append((category.id, category.category_name))
+
+        with self.assertNumQueries(1):
+            teacher_score_stats(categories)
+
+    def test_home_renders_teacher_stats_in_bounded_queries(self):
+        self.client.force_login(self.teacher)
+
+        def home_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('home'))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('teacher_stats', response.context)
+            return len(queries)
+
+        self._scored(self._category('Kategori 0'), 40)
+        home_queries()  # first request creates the default Visitor role
+        baseline = home_queries()
+        for index in range(1, 4):
+            self._category(f'Kategori {index}')
+        self.assertEqual(home_queries(), baseline)
+
+
+class TeacherPassSummaryTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            email='guru@example.com', username='guru@example.com', password='testpass123',
+            role=Role.objects.create(role_name='Teacher'),
+        )
+        self.student_role = Role.objects.create(role_name='Student')
+        self.category = Category.objects.create(category_name='Biologi', created_by=self.teacher, passing_score=70)
+        self.question = Question.objects.create(question_text='Sel?', pub_date=timezone.now(), category=self.category)
+        self.choice = Choice.objects.create(question=self.question, choice_text='Ya', is_correct=True)
+
+    def _student(self, name):
+        return User.objects.create_user(
+            email=f'{name}@example.com', username=f'{name}@example.com', password='testpass123', role=self.student_role
+        )
+
+    def _test(self, student, score, days_ago=0, answered=True, package=None):
+        test = Test.objects.create(student=student, is_submitted=True, score=score, tryout_package=package)
+        test.categories.add(self.category)
+        Test.objects.filter(pk=test.pk).update(date_taken=timezone.now() - timedelta(days=days_ago))
+        if answered:
+            Answer.objects.create(test=test, question=self.question, selected_choice=self.choice)
+        return Test.objects.get(pk=test.pk)
+
+    def test_latest_test_decides_and_matches_is_passed(self):
+        improved, slipped, silent, packaged = (self._student(name) for name in ('naik', 'turun', 'kosong', 'paket'))
+        package = TryoutPackage.objects.create(package_name='Paket', total_time=60, created_by=self.teacher)
+        self._test(improved, 40, days_ago=5)
+        self._test(slipped, 95, days_ago=5)
+        latest = [
+            self._test(improved, 90, days_ago=1),
+            self._test(slipped, 50, days_ago=1),
+            self._test(silent, 100, answered=False),
+            self._test(packaged, 4500, package=package),
+        ]
+
+        with self.assertNumQueries(1):
+            summary = teacher_pass_summary([self.category.id])
+
+        expected_passed = sum(1 for test in latest if test.is_passed())
+        self.assertEqual(expected_passed, 2)
+        self.assertEqual(summary, {
+            'tested_count': 4,
+            'passed_count': 2,
+            'failed_count': 2,
+            'pass_rate': 50.0,
+        })
+
+    def test_no_categories(self):
+        self.assertEqual(teacher_pass_summary([])['tested_count'], 0)
@@ -0,0 +1,199 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from otosapp.models import Message, MessageThread, Role, ThreadBroadcastJob, User
+from otosapp.services import thread_broadcast
+from otosapp.services.inbox_badges import unread_message_count
+from otosapp.services.thread_broadcast import (
+    BroadcastPayload, claim_job, process_pending_jobs, retry_job, run_job, send_broadcast,
+)
+from otosapp.services.thread_search import search_threads
+from otosapp.tests.mixins import UserFixtureMixin
+
+
+class ThreadBroadcastTests(UserFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student_role = Role.objects.create(role_name='Student')
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin@example.com', password='testpass123',
+            role=Role.objects.create(role_name='Admin'),
+        )
+        self.payload = BroadcastPayload(
+            title='Jadwal Tryout', thread_type='info', priority='normal', content='Tryout akbar dimulai Sabtu.',
+        )
+
+    def _students(self, count, prefix='siswa'):
+        return [
+            User.objects.create_user(
+                email=f'{prefix}{index}@example.com', username=f'{prefix}{index}@example.com',
+                password='testpass123', role=self.student_role,
+            )
+            for index in range(count)
+        ]
+
+    def test_fan_out_creates_threads_with_read_state_and_search_documents(self):
+        students = self._students(3)
+        student = self._fresh(students[0])
+        self.assertEqual(unread_message_count(student), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            send_broadcast(self.admin, [student.pk for student in students], self.payload)
+
+        threads = MessageThread.objects.filter(title='Jadwal Tryout')
+        self.assertEqual(threads.count(), 3)
+        self.assertEqual(Message.objects.filter(thread__in=threads, sender=self.admin).count(), 3)
+        thread = threads.get(student=student)
+        self.assertEqual((thread.teacher_or_admin, thread.last_activity.date()), (self.admin, thread.created_at.date()))
+        self.assertEqual(thread.get_unread_count_for_user(student), 1)
+        self.assertEqual(thread.get_unread_count_for_user(self.admin), 0)
+        # Counter yang sudah di-cache ikut dibatalkan
+        self.assertEqual(unread_message_count(student), 1)
+        self.assertEqual([pk for pk, _ in search_threads(student, 'akbar')], [thread.pk])
+
+    def test_query_count_depends_on_chunks_not_students(self):
+        def fan_out_queries(count, prefix):
+            ids = [student.pk for student in self._students(count, prefix)]
+            with CaptureQueriesContext(connection) as queries:
+                send_broadcast(self.admin, ids, self.payload, chunk_size=50)
+            return len(queries)
+
+        self.assertEqual(fan_out_queries(2, 'a'), fan_out_queries(12, 'b'))
+
+    @override_settings(THREAD_BROADCAST_INLINE_LIMIT=2)
+    def test_large_audience_is_queued_and_sent_by_the_runner(self):
+        students = self._students(3)
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin_broadcast_message_thread'), {
+            'title': 'Jadwal Tryout',
+            'thread_type': 'info',
+            'priority': 'normal',
+            'content': 'Tryout akbar dimulai Sabtu.',
+            'students': [str(student.pk) for student in students],
+        })
+
+        job = ThreadBroadcastJob.objects.get()
+        self.assertRedirects(response, f"{reverse('admin_broadcast_message_thread')}?job={job.pk}")
+        self.assertFalse(MessageThread.objects.exists())
+        progress_url = reverse('message_api_broadcast_job', args=[job.pk])
+        self.assertEqual(self.client.get(progress_url).json()['status'], 'pending')
+
+        out = StringIO()
+        call_command('process_broadcast_jobs', stdout=out)
+
+        self.assertIn('1 job terkirim', out.getvalue())
+        self.assertEqual(MessageThread.objects.filter(student__in=students).count(), 3)
+        progress = self.client.get(progress_url).json()
+        self.assertEqual((progress['status'], progress['processed'], progress['percent']), ('completed', 3, 100))
+
+    def _job(self, students, **kwargs):
+        return ThreadBroadcastJob.objects.create(
+            created_by=self.admin, title='Jadwal Tryout', thread_type='info', content='Isi',
+            student_ids=[student.pk for student in students], total_count=len(students), **kwargs
+        )
+
+    def test_interrupted_job_resumes_after_the_last_committed_chunk(self):
+        students = self._students(5)
+        job = self._job(students, processed_count=2, status='running', heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        self.assertTrue(claim_job(job.pk, 'runner'))
+        run_job(job, 'runner', chunk_size=2)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_count), ('completed', 5))
+        self.assertEqual(
+            set(MessageThread.objects.values_list('student_id', flat=True)), {student.pk for student in students[2:]}
+        )
+
+    def test_failed_job_keeps_progress_and_error(self):
+        students = self._students(3)
+        job = ThreadBroadcastJob.objects.create(
+            created_by=self.admin, title='Jadwal Tryout', thread_type='info', content='Isi',
+            student_ids=[student.pk for student in students] + [999999], total_count=4,
+        )
+        fan_out = thread_broadcast._fan_out_chunk
+
+        def fail_on_second_chunk(sender_id, student_ids, *args):
+            if students[1].pk in student_ids:
+                raise RuntimeError('database sibuk')
+            fan_out(sender_id, student_ids, *args)
+
+        claim_job(job.pk, 'runner')
+        with mock.patch.object(thread_broadcast, '_fan_out_chunk', side_effect=fail_on_second_chunk), \
+                self.assertLogs('otosapp.services.thread_broadcast', 'ERROR'):
+            run_job(job, 'runner', chunk_size=1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_count, job.error), ('failed', 1, 'database sibuk'))
+
+        # Job gagal tidak diambil otomatis; setelah diantrekan ulang ia melanjutkan dari chunk terakhir
+        self.assertEqual(process_pending_jobs().processed_jobs, [])
+        self.assertTrue(retry_job(job))
+        self.assertEqual(process_pending_jobs().processed_jobs, [job.pk])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_count, job.error), ('completed', 4, ''))
+        # Siswa yang sudah tidak ada dilewati
+        self.assertEqual(MessageThread.objects.count(), 3)
+
+    def test_job_held_by_a_live_runner_is_not_taken(self):
+        students = self._students(2)
+        job = self._job(students, status='running', claimed_by='lain', heartbeat_at=timezone.now())
+
+        self.assertEqual(process_pending_jobs().processed_jobs, [])
+        self.assertFalse(MessageThread.objects.exists())
+
+        # Heartbeat kedaluwarsa: runner lain dianggap mati dan job diambil alih
+        ThreadBroadcastJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(process_pending_jobs().processed_jobs, [job.pk])
+        self.assertEqual(MessageThread.objects.count(), 2)
+
+    def test_runner_that_lost_its_claim_rolls_back_its_chunk(self):
+        students = self._students(3)
+        job = self._job(students)
+        fan_out = thread_broadcast._fan_out_chunk
+
+        def taken_over_after_first_chunk(sender_id, student_ids, *args):
+            fan_out(sender_id, student_ids, *args)
+            ThreadBroadcastJob.objects.filter(pk=job.pk).update(claimed_by='lain')
+
+        claim_job(job.pk, 'runner')
+        with mock.patch.object(thread_broadcast, '_fan_out_chunk', side_effect=taken_over_after_first_chunk), \
+                self.assertLogs('otosapp.services.thread_broadcast', 'WARNING'):
+            run_job(job, 'runner', chunk_size=1)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.claimed_by, job.processed_count), ('running', 'lain', 1))
+        self.assertEqual(MessageThread.objects.count(), 1)
+
+    def test_progress_is_private_to_the_job_owner(self):
+        job = ThreadBroadcastJob.objects.create(created_by=self.admin, title='T', content='Isi')
+        student = self._students(1)[0]
+        self.client.force_login(student)
+        self.assertEqual(self.client.get(reverse('message_api_broadcast_job', args=[job.pk])).status_code, 403)
+
+    @override_settings(CRON_SECRET='rahasia')
+    def test_vercel_cron_runs_queued_jobs(self):
+        students = self._students(2)
+        self._job(students)
+        url = reverse('cron_run_command', args=['process-broadcast-jobs'])
+
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer salah').status_code, 401)
+        self.assertFalse(MessageThread.objects.exists())
+
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer rahasia')
+
+        self.assertIn('1 job terkirim', response.json()['output'])
+        self.assertEqual(MessageThread.objects.filter(student__in=students).count(), 2)
+        unknown = reverse('cron_run_command', args=['hapus-semua'])
+        self.assertEqual(self.client.get(unknown, HTTP_AUTHORIZATION='Bearer rahasia').status_code, 404)
+        with override_settings(CRON_SECRET=''):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer ').status_code, 404)
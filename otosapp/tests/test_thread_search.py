@@ -0,0 +1,100 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from otosapp.models import Message, MessageThread, ThreadSearchDocument, User
+from otosapp.services.thread_search import search_terms, search_threads
+from otosapp.tests.mixins import UserFixtureMixin
+
+
+class ThreadSearchTests(UserFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = self._user('murid', 'Student')
+        self.other_student = self._user('murid2', 'Student')
+        self.operator = self._user('operator', 'Operator')
+        self.login = MessageThread.objects.create(title='Tidak bisa login', thread_type='technical', student=self.student)
+        Message.objects.create(thread=self.login, sender=self.student, content='Password saya ditolak terus')
+        self.payment = MessageThread.objects.create(title='Pembayaran belum diverifikasi', student=self.student)
+        Message.objects.create(thread=self.payment, sender=self.student, content='Sudah transfer, login juga lambat')
+        self.private = MessageThread.objects.create(title='Login gagal', student=self.other_student)
+
+    def _ids(self, user, query):
+        return [thread_id for thread_id, _ in search_threads(User.objects.get(pk=user.pk), query)]
+
+    def test_title_matches_rank_above_body_matches(self):
+        ranked = self._ids(self.operator, 'login')
+        self.assertEqual(set(ranked), {self.login.pk, self.payment.pk, self.private.pk})
+        self.assertEqual(ranked[-1], self.payment.pk)
+
+    def test_results_are_limited_to_the_users_inbox(self):
+        self.assertEqual(set(self._ids(self.student, 'login')), {self.login.pk, self.payment.pk})
+        self.assertEqual(self._ids(self.other_student, 'transfer'), [])
+
+    def test_prefix_and_multi_term_queries(self):
+        self.assertEqual(self._ids(self.student, 'diverif'), [self.payment.pk])
+        self.assertEqual(self._ids(self.student, 'password ditolak'), [self.login.pk])
+        self.assertEqual(self._ids(self.student, 'password transfer'), [])
+        self.assertEqual(search_terms('"login" OR (NEAR*'), ['login', 'or', 'near'])
+
+    def test_index_follows_edits_and_deletes(self):
+        message = Message.objects.get(thread=self.login)
+        message.content = 'Akun terkunci'
+        message.save()
+        self.assertEqual(self._ids(self.student, 'terkunci'), [self.login.pk])
+        self.assertEqual(self._ids(self.student, 'ditolak'), [])
+
+        self.login.title = 'Akun diblokir'
+        self.login.save()
+        self.assertEqual(self._ids(self.student, 'diblokir'), [self.login.pk])
+
+        self.login.delete()
+        self.assertFalse(ThreadSearchDocument.objects.filter(pk=self.login.pk).exists())
+        self.assertEqual(self._ids(self.student, 'terkunci'), [])
+
+    def test_new_message_is_appended_without_reading_the_thread(self):
+        with CaptureQueriesContext(connection) as queries:
+            Message.objects.create(thread=self.login, sender=self.operator, content='Akun terkunci')
+
+        self.assertFalse([q for q in queries if q['sql'].startswith('SELECT') and '"otosapp_message"' in q['sql']])
+        self.assertEqual(
+            ThreadSearchDocument.objects.get(pk=self.login.pk).body, 'Password saya ditolak terus\nAkun terkunci'
+        )
+        self.assertEqual(self._ids(self.student, 'terkunci'), [self.login.pk])
+
+    def test_search_is_one_query(self):
+        user = User.objects.get(pk=self.operator.pk)
+        user.access_profile
+        with CaptureQueriesContext(connection) as queries:
+            search_threads(user, 'login lambat')
+        self.assertEqual(len(queries), 1)
+
+    def test_search_api_and_inbox_filter(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('message_api_search'), {'q': 'transfer'})
+        self.assertEqual([result['id'] for result in response.json()['results']], [self.payment.pk])
+        self.assertEqual(response.json()['results'][0]['url'], reverse('message_thread', args=[self.payment.pk]))
+
+        response = self.client.get(reverse('message_inbox'), {'search': 'login'})
+        self.assertEqual({thread.pk for thread in response.context['threads']}, {self.login.pk, self.payment.pk})
+
+    def test_inbox_filter_keeps_every_match(self):
+        for index in range(12):
+            MessageThread.objects.create(title=f'Login gagal {index}', student=self.student)
+        self.client.force_login(self.student)
+
+        response = self.client.get(reverse('message_inbox'), {'search': 'login'})
+
+        self.assertEqual(response.context['threads'].paginator.count, 14)
+
+    def test_rebuild_command(self):
+        ThreadSearchDocument.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_thread_search', stdout=out)
+        self.assertIn('3 dokumen thread', out.getvalue())
+        self.assertEqual(self._ids(self.student, 'transfer'), [self.payment.pk])
@@ -0,0 +1,103 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from otosapp.models import Answer, Category, Choice, Question, Role, Test, User
+from otosapp.services.scoring import SCORING_VERSION
+from otosapp.services.utbk_calibration import calibrate_categories, calibrate_category
+
+
+class UtbkCalibrationTests(TestCase):
+    def setUp(self):
+        role = Role.objects.create(role_name='Student')
+        self.students = [
+            User.objects.create_user(
+                email=f'utbk{index}@example.com', username=f'utbk{index}@example.com',
+                password='testpass123', role=role,
+            )
+            for index in range(5)
+        ]
+        self.category = Category.objects.create(category_name='Penalaran', scoring_method='utbk')
+
+    def _questions(self, category, correct_counts):
+        """One question per entry; ``correct_counts[i]`` of the five students answer question i correctly."""
+        questions = []
+        for index, correct in enumerate(correct_counts):
+            question = Question.objects.create(
+                question_text=f'Soal {index + 1}', pub_date=timezone.now(), category=category
+            )
+            right = Choice.objects.create(question=question, choice_text='Benar', is_correct=True)
+            wrong = Choice.objects.create(question=question, choice_text='Salah', is_correct=False)
+            for position, student in enumerate(self.students):
+                test, _ = Test.objects.get_or_create(
+                    student=student, is_submitted=True, defaults={'scoring_version': SCORING_VERSION}
+                )
+                Answer.objects.create(
+                    test=test, question=question, selected_choice=right if position < correct else wrong
+                )
+            questions.append(question)
+        return questions
+
+    def _coefficients(self, questions):
+        stored = dict(Question.objects.filter(pk__in=[q.pk for q in questions]).values_list('pk', 'difficulty_coefficient'))
+        return [round(stored[question.pk], 2) for question in questions]
+
+    def test_hardest_questions_get_highest_normalised_coefficients(self):
+        questions = self._questions(self.category, [1, 4, 2])
+        unanswered = Question.objects.create(
+            question_text='Belum dijawab', pub_date=timezone.now(), category=self.category, difficulty_coefficient=1.0
+        )
+
+        result = calibrate_category(self.category.pk)
+
+        self.assertTrue(result.applied)
+        self.assertEqual(result.calibrated_questions, 3)
+        self.assertEqual(self._coefficients(questions), [500.0, 166.67, 333.33])
+        self.assertEqual(Question.objects.get(pk=unanswered.pk).difficulty_coefficient, 1.0)
+        # Tes yang memakai soal tersebut ditandai untuk dinilai ulang
+        self.assertFalse(Test.objects.exclude(scoring_version=0).exists())
+
+    def test_writes_do_not_grow_with_question_count(self):
+        def calibration_queries(category, correct_counts):
+            self._questions(category, correct_counts)
+            with CaptureQueriesContext(connection) as queries:
+                calibrate_category(category.pk)
+            return len(queries)
+
+        small = calibration_queries(self.category, [1, 3])
+        other = Category.objects.create(category_name='Kuantitatif', scoring_method='utbk')
+        self.assertEqual(calibration_queries(other, [0, 1, 2, 3, 4, 5, 2, 1]), small)
+
+    def test_dry_run_reports_diff_without_writing(self):
+        questions = self._questions(self.category, [0, 5])
+
+        result = calibrate_category(self.category.pk, dry_run=True)
+
+        self.assertFalse(result.applied)
+        self.assertEqual([(change.old, round(change.new, 2)) for change in result.changes], [(1.0, 750.0), (1.0, 250.0)])
+        self.assertEqual(self._coefficients(questions), [1.0, 1.0])
+
+    def test_second_run_has_nothing_to_change(self):
+        self._questions(self.category, [1, 2, 3])
+        calibrate_category(self.category.pk)
+
+        results = calibrate_categories([self.category.pk])
+        self.assertEqual(results[0].changes, [])
+        self.assertFalse(results[0].applied)
+
+    def test_command_dry_run_lists_changes(self):
+        self._questions(self.category, [1, 4])
+        Category.objects.create(category_name='Biasa', scoring_method='default')
+
+        out = StringIO()
+        call_command('recalibrate_utbk', '--dry-run', stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('Penalaran: 2 dari 2 soal berubah', output)
+        self.assertIn('1.0000 -> 750.0000', output)
+        self.assertIn('1 kategori diproses, 2 koefisien akan diperbarui (dry run)', output)
+        self.assertNotIn('Biasa', output)
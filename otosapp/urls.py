@@ -47,6 +47,7 @@ urlpatterns = [
     path('admin/broadcasts/<int:broadcast_id>/remove/', views.admin_broadcast_remove, name='admin_broadcast_remove'),
     path('admin/broadcasts/<int:broadcast_id>/reactivate/', views.admin_broadcast_reactivate, name='admin_broadcast_reactivate'),
     path('admin/reports/sales/', views.admin_sales_report, name='admin_sales_report'),
+    path('admin/reports/sales/export/', views.admin_sales_report_export, name='admin_sales_report_export'),
     
     path('admin/categories/', views.category_list, name='category_list'),
     path('admin/categories/create/', views.category_create, name='category_create'),
@@ -91,6 +92,7 @@ urlpatterns = [
     path('students/tests/<int:test_id>/force-end/', views.force_end_test, name='force_end_test'),
     path('students/tests/<int:test_id>/results/', views.test_results, name='test_results'),
     path('students/tests/<int:test_id>/results/detail/', views.test_results_detail, name='test_results_detail'),
+    path('api/tests/<int:test_id>/answers/sync/', views.api_sync_test_answers, name='api_sync_test_answers'),
     path('students/tests/history/', views.test_history, name='test_history'),
     path('students/rankings/', views.student_rankings, name='student_rankings'),
     
@@ -101,6 +103,8 @@ urlpatterns = [
     path('messages/thread/<int:thread_id>/', views.message_thread, name='message_thread'),
     path('messages/thread/<int:thread_id>/assign/', views.assign_thread, name='assign_thread'),
     path('api/messages/unread-count/', views.message_api_unread_count, name='message_api_unread_count'),
+    path('api/messages/search/', views.message_api_search, name='message_api_search'),
+    path('api/messages/broadcast-jobs/<int:job_id>/', views.message_api_broadcast_job, name='message_api_broadcast_job'),
     
     # Subscription & Payment URLs
     path('subscription/packages/', views.subscription_packages, name='subscription_packages'),
@@ -149,4 +153,6 @@ urlpatterns = [
     path('students/university/recommendations/', views.student_university_recommendations, name='student_university_recommendations'),
     # API endpoint for university ajax search
     path('api/universities/', views.api_universities, name='api_universities'),
+    # Scheduled management commands (Vercel cron)
+    path('api/cron/<slug:task>/', views.cron_run_command, name='cron_run_command'),
 ]
\ No newline at end of file
@@ -1,7 +1,7 @@
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse, Http404, HttpResponseNotFound, HttpResponseBadRequest, HttpResponse
 from django.db.models import Q
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 from django.contrib import messages
 from django.forms import inlineformset_factory
 from django.utils import timezone
@@ -39,21 +39,40 @@ from otosapp.models import (
     TryoutPackageCategory,
     AccessLevel,
     EmailVerificationToken,
+    ThreadBroadcastJob,
 )
 from django.db import transaction
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import Count, Avg, Max, Min, Q, Sum, Case, When, IntegerField
-from datetime import timedelta, datetime, time
+from django.db.models import Count, Avg, Max, Q, Case, When, IntegerField
+from datetime import timedelta
 import secrets
 
 ACTIVATION_TOKEN_VALIDITY_HOURS = getattr(settings, 'ACCOUNT_ACTIVATION_TOKEN_VALID_HOURS', 24)
 ACTIVATION_RESEND_COOLDOWN_MINUTES = getattr(settings, 'ACCOUNT_ACTIVATION_RESEND_COOLDOWN_MINUTES', 5)
 from .forms import CustomUserCreationForm, AdminUserCreationForm, BroadcastMessageForm, UserUpdateForm, CategoryUpdateForm, CategoryCreationForm, QuestionForm, ChoiceFormSet, QuestionUpdateForm, SubscriptionPackageForm, PaymentMethodForm, PaymentProofForm, PaymentVerificationForm, AdminBroadcastThreadForm, UserRoleChangeForm, UserSubscriptionEditForm, UniversityForm, UniversityTargetForm, TryoutPackageForm, TryoutPackageCategoryFormSet
 from .decorators import admin_required, admin_or_operator_required, admin_or_teacher_required, admin_or_teacher_or_operator_required, operator_required, students_required, visitor_required, visitor_or_student_required, active_subscription_required
+from .services.access import evaluate_tryout_list
+from .services.admin_metrics import dashboard_metrics
+from .services.answers import MAX_SYNC_ENTRIES, AnswerSyncError, clear_answer, save_answer, sync_answers
+from .services.category_stats import attach_category_statistics
+from .services.inbox_badges import unread_message_count
+from .services.leaderboard import TIME_WINDOWS as LEADERBOARD_WINDOWS, LeaderboardQuery, leaderboard_page, leaderboard_totals, student_rank
+from .services.message_threads import visible_threads, with_unread_counts
+from .services.package_layout import get_package_layout
+from .services.sales_report import get_sales_report, resolve_period, write_sales_report_csv
+from .services.scoring import score_test
 from .services.student_momentum import get_momentum_snapshot
+from .services.subscription_expiry import expire_user_subscription_if_due
+from .services.teacher_dashboard import teacher_pass_summary, teacher_score_stats
+from .services.thread_broadcast import (
+    BroadcastPayload, inline_limit as broadcast_inline_limit, queue_broadcast, send_broadcast,
+)
+from .services.thread_search import filter_matching, search_threads
+from .services.utbk_calibration import calibrate_categories
 
-from django.db.models.functions import TruncDay, TruncMonth
 from django.core.exceptions import PermissionDenied
+from django.core.management import call_command
+import io
 import json
 
 
@@ -70,30 +89,6 @@ def favicon(request):
     return response
 
 
-def check_and_downgrade_expired_subscriptions():
-    """Check and automatically downgrade expired subscriptions"""
-    expired_subscriptions = UserSubscription.objects.filter(
-        is_active=True,
-        end_date__lt=timezone.now(),
-        auto_downgrade_processed=False
-    )
-    
-    visitor_role, created = Role.objects.get_or_create(role_name='Visitor')
-    
-    for subscription in expired_subscriptions:
-        # Change user role back to Visitor
-        subscription.user.role = visitor_role
-        subscription.user.save()
-        
-        # Mark subscription as processed
-        subscription.is_active = False
-        subscription.auto_downgrade_processed = True
-        subscription.save()
-        
-        # You could also send notification here
-        print(f"Downgraded user {subscription.user.email} to Visitor due to expired subscription")
-
-
 def _is_teacher_for_test(user, test):
     """Utility to determine if a teacher has rights over the test categories."""
     if not getattr(user, 'is_authenticated', False):
@@ -173,8 +168,8 @@ def home(request):
     broadcast_messages = BroadcastMessage.objects.visible_for_user(request.user)
     
     if request.user.is_authenticated:
-        # Auto downgrade expired subscriptions
-        check_and_downgrade_expired_subscriptions()
+        # Hanya langganan milik user ini yang diperiksa; sisanya oleh command expire_subscriptions
+        expire_user_subscription_if_due(request.user)
         
         if request.user.is_visitor():
             # Visitor dashboard - show subscription packages
@@ -308,148 +303,17 @@ def home(request):
             # Categories the teacher is responsible for
             teacher_categories = Category.objects.filter(Q(created_by=request.user) | Q(teachers=request.user)).distinct()
 
-            # Tests related to these categories (submitted)
-            tests_qs = Test.objects.filter(is_submitted=True, categories__in=teacher_categories).select_related('student').distinct()
-
-            # Number of distinct students who have submitted tests in teacher categories
-            tested_count = tests_qs.values('student').distinct().count()
-
-            # Determine passed/failed based on each student's latest submitted test for these categories
-            passed_count = 0
-            # Iterate students (could be optimized if needed)
-            student_ids = tests_qs.values_list('student', flat=True).distinct()
-            for sid in student_ids:
-                latest = Test.objects.filter(student_id=sid, is_submitted=True, categories__in=teacher_categories).order_by('-date_taken').first()
-                if latest and latest.is_passed():
-                    passed_count += 1
-
-            failed_count = max(0, tested_count - passed_count)
-            pass_rate = round((passed_count / tested_count) * 100, 1) if tested_count else 0
-
-            # Build teacher_stats for charts: aggregate per-category scores into series
-            now = timezone.now()
-
-            def build_per_category_chart(days, by_month=False):
-                # Returns {'categories': [labels], 'series': [{'name': cat_name, 'data': [vals]}]}
-                categories_labels = []
-                series = []
-
-                if not by_month:
-                    # daily labels oldest->newest
-                    days_list = [(now.date() - timedelta(days=i)) for i in range(days-1, -1, -1)]
-                    categories_labels = [d.strftime('%d %b') for d in days_list]
-
-                    for cat in teacher_categories:
-                        data = []
-                        for d in days_list:
-                            day_start = timezone.make_aware(datetime.combine(d, datetime.min.time())) if timezone.is_naive(datetime.now()) else datetime.combine(d, datetime.min.time()).replace(tzinfo=now.tzinfo)
-                            day_end = day_start + timedelta(days=1)
-                            tests = Test.objects.filter(is_submitted=True, date_taken__gte=day_start, date_taken__lt=day_end).distinct()
-                            tests = tests.filter(categories=cat)
-                            total = 0.0
-                            count = 0
-                            for test in tests:
-                                # compute this test's contribution for this category
-                                if test.tryout_package:
-                                    pkg_cat = test.tryout_package.tryoutpackagecategory_set.filter(category=cat).first()
-                                    if pkg_cat:
-                                        category_answers = test.answers.filter(question__category=cat)
-                                        if category_answers.exists():
-                                            correct_answers = category_answers.filter(selected_choice__is_correct=True).count()
-                                            total_questions = category_answers.count()
-                                            category_score_percentage = (correct_answers / total_questions) if total_questions else 0
-                                            contrib = category_score_percentage * pkg_cat.max_score
-                                            total += contrib
-                                            count += 1
-                                else:
-                                    # Non-package test: use test.score (already per-category)
-                                    total += test.score
-                                    count += 1
-                            avg = (total / count) if count else 0
-                            data.append(round(avg, 1))
-                        series.append({'name': cat.category_name, 'data': data})
-
-                    return {'categories': categories_labels, 'series': series}
-                else:
-                    # monthly aggregation (group by month)
-                    months = []
-                    # approximate months by 30-day steps
-                    for i in range(max(1, int(days/30))-1, -1, -1):
-                        dt = (now - timedelta(days=i*30)).date().replace(day=1)
-                        months.append(dt)
-                    categories_labels = [m.strftime('%b %Y') for m in months]
-
-                    for cat in teacher_categories:
-                        data = []
-                        for m in months:
-                            month_start = timezone.make_aware(datetime.combine(m, datetime.min.time())) if timezone.is_naive(datetime.now()) else datetime.combine(m, datetime.min.time()).replace(tzinfo=now.tzinfo)
-                            month_end = month_start + timedelta(days=30)
-                            tests = Test.objects.filter(is_submitted=True, date_taken__gte=month_start, date_taken__lt=month_end).distinct()
-                            tests = tests.filter(categories=cat)
-                            total = 0.0
-                            count = 0
-                            for test in tests:
-                                if test.tryout_package:
-                                    pkg_cat = test.tryout_package.tryoutpackagecategory_set.filter(category=cat).first()
-                                    if pkg_cat:
-                                        category_answers = test.answers.filter(question__category=cat)
-                                        if category_answers.exists():
-                                            correct_answers = category_answers.filter(selected_choice__is_correct=True).count()
-                                            total_questions = category_answers.count()
-                                            category_score_percentage = (correct_answers / total_questions) if total_questions else 0
-                                            contrib = category_score_percentage * pkg_cat.max_score
-                                            total += contrib
-                                            count += 1
-                                else:
-                                    total += test.score
-                                    count += 1
-                            avg = (total / count) if count else 0
-                            data.append(round(avg, 1))
-                        series.append({'name': cat.category_name, 'data': data})
-
-                    return {'categories': categories_labels, 'series': series}
-
-            scores_7d_chart = build_per_category_chart(7)
-            scores_30d_chart = build_per_category_chart(30)
-            scores_90d_chart = build_per_category_chart(90, by_month=True)
-            scores_180d_chart = build_per_category_chart(180, by_month=True)
-
-            # daily_summary: sum of per-category averages for each day (last 7 days)
-            daily_summary = []
-            chart7 = scores_7d_chart
-            if chart7 and chart7.get('categories') and chart7.get('series'):
-                # for each day index, sum series[i]
-                for idx, label in enumerate(chart7['categories']):
-                    total_score = 0
-                    for s in chart7['series']:
-                        vals = s.get('data', [])
-                        total_score += vals[idx] if idx < len(vals) else 0
-                    daily_summary.append({'date': label, 'total_score': round(total_score, 1)})
-
-            # Ensure at least two points for growth calculation
-            if len(daily_summary) >= 2:
-                last_total = daily_summary[-1]['total_score']
-                prev_total = daily_summary[-2]['total_score']
-                growth_percent = round(((last_total - prev_total) / prev_total * 100), 1) if prev_total else 0
-            else:
-                growth_percent = 0
-
-            teacher_stats = {
-                'scores_7d_chart': scores_7d_chart,
-                'scores_30d_chart': scores_30d_chart,
-                'scores_90d_chart': scores_90d_chart,
-                'scores_180d_chart': scores_180d_chart,
-                'daily_summary': daily_summary,
-                'growth_percent': growth_percent,
-            }
+            teacher_category_refs = list(teacher_categories.values_list('id', 'category_name'))
+            category_ids = [category_id for category_id, _ in teacher_category_refs]
 
-            context.update({
-                'tested_count': tested_count,
-                'passed_count': passed_count,
-                'failed_count': failed_count,
-                'pass_rate': pass_rate,
-                'teacher_stats': teacher_stats,
-            })
+            # Passed/failed based on each student's latest submitted test for these categories
+            pass_summary = teacher_pass_summary(category_ids)
+
+            # Build teacher_stats for charts: one (category, day) aggregate feeds every window
+            teacher_stats = teacher_score_stats(teacher_category_refs)
+
+            context.update(pass_summary)
+            context['teacher_stats'] = teacher_stats
 
         # Data untuk admin dashboard dengan statistik lengkap
         if request.user.is_superuser or request.user.is_admin():
@@ -457,327 +321,35 @@ def home(request):
             # from django.db.models import Count, Sum, Q  # Sudah di-import di atas
             # from datetime import datetime, timedelta  # Sudah di-import di atas
             
-            # Basic user stats
-            total_users = User.objects.count()
-            new_users_today = User.objects.filter(date_joined__date=timezone.now().date()).count()
-            new_users_this_month = User.objects.filter(date_joined__month=timezone.now().month, 
-                                                     date_joined__year=timezone.now().year).count()
-            
-            # Payment statistics
-            total_payments = PaymentProof.objects.count()
-            pending_payments = PaymentProof.objects.filter(status='pending').count()
-            approved_payments = PaymentProof.objects.filter(status='approved').count()
-            rejected_payments = PaymentProof.objects.filter(status='rejected').count()
-            
-            # Revenue calculation (from approved payments)
-            total_revenue = PaymentProof.objects.filter(status='approved').aggregate(
-                total=Sum('amount_paid')
-            )['total'] or 0
-            
-            # Monthly revenue (current month)
-            current_month_revenue = PaymentProof.objects.filter(
-                status='approved',
-                verified_at__month=timezone.now().month,
-                verified_at__year=timezone.now().year
-            ).aggregate(total=Sum('amount_paid'))['total'] or 0
-            
-            # Subscription statistics
-            total_subscriptions = UserSubscription.objects.count()
-            active_subscriptions = UserSubscription.objects.filter(is_active=True, end_date__gt=timezone.now()).count()
-            expired_subscriptions = UserSubscription.objects.filter(
-                Q(is_active=False) | Q(end_date__lt=timezone.now())
-            ).count()
-            
+            # Kartu & grafik dibaca dari rollup DailyMetrics
+            admin_stats = dashboard_metrics(include_revenue=True)
+
             # Package popularity
-            popular_packages = SubscriptionPackage.objects.annotate(
+            admin_stats['popular_packages'] = SubscriptionPackage.objects.annotate(
                 subscription_count=Count('usersubscription')
             ).order_by('-subscription_count')[:5]
-            
-            # Recent activities
-            recent_payments = PaymentProof.objects.order_by('-created_at')[:5]
-            recent_subscriptions = UserSubscription.objects.order_by('-created_at')[:5]
-            
-            # Monthly trends (last 6 months, 3 months, 30 days, 7 days)
-            from collections import OrderedDict
-            monthly_data = []
-            for i in range(6):
-                month_date = timezone.now() - timedelta(days=30*i)
-                month_revenue = PaymentProof.objects.filter(
-                    status='approved',
-                    verified_at__month=month_date.month,
-                    verified_at__year=month_date.year
-                ).aggregate(total=Sum('amount_paid'))['total'] or 0
-                month_sales = PaymentProof.objects.filter(
-                    status='approved',
-                    verified_at__month=month_date.month,
-                    verified_at__year=month_date.year
-                ).count()
-                month_subscriptions = UserSubscription.objects.filter(
-                    created_at__month=month_date.month,
-                    created_at__year=month_date.year
-                ).count()
-                monthly_data.append({
-                    'month': month_date.strftime('%B %Y'),
-                    'month_short': month_date.strftime('%b'),
-                    'revenue': float(month_revenue),
-                    'subscriptions': month_subscriptions,
-                    'sales_count': month_sales
-                })
-            monthly_data.reverse()  # Oldest to newest
-
-            # Growth percent (last vs previous month)
-            growth_percent = 0
-            if len(monthly_data) >= 2:
-                last = monthly_data[-1]['sales_count']
-                prev = monthly_data[-2]['sales_count']
-                if prev:
-                    growth_percent = round((last - prev) / prev * 100, 1)
-                else:
-                    growth_percent = 0
-
-            # Filtered data for 7, 30, 90, 180 days
-            now = timezone.now()
-            def filter_by_days(days):
-                start = now - timedelta(days=days)
-                sales = PaymentProof.objects.filter(status='approved', verified_at__gte=start)
-                return sales.count()
-            sales_7d = filter_by_days(7)
-            sales_30d = filter_by_days(30)
-            sales_90d = filter_by_days(90)
-            sales_180d = filter_by_days(180)
-
-            # Data harian/bulanan untuk chart filter
-            
-            # 7 days chart data
-            sales_7d_qs = PaymentProof.objects.filter(status='approved', verified_at__gte=timezone.now() - timedelta(days=7))
-            sales_7d_chart = sales_7d_qs.annotate(day=TruncDay('verified_at')).values('day').annotate(count=Count('id')).order_by('day')
-            sales_7d_chart_data = [{'label': d['day'].strftime('%d %b'), 'value': d['count']} for d in sales_7d_chart]
-            
-            # Fallback untuk 7 hari jika kosong
-            if not sales_7d_chart_data:
-                today = timezone.now().date()
-                sales_7d_chart_data = [
-                    {'label': (today - timedelta(days=i)).strftime('%d %b'), 'value': 0} 
-                    for i in range(6, -1, -1)
-                ]
-
-            # 30 days chart data
-            sales_30d_qs = PaymentProof.objects.filter(status='approved', verified_at__gte=timezone.now() - timedelta(days=30))
-            sales_30d_chart = sales_30d_qs.annotate(day=TruncDay('verified_at')).values('day').annotate(count=Count('id')).order_by('day')
-            sales_30d_chart_data = [{'label': d['day'].strftime('%d %b'), 'value': d['count']} for d in sales_30d_chart]
-            
-            # Fallback untuk 30 hari jika kosong
-            if not sales_30d_chart_data:
-                today = timezone.now().date()
-                sales_30d_chart_data = [
-                    {'label': (today - timedelta(days=i)).strftime('%d %b'), 'value': 0} 
-                    for i in range(29, -1, -7)  # Sample setiap 7 hari
-                ]
-
-            # 90 days chart data
-            sales_90d_qs = PaymentProof.objects.filter(status='approved', verified_at__gte=timezone.now() - timedelta(days=90))
-            sales_90d_chart = sales_90d_qs.annotate(month=TruncMonth('verified_at')).values('month').annotate(count=Count('id')).order_by('month')
-            sales_90d_chart_data = [{'label': d['month'].strftime('%b %Y'), 'value': d['count']} for d in sales_90d_chart]
-            
-            # Fallback untuk 90 hari jika kosong
-            if not sales_90d_chart_data:
-                today = timezone.now().date()
-                sales_90d_chart_data = [
-                    {'label': (today.replace(day=1) - timedelta(days=i*30)).strftime('%b %Y'), 'value': 0} 
-                    for i in range(2, -1, -1)  # 3 bulan terakhir
-                ]
 
-            # 180 days chart data
-            sales_180d_qs = PaymentProof.objects.filter(status='approved', verified_at__gte=timezone.now() - timedelta(days=180))
-            sales_180d_chart = sales_180d_qs.annotate(month=TruncMonth('verified_at')).values('month').annotate(count=Count('id')).order_by('month')
-            sales_180d_chart_data = [{'label': d['month'].strftime('%b %Y'), 'value': d['count']} for d in sales_180d_chart]
-            
-            # Fallback untuk 180 hari jika kosong
-            if not sales_180d_chart_data:
-                today = timezone.now().date()
-                sales_180d_chart_data = [
-                    {'label': (today.replace(day=1) - timedelta(days=i*30)).strftime('%b %Y'), 'value': 0} 
-                    for i in range(5, -1, -1)  # 6 bulan terakhir
-                ]
+            # Recent activities
+            admin_stats['recent_payments'] = PaymentProof.objects.select_related('user', 'package').order_by('-created_at')[:5]
+            admin_stats['recent_subscriptions'] = UserSubscription.objects.select_related('user', 'package').order_by('-created_at')[:5]
 
             context.update({
-                'admin_stats': {
-                    'total_users': total_users,
-                    'new_users_today': new_users_today,
-                    'new_users_this_month': new_users_this_month,
-                    'total_payments': total_payments,
-                    'pending_payments': pending_payments,
-                    'approved_payments': approved_payments,
-                    'rejected_payments': rejected_payments,
-                    'total_revenue': float(total_revenue),
-                    'current_month_revenue': float(current_month_revenue),
-                    'total_subscriptions': total_subscriptions,
-                    'active_subscriptions': active_subscriptions,
-                    'expired_subscriptions': expired_subscriptions,
-                    'popular_packages': popular_packages,
-                    'recent_payments': recent_payments,
-                    'recent_subscriptions': recent_subscriptions,
-                    'monthly_data': monthly_data,
-                    'growth_percent': growth_percent,
-                    'sales_7d': sales_7d,
-                    'sales_30d': sales_30d,
-                    'sales_90d': sales_90d,
-                    'sales_180d': sales_180d,
-                    'sales_7d_chart': sales_7d_chart_data,
-                    'sales_30d_chart': sales_30d_chart_data,
-                    'sales_90d_chart': sales_90d_chart_data,
-                    'sales_180d_chart': sales_180d_chart_data,
-                },
-                'pending_payments_count': pending_payments  # For sidebar notification
+                'admin_stats': admin_stats,
+                'pending_payments_count': admin_stats['pending_payments']  # For sidebar notification
             })
         
         # Data untuk operator dashboard (tanpa data finansial sensitif)
         elif request.user.is_operator():
-            # Basic user stats
-            total_users = User.objects.count()
-            new_users_today = User.objects.filter(date_joined__date=timezone.now().date()).count()
-            new_users_this_month = User.objects.filter(date_joined__month=timezone.now().month, 
-                                                     date_joined__year=timezone.now().year).count()
-            
-            # Payment statistics (counts only, no revenue)
-            total_payments = PaymentProof.objects.count()
-            pending_payments = PaymentProof.objects.filter(status='pending').count()
-            approved_payments = PaymentProof.objects.filter(status='approved').count()
-            rejected_payments = PaymentProof.objects.filter(status='rejected').count()
-            
-            # Subscription statistics
-            total_subscriptions = UserSubscription.objects.count()
-            active_subscriptions = UserSubscription.objects.filter(is_active=True, end_date__gt=timezone.now()).count()
-            expired_subscriptions = UserSubscription.objects.filter(
-                Q(is_active=False) | Q(end_date__lt=timezone.now())
-            ).count()
-            
-            # Recent activities (tanpa amounts)
-            recent_payments = PaymentProof.objects.order_by('-created_at')[:5]
-            recent_subscriptions = UserSubscription.objects.order_by('-created_at')[:5]
-            
-            # Monthly trends (subscriber counts only, no revenue)
-            monthly_data = []
-            for i in range(6):
-                month_date = timezone.now() - timedelta(days=30*i)
-                month_sales = PaymentProof.objects.filter(
-                    status='approved',
-                    verified_at__month=month_date.month,
-                    verified_at__year=month_date.year
-                ).count()
-                month_subscriptions = UserSubscription.objects.filter(
-                    created_at__month=month_date.month,
-                    created_at__year=month_date.year
-                ).count()
-                monthly_data.append({
-                    'month': month_date.strftime('%B %Y'),
-                    'month_short': month_date.strftime('%b'),
-                    'subscriptions': month_subscriptions,
-                    'sales_count': month_sales
-                })
-            monthly_data.reverse()  # Oldest to newest
-
-            # Growth percent (last vs previous month)
-            growth_percent = 0
-            if len(monthly_data) >= 2:
-                last = monthly_data[-1]['sales_count']
-                prev = monthly_data[-2]['sales_count']
-                if prev:
-                    growth_percent = round((last - prev) / prev * 100, 1)
-                else:
-                    growth_percent = 0
-
-            # Filtered data for 7, 30, 90, 180 days (counts only)
-            now = timezone.now()
-            def filter_by_days(days):
-                start = now - timedelta(days=days)
-                sales = PaymentProof.objects.filter(status='approved', verified_at__gte=start)
-                return sales.count()
-            sales_7d = filter_by_days(7)
-            sales_30d = filter_by_days(30)
-            sales_90d = filter_by_days(90)
-            sales_180d = filter_by_days(180)
-
-            # Data harian/bulanan untuk chart filter
-            
-            # 7 days chart data
-            sales_7d_qs = PaymentProof.objects.filter(status='approved', verified_at__gte=timezone.now() - timedelta(days=7))
-            sales_7d_chart = sales_7d_qs.annotate(day=TruncDay('verified_at')).values('day').annotate(count=Count('id')).order_by('day')
-            sales_7d_chart_data = [{'label': d['day'].strftime('%d %b'), 'value': d['count']} for d in sales_7d_chart]
-            
-            # Fallback untuk 7 hari jika kosong
-            if not sales_7d_chart_data:
-                today = timezone.now().date()
-                sales_7d_chart_data = [
-                    {'label': (today - timedelta(days=i)).strftime('%d %b'), 'value': 0} 
-                    for i in range(6, -1, -1)
-                ]
+            # Kartu & grafik dibaca dari rollup DailyMetrics (tanpa data pendapatan)
+            operator_stats = dashboard_metrics(include_revenue=False)
 
-            # 30 days chart data
-            sales_30d_qs = PaymentProof.objects.filter(status='approved', verified_at__gte=timezone.now() - timedelta(days=30))
-            sales_30d_chart = sales_30d_qs.annotate(day=TruncDay('verified_at')).values('day').annotate(count=Count('id')).order_by('day')
-            sales_30d_chart_data = [{'label': d['day'].strftime('%d %b'), 'value': d['count']} for d in sales_30d_chart]
-            
-            # Fallback untuk 30 hari jika kosong
-            if not sales_30d_chart_data:
-                today = timezone.now().date()
-                sales_30d_chart_data = [
-                    {'label': (today - timedelta(days=i)).strftime('%d %b'), 'value': 0} 
-                    for i in range(29, -1, -7)  # Sample setiap 7 hari
-                ]
-
-            # 90 days chart data
-            sales_90d_qs = PaymentProof.objects.filter(status='approved', verified_at__gte=timezone.now() - timedelta(days=90))
-            sales_90d_chart = sales_90d_qs.annotate(month=TruncMonth('verified_at')).values('month').annotate(count=Count('id')).order_by('month')
-            sales_90d_chart_data = [{'label': d['month'].strftime('%b %Y'), 'value': d['count']} for d in sales_90d_chart]
-            
-            # Fallback untuk 90 hari jika kosong
-            if not sales_90d_chart_data:
-                today = timezone.now().date()
-                sales_90d_chart_data = [
-                    {'label': (today.replace(day=1) - timedelta(days=i*30)).strftime('%b %Y'), 'value': 0} 
-                    for i in range(2, -1, -1)  # 3 bulan terakhir
-                ]
-
-            # 180 days chart data
-            sales_180d_qs = PaymentProof.objects.filter(status='approved', verified_at__gte=timezone.now() - timedelta(days=180))
-            sales_180d_chart = sales_180d_qs.annotate(month=TruncMonth('verified_at')).values('month').annotate(count=Count('id')).order_by('month')
-            sales_180d_chart_data = [{'label': d['month'].strftime('%b %Y'), 'value': d['count']} for d in sales_180d_chart]
-            
-            # Fallback untuk 180 hari jika kosong
-            if not sales_180d_chart_data:
-                today = timezone.now().date()
-                sales_180d_chart_data = [
-                    {'label': (today.replace(day=1) - timedelta(days=i*30)).strftime('%b %Y'), 'value': 0} 
-                    for i in range(5, -1, -1)  # 6 bulan terakhir
-                ]
+            # Recent activities (tanpa amounts)
+            operator_stats['recent_payments'] = PaymentProof.objects.select_related('user', 'package').order_by('-created_at')[:5]
+            operator_stats['recent_subscriptions'] = UserSubscription.objects.select_related('user', 'package').order_by('-created_at')[:5]
 
             context.update({
-                'operator_stats': {
-                    'total_users': total_users,
-                    'new_users_today': new_users_today,
-                    'new_users_this_month': new_users_this_month,
-                    'total_payments': total_payments,
-                    'pending_payments': pending_payments,
-                    'approved_payments': approved_payments,
-                    'rejected_payments': rejected_payments,
-                    'total_subscriptions': total_subscriptions,
-                    'active_subscriptions': active_subscriptions,
-                    'expired_subscriptions': expired_subscriptions,
-                    'recent_payments': recent_payments,
-                    'recent_subscriptions': recent_subscriptions,
-                    'monthly_data': monthly_data,
-                    'growth_percent': growth_percent,
-                    'sales_7d': sales_7d,
-                    'sales_30d': sales_30d,
-                    'sales_90d': sales_90d,
-                    'sales_180d': sales_180d,
-                    'sales_7d_chart': sales_7d_chart_data,
-                    'sales_30d_chart': sales_30d_chart_data,
-                    'sales_90d_chart': sales_90d_chart_data,
-                    'sales_180d_chart': sales_180d_chart_data,
-                },
-                'pending_payments_count': pending_payments  # For sidebar notification
+                'operator_stats': operator_stats,
+                'pending_payments_count': operator_stats['pending_payments']  # For sidebar notification
             })
     else:
         # Not logged in - show public home with packages preview
@@ -799,453 +371,55 @@ def home(request):
 @admin_required
 def admin_sales_report(request):
     """Render a dedicated admin-only sales analytics dashboard."""
-    now = timezone.now()
-    current_tz = timezone.get_current_timezone()
-
-    def parse_date(value, *, end_of_day=False):
-        if not value:
-            return None
-        try:
-            parsed_date = datetime.strptime(value, '%Y-%m-%d').date()
-        except ValueError:
-            return None
-        boundary_time = time(23, 59, 59, 999999) if end_of_day else time(0, 0, 0)
-        combined = datetime.combine(parsed_date, boundary_time)
-        return timezone.make_aware(combined, current_tz) if timezone.is_naive(combined) else combined
-
-    def ensure_aware_dt(value):
-        if not value:
-            return now
-        if timezone.is_naive(value):
-            return timezone.make_aware(value, current_tz)
-        return value
-
-    def to_float(value):
-        if value is None:
-            return 0.0
-        try:
-            return float(value)
-        except (TypeError, ValueError):
-            return 0.0
-
-    def growth_pct(current, previous):
-        previous_val = to_float(previous)
-        current_val = to_float(current)
-        if previous_val == 0.0:
-            return None
-        return round(((current_val - previous_val) / previous_val) * 100, 2)
-
-    def minutes_to_label(value):
-        if value is None:
-            return 'N/A'
-        total_minutes = int(round(value))
-        hours, minutes = divmod(total_minutes, 60)
-        if hours and minutes:
-            return f'{hours}j {minutes}m'
-        if hours:
-            return f'{hours}j'
-        return f'{minutes}m'
-
-    def add_price_point(storage, package_id, package_name, point):
-        bucket = storage.setdefault(package_id, {'name': package_name, 'data': []})
-        if any(existing['x'] == point['x'] and existing['y'] == point['y'] for existing in bucket['data']):
-            return
-        bucket['data'].append(point)
-
-    period_key = (request.GET.get('period') or '30d').lower()
-    start_param = request.GET.get('start_date')
-    end_param = request.GET.get('end_date')
-
-    period_labels = {
-        '7d': '7 Hari Terakhir',
-        '30d': '30 Hari Terakhir',
-        '90d': '90 Hari Terakhir',
-        '180d': '180 Hari Terakhir',
-    }
-    period_days = {'7d': 7, '30d': 30, '90d': 90, '180d': 180}
-    period_label = period_labels.get(period_key, period_labels['30d'])
-
-    base_qs = PaymentProof.objects.filter(status='approved', verified_at__isnull=False)
-    start_dt = None
-    end_dt = now
-
-    if period_key in period_days:
-        days = period_days[period_key]
-        start_dt = end_dt - timedelta(days=days - 1)
-        period_label = period_labels[period_key]
-    elif period_key == 'ytd':
-        start_dt = timezone.make_aware(datetime(now.year, 1, 1), current_tz)
-        period_label = f'Tahun Berjalan {now.year}'
-    elif period_key == 'all':
-        first_sale = base_qs.aggregate(first=Min('verified_at'))['first']
-        start_dt = first_sale
-        period_label = 'Sepanjang Waktu'
-    elif period_key == 'custom':
-        start_dt = parse_date(start_param)
-        custom_end = parse_date(end_param, end_of_day=True)
-        if custom_end:
-            end_dt = custom_end
-        period_label = 'Rentang Kustom'
-        if start_dt and end_dt and start_dt > end_dt:
-            start_dt, end_dt = end_dt, start_dt
-    else:
-        fallback_days = period_days['30d']
-        start_dt = end_dt - timedelta(days=fallback_days - 1)
-        period_label = period_labels['30d']
-
-    filtered_payments = base_qs
-    if start_dt:
-        filtered_payments = filtered_payments.filter(verified_at__gte=start_dt)
-    if end_dt:
-        filtered_payments = filtered_payments.filter(verified_at__lte=end_dt)
-    filtered_payments = filtered_payments.select_related('user', 'package')
-
-    start_date_local = timezone.localdate(start_dt) if start_dt else None
-    end_date_local = timezone.localdate(end_dt) if end_dt else timezone.localdate(now)
-    range_days = None
-    if start_date_local:
-        range_days = max(1, (end_date_local - start_date_local).days + 1)
-
-    aggregates = filtered_payments.aggregate(
-        total=Sum('amount_paid'),
-        avg=Avg('amount_paid'),
-        max=Max('amount_paid'),
-        min=Min('amount_paid'),
-    )
-    total_revenue = aggregates['total'] or 0
-    avg_order_value = aggregates['avg'] or 0
-    max_order_value = aggregates['max'] or 0
-    min_order_value = aggregates['min'] or 0
-    total_orders = filtered_payments.count()
-    unique_customers = filtered_payments.values('user_id').distinct().count() if total_orders else 0
-
-    repeat_purchase_rate = None
-    if total_orders > 1 and unique_customers:
-        repeat_purchase_rate = round(((total_orders - unique_customers) / total_orders) * 100, 2)
-
-    period_span = None
-    if start_dt:
-        period_span = (end_dt - start_dt) if end_dt else timedelta()
-        if period_span.total_seconds() <= 0:
-            period_span = timedelta(days=1)
-
-    previous_totals = {'total': 0, 'count': 0}
-    if period_span:
-        prev_end = start_dt - timedelta(microseconds=1)
-        prev_start = prev_end - period_span
-        previous_qs = base_qs.filter(verified_at__gte=prev_start, verified_at__lte=prev_end)
-        previous_totals = previous_qs.aggregate(total=Sum('amount_paid'), count=Count('id'))
-
-    revenue_growth = growth_pct(total_revenue, previous_totals.get('total'))
-    orders_growth = growth_pct(total_orders, previous_totals.get('count'))
-
-    daily_data = filtered_payments.annotate(day=TruncDay('verified_at')).values('day').annotate(total=Sum('amount_paid'), count=Count('id')).order_by('day')
-    daily_series = []
-    for entry in daily_data:
-        day_value = entry['day']
-        if day_value is None:
-            continue
-        local_day = timezone.localtime(day_value)
-        daily_series.append({
-            'date': local_day.date().isoformat(),
-            'label': local_day.strftime('%d %b'),
-            'revenue': round(to_float(entry['total']), 2),
-            'orders': entry['count'],
-        })
-
-    monthly_data = filtered_payments.annotate(month=TruncMonth('verified_at')).values('month').annotate(total=Sum('amount_paid'), count=Count('id')).order_by('month')
-    monthly_series = []
-    for entry in monthly_data:
-        month_value = entry['month']
-        if month_value is None:
-            continue
-        local_month = timezone.localtime(month_value)
-        monthly_series.append({
-            'label': local_month.strftime('%b %Y'),
-            'revenue': round(to_float(entry['total']), 2),
-            'orders': entry['count'],
-        })
-
-    average_daily_revenue = round(to_float(total_revenue) / len(daily_series), 2) if daily_series else round(to_float(total_revenue), 2)
-    peak_day = max(daily_series, key=lambda item: item['revenue']) if daily_series else None
-
-    payment_methods = []
-    payment_methods_raw = filtered_payments.values('payment_method').annotate(
-        total=Sum('amount_paid'), count=Count('id'), avg=Avg('amount_paid')
-    ).order_by('-total')
-    for entry in payment_methods_raw:
-        label = entry['payment_method'] or 'Lainnya'
-        payment_methods.append({
-            'label': label,
-            'count': entry['count'],
-            'revenue': round(to_float(entry['total']), 2),
-            'avg_order': round(to_float(entry['avg']), 2),
-        })
-
-    package_breakdown = []
-    package_raw = filtered_payments.values('package__id', 'package__name', 'package__access_level').annotate(
-        total=Sum('amount_paid'), count=Count('id'), avg=Avg('amount_paid')
-    ).order_by('-total')
-    for entry in package_raw:
-        package_breakdown.append({
-            'package_id': entry['package__id'],
-            'package_name': entry['package__name'] or 'Tidak Diketahui',
-            'access_level': entry['package__access_level'],
-            'revenue': round(to_float(entry['total']), 2),
-            'count': entry['count'],
-            'avg_order': round(to_float(entry['avg']), 2),
-        })
-
-    peak_package = package_breakdown[0] if package_breakdown else None
-
-    top_customers = []
-    top_customers_raw = filtered_payments.values(
-        'user_id', 'user__first_name', 'user__last_name', 'user__email'
-    ).annotate(total=Sum('amount_paid'), count=Count('id')).order_by('-total')[:8]
-    for entry in top_customers_raw:
-        first_name = entry.get('user__first_name') or ''
-        last_name = entry.get('user__last_name') or ''
-        full_name = f"{first_name} {last_name}".strip() or entry.get('user__email')
-        revenue_val = to_float(entry['total'])
-        orders_val = entry['count'] or 0
-        avg_ticket = round(revenue_val / orders_val, 2) if orders_val else 0.0
-        top_customers.append({
-            'user_id': entry['user_id'],
-            'name': full_name,
-            'email': entry.get('user__email'),
-            'orders': orders_val,
-            'revenue': round(revenue_val, 2),
-            'avg_order': avg_ticket,
-        })
-
-    recent_payments = list(filtered_payments.order_by('-verified_at')[:10])
-
-    status_labels = dict(PaymentProof.STATUS_CHOICES)
-    status_qs = PaymentProof.objects.all()
-    if start_dt:
-        status_qs = status_qs.filter(created_at__gte=start_dt)
-    if end_dt:
-        status_qs = status_qs.filter(created_at__lte=end_dt)
-    status_breakdown = []
-    for entry in status_qs.values('status').annotate(total=Sum('amount_paid'), count=Count('id')).order_by('-count'):
-        status_key = entry['status']
-        status_breakdown.append({
-            'status': status_key,
-            'label': status_labels.get(status_key, status_key.title()),
-            'count': entry['count'],
-            'revenue': round(to_float(entry['total']), 2),
-        })
-
-    pending_qs = PaymentProof.objects.filter(status='pending')
-    if start_dt:
-        pending_qs = pending_qs.filter(created_at__gte=start_dt)
-    if end_dt:
-        pending_qs = pending_qs.filter(created_at__lte=end_dt)
-    pending_totals = pending_qs.aggregate(total=Sum('amount_paid'), count=Count('id'))
-    pending_revenue = pending_totals.get('total') or 0
-    pending_count = pending_totals.get('count') or 0
-
-    processing_minutes = []
-    for verified_at, created_at in filtered_payments.values_list('verified_at', 'created_at'):
-        if verified_at and created_at:
-            delta_minutes = (verified_at - created_at).total_seconds() / 60
-            if delta_minutes >= 0:
-                processing_minutes.append(delta_minutes)
-
-    processing_metrics = {
-        'avg_minutes': None,
-        'fastest_minutes': None,
-        'slowest_minutes': None,
-        'avg_display': 'N/A',
-        'fastest_display': 'N/A',
-        'slowest_display': 'N/A',
-    }
-    if processing_minutes:
-        avg_minutes = sum(processing_minutes) / len(processing_minutes)
-        fastest_minutes = min(processing_minutes)
-        slowest_minutes = max(processing_minutes)
-        processing_metrics.update({
-            'avg_minutes': round(avg_minutes, 1),
-            'fastest_minutes': round(fastest_minutes, 1),
-            'slowest_minutes': round(slowest_minutes, 1),
-            'avg_display': minutes_to_label(avg_minutes),
-            'fastest_display': minutes_to_label(fastest_minutes),
-            'slowest_display': minutes_to_label(slowest_minutes),
-        })
-
-    price_history_qs = SubscriptionPackagePriceHistory.objects.select_related('package', 'changed_by').order_by('changed_at')
-    if start_dt:
-        price_history_qs = price_history_qs.filter(changed_at__gte=start_dt)
-    if end_dt:
-        price_history_qs = price_history_qs.filter(changed_at__lte=end_dt)
-
-    price_history_entries = list(price_history_qs)
-    price_series_map = {}
-    for change in price_history_entries:
-        local_changed_at = timezone.localtime(change.changed_at) if change.changed_at else timezone.localtime(now)
-        add_price_point(
-            price_series_map,
-            change.package_id,
-            change.package.name,
-            {
-                'x': local_changed_at.strftime('%Y-%m-%d'),
-                'y': round(to_float(change.new_price), 2),
-            }
-        )
-
-    if start_dt:
-        prior_changes = (
-            SubscriptionPackagePriceHistory.objects.select_related('package')
-            .filter(changed_at__lt=start_dt)
-            .order_by('package_id', '-changed_at')
-        )
-        tracked_packages = set()
-        local_start = timezone.localtime(start_dt)
-        for change in prior_changes:
-            if change.package_id in tracked_packages:
-                continue
-            tracked_packages.add(change.package_id)
-            add_price_point(
-                price_series_map,
-                change.package_id,
-                change.package.name,
-                {
-                    'x': local_start.strftime('%Y-%m-%d'),
-                    'y': round(to_float(change.new_price), 2),
-                }
-            )
-
-    baseline_reference = start_dt if start_dt else None
-    all_packages = SubscriptionPackage.objects.all()
-    for package in all_packages:
-        if baseline_reference:
-            baseline_dt = timezone.localtime(baseline_reference)
-        else:
-            candidate_dt = ensure_aware_dt(getattr(package, 'created_at', None) or getattr(package, 'updated_at', None) or now)
-            baseline_dt = timezone.localtime(candidate_dt)
-        add_price_point(
-            price_series_map,
-            package.id,
-            package.name,
-            {
-                'x': baseline_dt.strftime('%Y-%m-%d'),
-                'y': round(to_float(package.price), 2),
-            }
-        )
-
-    price_chart_series = []
-    for series in price_series_map.values():
-        series['data'].sort(key=lambda item: item['x'])
-        price_chart_series.append(series)
-
-    price_change_events = sorted(price_history_entries, key=lambda change: change.changed_at, reverse=True)[:10]
-    price_change_rows = []
-    for change in price_change_events:
-        local_changed_at = timezone.localtime(change.changed_at) if change.changed_at else None
-        old_price_val = round(to_float(change.old_price), 2) if change.old_price is not None else None
-        new_price_val = round(to_float(change.new_price), 2)
-        delta_val = None
-        direction = 'flat'
-        delta_abs = None
-        if change.old_price is not None:
-            delta_val = round(new_price_val - old_price_val, 2)
-            delta_abs = round(abs(delta_val), 2)
-            if delta_val > 0:
-                direction = 'up'
-            elif delta_val < 0:
-                direction = 'down'
-        changer_name = None
-        changer_email = None
-        if change.changed_by:
-            changer_name = change.changed_by.get_full_name() or change.changed_by.email
-            changer_email = change.changed_by.email
-        price_change_rows.append({
-            'package_name': change.package.name,
-            'changed_at': local_changed_at,
-            'old_price': old_price_val,
-            'new_price': new_price_val,
-            'delta': delta_val,
-            'delta_abs': delta_abs,
-            'direction': direction,
-            'changed_by_name': changer_name,
-            'changed_by_email': changer_email,
-        })
-
-    previous_revenue = previous_totals.get('total') or 0
-    previous_orders = previous_totals.get('count') or 0
-
-    report = {
-        'has_data': total_orders > 0,
-        'period_label': period_label,
-        'period_key': period_key,
-        'start_date': start_date_local,
-        'end_date': end_date_local,
-        'range_days': range_days,
-        'total_revenue': round(to_float(total_revenue), 2),
-        'total_orders': total_orders,
-        'unique_customers': unique_customers,
-        'repeat_purchase_rate': repeat_purchase_rate,
-        'avg_order_value': round(to_float(avg_order_value), 2),
-        'max_order_value': round(to_float(max_order_value), 2),
-        'min_order_value': round(to_float(min_order_value), 2),
-        'average_daily_revenue': average_daily_revenue,
-        'growth': {
-            'revenue_pct': revenue_growth,
-            'orders_pct': orders_growth,
-            'previous_revenue': round(to_float(previous_revenue), 2),
-            'previous_orders': previous_orders,
-        },
-        'pending_revenue': round(to_float(pending_revenue), 2),
-        'pending_orders': pending_count,
-        'peak_day': peak_day,
-        'peak_package': peak_package,
-        'processing': processing_metrics,
-    }
-
-    chart_payload = {
-        'daily': daily_series,
-        'monthly': monthly_series,
-        'paymentMethods': [
-            {'label': item['label'], 'value': item['revenue']} for item in payment_methods
-        ],
-        'packageShare': [
-            {'label': item['package_name'], 'value': item['revenue']} for item in package_breakdown
-        ],
-        'priceChanges': price_chart_series,
-    }
-    chart_data_json = json.dumps(chart_payload)
+    period = resolve_period(request.GET.get('period'), request.GET.get('start_date'), request.GET.get('end_date'))
+    sales = get_sales_report(period)
 
     period_options = [
         {'key': '7d', 'label': '7 Hari'},
         {'key': '30d', 'label': '30 Hari'},
         {'key': '90d', 'label': '90 Hari'},
         {'key': '180d', 'label': '180 Hari'},
-        {'key': 'ytd', 'label': f'Year to Date {now.year}'},
+        {'key': 'ytd', 'label': f'Year to Date {timezone.localdate().year}'},
         {'key': 'all', 'label': 'Sepanjang Waktu'},
     ]
     filters = {
         'options': period_options,
-        'active': period_key if period_key in {opt['key'] for opt in period_options} or period_key == 'custom' else '30d',
-        'start_value': start_date_local.strftime('%Y-%m-%d') if start_date_local else '',
-        'end_value': end_date_local.strftime('%Y-%m-%d') if end_date_local else '',
-        'is_custom': period_key == 'custom',
+        'active': period.key,
+        'start_value': period.start_date.strftime('%Y-%m-%d') if period.start_date else '',
+        'end_value': period.end_date.strftime('%Y-%m-%d'),
+        'is_custom': period.key == 'custom',
+        'query': request.GET.urlencode(),
     }
 
     context = {
-        'report': report,
+        'report': sales['report'],
         'filters': filters,
-        'payment_methods': payment_methods,
-        'package_breakdown': package_breakdown,
-        'top_customers': top_customers,
-        'recent_payments': recent_payments,
-        'status_breakdown': status_breakdown,
-        'price_change_rows': price_change_rows,
-        'chart_data_json': chart_data_json,
+        'payment_methods': sales['payment_methods'],
+        'package_breakdown': sales['package_breakdown'],
+        'top_customers': sales['top_customers'],
+        'recent_payments': sales['recent_payments'],
+        'status_breakdown': sales['status_breakdown'],
+        'price_change_rows': sales['price_change_rows'],
+        'chart_data_json': sales['chart_data_json'],
     }
 
     return render(request, 'admin/reports/sales_report.html', context)
 
 
+@login_required
+@admin_required
+def admin_sales_report_export(request):
+    """Download the (cached) sales report of the selected period as CSV."""
+    period = resolve_period(request.GET.get('period'), request.GET.get('start_date'), request.GET.get('end_date'))
+    sales = get_sales_report(period)
+
+    start = period.start_date.isoformat() if period.start_date else 'awal'
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="laporan-penjualan-{start}-{period.end_date.isoformat()}.csv"'
+    write_sales_report_csv(sales, response)
+    return response
+
+
 # ------------------------- TEACHER VIEWS -------------------------
 
 
@@ -2039,7 +1213,13 @@ def teacher_student_list(request):
         categories = categories.order_by('-id')
 
     # Add quick stats
+    categories = attach_category_statistics(list(categories))
+    question_counts = dict(
+        Question.objects.filter(category__in=categories).values('category').annotate(total=Count('id'))
+        .order_by().values_list('category', 'total')
+    )
     for cat in categories:
+        cat.question_count = question_counts.get(cat.pk, 0)
         stats = cat.get_test_statistics()
         cat.total_students = stats['total_students']
         cat.total_tests = stats['total_tests']
@@ -2528,11 +1708,8 @@ def update_utbk_coefficients(request, category_id):
 @admin_required
 @require_POST
 def update_all_utbk_coefficients(request):
-    utbk_categories = Category.objects.filter(scoring_method='utbk')
-    updated_count = 0
-    for category in utbk_categories:
-        Test.update_utbk_difficulty_coefficients(category.id)
-        updated_count += 1
+    results = calibrate_categories(Category.objects.filter(scoring_method='utbk').values_list('id', flat=True))
+    updated_count = len(results)
     if updated_count:
         messages.success(request, f'UTBK coefficients updated for {updated_count} categories.')
     else:
@@ -3179,7 +2356,7 @@ def tryout_list(request):
     # Get search and sort parameters and then categories and packages
     search_query = request.GET.get('q', '').strip()
     sort_option = request.GET.get('sort', '').strip()
-    categories = Category.objects.all()
+    categories = Category.objects.annotate(question_count=Count('question'))
     packages = TryoutPackage.objects.filter(is_active=True)
     # Apply search filter if provided
     if search_query:
@@ -3194,44 +2371,26 @@ def tryout_list(request):
     elif sort_option == 'method':
         categories = categories.order_by('scoring_method')
     
-    # Add personal best scores for categories
-    is_visitor = hasattr(request.user, 'is_visitor') and request.user.is_visitor()
-    has_privileged_access = any([
-        getattr(request.user, 'is_superuser', False),
-        hasattr(request.user, 'is_admin') and request.user.is_admin(),
-        hasattr(request.user, 'is_teacher') and request.user.is_teacher(),
-        hasattr(request.user, 'is_operator') and request.user.is_operator(),
-    ]) if request.user.is_authenticated else False
-
-    user_can_tryouts = False
-    if hasattr(request.user, 'can_access_tryouts') and request.user.can_access_tryouts():
-        user_can_tryouts = True
-    if has_privileged_access:
-        user_can_tryouts = True
-
-    user_access_level = AccessLevel.VISITOR
-    if request.user.is_authenticated and hasattr(request.user, 'get_access_level'):
-        try:
-            user_access_level = request.user.get_access_level()
-        except Exception:
-            user_access_level = AccessLevel.VISITOR
+    # Akses dan skor terbaik semua kartu dievaluasi sekali dari profil akses user
+    profile = request.user.access_profile
+    is_visitor = profile.role_name == 'Visitor'
+    user_access_level = profile.access_level
+    categories = list(categories)
+    packages = list(packages.prefetch_related('tryoutpackagecategory_set__category'))
+    access = evaluate_tryout_list(profile, packages, categories)
+    user_can_tryouts = not access.categories_locked
 
-    if request.user.is_authenticated:
-        for category in categories:
-            user_best = Test.objects.filter(
-                student=request.user,
-                categories=category,
-                is_submitted=True
-            ).aggregate(best_score=Max('score'))['best_score']
-            category.user_best_score = user_best
-            category.is_locked_for_user = not user_can_tryouts
+    for category in categories:
+        category.user_best_score = access.category_best_scores[category.pk]
+        category.is_locked_for_user = access.categories_locked
 
-    packages = list(packages.prefetch_related('tryoutpackagecategory_set__category'))
     for package in packages:
-        package.is_locked_for_user = package.is_locked_for(request.user)
-        package.is_free_for_visitors_display = package.required_access_level == AccessLevel.VISITOR
-        package.required_access_level_label = package.get_required_access_level_display()
-        package.user_meets_required_level = AccessLevel.meets_requirement(user_access_level, package.required_access_level)
+        package_access = access.packages[package.pk]
+        package.is_locked_for_user = package_access.locked
+        package.is_free_for_visitors_display = package_access.required_level == AccessLevel.VISITOR
+        package.required_access_level_label = package_access.required_label
+        package.user_meets_required_level = package_access.meets_required_level
+        package.user_best_score = package_access.best_score
     
     context = {
         'categories': categories,
@@ -3246,6 +2405,13 @@ def tryout_list(request):
     
     return render(request, 'students/tryouts/tryout_list.html', context)
 
+def _remember_question_position(test, number):
+    """Persist the 1-based question position of an ongoing test only when it changes"""
+    if test.current_question != number:
+        test.current_question = number
+        test.save(update_fields=['current_question'])
+
+
 @login_required
 @active_subscription_required
 def take_test(request, category_id, question):
@@ -3362,6 +2528,9 @@ def take_test(request, category_id, question):
 
     # Handle POST (accept both 'choice' and 'answer' names to be compatible)
     if request.method == 'POST':
+        # Posisi soal hanya disimpan saat siswa berinteraksi, bukan pada setiap GET
+        _remember_question_position(test, current_question_index + 1)
+
         choice_id = request.POST.get('choice') or request.POST.get('answer')
         text_answer = request.POST.get('text_answer')
         action = request.POST.get('action')
@@ -3370,27 +2539,7 @@ def take_test(request, category_id, question):
         # Handle multiple choice answers
         if choice_id and current_question.is_multiple_choice():
             choice = get_object_or_404(Choice, id=choice_id, question=current_question)
-            
-            # Use update_or_create to handle race conditions more reliably
-            try:
-                answer, created = Answer.objects.update_or_create(
-                    test=test, 
-                    question=current_question,
-                    defaults={
-                        'selected_choice': choice,
-                        'text_answer': None
-                    }
-                )
-                    
-                # Clean up any duplicate answers that might still exist
-                duplicate_answers = Answer.objects.filter(test=test, question=current_question).exclude(id=answer.id)
-                if duplicate_answers.exists():
-                    duplicate_answers.delete()
-                    
-            except Exception as e:
-                # Fall back to simple creation if there's an issue
-                Answer.objects.filter(test=test, question=current_question).delete()
-                answer = Answer.objects.create(test=test, question=current_question, selected_choice=choice)
+            save_answer(test.id, current_question.id, selected_choice_id=choice.id)
 
             # Update session store
             test_session = request.session.get(session_key, {'answered_questions': {}})
@@ -3402,20 +2551,7 @@ def take_test(request, category_id, question):
 
         # Handle essay answers
         elif text_answer is not None and current_question.is_essay():
-            existing_answers_qs = Answer.objects.filter(test=test, question=current_question)
-            if existing_answers_qs.count() > 1:
-                first_answer = existing_answers_qs.first()
-                existing_answers_qs.exclude(id=first_answer.id).delete()
-                first_answer.text_answer = text_answer
-                first_answer.selected_choice = None  # Clear choice
-                first_answer.save()
-            elif existing_answers_qs.count() == 1:
-                ans = existing_answers_qs.first()
-                ans.text_answer = text_answer
-                ans.selected_choice = None  # Clear choice
-                ans.save()
-            else:
-                Answer.objects.create(test=test, question=current_question, text_answer=text_answer)
+            save_answer(test.id, current_question.id, text_answer=text_answer)
 
             # Update session store
             test_session = request.session.get(session_key, {'answered_questions': {}})
@@ -3428,9 +2564,7 @@ def take_test(request, category_id, question):
         # Only remove answer if explicitly requested or if no valid answer data was provided
         elif action == 'clear' or (choice_id is None and text_answer is None and action != 'submit'):
             # remove existing answer
-            existing_ans = Answer.objects.filter(test=test, question=current_question).first()
-            if existing_ans:
-                existing_ans.delete()
+            clear_answer(test.id, current_question.id)
             if current_question and current_question.id in test_session.get('answered_questions', {}):
                 del test_session['answered_questions'][current_question.id]
                 request.session[session_key] = test_session
@@ -3462,10 +2596,6 @@ def take_test(request, category_id, question):
                         del request.session[session_key]
                 return redirect('test_results', test_id=test.id)
 
-    # Update model current question (1-based)
-    test.current_question = current_question_index + 1
-    test.save(update_fields=['current_question'])
-
     # Progress stats
     answered_count = Answer.objects.filter(test=test).count()
     unanswered_count = max(0, total_questions - answered_count)
@@ -3517,19 +2647,13 @@ def submit_test(request, test_id):
     if request.method == 'POST':
         test = get_object_or_404(Test, id=test_id, student=request.user)
         
-        print(f"[DEBUG submit_test] Test {test_id}: Before submission - Answers count: {test.answers.count()}")
-        
         if not test.is_submitted:
             test.is_submitted = True
             test.end_time = timezone.now()
             test.save()  # Save is_submitted and end_time first
             
-            print(f"[DEBUG submit_test] Test {test_id}: After marking submitted - Answers count: {test.answers.count()}")
-            
             test.calculate_score()  # This will call save() again with the score
             
-            print(f"[DEBUG submit_test] Test {test_id}: After calculate_score - Answers count: {test.answers.count()}, Score: {test.score}")
-            
             # Clear session - Use correct category_id from test
             test_category = test.categories.first()
             if test_category:
@@ -3560,6 +2684,13 @@ def submit_test(request, test_id):
     
     return redirect('home')
 
+def _apply_preview_score(test):
+    """Set test.score for an unsubmitted test without saving it"""
+    result = score_test(test)
+    if result.score is not None:
+        test.score = result.score
+
+
 @login_required
 def test_results(request, test_id):
     test = get_object_or_404(Test, id=test_id)
@@ -3578,11 +2709,10 @@ def test_results(request, test_id):
         first_answer = test.answers.first()
         category = first_answer.question.category if first_answer else None
 
-    # Calculate score if not already calculated
-    if test.answers.exists():
-        test.calculate_score()
-        # Refresh test object from database to get updated score
-        test.refresh_from_db()
+    # Skor test yang sudah disubmit bersifat final (lihat rescore_tests untuk hitung ulang);
+    # test yang belum disubmit hanya dihitung di memori tanpa menulis ke database
+    if not test.is_submitted:
+        _apply_preview_score(test)
 
     # Get university recommendations for UTBK tests
     university_recommendations = []
@@ -3671,11 +2801,10 @@ def test_results_detail(request, test_id):
     if not (request.user == test.student or getattr(request.user, 'is_superuser', False) or request.user.is_admin() or is_owner_teacher):
         raise PermissionDenied
 
-    # Calculate score if not already calculated
-    if test.answers.exists():
-        test.calculate_score()
-        # Refresh test object from database to get updated score
-        test.refresh_from_db()
+    # Skor test yang sudah disubmit bersifat final (lihat rescore_tests untuk hitung ulang);
+    # test yang belum disubmit hanya dihitung di memori tanpa menulis ke database
+    if not test.is_submitted:
+        _apply_preview_score(test)
     
     # Build full question list for this test (include unanswered questions)
     question_list = []
@@ -4153,22 +3282,7 @@ def message_inbox(request):
     user = request.user
     
     # Filter thread berdasarkan role user
-    if user.role and user.role.role_name == 'Student':
-        # Siswa: lihat thread yang mereka buat
-        threads = MessageThread.objects.filter(student=user)
-    elif (user.role and user.role.role_name == 'Admin') or user.is_superuser:
-        # Admin (and superusers): see threads that require admin/operator attention
-        # - Threads where a teacher explicitly requested closure
-        # - Threads assigned to this admin
-        # - Non-academic threads (technical/report/general) so operator/admin can handle them
-        threads = MessageThread.objects.filter(
-            Q(close_requested_by__isnull=False) | Q(teacher_or_admin=user) | ~Q(thread_type='academic')
-        )
-    else:
-        # Teachers/Operators: lihat thread yang ditugaskan ke mereka atau belum ditugaskan
-        threads = MessageThread.objects.filter(
-            Q(teacher_or_admin=user) | Q(teacher_or_admin=None)
-        )
+    threads = visible_threads(user)
     
     # Filter berdasarkan status dan tipe jika ada
     status_filter = request.GET.get('status', '')
@@ -4182,13 +3296,11 @@ def message_inbox(request):
         threads = threads.filter(thread_type=type_filter)
     
     if search_query:
-        threads = threads.filter(
-            Q(title__icontains=search_query) |
-            Q(messages__content__icontains=search_query)
-        ).distinct()
+        # Indeks full-text (services.thread_search), bukan join + icontains ke semua pesan
+        threads = filter_matching(threads, search_query)
     
-    # Urutkan berdasarkan aktivitas terakhir
-    threads = threads.order_by('-last_activity')
+    # Urutkan berdasarkan aktivitas terakhir; jumlah belum dibaca ikut dihitung di query yang sama
+    threads = with_unread_counts(threads, user).order_by('-last_activity')
     
     # Pagination
     paginator = Paginator(threads, 10)
@@ -4200,10 +3312,6 @@ def message_inbox(request):
     except EmptyPage:
         threads_page = paginator.page(paginator.num_pages)
     
-    # Add unread count for each thread
-    for thread in threads_page:
-        thread.unread_count = thread.get_unread_count_for_user(user)
-    
     # Data untuk filter options
     context = {
         'threads': threads_page,
@@ -4328,24 +3436,25 @@ def admin_broadcast_message_thread(request):
             if not selected_students:
                 form.add_error('students', 'Pilih minimal satu siswa.')
             else:
+                payload = BroadcastPayload(
+                    title=title,
+                    thread_type=thread_type,
+                    priority=priority,
+                    content=content,
+                    category_id=category.pk if category and thread_type == 'academic' else None,
+                )
+                student_ids = [student.pk for student in selected_students]
                 try:
-                    with transaction.atomic():
-                        for student in selected_students:
-                            thread = MessageThread.objects.create(
-                                title=title,
-                                thread_type=thread_type,
-                                student=student,
-                                teacher_or_admin=user,
-                                priority=priority,
-                                category=category if thread_type == 'academic' else None
-                            )
-
-                            Message.objects.create(
-                                thread=thread,
-                                sender=user,
-                                content=content
-                            )
+                    if len(student_ids) > broadcast_inline_limit():
+                        # Audiens besar diproses runner latar belakang agar request langsung selesai
+                        job = queue_broadcast(user, student_ids, payload)
+                        messages.info(
+                            request,
+                            f'Broadcast ke {len(student_ids)} siswa masuk antrean dan dikirim di latar belakang.',
+                        )
+                        return redirect(f"{reverse('admin_broadcast_message_thread')}?job={job.pk}")
 
+                    send_broadcast(user, student_ids, payload)
                     messages.success(request, f'Thread berhasil dikirim ke {len(selected_students)} siswa.')
                     return redirect('message_inbox')
                 except Exception as exc:
@@ -4365,11 +3474,31 @@ def admin_broadcast_message_thread(request):
         'thread_type_choices': MessageThread.THREAD_TYPES,
         'priority_choices': form.PRIORITY_CHOICES,
         'selected_student_ids': selected_student_ids,
+        'broadcast_jobs': ThreadBroadcastJob.objects.filter(created_by=user)[:5],
     }
 
     return render(request, 'messages/admin_broadcast_thread.html', context)
 
 
+@login_required
+def message_api_broadcast_job(request, job_id):
+    """API progres job broadcast thread milik admin/operator yang membuatnya"""
+    user = request.user
+    if not (user.is_superuser or user.access_profile.role_name in ['Admin', 'Operator']):
+        return JsonResponse({'error': 'Akses ditolak.'}, status=403)
+    job_filter = {} if user.is_superuser else {'created_by': user}
+    job = get_object_or_404(ThreadBroadcastJob, pk=job_id, **job_filter)
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'total': job.total_count,
+        'processed': job.processed_count,
+        'percent': job.progress_percent,
+        'error': job.error,
+    })
+
+
 @login_required
 def message_thread(request, thread_id):
     """View untuk melihat detail thread dan pesan-pesannya"""
@@ -4607,31 +3736,33 @@ def assign_thread(request, thread_id):
 @login_required
 def message_api_unread_count(request):
     """API untuk mendapatkan jumlah pesan yang belum dibaca"""
-    user = request.user
-    
-    if user.role and user.role.role_name == 'Student':
-        # Siswa: hitung pesan belum dibaca dari guru/admin/operator
-        unread_count = Message.objects.filter(
-            thread__student=user,
-            is_read=False
-        ).exclude(sender=user).count()
-    elif user.role and user.role.role_name == 'Admin' or user.is_superuser:
-        # Admin/superuser: count unread messages for threads that require admin/operator attention
-        unread_count = Message.objects.filter(
-            is_read=False
-        ).exclude(sender=user).filter(
-            Q(thread__close_requested_by__isnull=False) | Q(thread__teacher_or_admin=user) | ~Q(thread__thread_type='academic')
-        ).count()
-    else:
-        # Teachers/Operators: hitung pesan belum dibaca dari siswa for threads assigned to them or unassigned
-        unread_count = Message.objects.filter(
-            Q(thread__teacher_or_admin=user) | Q(thread__teacher_or_admin=None),
-            is_read=False
-        ).exclude(sender=user).count()
+    unread_count = unread_message_count(request.user)
     
     return JsonResponse({'unread_count': unread_count})
 
 
+@login_required
+def message_api_search(request):
+    """API pencarian thread: hasil berperingkat dari inbox user"""
+    query = request.GET.get('q', '').strip()
+    matches = search_threads(request.user, query)
+    threads = MessageThread.objects.in_bulk([thread_id for thread_id, _ in matches])
+    results = [
+        {
+            'id': thread_id,
+            'title': threads[thread_id].title,
+            'status': threads[thread_id].status,
+            'thread_type': threads[thread_id].thread_type,
+            'last_activity': threads[thread_id].last_activity.isoformat(),
+            'rank': round(rank, 6),
+            'url': reverse('message_thread', args=[thread_id]),
+        }
+        for thread_id, rank in matches
+        if thread_id in threads
+    ]
+    return JsonResponse({'query': query, 'results': results})
+
+
 # ======================= SUBSCRIPTION & PAYMENT VIEWS =======================
 
 def subscription_packages(request):
@@ -5523,13 +4654,41 @@ def edit_user_subscription(request, subscription_id):
     
     return render(request, 'admin/subscription/edit_subscription.html', context)
 
+def _ranking_university_info(university_target, utbk_score):
+    """Target achievement info for a ranking row (target universities only, no suggestions)"""
+    recs = university_target.get_recommendations_for_score(utbk_score) if university_target else []
+    total_targets = 0
+    met_targets = 0
+    met_target_type = None
+    for rec in recs:
+        minimum = rec['university'].minimum_utbk_score
+        rec['meets_minimum'] = utbk_score >= minimum
+        rec['achievement_percentage'] = round((utbk_score / minimum) * 100, 1) if minimum > 0 else 0
+        total_targets += 1
+        if rec['meets_minimum']:
+            met_targets += 1
+            if not met_target_type:
+                met_target_type = rec.get('target_type')
+    if total_targets > 0:
+        if met_targets == total_targets:
+            target_achievement_status = 'all_met'
+        elif met_targets > 0:
+            target_achievement_status = 'some_met'
+        else:
+            target_achievement_status = 'none_met'
+    else:
+        target_achievement_status = None
+    return {
+        'recommendations': recs,
+        'target_achievement_status': target_achievement_status,
+        'met_target_type': met_target_type,
+    }
+
+
 @login_required
 @active_subscription_required
 def student_rankings(request):
     """Student rankings page with various filters and sorting options"""
-    from django.db.models import Avg, Max, Count, Q
-    from django.db import models
-    
     # Get filter parameters
     ranking_type = request.GET.get('ranking_type', 'utbk_package_best')  # utbk_package_best, overall_average, category_best, category_average
     category_id = request.GET.get('category_id', '')
@@ -5538,303 +4697,67 @@ def student_rankings(request):
     scoring_method = request.GET.get('scoring_method', 'all')  # all, default, custom, utbk
     min_tests = int(request.GET.get('min_tests', 3))  # Minimum number of tests to qualify
     university_id = request.GET.get('university_id', '')
-    
-    # Base queryset for submitted tests
-    base_tests = Test.objects.filter(is_submitted=True).select_related('student')
-    
-    # Apply time period filter
-    if time_period != 'all':
-        from datetime import datetime, timedelta
-        now = timezone.now()
-        
-        if time_period == 'week':
-            start_date = now - timedelta(days=7)
-        elif time_period == 'month':
-            start_date = now - timedelta(days=30)
-        elif time_period == 'year':
-            start_date = now - timedelta(days=365)
-        
-        base_tests = base_tests.filter(date_taken__gte=start_date)
-    
-    # Apply scoring method filter
-    if scoring_method != 'all':
-        base_tests = base_tests.filter(categories__scoring_method=scoring_method)
-    
-    # Apply category filter if specified
-    if category_id and category_id.isdigit():
-        base_tests = base_tests.filter(categories__id=int(category_id))
-    
-    # Build rankings based on type
-    rankings = []
-    show_utbk_university_info = False
-    utbk_category = None
-    if scoring_method == 'utbk' or (category_id and category_id.isdigit() and Category.objects.filter(id=category_id, scoring_method='utbk').exists()):
-        show_utbk_university_info = True
-        if category_id and category_id.isdigit():
-            utbk_category = Category.objects.filter(id=category_id, scoring_method='utbk').first()
 
+    if time_period not in LEADERBOARD_WINDOWS:
+        time_period = 'all'
+    category_key = int(category_id) if category_id and category_id.isdigit() else 0
+
+    # Get selected category name
+    selected_category = Category.objects.filter(id=category_key).first() if category_key else None
+
+    show_utbk_university_info = scoring_method == 'utbk' or (
+        selected_category is not None and selected_category.scoring_method == 'utbk'
+    )
+
+    # Rankings dibaca dari tabel LeaderboardEntry yang diperbarui setiap kali test disubmit
+    query = None
     if ranking_type == 'utbk_package_best':
-        # Best score per UTBK tryout package (default)
-        # Get all students who have submitted UTBK tryout package tests
-        utbk_tests = Test.objects.filter(is_submitted=True, tryout_package__isnull=False, categories__scoring_method='utbk')
-        if utbk_package_id and utbk_package_id.isdigit():
-            utbk_tests = utbk_tests.filter(tryout_package__id=int(utbk_package_id))
-        if university_id and university_id.isdigit():
-            # Only include students whose best/latest UTBK test has this university as a target
-            utbk_tests = utbk_tests.filter(
-                student__university_target__primary_university_id=university_id
-            ) | utbk_tests.filter(
-                student__university_target__backup_university_id=university_id
-            ) | utbk_tests.filter(
-                student__university_target__secondary_university_id=university_id
-            )
-        # For each student, get their best score in any UTBK tryout package
-        student_best = {}
-        for test in utbk_tests.select_related('student').order_by('-score'):
-            sid = test.student.id
-            if sid not in student_best:
-                student_best[sid] = test
-        # Sort by score
-        sorted_best = sorted(student_best.values(), key=lambda t: t.score, reverse=True)
-        for i, test in enumerate(sorted_best[:50], 1):
-            row = {
-                'rank': i,
-                'student_id': test.student.id,
-                'username': test.student.username,
-                'email': test.student.email,
-                'score': round(test.score, 1),
-                'total_tests': Test.objects.filter(student=test.student, is_submitted=True, tryout_package__isnull=False, categories__scoring_method='utbk').count(),
-                'max_score': round(test.score, 1),
-                'latest_test': test.date_taken,
-                'is_current_user': test.student.id == request.user.id,
-                'latest_test_package_name': test.tryout_package.package_name if test.tryout_package else None,
-                'latest_test_category_name': test.categories.first().category_name if test.categories.exists() else None,
-            }
-            # Add university info for UTBK if applicable
-            recs = test.get_university_recommendations() if hasattr(test, 'get_university_recommendations') else []
-            total_targets = 0
-            met_targets = 0
-            met_target_type = None
-            for rec in recs:
-                if rec.get('target_type') != 'suggested':
-                    total_targets += 1
-                    if rec.get('meets_minimum'):
-                        met_targets += 1
-                        if not met_target_type:
-                            met_target_type = rec.get('target_type')
-            if total_targets > 0:
-                if met_targets == total_targets:
-                    target_achievement_status = 'all_met'
-                elif met_targets > 0:
-                    target_achievement_status = 'some_met'
-                else:
-                    target_achievement_status = 'none_met'
-            else:
-                target_achievement_status = None
-            row['university_info'] = {
-                'recommendations': recs,
-                'target_achievement_status': target_achievement_status,
-                'met_target_type': met_target_type,
-            }
-            rankings.append(row)
+        query = LeaderboardQuery(
+            ranking_type,
+            time_period=time_period,
+            package_key=int(utbk_package_id) if utbk_package_id.isdigit() else 0,
+            university_id=int(university_id) if university_id.isdigit() else None,
+        )
     elif ranking_type == 'overall_average':
-        student_stats = base_tests.values('student__id', 'student__username', 'student__email') \
-            .annotate(
-                avg_score=Avg('score'),
-                total_tests=Count('id'),
-                max_score=Max('score'),
-                latest_test=Max('date_taken')
-            ) \
-            .filter(total_tests__gte=min_tests) \
-            .order_by('-avg_score', '-total_tests')
-        for i, stat in enumerate(student_stats[:50], 1):
-            # Get latest test for this student
-            latest_test_obj = Test.objects.filter(student_id=stat['student__id'], is_submitted=True).order_by('-date_taken').first()
-            ranking_row = {
-                'rank': i,
-                'student_id': stat['student__id'],
-                'username': stat['student__username'],
-                'email': stat['student__email'],
-                'score': round(stat['avg_score'], 1),
-                'total_tests': stat['total_tests'],
-                'max_score': round(stat['max_score'], 1),
-                'latest_test': stat['latest_test'],
-                'is_current_user': stat['student__id'] == request.user.id,
-                'latest_test_package_name': latest_test_obj.tryout_package.package_name if latest_test_obj and latest_test_obj.tryout_package else None,
-                'latest_test_category_name': latest_test_obj.categories.first().category_name if latest_test_obj and latest_test_obj.categories.exists() else None,
-            }
-            # Add university info for UTBK if applicable
-            if show_utbk_university_info:
-                latest_utbk_test = Test.objects.filter(student_id=stat['student__id'], is_submitted=True, categories__scoring_method='utbk').order_by('-date_taken').first()
-                if latest_utbk_test:
-                    recs = latest_utbk_test.get_university_recommendations() if hasattr(latest_utbk_test, 'get_university_recommendations') else []
-                    # Target achievement status logic
-                    total_targets = 0
-                    met_targets = 0
-                    met_target_type = None
-                    for rec in recs:
-                        if rec.get('target_type') != 'suggested':
-                            total_targets += 1
-                            if rec.get('meets_minimum'):
-                                met_targets += 1
-                                if not met_target_type:
-                                    met_target_type = rec.get('target_type')
-                    if total_targets > 0:
-                        if met_targets == total_targets:
-                            target_achievement_status = 'all_met'
-                        elif met_targets > 0:
-                            target_achievement_status = 'some_met'
-                        else:
-                            target_achievement_status = 'none_met'
-                    else:
-                        target_achievement_status = None
-                    ranking_row['university_info'] = {
-                        'recommendations': recs,
-                        'target_achievement_status': target_achievement_status,
-                        'met_target_type': met_target_type,
-                    }
-            rankings.append(ranking_row)
-    elif ranking_type == 'category_best':
-        if category_id and category_id.isdigit():
-            student_stats = base_tests.values('student__id', 'student__username', 'student__email') \
-                .annotate(
-                    best_score=Max('score'),
-                    total_tests=Count('id'),
-                    avg_score=Avg('score'),
-                    latest_test=Max('date_taken')
-                ) \
-                .filter(total_tests__gte=min_tests) \
-                .order_by('-best_score', '-avg_score')
-            for i, stat in enumerate(student_stats[:50], 1):
-                # Get latest test for this student
-                latest_test_obj = Test.objects.filter(student_id=stat['student__id'], is_submitted=True).order_by('-date_taken').first()
-                ranking_row = {
-                    'rank': i,
-                    'student_id': stat['student__id'],
-                    'username': stat['student__username'],
-                    'email': stat['student__email'],
-                    'score': round(stat['best_score'], 1),
-                    'avg_score': round(stat['avg_score'], 1),
-                    'total_tests': stat['total_tests'],
-                    'latest_test': stat['latest_test'],
-                    'is_current_user': stat['student__id'] == request.user.id,
-                    'latest_test_package_name': latest_test_obj.tryout_package.package_name if latest_test_obj and latest_test_obj.tryout_package else None,
-                    'latest_test_category_name': latest_test_obj.categories.first().category_name if latest_test_obj and latest_test_obj.categories.exists() else None,
-                }
-                if show_utbk_university_info:
-                    latest_utbk_test = Test.objects.filter(student_id=stat['student__id'], is_submitted=True, categories__scoring_method='utbk').order_by('-date_taken').first()
-                    if latest_utbk_test:
-                        recs = latest_utbk_test.get_university_recommendations() if hasattr(latest_utbk_test, 'get_university_recommendations') else []
-                        total_targets = 0
-                        met_targets = 0
-                        met_target_type = None
-                        for rec in recs:
-                            if rec.get('target_type') != 'suggested':
-                                total_targets += 1
-                                if rec.get('meets_minimum'):
-                                    met_targets += 1
-                                    if not met_target_type:
-                                        met_target_type = rec.get('target_type')
-                        if total_targets > 0:
-                            if met_targets == total_targets:
-                                target_achievement_status = 'all_met'
-                            elif met_targets > 0:
-                                target_achievement_status = 'some_met'
-                            else:
-                                target_achievement_status = 'none_met'
-                        else:
-                            target_achievement_status = None
-                        ranking_row['university_info'] = {
-                            'recommendations': recs,
-                            'target_achievement_status': target_achievement_status,
-                            'met_target_type': met_target_type,
-                        }
-                rankings.append(ranking_row)
-    elif ranking_type == 'category_average':
-        if category_id and category_id.isdigit():
-            student_stats = base_tests.values('student__id', 'student__username', 'student__email') \
-                .annotate(
-                    avg_score=Avg('score'),
-                    total_tests=Count('id'),
-                    max_score=Max('score'),
-                    latest_test=Max('date_taken')
-                ) \
-                .filter(total_tests__gte=min_tests) \
-                .order_by('-avg_score', '-total_tests')
-            for i, stat in enumerate(student_stats[:50], 1):
-                # Get latest test for this student
-                latest_test_obj = Test.objects.filter(student_id=stat['student__id'], is_submitted=True).order_by('-date_taken').first()
-                ranking_row = {
-                    'rank': i,
-                    'student_id': stat['student__id'],
-                    'username': stat['student__username'],
-                    'email': stat['student__email'],
-                    'score': round(stat['avg_score'], 1),
-                    'total_tests': stat['total_tests'],
-                    'max_score': round(stat['max_score'], 1),
-                    'latest_test': stat['latest_test'],
-                    'is_current_user': stat['student__id'] == request.user.id,
-                    'latest_test_package_name': latest_test_obj.tryout_package.package_name if latest_test_obj and latest_test_obj.tryout_package else None,
-                    'latest_test_category_name': latest_test_obj.categories.first().category_name if latest_test_obj and latest_test_obj.categories.exists() else None,
-                }
-                if show_utbk_university_info:
-                    latest_utbk_test = Test.objects.filter(student_id=stat['student__id'], is_submitted=True, categories__scoring_method='utbk').order_by('-date_taken').first()
-                    if latest_utbk_test:
-                        recs = latest_utbk_test.get_university_recommendations() if hasattr(latest_utbk_test, 'get_university_recommendations') else []
-                        total_targets = 0
-                        met_targets = 0
-                        met_target_type = None
-                        for rec in recs:
-                            if rec.get('target_type') != 'suggested':
-                                total_targets += 1
-                                if rec.get('meets_minimum'):
-                                    met_targets += 1
-                                    if not met_target_type:
-                                        met_target_type = rec.get('target_type')
-                        if total_targets > 0:
-                            if met_targets == total_targets:
-                                target_achievement_status = 'all_met'
-                            elif met_targets > 0:
-                                target_achievement_status = 'some_met'
-                            else:
-                                target_achievement_status = 'none_met'
-                        else:
-                            target_achievement_status = None
-                        ranking_row['university_info'] = {
-                            'recommendations': recs,
-                            'target_achievement_status': target_achievement_status,
-                            'met_target_type': met_target_type,
-                        }
-                rankings.append(ranking_row)
-    
+        if category_key:
+            # Rata-rata keseluruhan yang difilter satu kategori sama dengan rata-rata kategori
+            query = LeaderboardQuery('category_average', time_period=time_period, category_key=category_key, min_tests=min_tests)
+        else:
+            query = LeaderboardQuery(ranking_type, time_period=time_period, scoring_method=scoring_method, min_tests=min_tests)
+    elif ranking_type in ('category_best', 'category_average') and category_key:
+        query = LeaderboardQuery(ranking_type, time_period=time_period, category_key=category_key, min_tests=min_tests)
+
+    if (query is not None and ranking_type != 'utbk_package_best' and selected_category is not None
+            and scoring_method != 'all' and selected_category.scoring_method != scoring_method):
+        # The selected category never matches the requested scoring method
+        query = None
+
+    entries = leaderboard_page(query, student_id=request.user.id) if query is not None else []
+
+    rankings = []
+    for i, entry in enumerate(entries, 1):
+        display_test = entry.display_test
+        row = {
+            'rank': i,
+            'student_id': entry.student_id,
+            'username': entry.student.username,
+            'email': entry.student.email,
+            'score': round(entry.score, 1),
+            'avg_score': round(entry.avg_score, 1),
+            'total_tests': entry.total_tests,
+            'max_score': round(entry.max_score, 1),
+            'latest_test': display_test.date_taken if ranking_type == 'utbk_package_best' and display_test else entry.latest_test_at,
+            'is_current_user': entry.student_id == request.user.id,
+            'latest_test_package_name': display_test.tryout_package.package_name if display_test and display_test.tryout_package else None,
+            'latest_test_category_name': entry.display_category.category_name if entry.display_category else None,
+            'university_score': entry.university_score,
+        }
+        rankings.append(row)
+
     # Get current user's position if not in top 50
     current_user_rank = None
-    if not any(r['is_current_user'] for r in rankings):
-        # Find current user's rank
-        if ranking_type == 'overall_average':
-            user_stats = base_tests.filter(student=request.user) \
-                .aggregate(
-                    avg_score=Avg('score'),
-                    total_tests=Count('id')
-                )
-            
-            if user_stats['total_tests'] and user_stats['total_tests'] >= min_tests:
-                # Count how many students have better average score
-                better_students = base_tests.values('student__id') \
-                    .annotate(
-                        avg_score=Avg('score'),
-                        total_tests=Count('id')
-                    ) \
-                    .filter(
-                        total_tests__gte=min_tests,
-                        avg_score__gt=user_stats['avg_score']
-                    ).count()
-                
-                current_user_rank = {
-                    'rank': better_students + 1,
-                    'score': round(user_stats['avg_score'], 1),
-                    'total_tests': user_stats['total_tests']
-                }
+    if query is not None and not any(r['is_current_user'] for r in rankings):
+        current_user_rank = student_rank(query, request.user.id)
     
     # Get categories for filter dropdown
     categories = Category.objects.filter(
@@ -5843,20 +4766,11 @@ def student_rankings(request):
     # Get universities for filter dropdown
     universities = University.objects.filter(is_active=True).order_by('name')
     # Get UTBK tryout packages for filter dropdown
-    from otosapp.models import TryoutPackage
     utbk_packages = TryoutPackage.objects.filter(
         is_active=True,
         categories__scoring_method='utbk'
     ).distinct().order_by('package_name')
     
-    # Get selected category name
-    selected_category = None
-    if category_id and category_id.isdigit():
-        try:
-            selected_category = Category.objects.get(id=int(category_id))
-        except Category.DoesNotExist:
-            pass
-    
     # Enrich rankings with avatars and chosen university targets
     if rankings:
         try:
@@ -5892,6 +4806,9 @@ def student_rankings(request):
                     if ut.secondary_university_id:
                         targets.append({'label': 'Target Cadangan', 'university': ut.secondary_university})
                 row['user_targets'] = targets
+                # Add university info for UTBK if applicable (uses the batch-loaded targets)
+                if (ranking_type == 'utbk_package_best' or show_utbk_university_info) and row['university_score'] is not None:
+                    row['university_info'] = _ranking_university_info(ut, row['university_score'])
         except Exception as e:
             # Fail-safe: don't break page if enrichment fails
             try:
@@ -5925,12 +4842,9 @@ def student_rankings(request):
                 r['bar_color'] = 'bg-red-500'
 
     # Get some general statistics
-    total_students = User.objects.filter(
-        role__role_name='Student',
-        tests__is_submitted=True
-    ).distinct().count()
-    
-    total_tests_taken = base_tests.count()
+    totals = leaderboard_totals(time_period, scoring_method=scoring_method, category_key=category_key)
+    total_students = totals['total_students']
+    total_tests_taken = totals['total_tests']
     
     context = {
         'rankings': rankings,
@@ -6512,20 +5426,17 @@ def take_package_test_question(request, package_id, question):
         messages.warning(request, 'Waktu tryout telah habis. Test otomatis disubmit.')
         return redirect('test_results', test_id=test.id)
     
-    # Get all questions for this package in order
-    all_questions = []
-    for package_category in package.tryoutpackagecategory_set.all().order_by('order'):
-        category_questions = list(Question.objects.filter(
-            category=package_category.category
-        ).order_by('id'))
-        all_questions.extend(category_questions)
+    # Urutan soal paket diambil dari layout yang di-cache; hanya soal aktif yang dibaca
+    layout = get_package_layout(package)
+    total_questions = layout.total_questions
+    current_question_id = layout.question_id_at(question)
     
     # Validate question number
-    if question < 1 or question > len(all_questions):
+    if current_question_id is None:
         messages.error(request, 'Nomor soal tidak valid.')
         return redirect('tryout_list')
     
-    current_question = all_questions[question - 1]
+    current_question = get_object_or_404(Question, pk=current_question_id)
     choices = current_question.choices.all()
     
     # Get previous answer if exists
@@ -6537,10 +5448,6 @@ def take_package_test_question(request, package_id, question):
     # Get previous text answer if exists (for essay questions)
     previous_text_answer = previous_answer.text_answer if previous_answer and previous_answer.text_answer else ''
     
-    # Update current question position in the test model
-    test.current_question = question
-    test.save(update_fields=['current_question'])
-    
     if request.method == 'POST':
         choice_id = request.POST.get('choice')
         text_answer = request.POST.get('text_answer')
@@ -6548,51 +5455,13 @@ def take_package_test_question(request, package_id, question):
         
         # Handle AJAX requests for saving answers
         is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
-        
-        # Debug logging: record incoming POST attempts for troubleshooting
-        print(f"[DEBUG] take_package_test_question POST - user={getattr(request.user, 'email', request.user)} package_id={package_id} question_index={question} choice_id={choice_id} text_answer={text_answer} is_ajax={is_ajax} test_id={getattr(test, 'id', None)}")
+
+        # Posisi soal hanya disimpan saat siswa berinteraksi, bukan pada setiap GET
+        _remember_question_position(test, question)
 
         if choice_id and current_question.is_multiple_choice():
             choice = get_object_or_404(Choice, id=choice_id, question=current_question)
-            
-            # Check for existing answers and clean up duplicates if any
-            existing_answers = Answer.objects.filter(
-                test=test,
-                question=current_question
-            )
-            
-            if existing_answers.count() > 1:
-                # Keep the first answer and delete the rest
-                first_answer = existing_answers.first()
-                existing_answers.exclude(id=first_answer.id).delete()
-                
-                # Update the remaining answer
-                first_answer.selected_choice = choice
-                first_answer.text_answer = None  # Clear text answer for multiple choice
-                first_answer.save()
-                answer = first_answer
-                created = False
-            elif existing_answers.count() == 1:
-                # Update existing single answer
-                answer = existing_answers.first()
-                answer.selected_choice = choice
-                answer.text_answer = None  # Clear text answer for multiple choice
-                answer.save()
-                created = False
-            else:
-                # Create new answer
-                answer = Answer.objects.create(
-                    test=test,
-                    question=current_question,
-                    selected_choice=choice
-                )
-                created = True
-
-            # Debug logging: report result of save
-            try:
-                print(f"[DEBUG] Multiple choice answer saved - test_id={test.id} question_id={current_question.id} answer_id={answer.id} created={created} selected_choice={getattr(answer.selected_choice, 'id', None)}")
-            except Exception as _e:
-                print(f"[DEBUG] Answer save - exception while logging: {_e}")
+            save_answer(test.id, current_question.id, selected_choice_id=choice.id)
 
             # If this is AJAX, return JSON response
             if is_ajax:
@@ -6600,43 +5469,7 @@ def take_package_test_question(request, package_id, question):
                 
         elif text_answer is not None and current_question.is_essay():
             # Handle essay answer
-            existing_answers = Answer.objects.filter(
-                test=test,
-                question=current_question
-            )
-            
-            if existing_answers.count() > 1:
-                # Keep the first answer and delete the rest
-                first_answer = existing_answers.first()
-                existing_answers.exclude(id=first_answer.id).delete()
-                
-                # Update the remaining answer
-                first_answer.text_answer = text_answer
-                first_answer.selected_choice = None  # Clear selected choice for essay
-                first_answer.save()
-                answer = first_answer
-                created = False
-            elif existing_answers.count() == 1:
-                # Update existing single answer
-                answer = existing_answers.first()
-                answer.text_answer = text_answer
-                answer.selected_choice = None  # Clear selected choice for essay
-                answer.save()
-                created = False
-            else:
-                # Create new answer
-                answer = Answer.objects.create(
-                    test=test,
-                    question=current_question,
-                    text_answer=text_answer
-                )
-                created = True
-
-            # Debug logging: report result of save
-            try:
-                print(f"[DEBUG] Essay answer saved - test_id={test.id} question_id={current_question.id} answer_id={answer.id} created={created} text_answer='{text_answer}'")
-            except Exception as _e:
-                print(f"[DEBUG] Essay answer save - exception while logging: {_e}")
+            save_answer(test.id, current_question.id, text_answer=text_answer)
 
             # If this is AJAX, return JSON response
             if is_ajax:
@@ -6645,7 +5478,7 @@ def take_package_test_question(request, package_id, question):
         # If not AJAX, handle navigation
         if not is_ajax:
             # Handle navigation
-            if action == 'next' and question < len(all_questions):
+            if action == 'next' and question < total_questions:
                 return redirect('take_package_test_question', 
                               package_id=package_id, 
                               question=question + 1)
@@ -6663,17 +5496,14 @@ def take_package_test_question(request, package_id, question):
                 return redirect('test_results', test_id=test.id)
     
     # Calculate progress and answered questions
-    answered_questions = Answer.objects.filter(test=test).count()
-    answered_question_ids = set(Answer.objects.filter(test=test).values_list('question_id', flat=True))
-    answered_question_numbers = []
-    
+    answered_question_ids = list(Answer.objects.filter(test=test).values_list('question_id', flat=True))
+    answered_questions = len(answered_question_ids)
+
     # Map question IDs to question numbers in the package
-    for i, q in enumerate(all_questions):
-        if q.id in answered_question_ids:
-            answered_question_numbers.append(i + 1)
+    answered_question_numbers = layout.numbers_for(answered_question_ids)
     
-    progress = round((answered_questions / len(all_questions)) * 100, 1) if all_questions else 0
-    unanswered_questions = len(all_questions) - answered_questions
+    progress = round((answered_questions / total_questions) * 100, 1) if total_questions else 0
+    unanswered_questions = total_questions - answered_questions
     
     # Time remaining
     time_remaining = None
@@ -6692,7 +5522,7 @@ def take_package_test_question(request, package_id, question):
         'question': current_question,
         'choices': choices,
         'current_question_number': question,
-        'total_questions': len(all_questions),
+        'total_questions': total_questions,
         'previous_answer': previous_answer,
         'previous_text_answer': previous_text_answer,
         'progress': progress,
@@ -6701,31 +5531,61 @@ def take_package_test_question(request, package_id, question):
         'answered_question_numbers': answered_question_numbers,
         'time_remaining': time_remaining,
         'can_go_previous': question > 1,
-        'can_go_next': question < len(all_questions),
-        'is_last_question': question == len(all_questions),
+        'can_go_next': question < total_questions,
+        'is_last_question': question == total_questions,
         'remaining_time': test.get_remaining_time() if test.start_time else 0,
     'is_package': True,
+        # Per-subtest metadata (start index and question count) for client-side navigation
+        'package_subtests': layout.subtests_as_dicts(),
+        'answer_sync_url': reverse('api_sync_test_answers', args=[test.id]),
+        'max_sync_entries': MAX_SYNC_ENTRIES,
     }
-    # Build per-subtest metadata (start index and question count) for client-side navigation
-    try:
-        package_subtests = []
-        running = 1
-        for pc in package.tryoutpackagecategory_set.all().order_by('order'):
-            qcount = Question.objects.filter(category=pc.category).count()
-            package_subtests.append({
-                'category_id': pc.category.id,
-                'category_name': pc.category.category_name,
-                'start': running,
-                'count': qcount,
-            })
-            running += qcount
-        context['package_subtests'] = package_subtests
-    except Exception:
-        context['package_subtests'] = []
     
     return render(request, 'students/tryouts/package_test_question.html', context)
 
 
+@login_required
+@require_POST
+def api_sync_test_answers(request, test_id):
+    """API autosave: terima batch jawaban untuk satu test dan simpan dalam satu transaksi"""
+    test = get_object_or_404(Test, id=test_id, student=request.user)
+    results_url = reverse('test_results', args=[test.id])
+
+    if not test.is_submitted and test.is_time_up():
+        test.is_submitted = True
+        test.end_time = timezone.now()
+        test.calculate_score()
+        return JsonResponse({'status': 'time_up', 'results_url': results_url, 'remaining_time': 0}, status=409)
+    if test.is_submitted:
+        return JsonResponse({'status': 'submitted', 'results_url': results_url, 'remaining_time': 0}, status=409)
+
+    try:
+        payload = json.loads(request.body or b'{}')
+    except (TypeError, ValueError):
+        return JsonResponse({'status': 'error', 'message': 'Payload JSON tidak valid'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'status': 'error', 'message': 'Payload JSON tidak valid'}, status=400)
+
+    try:
+        result = sync_answers(test, payload.get('answers', []))
+    except AnswerSyncError as exc:
+        return JsonResponse({'status': 'error', 'message': str(exc)}, status=400)
+
+    response = {
+        'status': 'success',
+        'saved': result.saved,
+        'cleared': result.cleared,
+        'rejected': result.rejected,
+        'answered_question_ids': result.answered_question_ids,
+        'remaining_time': test.get_remaining_time(),
+    }
+    if test.tryout_package_id:
+        response['answered_question_numbers'] = get_package_layout(test.tryout_package).numbers_for(
+            result.answered_question_ids
+        )
+    return JsonResponse(response)
+
+
 @login_required
 def submit_package_test(request, package_id):
     """Submit package test and calculate results"""
@@ -6790,6 +5650,28 @@ def submit_package_test(request, package_id):
     return redirect('take_package_test_question', package_id=package_id, question=1)
 
 
+# Management command yang dijadwalkan lewat "crons" di vercel.json
+CRON_COMMANDS = {
+    'process-broadcast-jobs': 'process_broadcast_jobs',
+    'expire-subscriptions': 'expire_subscriptions',
+    'refresh-leaderboard': 'refresh_leaderboard',
+}
+
+
+@require_GET
+def cron_run_command(request, task):
+    """Endpoint cron Vercel: jalankan management command terjadwal bila token CRON_SECRET cocok"""
+    command = CRON_COMMANDS.get(task)
+    if not settings.CRON_SECRET or command is None:
+        raise Http404
+    expected = f'Bearer {settings.CRON_SECRET}'.encode()
+    if not secrets.compare_digest(request.headers.get('Authorization', '').encode(), expected):
+        return JsonResponse({'error': 'Unauthorized'}, status=401)
+    output = io.StringIO()
+    call_command(command, stdout=output)
+    return JsonResponse({'task': task, 'output': output.getvalue()})
+
+
 @csrf_exempt
 def api_universities(request):
     """API endpoint untuk pencarian universitas (ajax search)"""